@@ -26,6 +26,9 @@ try:
 except ImportError:
     pass  # dotenv not available, rely on environment
 
+# LLM rate limits are per-test (see reset_llm_rate_limiter); never share a bucket file with a running app
+os.environ.setdefault("LLM_RATE_LIMIT_BACKEND", "memory")
+
 # Archived integration suites (renamed with `arch_` prefix). We keep the notes
 # here as institutional memory in case we ever revive these flows.
 ARCHIVED_MODULE_NOTES = {
@@ -205,3 +208,73 @@ class StubSupabase:
 @pytest.fixture
 def stub_supabase():
     return StubSupabase()
+
+
+@pytest.fixture
+def audio_files():
+    """Factory for n discovered files: call-0.mp3 ... call-{n-1}.mp3"""
+    def make(n):
+        return [{"name": f"call-{i}.mp3", "url": f"https://example.com/call-{i}.mp3"} for i in range(n)]
+    return make
+
+
+@pytest.fixture
+def job_updates():
+    """Rows passed to .update() on a MagicMock Supabase client, in call order"""
+    def updates(supabase):
+        return [c.args[0] for c in supabase.table.return_value.update.call_args_list]
+    return updates
+
+
+@pytest.fixture
+def bulk_import(monkeypatch):
+    """
+    Factory for a BulkImportService on a MagicMock Supabase client.
+    Discovery yields `files` (or runs `discover`), `process_file` replaces
+    _process_file and `limits` sets up limits and progress for calling
+    _process_file directly. HEAD prefetch and content dedup start off;
+    tests that cover them switch them back on with monkeypatch.
+    """
+    from unittest.mock import MagicMock
+    import services.bulk_import_service as bulk_import_service
+    monkeypatch.setattr(bulk_import_service, "BULK_IMPORT_HEAD_CONCURRENCY", 0)
+    monkeypatch.setattr(bulk_import_service, "CONTENT_DEDUP_ENABLED", False)
+
+    def make(files=(), process_file=None, discover=None, limits=None):
+        service = bulk_import_service.BulkImportService(MagicMock())
+
+        async def yield_files(_url):
+            for file_info in files:
+                yield file_info
+
+        monkeypatch.setattr(service, "_iter_audio_files", discover or yield_files)
+        if process_file is not None:
+            monkeypatch.setattr(service, "_process_file", process_file)
+        if limits is not None:
+            service._limits = limits
+            service._progress = bulk_import_service.BulkImportProgress(len(files), limits)
+        return service
+    return make
+
+
+@pytest.fixture(autouse=True)
+def reset_llm_rate_limiter():
+    """Fresh in-memory LLM rate limiter for every test"""
+    import services.llm_rate_limiter as llm_rate_limiter
+    llm_rate_limiter._llm_rate_limiter = None
+    yield
+    llm_rate_limiter._llm_rate_limiter = None
+
+
+@pytest.fixture(autouse=True)
+def reset_llm_router():
+    """Provider health, circuit breakers and hedge budgets start fresh for every test"""
+    import services.llm_router as llm_router
+    import services.llm_hedging as llm_hedging
+    llm_router._llm_router = None
+    llm_router._org_providers_cache.clear()
+    llm_hedging._llm_hedger = None
+    yield
+    llm_router._llm_router = None
+    llm_router._org_providers_cache.clear()
+    llm_hedging._llm_hedger = None
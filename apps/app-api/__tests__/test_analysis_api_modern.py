@@ -1,11 +1,15 @@
+import json
 import sys
 import types
 
+import httpx
+
 import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from api import analysis_api
+from services.llm_router import get_llm_router
 
 
 @pytest.fixture
@@ -73,3 +77,108 @@ def test_analyze_falls_back_when_request_fails(monkeypatch, analysis_client):
     assert response.status_code == 200
     assert "Summary:" in response.json()["analysis"]
 
+
+
+def _sse_events(body):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _mock_openai_stream(monkeypatch, handler):
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(
+        analysis_api.httpx,
+        "AsyncClient",
+        lambda **kwargs: real_client(transport=httpx.MockTransport(handler), **kwargs),
+    )
+
+
+def test_analyze_stream_proxies_openai_tokens(monkeypatch, analysis_client):
+    chunks = [
+        {"choices": [{"delta": {"content": "AI "}}]},
+        {"choices": [{"delta": {"content": "summary"}}]},
+        {"choices": [], "usage": {"prompt_tokens": 12, "completion_tokens": 2}},
+    ]
+    stream_body = "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+    seen = {}
+
+    def handler(request):
+        seen["body"] = json.loads(request.content)
+        return httpx.Response(200, text=stream_body, headers={"content-type": "text/event-stream"})
+
+    monkeypatch.setattr(analysis_api, "os", types.SimpleNamespace(getenv=_fake_getenv_factory(openai_key="key-123")))
+    _mock_openai_stream(monkeypatch, handler)
+
+    response = analysis_client.post("/api/analysis/analyze/stream", json={"prompt": "Discuss renewal options"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(response.text)
+    assert "".join(data["text"] for event, data in events if event == "token") == "AI summary"
+    assert events[-1] == ("done", {"provider": "openai", "usage": {"prompt_tokens": 12, "completion_tokens": 2}})
+    assert seen["body"]["stream"] is True
+    openai = get_llm_router().snapshot()["providers"]["openai"]
+    assert (openai["consecutive_failures"], set(openai["models"])) == (0, {"gpt-4o-mini"})
+    assert openai["models"]["gpt-4o-mini"]["samples"] == 1
+
+
+def test_analyze_stream_falls_back_to_heuristic(monkeypatch, analysis_client):
+    monkeypatch.setattr(analysis_api, "os", types.SimpleNamespace(getenv=_fake_getenv_factory(openai_key="key-123")))
+    _mock_openai_stream(monkeypatch, lambda request: httpx.Response(500, text="boom"))
+
+    response = analysis_client.post("/api/analysis/analyze/stream", json={"prompt": "Customer asked about pricing."})
+    events = _sse_events(response.text)
+    assert events[0][0] == "token" and "Summary:" in events[0][1]["text"]
+    assert events[-1] == ("done", {"provider": "heuristic"})
+    assert get_llm_router().snapshot()["providers"]["openai"]["consecutive_failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_analyze_stream_stops_reading_when_client_disconnects(monkeypatch):
+    chunks = "".join(f"data: {json.dumps({'choices': [{'delta': {'content': f't{i} '}}]})}\n\n" for i in range(50))
+    _mock_openai_stream(monkeypatch, lambda request: httpx.Response(200, text=chunks))
+
+    class FakeRequest:
+        calls = 0
+
+        async def is_disconnected(self):
+            self.calls += 1
+            return self.calls > 2
+
+    events = [e async for e in analysis_api._stream_openai_analysis(FakeRequest(), "prompt", "key-123")]
+    assert len(events) == 2
+    assert all(e.startswith("event: token") for e in events)
+    # The client going away says nothing about OpenAI
+    assert "openai" not in get_llm_router().snapshot()["providers"]
+
+
+def test_analyze_hedges_slow_openai_with_gemini(monkeypatch, analysis_client):
+    import time as _time
+
+    class SlowResponse:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"choices": [{"message": {"content": "slow OpenAI summary"}}]}
+
+    def slow_post(*_args, **_kwargs):
+        _time.sleep(0.5)
+        return SlowResponse()
+
+    async def gemini_summary(prompt):
+        return "Gemini summary"
+
+    monkeypatch.setenv("LLM_HEDGING_ENABLED", "true")
+    monkeypatch.setenv("LLM_HEDGE_MIN_DELAY_MS", "10")
+    monkeypatch.setenv("LLM_HEDGE_DEFAULT_DELAY_MS", "50")
+    monkeypatch.setattr(analysis_api, "os", types.SimpleNamespace(getenv=_fake_getenv_factory(openai_key="key-123")))
+    monkeypatch.setitem(sys.modules, "requests", types.SimpleNamespace(post=slow_post))
+    monkeypatch.setattr(analysis_api, "_hedge_provider", lambda org_id: "gemini")
+    monkeypatch.setattr(analysis_api, "_gemini_summary", gemini_summary)
+
+    response = analysis_client.post("/api/analysis/analyze", json={"prompt": "Discuss renewal options"})
+    assert response.status_code == 200
+    assert response.json()["analysis"] == "Gemini summary"
@@ -0,0 +1,118 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from services import analysis_dag
+from services.analysis_dag import AnalysisDAG, build_call_analysis_dag, get_org_analysis_concurrency
+
+
+class FakeAnalysisService:
+    def __init__(self, category="consult_scheduled", objections=None, delay=0.05):
+        self.category = category
+        self.objections = objections if objections is not None else [{"type": "cost-value"}]
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self.calls = []
+
+    async def _track(self, name, value):
+        self.calls.append(name)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delay)
+        self.running -= 1
+        return value
+
+    async def categorize_call(self, transcript, call_record_id, provider):
+        return await self._track("categorize", {"category": self.category, "call_type": "scheduling"})
+
+    async def detect_objections(self, transcript, call_record_id, provider, segments=None):
+        return await self._track("objections", self.objections)
+
+    async def analyze_objection_overcome(self, transcript, call_record_id, objections, provider):
+        return await self._track("overcome", [{"objection_type": objections[0]["type"]}])
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_run_concurrently():
+    service = FakeAnalysisService()
+    results = await build_call_analysis_dag(service, "t", "cr-1", "heuristic", max_concurrency=2).run()
+
+    assert service.max_running == 2
+    assert service.calls[-1] == "overcome"
+    assert results["overcome"] == [{"objection_type": "cost-value"}]
+
+
+@pytest.mark.asyncio
+async def test_concurrency_one_runs_sequentially():
+    service = FakeAnalysisService()
+    await build_call_analysis_dag(service, "t", "cr-1", "heuristic", max_concurrency=1).run()
+    assert service.max_running == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("category,objections", [("consult_not_scheduled", [{"type": "timing"}]), ("consult_scheduled", [])])
+async def test_overcome_skipped_when_condition_not_met(category, objections):
+    service = FakeAnalysisService(category=category, objections=objections)
+    results = await build_call_analysis_dag(service, "t", "cr-1", "heuristic").run()
+    assert "overcome" not in service.calls
+    assert results["overcome"] is None
+
+
+@pytest.mark.asyncio
+async def test_step_error_cancels_pending_steps():
+    dag = AnalysisDAG(max_concurrency=2)
+    finished = []
+
+    async def boom(_):
+        raise RuntimeError("provider down")
+
+    async def slow(_):
+        await asyncio.sleep(1)
+        finished.append("slow")
+
+    dag.add_step("boom", boom).add_step("slow", slow)
+    with pytest.raises(RuntimeError):
+        await dag.run()
+    assert finished == []
+
+
+@pytest.mark.asyncio
+async def test_unknown_dependency_and_cycle_rejected():
+    async def noop(_):
+        return None
+
+    with pytest.raises(ValueError):
+        await AnalysisDAG().add_step("a", noop, depends_on=["missing"]).run()
+    with pytest.raises(ValueError):
+        await AnalysisDAG().add_step("a", noop, depends_on=["b"]).add_step("b", noop, depends_on=["a"]).run()
+
+
+def _supabase_with(org_rows, settings_rows):
+    supabase = MagicMock()
+
+    def from_(table):
+        chain = MagicMock()
+        rows = org_rows if table == "call_records" else settings_rows
+        chain.select.return_value.eq.return_value.execute.return_value = MagicMock(data=rows)
+        return chain
+
+    supabase.from_.side_effect = from_
+    return supabase
+
+
+def test_org_concurrency_from_settings():
+    supabase = _supabase_with([{"organization_id": "org-1"}], [{"analysis_concurrency": 4}])
+    assert get_org_analysis_concurrency(supabase, "cr-1") == 4
+
+
+def test_org_concurrency_defaults():
+    default = analysis_dag.DEFAULT_ANALYSIS_CONCURRENCY
+    assert get_org_analysis_concurrency(None, "cr-1") == default
+    assert get_org_analysis_concurrency(_supabase_with([], []), "cr-1") == default
+    assert get_org_analysis_concurrency(_supabase_with([{"organization_id": "org-1"}], [{"analysis_concurrency": None}]), "cr-1") == default
+
+    broken = MagicMock()
+    broken.from_.side_effect = Exception("db down")
+    assert get_org_analysis_concurrency(broken, "cr-1") == default
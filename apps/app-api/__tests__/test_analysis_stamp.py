@@ -0,0 +1,158 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+import services.analysis_stamp as stamp
+from services.analysis_dag import run_call_analysis
+from services.call_analysis_service import CallAnalysisService, ObjectionResults
+
+
+class FakeAnalysisService:
+    def __init__(self, reasoning="llm", objections=None, answered_by=None):
+        self.gemini_key = "g"
+        self.openai_key = "o"
+        self.reasoning = reasoning
+        self.objections = [] if objections is None else objections
+        self.answered_by = answered_by
+        self.calls = 0
+
+    async def categorize_call(self, transcript, call_record_id, provider):
+        self.calls += 1
+        return {"category": "other_question", "reasoning": self.reasoning, "provider": self.answered_by}
+
+    async def detect_objections(self, transcript, call_record_id, provider, segments=None):
+        return self.objections
+
+
+def _supabase_with_stamp(transcript_hash=None, analysis_version=None):
+    supabase = MagicMock()
+    table = supabase.table.return_value
+    table.select.return_value.eq.return_value.execute.return_value = MagicMock(
+        data=[{"transcript_hash": transcript_hash, "analysis_version": analysis_version}]
+    )
+    return supabase
+
+
+def _stamp_updates(supabase):
+    return [c.args[0] for c in supabase.table.return_value.update.call_args_list if "transcript_hash" in c.args[0]]
+
+
+def test_transcript_hash_ignores_whitespace_only_changes():
+    assert stamp.transcript_hash("Hello  there\nfriend ") == stamp.transcript_hash("Hello there friend")
+    assert stamp.transcript_hash("Hello there") != stamp.transcript_hash("Hello there!")
+
+
+def test_analysis_version_override(monkeypatch):
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-x")
+    assert stamp.current_analysis_version().endswith("openai:gpt-x")
+    monkeypatch.setenv("ANALYSIS_VERSION", "v42")
+    assert stamp.current_analysis_version() == "v42"
+
+
+def test_analysis_version_names_each_answering_provider_model(monkeypatch):
+    import services.call_analysis_service as call_analysis_service
+
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-x")
+    assert stamp.current_analysis_version(["openai", "gemini"]) == "p1+gemini:gemini-pro,openai:gpt-x"
+    transcript = "Customer asked about pricing"
+    supabase = _supabase_with_stamp(stamp.transcript_hash(transcript), stamp.current_analysis_version(["gemini"]))
+
+    # Only the model of the provider that answered matters
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-y")
+    assert stamp.is_analysis_current(supabase, "cr-1", transcript)
+    monkeypatch.setattr(call_analysis_service, "GEMINI_ANALYSIS_MODELS", ["gemini-2.5-flash"])
+    assert not stamp.is_analysis_current(supabase, "cr-1", transcript)
+
+
+@pytest.mark.asyncio
+async def test_stamp_records_the_providers_that_answered(monkeypatch):
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-x")
+    supabase = _supabase_with_stamp()
+    service = FakeAnalysisService(objections=ObjectionResults(provider="openai"), answered_by="gemini")
+
+    await run_call_analysis(supabase, service, "some call", "cr-1", "gemini", 2)
+
+    assert _stamp_updates(supabase)[0]["analysis_version"] == "p1+gemini:gemini-pro,openai:gpt-x"
+
+
+@pytest.mark.asyncio
+async def test_current_analysis_is_skipped_unless_forced():
+    transcript = "Customer asked about pricing"
+    supabase = _supabase_with_stamp(stamp.transcript_hash(transcript), stamp.current_analysis_version())
+    service = FakeAnalysisService()
+
+    assert await run_call_analysis(supabase, service, transcript, "cr-1", "openai", 2) is None
+    assert service.calls == 0
+
+    results = await run_call_analysis(supabase, service, transcript, "cr-1", "openai", 2, force=True)
+    assert results["categorize"]["category"] == "other_question"
+    assert service.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_changed_transcript_runs_and_stamps():
+    supabase = _supabase_with_stamp(stamp.transcript_hash("old"), stamp.current_analysis_version())
+    service = FakeAnalysisService()
+
+    await run_call_analysis(supabase, service, "new transcript", "cr-1", "openai", 2)
+
+    assert service.calls == 1
+    updates = _stamp_updates(supabase)
+    assert len(updates) == 1
+    assert updates[0]["transcript_hash"] == stamp.transcript_hash("new transcript")
+    assert updates[0]["analysis_version"] == stamp.current_analysis_version()
+
+
+@pytest.mark.asyncio
+async def test_heuristic_fallback_is_not_stamped():
+    supabase = _supabase_with_stamp()
+    service = FakeAnalysisService(reasoning="keywords [HEURISTIC - Last Resort]")
+
+    await run_call_analysis(supabase, service, "some call", "cr-1", "openai", 2)
+
+    assert service.calls == 1
+    assert _stamp_updates(supabase) == []
+
+
+@pytest.mark.asyncio
+async def test_heuristic_or_failed_objections_are_not_stamped():
+    for objections in (ObjectionResults([{"type": "cost-value"}], reliable=False), ObjectionResults(reliable=False)):
+        supabase = _supabase_with_stamp()
+        service = FakeAnalysisService(objections=objections)
+
+        await run_call_analysis(supabase, service, "some call", "cr-1", "openai", 2)
+
+        assert _stamp_updates(supabase) == []
+
+
+@pytest.mark.asyncio
+async def test_objection_detection_reports_heuristic_and_failure(monkeypatch):
+    for key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "GOOGLE_API_KEY", "GOOGLE_SERVICES_API_KEY"):
+        monkeypatch.delenv(key, raising=False)
+    service = CallAnalysisService(MagicMock())
+    service.openai_key = service.gemini_key = None
+
+    heuristic = await service.detect_objections("It is too expensive for me", "cr-1", "openai")
+    assert heuristic.reliable is False
+
+    monkeypatch.setattr(service, "_compact", MagicMock(side_effect=RuntimeError("boom")))
+    failed = await service.detect_objections("It is too expensive for me", "cr-1", "openai")
+    assert failed == [] and failed.reliable is False
+
+
+@pytest.mark.asyncio
+async def test_objection_detection_reports_the_answering_provider(monkeypatch):
+    service = CallAnalysisService(MagicMock())
+    service.openai_key = service.gemini_key = "key"
+    monkeypatch.setattr(service, "_provider_chain", lambda provider: ["gemini", "openai"])
+
+    async def gemini(transcript):
+        raise RuntimeError("503")
+
+    async def openai(transcript):
+        return [{"type": "cost-value", "text": "too expensive", "confidence": 0.9}]
+
+    monkeypatch.setattr(service, "_detect_objections_with_gemini", gemini)
+    monkeypatch.setattr(service, "_detect_objections_with_openai", openai)
+    objections = await service.detect_objections("It is too expensive for me", "cr-1", "gemini")
+    assert (objections.provider, objections.reliable) == ("openai", True)
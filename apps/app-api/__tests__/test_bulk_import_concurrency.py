@@ -0,0 +1,105 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from services.bulk_import_service import BulkImportLimits, BulkImportProgress, DownloadedAudio
+
+
+class Gauge:
+    """Tracks how many coroutines are inside a block at once"""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+
+    async def hold(self, seconds=0.02):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+        await asyncio.sleep(seconds)
+        self.current -= 1
+
+
+@pytest.mark.asyncio
+async def test_default_concurrency_processes_files_one_by_one(bulk_import, audio_files):
+    gauge = Gauge()
+
+    async def process_file(**kwargs):
+        await gauge.hold()
+
+    service = bulk_import(audio_files(4), process_file)
+    await service.process_import_job("job-1", "Acme", "https://example.com", "bucket", "user-1")
+    assert gauge.peak == 1
+    assert service._progress.processed == 4
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_bounds_files_in_flight_and_counts_failures(bulk_import, audio_files, job_updates):
+    gauge = Gauge()
+
+    async def process_file(file_info, **kwargs):
+        await gauge.hold()
+        if file_info["name"] == "call-2.mp3":
+            raise RuntimeError("download failed")
+
+    service = bulk_import(audio_files(8), process_file)
+    await service.process_import_job("job-1", "Acme", "https://example.com", "bucket", "user-1", concurrency=3)
+
+    assert gauge.peak == 3
+    assert (service._progress.processed, service._progress.failed) == (7, 1)
+    progress_updates = [u for u in job_updates(service.supabase) if "stats" in u]
+    # Coalesced: buffered per file, written on flush rather than once per file
+    assert 1 <= len(progress_updates) < 8
+    final = progress_updates[-1]
+    assert (final["processed_files"], final["failed_files"]) == (7, 1)
+    assert final["stats"]["concurrency"]["files"] == 3
+    assert final["stats"]["in_flight"] == {"downloading": 0, "uploading": 0, "transcribing": 0}
+
+
+@pytest.mark.asyncio
+async def test_stage_limits_are_separate_from_file_concurrency(monkeypatch, tmp_path, bulk_import, audio_files):
+    files = audio_files(4)
+    service = bulk_import(files, limits=BulkImportLimits(files=4, download=4, upload=1, transcription=2))
+    downloads, uploads, transcriptions = Gauge(), Gauge(), Gauge()
+
+    async def download(url, suffix=""):
+        await downloads.hold()
+        path = tmp_path / url.rsplit("/", 1)[-1]
+        path.write_bytes(b"audio")
+        return DownloadedAudio(str(path), 5, "hash")
+
+    def upload(*args, **kwargs):
+        assert service._progress.in_flight["uploading"] == 1
+        return MagicMock(path="p")
+
+    async def transcribe(**kwargs):
+        await transcriptions.hold(0.05)
+
+    monkeypatch.setattr(service, "_download_to_temp_file", download)
+    monkeypatch.setattr(service, "_trigger_transcription_and_analysis", transcribe)
+    service.supabase.storage.from_.return_value.upload.side_effect = upload
+
+    await asyncio.gather(*(
+        service._process_file(
+            job_id="job-1", file_info=f, bucket_name="bucket", user_id="user-1",
+            customer_name="Acme", provider="openai"
+        )
+        for f in files
+    ))
+
+    assert downloads.peak == 4
+    assert transcriptions.peak == 2
+    assert service.supabase.storage.from_.return_value.upload.call_count == 4
+
+
+def test_limits_are_clamped():
+    limits = BulkImportLimits(files=500, download=0, upload=-1, transcription=3)
+    assert limits.files == 32
+    assert limits.stage_limits == {"downloading": 1, "uploading": 1, "transcribing": 3}
+
+    progress = BulkImportProgress(10, limits)
+    progress.record(ok=True)
+    progress.record(ok=False)
+    snapshot = progress.snapshot()
+    assert snapshot["progress_percentage"] == 20.0
+    assert snapshot["eta_seconds"] is not None
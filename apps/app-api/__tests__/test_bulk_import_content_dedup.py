@@ -0,0 +1,103 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+import services.bulk_import_service as bulk_import_service
+from services.bulk_import_service import BulkImportLimits, DownloadedAudio
+
+FILE = {"name": "a.mp3", "url": "https://x/a.mp3"}
+EARLIER = {"id": "file-0", "call_record_id": "cr-0", "storage_path": "u/job-0/a.mp3", "file_size": 2048}
+
+
+@pytest.fixture
+def dedup_service(monkeypatch, tmp_path, bulk_import):
+    """Factory for a service importing FILE; matches: filters dict -> earlier file, for the duplicate lookup"""
+    monkeypatch.setattr(bulk_import_service, "CONTENT_DEDUP_ENABLED", True)
+
+    def make(head, matches):
+        service = bulk_import([FILE], limits=BulkImportLimits(files=1))
+        service._file_ids = {FILE["url"]: "file-1"}
+        lookups, downloads, triggered = [], [], []
+
+        async def head_metadata(_url):
+            return head
+
+        async def find_duplicate(file_id, user_id, filters):
+            lookups.append(filters)
+            return next((f for key, f in matches if key.items() <= filters.items()), None)
+
+        async def download(url, suffix=""):
+            downloads.append(url)
+            path = tmp_path / "a.mp3"
+            path.write_bytes(b"audio")
+            return DownloadedAudio(str(path), 5, "sha-a")
+
+        async def trigger(**kwargs):
+            triggered.append(kwargs["call_record_id"])
+
+        monkeypatch.setattr(service, "_head_metadata", head_metadata)
+        monkeypatch.setattr(service, "_find_duplicate", find_duplicate)
+        monkeypatch.setattr(service, "_download_to_temp_file", download)
+        monkeypatch.setattr(service, "_trigger_transcription_and_analysis", trigger)
+        service.supabase.storage.from_.return_value.upload.return_value = MagicMock(path="p")
+        return service, lookups, downloads, triggered
+    return make
+
+
+async def _process(service):
+    await service._process_file(
+        job_id="job-1", file_info=FILE,
+        bucket_name="bucket", user_id="u", customer_name="Acme", provider="openai"
+    )
+
+
+@pytest.mark.asyncio
+async def test_strong_etag_match_skips_download(dedup_service, job_updates):
+    head = {"etag": '"abc"', "content_length": 2048}
+    service, lookups, downloads, triggered = dedup_service(head, [({"etag": '"abc"'}, EARLIER)])
+
+    await _process(service)
+
+    assert downloads == [] and triggered == []
+    linked = job_updates(service.supabase)[-1]
+    assert (linked["status"], linked["duplicate_of"], linked["call_record_id"]) == ("completed", "file-0", "cr-0")
+    assert linked["storage_path"] == "u/job-0/a.mp3"
+    snapshot = service._progress.snapshot()
+    assert (snapshot["skipped_duplicates"], snapshot["skipped_duplicate_bytes"]) == (1, 2048)
+
+
+@pytest.mark.asyncio
+async def test_weak_etag_falls_through_to_content_hash(dedup_service, job_updates, tmp_path):
+    head = {"etag": 'W/"abc"', "content_length": 5}
+    service, lookups, downloads, triggered = dedup_service(
+        head, [({"content_sha256": "sha-a"}, EARLIER)]
+    )
+
+    await _process(service)
+
+    assert lookups == [{"content_sha256": "sha-a"}]
+    assert downloads == ["https://x/a.mp3"] and triggered == []
+    service.supabase.storage.from_.return_value.upload.assert_not_called()
+    linked = job_updates(service.supabase)[-1]
+    assert (linked["duplicate_of"], linked["content_sha256"], linked["file_size"]) == ("file-0", "sha-a", 5)
+    assert service._progress.duplicates == 1
+    assert not list(tmp_path.iterdir())  # temp file removed
+
+
+@pytest.mark.asyncio
+async def test_new_content_is_imported_with_source_metadata(dedup_service, job_updates):
+    head = {"etag": '"new"', "content_length": 5, "last_modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    service, lookups, downloads, triggered = dedup_service(head, [])
+    service._create_call_record = MagicMock(side_effect=lambda **kw: _async({"id": "cr-1"}))
+
+    await _process(service)
+
+    assert lookups[0] == {"etag": '"new"', "content_length": 5, "last_modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert triggered == ["cr-1"]
+    stored = next(u for u in job_updates(service.supabase) if "storage_path" in u)
+    assert (stored["etag"], stored["content_length"], stored["content_sha256"]) == ('"new"', 5, "sha-a")
+    assert service._progress.duplicates == 0
+
+
+async def _async(value):
+    return value
@@ -0,0 +1,93 @@
+from unittest.mock import MagicMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import bulk_import_api
+from services.bulk_import_service import DiscoveryManifest
+
+
+def test_manifest_rows_and_counts():
+    supabase = MagicMock()
+    tables = {}
+    supabase.table.side_effect = lambda name: tables.setdefault(name, MagicMock())
+    manifest = DiscoveryManifest(supabase, "job-1")
+    files = [
+        {"name": "a.mp3", "url": "https://x/a.mp3"},
+        {"name": "b.mp3", "url": "https://x/b.mp3", "file_id": "drive-b"},
+        {"name": "a.mp3", "url": "https://x/a.mp3"},
+        {"name": "a.mp3", "url": "https://x/a.mp3"},
+    ]
+
+    assert [manifest.add(f) for f in files] == [True, True, False, False]
+    manifest.reset()
+    manifest.save()
+
+    rows = tables["bulk_import_discovery_entries"].upsert.call_args.args[0]
+    assert [(r["position"], r["url"], r["occurrences"], r["source_file_id"]) for r in rows] == [
+        (0, "https://x/a.mp3", 3, None),
+        (1, "https://x/b.mp3", 1, "drive-b"),
+    ]
+    tables["bulk_import_jobs"].update.assert_called_once_with(
+        {"discovered_files": 4, "unique_files": 2, "duplicate_urls": 1}
+    )
+    # Nothing is serialized into error_message any more
+    assert all("error_message" not in c.args[0] for c in tables["bulk_import_jobs"].update.call_args_list)
+
+
+def _status_client(job, entries, duplicates):
+    supabase = MagicMock()
+    tables = {name: MagicMock() for name in ("bulk_import_jobs", "bulk_import_discovery_entries", "bulk_import_files")}
+    supabase.table.side_effect = lambda name: tables[name]
+    tables["bulk_import_jobs"].select.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(data=[job])
+    manifest = tables["bulk_import_discovery_entries"].select.return_value.eq.return_value
+    manifest.order.return_value.range.return_value.execute.return_value = MagicMock(data=entries)
+    manifest.gt.return_value.order.return_value.limit.return_value.execute.return_value = MagicMock(data=duplicates)
+
+    app = FastAPI()
+    app.include_router(bulk_import_api.router)
+    app.dependency_overrides[bulk_import_api.get_current_user] = lambda: {"id": "user-1"}
+    return TestClient(app), supabase, tables
+
+
+def test_status_returns_page_of_entries_and_stored_counts():
+    job = {
+        "id": "job-1", "status": "converting", "customer_name": "Acme", "total_files": 2,
+        "processed_files": 0, "failed_files": 0, "error_message": None,
+        "discovered_files": 4, "unique_files": 2, "duplicate_urls": 1,
+        "created_at": "2025-01-01T00:00:00Z", "updated_at": "2025-01-01T00:00:00Z",
+    }
+    entries = [{"position": 1, "name": "b.mp3", "url": "https://x/b.mp3", "source_file_id": None, "occurrences": 1}]
+    client, supabase, tables = _status_client(job, entries, [{"url": "https://x/a.mp3", "occurrences": 3}])
+
+    with patch("api.bulk_import_api.get_supabase_client", return_value=supabase):
+        response = client.get("/api/bulk-import/status/job-1?entries_offset=1&entries_limit=1")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["discovered_files"], body["unique_files"]) == (4, 2)
+    details = body["discovery_details"]
+    assert details["entries"] == [{"name": "b.mp3", "url": "https://x/b.mp3", "file_id": None, "occurrences": 1}]
+    assert details["duplicates_by_url"] == [{"url": "https://x/a.mp3", "count": 3}]
+    tables["bulk_import_discovery_entries"].select.return_value.eq.return_value.order.return_value.range.assert_called_once_with(1, 1)
+    # Counts come from the job row, not from counting bulk_import_files
+    tables["bulk_import_files"].select.assert_not_called()
+
+
+def test_status_still_reads_legacy_discovery_json():
+    job = {
+        "id": "job-1", "status": "completed", "customer_name": "Acme", "total_files": 1,
+        "processed_files": 1, "failed_files": 0,
+        "error_message": 'DISCOVERY_JSON::{"discovered": 1, "entries": [{"name": "a.mp3"}]}',
+        "created_at": "2025-01-01T00:00:00Z", "updated_at": "2025-01-01T00:00:00Z",
+    }
+    client, supabase, tables = _status_client(job, [], [])
+    tables["bulk_import_files"].select.return_value.eq.return_value.execute.return_value = MagicMock(count=1)
+
+    with patch("api.bulk_import_api.get_supabase_client", return_value=supabase):
+        body = client.get("/api/bulk-import/status/job-1").json()
+
+    assert body["discovery_details"]["discovered"] == 1
+    # Legacy jobs have no stored unique count, so the files are counted
+    assert (body["discovered_files"], body["unique_files"]) == (1, 1)
+    tables["bulk_import_discovery_entries"].select.assert_not_called()
@@ -0,0 +1,60 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+import services.bulk_import_service as bulk_import_service
+
+
+def _upsert_returns_ids(supabase):
+    def upsert(rows, on_conflict=""):
+        assert on_conflict == "job_id,original_url"
+        rows = rows if isinstance(rows, list) else [rows]
+        query = MagicMock()
+        query.execute.return_value = MagicMock(
+            data=[{**row, "id": f"id-{row['original_url'].rsplit('/', 1)[-1]}"} for row in rows]
+        )
+        return query
+
+    supabase.table.return_value.upsert.side_effect = upsert
+
+
+@pytest.mark.asyncio
+async def test_file_records_are_created_in_batches(monkeypatch, bulk_import, audio_files):
+    monkeypatch.setattr(bulk_import_service, "FILE_RECORD_BATCH_SIZE", 2)
+    service = bulk_import()
+    _upsert_returns_ids(service.supabase)
+
+    await service._upsert_file_records("job-1", audio_files(5) + [{"name": "no-url.mp3"}])
+
+    assert service.supabase.table.return_value.upsert.call_count == 3
+    assert service._file_ids["https://example.com/call-4.mp3"] == "id-call-4.mp3"
+    assert len(service._file_ids) == 5
+    service.supabase.table.return_value.select.assert_not_called()
+    service.supabase.table.return_value.insert.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_import_job_never_looks_file_records_up(monkeypatch, bulk_import, audio_files):
+    service = bulk_import(audio_files(3) + audio_files(1))  # duplicate URL
+    _upsert_returns_ids(service.supabase)
+    seen = []
+
+    async def download(url, suffix=""):
+        seen.append(service._file_ids.get(url))
+        raise RuntimeError("offline")
+
+    monkeypatch.setattr(service, "_download_to_temp_file", download)
+
+    await service.process_import_job("job-1", "Acme", "https://example.com", "bucket", "user-1")
+
+    assert seen == ["id-call-0.mp3", "id-call-1.mp3", "id-call-2.mp3"]
+    # One batched upsert for all files; downloads and failures use the ids from it
+    file_upserts = [
+        c for c in service.supabase.table.return_value.upsert.call_args_list if "original_url" in c.args[0][0]
+    ]
+    assert len(file_upserts) == 1
+    file_updates = [
+        c.args[0] for c in service.supabase.table.return_value.update.call_args_list
+        if c.args[0].get("status") == "failed" and "error_message" in c.args[0]
+    ]
+    assert len(file_updates) == 3
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+import services.bulk_import_service as bulk_import_service
+
+
+@pytest.fixture(autouse=True)
+def write_discovery_counts_at_once(monkeypatch):
+    monkeypatch.setattr(bulk_import_service, "BULK_IMPORT_DISCOVERY_BATCH_SECONDS", 0)
+
+
+@pytest.mark.asyncio
+async def test_files_are_processed_while_discovery_runs(bulk_import, audio_files, job_updates):
+    files = audio_files(3)
+    first_processed = asyncio.Event()
+    processed = []
+
+    async def discover(_url):
+        yield files[0]
+        # Only continues once a worker has picked up the first file
+        await first_processed.wait()
+        for f in (files[1], files[0], files[2]):  # call-0 again
+            yield f
+
+    async def process_file(file_info, **kwargs):
+        processed.append(file_info["name"])
+        first_processed.set()
+
+    service = bulk_import(process_file=process_file, discover=discover)
+    await asyncio.wait_for(
+        service.process_import_job("job-1", "Acme", "https://example.com", "bucket", "user-1"), timeout=5
+    )
+
+    assert processed == ["call-0.mp3", "call-1.mp3", "call-2.mp3"]
+    totals = [u["total_files"] for u in job_updates(service.supabase) if "total_files" in u]
+    assert totals == [1, 2, 3, 3]
+    final = [u for u in job_updates(service.supabase) if "discovered_files" in u][-1]
+    assert (final["discovered_files"], final["unique_files"], final["duplicate_urls"]) == (4, 3, 1)
+    assert service._progress.snapshot()["discovering"] is False
+
+
+@pytest.mark.asyncio
+async def test_full_queue_pauses_discovery(monkeypatch, bulk_import, audio_files):
+    monkeypatch.setattr(bulk_import_service, "BULK_IMPORT_DISCOVERY_QUEUE_SIZE", 1)
+    started = []
+    ahead = []
+
+    async def discover(_url):
+        for i, file_info in enumerate(audio_files(8)):
+            ahead.append(i - len(started))
+            yield file_info
+
+    async def process_file(file_info, **kwargs):
+        started.append(file_info["name"])
+        await asyncio.sleep(0.01)
+
+    service = bulk_import(process_file=process_file, discover=discover)
+    await service.process_import_job("job-1", "Acme", "https://example.com", "bucket", "user-1")
+
+    assert len(started) == 8
+    # One file in the worker, one in the queue, one being handed over
+    assert max(ahead) <= 3
+
+
+@pytest.mark.asyncio
+async def test_discovery_failure_stops_workers_and_fails_job(bulk_import, audio_files, job_updates):
+    async def discover(_url):
+        yield audio_files(1)[0]
+        raise RuntimeError("folder listing expired")
+
+    async def process_file(file_info, **kwargs):
+        await asyncio.sleep(10)
+
+    service = bulk_import(process_file=process_file, discover=discover)
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(
+            service.process_import_job("job-1", "Acme", "https://example.com", "bucket", "user-1"), timeout=5
+        )
+
+    statuses = [u.get("status") for u in job_updates(service.supabase)]
+    assert statuses[-1] == "failed"
@@ -0,0 +1,95 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+import services.bulk_import_service as bulk_import_service
+from services.bulk_import_service import BulkImportLimits, BulkImportProgress, order_files
+
+SOURCES = {
+    "https://x/small.mp3": {"content_length": 1_000, "content_type": "audio/mpeg"},
+    "https://x/big.wav": {"content_length": 50_000, "content_type": "audio/wav"},
+    "https://x/huge.wav": {"content_length": 5 * 1024 ** 3, "content_type": "audio/wav"},
+    "https://x/login.mp3": {"content_length": 300, "content_type": "text/html; charset=utf-8"},
+    "https://x/unknown.mp3": {},
+}
+
+
+def _stub_sources(monkeypatch, service):
+    """HEAD answers from SOURCES; returns HEAD concurrency and recorded failures"""
+    in_flight = {"now": 0, "peak": 0}
+
+    async def head_metadata(url):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        return dict(SOURCES[url])
+
+    failures = []
+
+    async def record_failure(job_id, file_info, error):
+        failures.append((file_info["name"], str(error)))
+
+    monkeypatch.setattr(service, "_head_metadata", head_metadata)
+    monkeypatch.setattr(service, "_record_file_failure", record_failure)
+    return in_flight, failures
+
+
+@pytest.mark.asyncio
+async def test_prefetch_rejects_before_download_and_orders_shortest_first(monkeypatch, bulk_import):
+    monkeypatch.setattr(bulk_import_service, "BULK_IMPORT_HEAD_CONCURRENCY", 3)
+    files = [{"name": url.rsplit("/", 1)[-1], "url": url} for url in SOURCES]
+    service = bulk_import(files, limits=BulkImportLimits(files=1))
+    in_flight, failures = _stub_sources(monkeypatch, service)
+
+    ordered = await service._prefetch_metadata("job-1", files, "shortest_first")
+
+    assert [f["name"] for f in ordered] == ["small.mp3", "big.wav", "unknown.mp3"]
+    assert in_flight["peak"] == 3
+    assert [name for name, _ in failures] == ["huge.wav", "login.mp3"]
+    assert "exceeds maximum" in failures[0][1] and "text/html" in failures[1][1]
+
+    snapshot = service._progress.snapshot()
+    assert (snapshot["rejected_before_download"], snapshot["failed"]) == (2, 2)
+    assert (snapshot["total_bytes"], snapshot["unknown_size_files"]) == (51_000, 1)
+
+
+def test_largest_first_and_discovery_order():
+    files = [
+        {"name": "a", "source": {"content_length": 10}},
+        {"name": "b", "source": {}},
+        {"name": "c", "source": {"content_length": 30}},
+    ]
+    assert [f["name"] for f in order_files(files, "largest_first")] == ["c", "a", "b"]
+    assert [f["name"] for f in order_files(files, "discovery")] == ["a", "b", "c"]
+
+
+def test_eta_uses_bytes_when_every_size_is_known():
+    progress = BulkImportProgress(2, BulkImportLimits(files=1))
+    progress.expect_bytes(100)
+    progress.expect_bytes(300)
+    progress._started -= 10
+    progress.record(ok=True, size=100)
+
+    # 100 bytes in ~10s leaves ~30s for the remaining 300 bytes (a file count would say ~10s)
+    assert 25 <= progress.snapshot()["eta_seconds"] <= 31
+
+
+@pytest.mark.asyncio
+async def test_prefetched_metadata_is_reused_for_the_duplicate_check(monkeypatch, bulk_import):
+    service = bulk_import()
+    service._file_ids = {"https://x/a.mp3": "file-1"}
+    service._head_metadata = MagicMock(side_effect=AssertionError("no second HEAD"))
+    seen = []
+
+    async def find_by_source(file_id, user_id, source):
+        seen.append(source)
+        return {"id": "file-0", "call_record_id": "cr-0", "storage_path": "p"}
+
+    monkeypatch.setattr(service, "_find_duplicate_by_source", find_by_source)
+    await service._process_file(
+        job_id="job-1", file_info={"name": "a.mp3", "url": "https://x/a.mp3", "source": {"etag": '"e"', "content_length": 5}},
+        bucket_name="bucket", user_id="u", customer_name="Acme", provider="openai"
+    )
+    assert seen == [{"etag": '"e"', "content_length": 5}]
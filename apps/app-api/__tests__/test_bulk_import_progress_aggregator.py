@@ -0,0 +1,101 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from services.bulk_import_service import BulkImportService, ProgressAggregator
+
+
+def _writes(supabase):
+    """(table, updates, ids) for every UPDATE issued"""
+    writes = []
+
+    def table(name):
+        t = MagicMock()
+
+        def update(updates):
+            q = MagicMock()
+            q.eq.side_effect = lambda col, value: MagicMock(
+                execute=lambda: writes.append((name, dict(updates), [value]))
+            )
+            q.in_.side_effect = lambda col, values: MagicMock(
+                execute=lambda: writes.append((name, dict(updates), list(values)))
+            )
+            return q
+
+        t.update.side_effect = update
+        return t
+
+    supabase.table.side_effect = table
+    return writes
+
+
+@pytest.mark.asyncio
+async def test_changes_coalesce_into_grouped_writes():
+    supabase = MagicMock()
+    writes = _writes(supabase)
+    aggregator = ProgressAggregator(supabase, "job-1", flush_interval=60, flush_every=1000)
+
+    for i in range(10):
+        await aggregator.update_file(f"f{i}", {"status": "downloading"})
+        await aggregator.update_file(f"f{i}", {"status": "uploading"})
+    await aggregator.update_job({"processed_files": 1})
+    await aggregator.update_job({"processed_files": 2})
+    assert writes == []
+
+    await aggregator.close()
+    assert sorted(writes, key=lambda w: w[0]) == [
+        ("bulk_import_files", {"status": "uploading"}, [f"f{i}" for i in range(10)]),
+        ("bulk_import_jobs", {"processed_files": 2}, ["job-1"]),
+    ]
+    assert (aggregator.changes, aggregator.writes) == (22, 2)
+
+
+@pytest.mark.asyncio
+async def test_terminal_states_and_batch_size_flush_immediately():
+    supabase = MagicMock()
+    writes = _writes(supabase)
+    aggregator = ProgressAggregator(supabase, "job-1", flush_interval=60, flush_every=3)
+
+    await aggregator.update_file("f1", {"status": "uploading"})
+    await aggregator.update_file("f1", {"status": "failed", "error_message": "boom"})
+    assert writes == [("bulk_import_files", {"status": "failed", "error_message": "boom"}, ["f1"])]
+
+    for i in range(3):
+        await aggregator.update_job({"processed_files": i})
+    assert writes[-1] == ("bulk_import_jobs", {"processed_files": 2}, ["job-1"])
+
+
+@pytest.mark.asyncio
+async def test_timer_flushes_within_interval():
+    supabase = MagicMock()
+    writes = _writes(supabase)
+    aggregator = ProgressAggregator(supabase, "job-1", flush_interval=0.02, flush_every=1000)
+    aggregator.start()
+    try:
+        await aggregator.update_file("f1", {"status": "downloading"})
+        await asyncio.sleep(0.1)
+        assert writes == [("bulk_import_files", {"status": "downloading"}, ["f1"])]
+    finally:
+        await aggregator.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_retried_under_newer_changes():
+    supabase = MagicMock()
+    supabase.table.return_value.update.return_value.eq.return_value.execute.side_effect = [RuntimeError("down"), None]
+    aggregator = ProgressAggregator(supabase, "job-1", flush_interval=60, flush_every=1000)
+
+    await aggregator.update_file("f1", {"status": "uploading", "file_size": 10})
+    await aggregator.flush()
+    await aggregator.update_file("f1", {"status": "transcribing"})
+    await aggregator.flush()
+
+    assert supabase.table.return_value.update.call_args.args[0] == {"status": "transcribing", "file_size": 10}
+
+
+@pytest.mark.asyncio
+async def test_service_writes_directly_outside_a_job():
+    service = BulkImportService(MagicMock())
+    await service._update_file_status("f1", "uploading")
+    service.supabase.table.return_value.update.assert_called_once_with({"status": "uploading", "error_message": None})
@@ -0,0 +1,128 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+import services.bulk_import_service as bulk_import_service
+from services.bulk_import_service import (
+    BulkImportService,
+    resume_bulk_import_jobs,
+    start_bulk_import_job,
+)
+
+
+@pytest.mark.asyncio
+async def test_resumed_job_skips_finished_and_uploaded_work(monkeypatch, bulk_import, audio_files):
+    service = bulk_import(audio_files(5))
+    existing = {
+        "https://example.com/call-0.mp3": {"status": "completed"},
+        "https://example.com/call-1.mp3": {"status": "failed"},
+        "https://example.com/call-2.mp3": {
+            "status": "analyzing", "storage_path": "u/job-1/call-2.mp3", "call_record_id": "cr-2"
+        },
+        "https://example.com/call-3.mp3": {"status": "transcribing", "storage_path": "u/job-1/call-3.mp3"},
+    }
+
+    def upsert(rows, on_conflict=""):
+        query = MagicMock()
+        query.execute.return_value = MagicMock(data=[
+            {**row, "id": f"id-{i}", "status": "pending", **existing.get(row["original_url"], {})}
+            for i, row in enumerate(rows)
+        ])
+        return query
+
+    service.supabase.table.return_value.upsert.side_effect = upsert
+    downloads, triggered, created = [], [], []
+
+    async def download_and_store(job_id, file_id, file_info, bucket_name, user_id, source=None):
+        downloads.append(file_info["url"])
+        return f"{user_id}/{job_id}/{file_info['name']}"
+
+    async def create_call_record(**kwargs):
+        created.append(kwargs["file_name"])
+        return {"id": f"cr-new-{kwargs['file_name']}"}
+
+    async def trigger(**kwargs):
+        triggered.append((kwargs["file_name"], kwargs["call_record_id"]))
+
+    monkeypatch.setattr(service, "_download_and_store", download_and_store)
+    monkeypatch.setattr(service, "_create_call_record", create_call_record)
+    monkeypatch.setattr(service, "_trigger_transcription_and_analysis", trigger)
+
+    await service.process_import_job("job-1", "Acme", "https://example.com", "bucket", "u")
+
+    assert downloads == ["https://example.com/call-4.mp3"]
+    assert created == ["call-3.mp3", "call-4.mp3"]
+    assert triggered == [
+        ("call-2.mp3", "cr-2"), ("call-3.mp3", "cr-new-call-3.mp3"), ("call-4.mp3", "cr-new-call-4.mp3")
+    ]
+    assert (service._progress.processed, service._progress.failed) == (4, 1)
+
+
+def _job():
+    return {
+        "id": "job-1", "customer_name": "Acme", "source_url": "https://example.com",
+        "storage_bucket_name": "bucket", "user_id": "u", "provider": "gemini", "concurrency": 2,
+    }
+
+
+@pytest.mark.asyncio
+async def test_started_job_runs_once_under_lease_and_releases_it(monkeypatch, job_updates):
+    supabase = MagicMock()
+    claim = supabase.table.return_value.update.return_value.eq.return_value.in_.return_value.or_.return_value
+    claim.execute.return_value = MagicMock(data=[_job()])
+    calls = []
+    release = asyncio.Event()
+
+    async def process_import_job(self, **kwargs):
+        calls.append(kwargs)
+        await release.wait()
+
+    monkeypatch.setattr(BulkImportService, "process_import_job", process_import_job)
+
+    assert start_bulk_import_job(supabase, "job-1")
+    assert not start_bulk_import_job(supabase, "job-1")  # already running here
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.sleep(0.01)
+
+    assert len(calls) == 1
+    assert (calls[0]["provider"], calls[0]["concurrency"]) == ("gemini", 2)
+    released = job_updates(supabase)
+    assert released[-1] == {"lease_owner": None, "lease_expires_at": None}
+    assert "job-1" not in bulk_import_service._running_imports
+
+
+@pytest.mark.asyncio
+async def test_lost_lease_stops_the_job(monkeypatch):
+    monkeypatch.setattr(bulk_import_service, "BULK_IMPORT_LEASE_SECONDS", 0.03)
+    monkeypatch.setattr(bulk_import_service, "claim_bulk_import_job", lambda supabase, job_id: _job())
+    monkeypatch.setattr(bulk_import_service, "renew_bulk_import_lease", lambda supabase, job_id: False)
+    stopped = asyncio.Event()
+
+    async def process_import_job(self, **kwargs):
+        try:
+            await asyncio.sleep(5)
+        finally:
+            stopped.set()
+
+    monkeypatch.setattr(BulkImportService, "process_import_job", process_import_job)
+
+    assert start_bulk_import_job(MagicMock(), "job-1")
+    await asyncio.wait_for(stopped.wait(), timeout=1)
+    await asyncio.sleep(0)
+    assert "job-1" not in bulk_import_service._running_imports
+
+
+@pytest.mark.asyncio
+async def test_sweep_starts_unowned_jobs(monkeypatch):
+    supabase = MagicMock()
+    sweep = supabase.table.return_value.select.return_value.in_.return_value.or_.return_value
+    sweep.execute.return_value = MagicMock(data=[{"id": "job-1"}, {"id": "job-2"}])
+    started = []
+    monkeypatch.setattr(
+        bulk_import_service, "start_bulk_import_job", lambda supabase, job_id: started.append(job_id) or job_id == "job-1"
+    )
+
+    assert resume_bulk_import_jobs(supabase) == ["job-1"]
+    assert started == ["job-1", "job-2"]
@@ -0,0 +1,118 @@
+import hashlib
+import os
+from unittest.mock import MagicMock
+
+import pytest
+
+import services.bulk_import_service as bulk_import_service
+from services.bulk_import_service import BulkImportService
+
+
+class FakeContent:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.read = 0
+
+    async def iter_chunked(self, _size):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+
+class FakeResponse:
+    def __init__(self, chunks, status=200, content_length=None):
+        self.status = status
+        self.content_length = content_length
+        self.content = FakeContent(chunks)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, _url):
+        return self.response
+
+
+def _service(tmp_path, monkeypatch, response):
+    monkeypatch.setattr(bulk_import_service, "BULK_IMPORT_TEMP_DIR", str(tmp_path))
+    service = BulkImportService(MagicMock())
+    service.session = FakeSession(response)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_download_streams_to_disk_with_size_and_hash(tmp_path, monkeypatch):
+    chunks = [b"a" * 1000, b"b" * 1000, b"c" * 24]
+    service = _service(tmp_path, monkeypatch, FakeResponse(chunks))
+
+    download = await service._download_to_temp_file("https://example.com/a.mp3", ".mp3")
+
+    assert download.size == 2024
+    assert download.sha256 == hashlib.sha256(b"".join(chunks)).hexdigest()
+    with open(download.path, "rb") as f:
+        assert f.read() == b"".join(chunks)
+    download.cleanup()
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_oversized_download_stops_early_and_removes_temp_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_import_service, "MAX_FILE_SIZE", 1500)
+    response = FakeResponse([b"a" * 1000, b"b" * 1000, b"c" * 1000])
+    service = _service(tmp_path, monkeypatch, response)
+
+    with pytest.raises(Exception, match="exceeds maximum"):
+        await service._download_to_temp_file("https://example.com/a.mp3", ".mp3")
+
+    assert response.content.read == 2
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_declared_length_over_limit_is_rejected_before_reading(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_import_service, "MAX_FILE_SIZE", 1500)
+    response = FakeResponse([b"a" * 1000], content_length=5000)
+    service = _service(tmp_path, monkeypatch, response)
+
+    with pytest.raises(Exception, match="exceeds maximum"):
+        await service._download_to_temp_file("https://example.com/a.mp3", ".mp3")
+
+    assert response.content.read == 0
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_process_file_uploads_file_object_and_records_hash(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_import_service, "CONTENT_DEDUP_ENABLED", False)
+    chunks = [b"x" * 4096, b"y" * 10]
+    service = _service(tmp_path, monkeypatch, FakeResponse(chunks))
+    uploaded = {}
+
+    def upload(path, file, file_options=None):
+        uploaded["data"] = file.read()
+        return MagicMock(path=path)
+
+    async def transcribe(**kwargs):
+        pass
+
+    service.supabase.storage.from_.return_value.upload.side_effect = upload
+    monkeypatch.setattr(service, "_trigger_transcription_and_analysis", transcribe)
+
+    await service._process_file(
+        job_id="job-1", file_info={"name": "a.mp3", "url": "https://example.com/a.mp3"},
+        bucket_name="bucket", user_id="user-1", customer_name="Acme", provider="openai"
+    )
+
+    assert uploaded["data"] == b"".join(chunks)
+    assert os.listdir(tmp_path) == []
+    updates = [c.args[0] for c in service.supabase.table.return_value.update.call_args_list]
+    record = next(u for u in updates if "storage_path" in u)
+    assert record["file_size"] == 4106
+    assert record["content_sha256"] == hashlib.sha256(b"".join(chunks)).hexdigest()
@@ -340,16 +340,15 @@ class TestAnalyzeWithGemini:
         mock_genai.configure = Mock()
         mock_genai.list_models = Mock(side_effect=Exception("List models failed"))
         
-        # First model fails, second succeeds
-        mock_model1 = Mock()
-        mock_model1.generate_content = Mock(side_effect=Exception("Model 1 failed"))
+        # First preferred model is retired, second exists
+        mock_genai.get_model = Mock(side_effect=[Exception("404 model not found"), Mock()])
         
         mock_model2 = Mock()
         mock_response = Mock()
         mock_response.text = "Success from model 2"
         mock_model2.generate_content = Mock(return_value=mock_response)
         
-        mock_genai.GenerativeModel = Mock(side_effect=[mock_model1, mock_model2])
+        mock_genai.GenerativeModel = Mock(return_value=mock_model2)
         
         env_vars = {"GEMINI_API_KEY": "test_key"}
         
@@ -362,6 +361,7 @@ class TestAnalyzeWithGemini:
                 with patch('api.call_center_followup_api.logger'):
                     result = api.call_center_followup_api._analyze_with_gemini("Test prompt")
                     assert result == "Success from model 2"
+                    mock_genai.GenerativeModel.assert_called_once_with("gemini-2.0-flash")
     
     def test_analyze_with_gemini_all_models_fail(self):
         """Test Gemini call when all models fail - lines 139-154"""
@@ -370,10 +370,8 @@ class TestAnalyzeWithGemini:
         mock_genai = Mock()
         mock_genai.configure = Mock()
         mock_genai.list_models = Mock(side_effect=Exception("List failed"))
-        
-        mock_model = Mock()
-        mock_model.generate_content = Mock(side_effect=Exception("Model failed"))
-        mock_genai.GenerativeModel = Mock(return_value=mock_model)
+        mock_genai.get_model = Mock(side_effect=Exception("404 model not found"))
+        mock_genai.GenerativeModel = Mock()
         
         env_vars = {"GEMINI_API_KEY": "test_key"}
         
@@ -387,6 +385,7 @@ class TestAnalyzeWithGemini:
                     with pytest.raises(Exception) as exc_info:
                         api.call_center_followup_api._analyze_with_gemini("Test prompt")
                     assert "All Gemini models failed" in str(exc_info.value)
+                    mock_genai.GenerativeModel.assert_not_called()
 
 
 class TestGetOrgAnalysisSettings:
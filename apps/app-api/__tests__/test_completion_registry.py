@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+import services.completion_registry as completion_registry
+from services.completion_registry import COMPLETED, FAILED, CompletionRegistry
+
+
+class SharedBackend:
+    """Stands in for the Redis lists both processes talk to"""
+
+    name = "shared"
+
+    def __init__(self):
+        self.items = {}
+        self.cond = threading.Condition()
+
+    def publish(self, key, outcome):
+        with self.cond:
+            self.items.setdefault(key, []).append(outcome)
+            self.cond.notify_all()
+
+    def clear(self, key):
+        with self.cond:
+            self.items.pop(key, None)
+
+    def wait(self, key, timeout):
+        with self.cond:
+            self.cond.wait_for(lambda: self.items.get(key), timeout=timeout)
+            return self.items[key].pop(0) if self.items.get(key) else None
+
+
+def _resolve_later(registry, key, *args, delay=0.02, **kwargs):
+    def run():
+        time.sleep(delay)
+        registry.resolve(key, *args, **kwargs)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+@pytest.mark.asyncio
+async def test_thread_resolution_wakes_waiter():
+    registry = CompletionRegistry()
+    registry.expect("file-1")
+    _resolve_later(registry, "file-1", COMPLETED)
+
+    outcome = await registry.wait("file-1", timeout=2)
+    assert outcome == {"status": COMPLETED, "error": None, "persisted": True}
+    assert registry.pending() == 0
+
+
+@pytest.mark.asyncio
+async def test_resolution_before_wait_is_not_lost_and_first_wins():
+    registry = CompletionRegistry()
+    registry.expect("file-1")
+    registry.resolve("file-1", FAILED, "Analysis failed: boom")
+    registry.resolve("file-1", FAILED, "Transcription finished without analysis", persisted=False)
+
+    outcome = await registry.wait("file-1", timeout=1)
+    assert outcome["error"] == "Analysis failed: boom"
+    assert outcome["persisted"] is True
+
+
+@pytest.mark.asyncio
+async def test_wait_times_out():
+    registry = CompletionRegistry()
+    assert await registry.wait("file-1", timeout=0.05) is None
+    assert registry.pending() == 0
+
+
+@pytest.mark.asyncio
+async def test_outcome_crosses_processes_through_backend():
+    backend = SharedBackend()
+    importer, pipeline = CompletionRegistry(backend), CompletionRegistry(backend)
+    backend.publish("file-1", {"status": FAILED, "error": "stale", "persisted": True})
+
+    importer.expect("file-1")  # drops the stale outcome of an earlier run
+    _resolve_later(pipeline, "file-1", COMPLETED)
+
+    outcome = await importer.wait("file-1", timeout=2)
+    assert outcome["status"] == COMPLETED
+
+
+@pytest.mark.asyncio
+async def test_shared_wait_stops_when_resolved_in_process(monkeypatch):
+    monkeypatch.setattr(completion_registry, "SHARED_WAIT_SLICE_SECONDS", 0.02)
+    backend = SharedBackend()
+    backend.wait = MagicMock(side_effect=lambda key, timeout: time.sleep(timeout))
+    registry = CompletionRegistry(backend)
+    registry.expect("file-1")
+    _resolve_later(registry, "file-1", COMPLETED)
+
+    assert (await registry.wait("file-1", timeout=30))["status"] == COMPLETED
+    await asyncio.sleep(0.1)
+    slices = backend.wait.call_count
+    await asyncio.sleep(0.1)
+    # The blocked thread gave up after its current slice instead of the whole 30s
+    assert backend.wait.call_count == slices
+    assert all(c.args[1] <= 0.02 for c in backend.wait.call_args_list)
+
+
+@pytest.mark.asyncio
+async def test_importer_waits_for_completion_without_polling(monkeypatch):
+    import api.transcribe_api as transcribe_api
+    from services.bulk_import_service import BulkImportService
+
+    registry = CompletionRegistry()
+    monkeypatch.setattr(completion_registry, "_completion_registry", registry)
+
+    def fake_pipeline(*args, **kwargs):
+        file_id = args[10]
+        time.sleep(0.05)
+        registry.resolve(file_id, FAILED, "Transcription finished without analysis", persisted=False)
+
+    monkeypatch.setattr(transcribe_api, "_process_transcription_background", fake_pipeline)
+    service = BulkImportService(MagicMock())
+    service._update_file_status = MagicMock(side_effect=lambda *a, **k: asyncio.sleep(0))
+
+    started = time.monotonic()
+    await service._trigger_transcription_and_analysis(
+        call_record_id="cr-1", storage_path="u/j/a.mp3", bucket_name="bucket", file_name="a.mp3",
+        user_id="u", customer_name="Acme", provider="openai", file_id="file-1"
+    )
+
+    assert time.monotonic() - started < 2
+    # No status polling of bulk_import_files / call_records while waiting
+    service.supabase.table.return_value.select.assert_not_called()
+    statuses = [c.args[1] for c in service._update_file_status.call_args_list]
+    assert statuses == ["transcribing", "failed"]
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from services.analysis_dag import AnalysisDAG, run_call_analysis
+from services.call_analysis_service import CallAnalysisService
+from services.deadline import Deadline, DeadlineExceeded, deadline_scope, get_deadline, has_budget, step_timeout
+
+
+def test_step_timeout_without_deadline_is_the_default():
+    assert get_deadline() is None
+    assert step_timeout(60) == 60
+    assert has_budget(10_000)
+
+
+def test_step_timeout_is_capped_by_remaining_budget():
+    with deadline_scope(10):
+        assert 9 < step_timeout(60) <= 10
+        assert step_timeout(5) == 5
+        assert has_budget(5) and not has_budget(30)
+    assert get_deadline() is None
+
+
+def test_expired_deadline_raises():
+    expired = Deadline(10)
+    expired.expires_at = time.monotonic() - 1
+    with deadline_scope(deadline=expired):
+        with pytest.raises(DeadlineExceeded):
+            step_timeout(60)
+
+
+def test_nested_scope_cannot_extend_the_budget():
+    with deadline_scope(5) as outer:
+        with deadline_scope(600) as inner:
+            assert inner is outer
+        with deadline_scope(1) as shorter:
+            assert shorter is not outer
+            assert get_deadline() is shorter
+        assert get_deadline() is outer
+
+
+@pytest.mark.asyncio
+async def test_deadline_follows_tasks_and_threads():
+    with deadline_scope(30) as deadline:
+        assert await asyncio.to_thread(get_deadline) is deadline
+        assert await asyncio.ensure_future(asyncio.sleep(0, result=get_deadline())) is deadline
+
+
+@pytest.mark.asyncio
+async def test_dag_skips_step_without_enough_budget():
+    async def quick(_results):
+        return "ok"
+
+    dag = AnalysisDAG()
+    dag.add_step("required", quick)
+    dag.add_step("optional", quick, depends_on=["required"], min_budget=30)
+    with deadline_scope(5):
+        results = await dag.run()
+    assert results == {"required": "ok", "optional": None}
+    assert dag.skipped == {"optional": "deadline"}
+
+
+class ScheduledCallService:
+    """Analysis where overcome would normally run (consult scheduled with objections)"""
+
+    def __init__(self):
+        self.overcome_calls = 0
+
+    async def categorize_call(self, transcript, call_record_id, provider):
+        return {"category": "consult_scheduled", "reasoning": "llm"}
+
+    async def detect_objections(self, transcript, call_record_id, provider, segments=None):
+        return [{"type": "price"}]
+
+    async def analyze_objection_overcome(self, transcript, call_record_id, objections, provider):
+        self.overcome_calls += 1
+        return [{"overcome": True}]
+
+
+@pytest.mark.asyncio
+async def test_low_budget_skips_overcome_and_leaves_analysis_unstamped():
+    # Overcome needs OVERCOME_MIN_BUDGET_SECONDS (30 by default)
+    supabase = MagicMock()
+    supabase.table.return_value.select.return_value.eq.return_value.execute.return_value = MagicMock(data=[{}])
+    service = ScheduledCallService()
+
+    with deadline_scope(10):
+        results = await run_call_analysis(supabase, service, "Customer booked a consult", "cr-1", "openai", 2)
+
+    assert results["overcome"] is None
+    assert service.overcome_calls == 0
+    # Neither stamped (so the next run completes it) nor clearing earlier overcome details
+    assert not supabase.table.return_value.update.called
+    assert not supabase.table.return_value.delete.called
+
+    results = await run_call_analysis(supabase, service, "Customer booked a consult", "cr-1", "openai", 2)
+    assert service.overcome_calls == 1
+    assert results["overcome"] == [{"overcome": True}]
+
+
+@pytest.mark.asyncio
+async def test_provider_chain_goes_to_last_resort_when_out_of_time():
+    service = CallAnalysisService(MagicMock())
+    provider_call = MagicMock()
+
+    async def call(_text):
+        provider_call()
+        return "provider"
+
+    expired = Deadline(10)
+    expired.expires_at = time.monotonic() - 1
+    with deadline_scope(deadline=expired):
+        result = await service._run_provider_chain(
+            "categorization", "openai", {"openai": call, "gemini": call}, lambda: "heuristic", "text"
+        )
+    assert result == "heuristic"
+    provider_call.assert_not_called()
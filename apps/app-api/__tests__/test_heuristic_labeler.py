@@ -0,0 +1,72 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import analysis_api
+from services.heuristic_labeler import heuristic_categorize, heuristic_objections, label_transcripts
+from services.keyword_matcher import KeywordMatcher
+
+
+def test_matcher_reports_overlapping_hits_with_position():
+    matcher = KeywordMatcher({"a": ["schedule", "reschedule", "cancel", "cancellation"], "b": ["cancel", "set up", "up to"]})
+    hits = matcher.first_hits("Reschedule? Set up to cancellation")
+
+    assert [(h["keyword"], h["start"]) for h in hits] == [
+        ("reschedule", 0),
+        ("schedule", 2),
+        ("set up", 12),
+        ("up to", 16),
+        ("cancellation", 22),
+        ("cancel", 22),
+    ]
+    assert hits[-1]["groups"] == ["a", "b"]
+    assert matcher.first_hits("") == []
+    assert KeywordMatcher({}).first_hits("anything") == []
+
+
+def test_matcher_matches_substring_semantics():
+    keywords = ["where", "bill", "later", "price", "expensive"]
+    matcher = KeywordMatcher({"k": keywords})
+    text = "somewhere a billion translaters pricexpensive"
+    assert {h["keyword"] for h in matcher.first_hits(text)} == {kw for kw in keywords if kw in text}
+
+
+def test_heuristic_categorize_matches_previous_rules():
+    assert heuristic_categorize("Let's schedule an appointment, you can book now, I'm available")["category"] == "consult_scheduled"
+    result = heuristic_categorize("I'm not interested, what's the price?")
+    assert (result["category"], result["call_type"]) == ("consult_not_scheduled", "pricing")
+    assert heuristic_categorize("Can I confirm my meeting?")["call_type"] == "confirming_existing_appointment"
+    assert heuristic_categorize("I need to reschedule")["call_type"] == "reschedule"
+    assert heuristic_categorize("Hello")["call_type"] == "general_question"
+    assert heuristic_categorize("Hello")["category"] == "other_question"
+
+
+def test_heuristic_objections_include_segment_around_hit():
+    objections = heuristic_objections("Honestly it's too expensive for me and I'm worried about pain.")
+    assert [o["type"] for o in objections] == ["cost-value", "safety-risk"]
+    assert "too expensive" in objections[0]["segment"]
+    assert objections[0]["confidence"] == 0.6
+
+
+def test_batch_labels_and_endpoint():
+    results = label_transcripts(["it costs too much, maybe later", "", "where are you located"])
+    assert [r["call_type"] for r in results] == ["pricing", "general_question", "directions"]
+    assert {o["type"] for o in results[0]["objections"]} == {"cost-value", "timing"}
+
+    app = FastAPI()
+    app.include_router(analysis_api.router)
+    app.dependency_overrides[analysis_api.get_current_user] = lambda: {"id": "user-123"}
+    client = TestClient(app)
+    response = client.post("/api/analysis/heuristic-labels", json={"transcripts": ["price?"] * 3})
+    assert response.status_code == 200
+    assert response.json()["count"] == 3
+
+
+def test_first_hits_report_first_occurrence_of_each_keyword():
+    matcher = KeywordMatcher({"a": ["price", "cost", "later"], "b": ["cost", "too soon"]})
+    text = "The cost is fine, later maybe. Cost again, price later, too soon."
+    first = {h["keyword"]: h["start"] for h in matcher.first_hits(text)}
+    assert first == {kw: text.lower().find(kw) for kw in ["price", "cost", "later", "too soon"]}
+    scan = matcher.scan(text)
+    assert scan.group_keywords("a") == ["price", "cost", "later"]
+    assert scan.first_hit("b")["keyword"] == "cost"
+    assert scan.has("too soon") and not scan.has("budget")
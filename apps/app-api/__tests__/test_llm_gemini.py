@@ -0,0 +1,57 @@
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from services.llm_gemini import generate_with_gemini
+from services.llm_router import CLOSED, get_llm_router
+
+
+@pytest.fixture
+def genai(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    genai = MagicMock()
+    genai.list_models.side_effect = RuntimeError("list unavailable")
+
+    def get_model(name):
+        # Only the last preferred name still exists
+        if name != "models/gemini-2.5-pro":
+            raise RuntimeError(f"404 {name} not found")
+        return MagicMock()
+
+    genai.get_model.side_effect = get_model
+    google = MagicMock(generativeai=genai)
+    with patch.dict(sys.modules, {"google": google, "google.generativeai": genai}):
+        yield genai
+
+
+def test_retired_model_names_are_not_provider_failures(genai):
+    genai.GenerativeModel.return_value.generate_content.return_value = MagicMock(text=" plan ")
+    limiter = MagicMock()
+
+    with patch("services.llm_gemini.get_llm_rate_limiter", return_value=limiter):
+        for _ in range(6):
+            assert generate_with_gemini("prompt", "followup") == "plan"
+
+    assert limiter.acquire_sync.call_count == 6
+    genai.GenerativeModel.assert_called_with("gemini-2.5-pro")
+    gemini = get_llm_router().snapshot()["providers"]["gemini"]
+    assert (gemini["state"], gemini["consecutive_failures"]) == (CLOSED, 0)
+    assert set(gemini["models"]) == {"gemini-2.5-pro"}
+
+
+def test_listed_preferred_model_is_used_and_failure_tracked_once(genai):
+    genai.list_models.side_effect = None
+    genai.list_models.return_value = [
+        SimpleNamespace(name=f"models/{name}", supported_generation_methods=["generateContent"])
+        for name in ("gemini-1.0-pro-vision", "gemini-2.0-flash")
+    ]
+    genai.GenerativeModel.return_value.generate_content.side_effect = RuntimeError("503")
+
+    with pytest.raises(RuntimeError):
+        generate_with_gemini("prompt", "analyze")
+
+    genai.GenerativeModel.assert_called_once_with("gemini-2.0-flash")
+    genai.get_model.assert_not_called()
+    assert get_llm_router().snapshot()["providers"]["gemini"]["consecutive_failures"] == 1
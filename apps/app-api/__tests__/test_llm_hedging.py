@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from services.llm_hedging import LLMHedger
+from services.llm_router import get_llm_router
+
+
+@pytest.fixture
+def hedger(monkeypatch):
+    monkeypatch.setenv("LLM_HEDGING_ENABLED", "true")
+    monkeypatch.setenv("LLM_HEDGE_MIN_DELAY_MS", "10")
+    monkeypatch.setenv("LLM_HEDGE_DEFAULT_DELAY_MS", "20")
+    monkeypatch.setenv("LLM_HEDGE_MAX_RATE", "0.5")
+    return LLMHedger()
+
+
+def _runner(delays, results, cancelled=None):
+    async def run(provider):
+        try:
+            await asyncio.sleep(delays[provider])
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.append(provider)
+            raise
+        if isinstance(results[provider], Exception):
+            raise results[provider]
+        return results[provider]
+    return run
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged(hedger):
+    run = _runner({"openai": 0, "gemini": 0}, {"openai": "a", "gemini": "b"})
+    assert await hedger.call("org-1", "openai", "gemini", run) == ("openai", "a")
+    assert hedger.snapshot()["totals"]["hedged"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_loser_cancelled(hedger):
+    cancelled = []
+    run = _runner({"openai": 1.0, "gemini": 0.01}, {"openai": "a", "gemini": "b"}, cancelled)
+    assert await hedger.call("org-1", "openai", "gemini", run) == ("gemini", "b")
+    await asyncio.sleep(0)
+    assert cancelled == ["openai"]
+    totals = hedger.snapshot()["totals"]
+    assert totals["hedged"] == 1 and totals["hedge_wins"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_failure_falls_back_to_primary(hedger):
+    run = _runner({"openai": 0.1, "gemini": 0}, {"openai": "a", "gemini": RuntimeError("503")})
+    assert await hedger.call("org-1", "openai", "gemini", run) == ("openai", "a")
+
+
+@pytest.mark.asyncio
+async def test_primary_error_before_delay_goes_to_secondary(hedger):
+    run = _runner({"openai": 0, "gemini": 0}, {"openai": RuntimeError("boom"), "gemini": "b"})
+    assert await hedger.call("org-1", "openai", "gemini", run) == ("gemini", "b")
+
+
+@pytest.mark.asyncio
+async def test_hedges_capped_per_org(hedger):
+    run = _runner({"openai": 0.05, "gemini": 0}, {"openai": "a", "gemini": "b"})
+    winners = [(await hedger.call("org-1", "openai", "gemini", run))[0] for _ in range(4)]
+    # max rate 0.5: at most every other request of the org may hedge
+    assert winners == ["gemini", "openai", "gemini", "openai"]
+    assert (await hedger.call("org-2", "openai", "gemini", run))[0] == "gemini"
+    snapshot = hedger.snapshot()
+    assert snapshot["totals"]["capped"] == 2
+    assert snapshot["organizations"]["org-1"]["hedge_rate"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_capped_primary_error_goes_to_secondary(hedger):
+    hedger.max_rate = 0.0
+    run = _runner({"openai": 0.05, "gemini": 0}, {"openai": RuntimeError("boom"), "gemini": "b"})
+    assert await hedger.call("org-1", "openai", "gemini", run) == ("gemini", "b")
+    assert hedger.snapshot()["totals"]["capped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disabled_or_other_org_never_hedges(monkeypatch):
+    run = _runner({"openai": 0.05, "gemini": 0}, {"openai": "a", "gemini": "b"})
+    assert (await LLMHedger().call("org-1", "openai", "gemini", run))[0] == "openai"
+    monkeypatch.setenv("LLM_HEDGING_ENABLED", "true")
+    monkeypatch.setenv("LLM_HEDGING_ORGS", "org-2")
+    assert LLMHedger().enabled_for("org-2") and not LLMHedger().enabled_for("org-1")
+
+
+def test_hedge_delay_follows_rolling_percentile(hedger):
+    assert hedger.hedge_delay("openai") == pytest.approx(0.02)
+    for latency in range(100, 2100, 100):
+        get_llm_router().record("openai", "gpt-4o-mini", latency, ok=True)
+    assert hedger.hedge_delay("openai") == pytest.approx(1.9)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_hedge_loser_leaves_breaker_closed(hedger, monkeypatch):
+    from services.llm_router import CLOSED, LLMProviderRouter
+
+    monkeypatch.setenv("LLM_ROUTER_FAILURE_THRESHOLD", "3")
+    router = LLMProviderRouter()
+    hedger.max_rate = 1.0  # every slow call gets its hedge
+    inner = _runner({"openai": 1.0, "gemini": 0.01}, {"openai": "a", "gemini": "b"})
+
+    async def run(provider):
+        with router.track(provider):
+            return await inner(provider)
+
+    for _ in range(5):
+        assert await hedger.call("org-1", "openai", "gemini", run) == ("gemini", "b")
+    await asyncio.sleep(0)
+
+    openai = router.snapshot()["providers"].get("openai", {"state": CLOSED, "errors": 0})
+    assert openai["state"] == CLOSED
+    assert openai["errors"] == 0
@@ -0,0 +1,80 @@
+import pytest
+
+from services.llm_json import (
+    CATEGORY_SCHEMA,
+    FOLLOWUP_PLAN_SCHEMA,
+    OBJECTIONS_SCHEMA,
+    JSONRepairStats,
+    LLMJSONError,
+    parse_llm_json,
+    get_json_repair_stats,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats():
+    get_json_repair_stats().reset()
+    yield
+    get_json_repair_stats().reset()
+
+
+def test_clean_json_is_not_counted_as_repaired():
+    result = parse_llm_json('{"category": "consult_scheduled", "confidence": 0.9}', CATEGORY_SCHEMA, source="t")
+    assert result["category"] == "consult_scheduled"
+    assert get_json_repair_stats().snapshot()["sources"]["t"]["clean"] == 1
+
+
+@pytest.mark.parametrize("text", [
+    '```json\n{"objections": [{"type": "price", "text": "cost [a lot]"},]}\n```',
+    "Here is the analysis: {'objections': [{'type': 'price', 'text': 'it\\'s too much'}]} Hope it helps",
+    '{"objections": [{"type": "price", "text": "too much", "ok": True}, {"type": "tim',
+    '[{"type": "price", "text": "too much"}]',
+])
+def test_malformed_objections_are_repaired(text):
+    result = parse_llm_json(text, OBJECTIONS_SCHEMA, source="gemini:objections", fallback_is_provider_call=True)
+    assert result["objections"][0]["type"] == "price"
+    assert len(result["objections"]) == 1
+    counts = get_json_repair_stats().snapshot()["sources"]["gemini:objections"]
+    assert counts["provider_calls_avoided"] == counts["repaired"]
+
+
+def test_truncated_response_drops_the_partial_field():
+    result = parse_llm_json('{"category": "other_question", "reasoning": "caller asked ab', CATEGORY_SCHEMA)
+    assert result == {"category": "other_question"}
+    result = parse_llm_json('{"objections": [{"type": "price", "text": "too exp', OBJECTIONS_SCHEMA)
+    assert result["objections"] == [{"type": "price"}]
+    # Nothing complete to cut back to: the open string is terminated instead
+    result = parse_llm_json('{"category": "other_quest', CATEGORY_SCHEMA)
+    assert result == {"category": "other_quest"}
+
+
+def test_schema_violations_raise_and_drop_bad_items():
+    with pytest.raises(LLMJSONError, match="Missing required key 'category'"):
+        parse_llm_json('{"call_type": "x"}', CATEGORY_SCHEMA)
+    result = parse_llm_json('{"objections": [{"type": "price"}, {"text": "no type"}, "junk"]}', OBJECTIONS_SCHEMA)
+    assert result["objections"] == [{"type": "price"}]
+
+
+def test_unparseable_text_fails_and_is_counted():
+    with pytest.raises(ValueError):
+        parse_llm_json("I could not analyze this call.", source="t")
+    assert get_json_repair_stats().snapshot()["totals"]["failed"] == 1
+
+
+def test_followup_plan_is_unwrapped_and_parser_keeps_error_contract():
+    from api.followup_api import _parse_followup_response
+
+    plan = parse_llm_json('{"follow_up_plan": {"strategy_type": "email",}}', FOLLOWUP_PLAN_SCHEMA)
+    assert plan == {"strategy_type": "email"}
+    assert _parse_followup_response('```\n{"strategy_type": "sms", "messages": [],}\n```')["strategy_type"] == "sms"
+    with pytest.raises(ValueError, match="Invalid JSON response"):
+        _parse_followup_response("not valid json")
+
+
+def test_stats_snapshot_totals():
+    stats = JSONRepairStats()
+    stats.record("gemini:categorize", "repaired", avoided_provider_call=True)
+    stats.record("openai:categorize", "repaired")
+    stats.record("openai:categorize", "clean")
+    totals = stats.snapshot()["totals"]
+    assert totals == {"clean": 1, "repaired": 2, "failed": 0, "provider_calls_avoided": 1}
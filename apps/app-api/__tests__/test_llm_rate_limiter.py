@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import pytest
+
+from services.llm_rate_limiter import (
+    BATCH,
+    INTERACTIVE,
+    FileBucketBackend,
+    LLMRateLimiter,
+    MemoryBucketBackend,
+    RateLimitTimeout,
+    _llm_priority,
+    _take,
+    set_llm_priority,
+)
+
+
+def _limiter(rpm=60, tpm=100000, **kwargs):
+    return LLMRateLimiter(
+        MemoryBucketBackend(),
+        limits={"openai": {"rpm": rpm, "tpm": tpm}},
+        completion_tokens_estimate=0,
+        **kwargs,
+    )
+
+
+def test_take_refills_and_reports_wait():
+    state, wait = _take(None, 0.0, rpm=60, tpm=1000, tokens=400, reserve=0.0)
+    assert wait == 0.0 and state["tok"] == 600
+    state, wait = _take(state, 0.0, rpm=60, tpm=1000, tokens=800, reserve=0.0)
+    assert wait == pytest.approx(12.0)  # 200 missing tokens at 1000/min
+    state, wait = _take(state, 12.0, rpm=60, tpm=1000, tokens=800, reserve=0.0)
+    assert wait == 0.0
+
+
+def test_batch_leaves_interactive_reserve():
+    state, wait = _take({"req": 3.0, "tok": 1000.0, "ts": 0.0}, 0.0, rpm=10, tpm=1000, tokens=1, reserve=0.2)
+    assert wait == 0.0
+    _, wait = _take(state, 0.0, rpm=10, tpm=1000, tokens=1, reserve=0.2)
+    assert wait > 0  # only the 20% reserve (2 requests) is left
+    _, wait = _take(state, 0.0, rpm=10, tpm=1000, tokens=1, reserve=0.0)
+    assert wait == 0.0
+
+
+def test_file_backend_shares_state(tmp_path):
+    first, second = FileBucketBackend(str(tmp_path)), FileBucketBackend(str(tmp_path))
+    assert first.try_acquire("openai", 2, 1000, 10, 0.0) == 0.0
+    assert second.try_acquire("openai", 2, 1000, 10, 0.0) == 0.0
+    assert first.try_acquire("openai", 2, 1000, 10, 0.0) > 0
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_jump_the_queue():
+    limiter = _limiter(rpm=600, interactive_reserve=0.0)
+    limiter.backend.try_acquire("openai", 600, 100000, 0, 0.0)
+    # Drain the request bucket so everyone has to queue
+    limiter.backend._state["openai"]["req"] = 0.0
+    order = []
+
+    async def call(name, priority):
+        await limiter.acquire("openai", "hi", priority=priority)
+        order.append(name)
+
+    batch = [asyncio.create_task(call(f"batch-{i}", BATCH)) for i in range(3)]
+    await asyncio.sleep(0.01)
+    interactive = asyncio.create_task(call("interactive", INTERACTIVE))
+    await asyncio.gather(*batch, interactive)
+
+    assert order.index("interactive") <= 1
+    snapshot = limiter.snapshot()["providers"]["openai"]
+    assert snapshot["queued"] == 0
+    assert snapshot["by_priority"][BATCH]["throttled"] >= 2
+    assert snapshot["by_priority"][INTERACTIVE]["wait_ms_max"] > 0
+
+
+@pytest.mark.asyncio
+async def test_acquire_times_out_and_unknown_providers_pass():
+    limiter = _limiter(rpm=1, max_wait_seconds=0.2, interactive_reserve=0.0)
+    await limiter.acquire("openai", "x")
+    with pytest.raises(RateLimitTimeout):
+        await limiter.acquire("openai", "x")
+    assert await limiter.acquire("heuristic", "x") == 0.0
+    assert limiter.snapshot()["providers"]["openai"]["by_priority"][BATCH]["timeouts"] == 1
+
+
+def test_sync_acquire_uses_context_priority():
+    limiter = _limiter(interactive_reserve=0.5, rpm=2)
+    token = set_llm_priority(INTERACTIVE)
+    try:
+        started = time.monotonic()
+        limiter.acquire_sync("openai", "x")
+        limiter.acquire_sync("openai", "x")
+    finally:
+        _llm_priority.reset(token)
+    assert time.monotonic() - started < 0.5
+    assert limiter.snapshot()["providers"]["openai"]["by_priority"][INTERACTIVE]["acquired"] == 2
@@ -0,0 +1,111 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+import services.llm_router as llm_router
+from services.llm_router import CLOSED, HALF_OPEN, OPEN, LLMProviderRouter, get_org_enabled_providers
+
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setenv("LLM_ROUTER_FAILURE_THRESHOLD", "3")
+    monkeypatch.setenv("LLM_ROUTER_OPEN_SECONDS", "30")
+    return LLMProviderRouter()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_router.time, "time", lambda: now[0])
+    return now
+
+
+def test_fastest_healthy_provider_first(router):
+    for _ in range(5):
+        router.record("gemini", "gemini-1.5-flash", 4000, ok=True)
+        router.record("openai", "gpt-4o-mini", 900, ok=True)
+    assert router.order(["gemini", "openai"]) == ["openai", "gemini"]
+    # Error rate raises the expected latency per success
+    for _ in range(2):
+        router.record("openai", "gpt-4o-mini", 900, ok=False)
+    assert router.order(["gemini", "openai"])[0] == "openai"
+    # Pinned provider stays first while healthy; unknown providers are tried in given order
+    assert router.order(["gemini", "openai"], preferred="gemini") == ["gemini", "openai"]
+    assert router.order(["openai"]) == ["openai"]
+
+
+def test_circuit_opens_half_opens_and_closes(router, clock):
+    for _ in range(3):
+        router.record("gemini", "gemini-pro", 30000, ok=False)
+    assert router.order(["gemini", "openai"], preferred="gemini") == ["openai"]
+    # Nothing else enabled: still try the open provider rather than nothing
+    assert router.order(["gemini"]) == ["gemini"]
+    assert router.snapshot()["providers"]["gemini"]["state"] == OPEN
+
+    clock[0] += 31
+    assert router.order(["gemini", "openai"]) == ["openai", "gemini"]
+    assert router.snapshot()["providers"]["gemini"]["state"] == HALF_OPEN
+    router.record("gemini", "gemini-pro", 800, ok=True)
+    assert router.snapshot()["providers"]["gemini"]["state"] == CLOSED
+
+    # A single failure while half-open reopens immediately
+    for _ in range(3):
+        router.record("gemini", "gemini-pro", 800, ok=False)
+    assert router.snapshot()["providers"]["gemini"]["times_opened"] == 2
+    clock[0] += 31
+    router.record("gemini", "gemini-pro", 800, ok=False)
+    assert router.snapshot()["providers"]["gemini"]["state"] == OPEN
+    assert router.snapshot()["providers"]["gemini"]["times_opened"] == 3
+
+
+def test_track_records_latency_and_failures(router):
+    with router.track("openai", "gpt-4o-mini"):
+        pass
+    with pytest.raises(RuntimeError):
+        with router.track("openai", "gpt-4o-mini"):
+            raise RuntimeError("503")
+    stats = router.snapshot()["providers"]["openai"]
+    assert stats["samples"] == 2 and stats["errors"] == 1
+    assert stats["models"]["gpt-4o-mini"]["error_rate"] == 0.5
+    assert stats["p50_ms"] is not None
+
+
+def test_org_enabled_providers_cached():
+    supabase = MagicMock()
+    query = supabase.from_.return_value.select.return_value.eq.return_value
+    query.execute.return_value = MagicMock(data=[{"enabled_providers": ["openai"]}])
+    assert get_org_enabled_providers(supabase, "org-1") == ["openai"]
+    assert get_org_enabled_providers(supabase, "org-1") == ["openai"]
+    assert query.execute.call_count == 1
+    assert get_org_enabled_providers(supabase, None) == ["gemini", "openai"]
+
+
+@pytest.mark.asyncio
+async def test_analysis_service_skips_open_provider(monkeypatch):
+    from services.call_analysis_service import CallAnalysisService
+
+    monkeypatch.setenv("OPENAI_API_KEY", "o")
+    monkeypatch.setenv("GEMINI_API_KEY", "g")
+    service = CallAnalysisService(MagicMock())
+    calls = []
+
+    async def gemini(transcript):
+        calls.append("gemini")
+        raise RuntimeError("timeout")
+
+    async def openai(transcript):
+        calls.append("openai")
+        return {"category": "other_question", "call_type": "general_question", "confidence": 0.9, "reasoning": "llm"}
+
+    monkeypatch.setattr(service, "_categorize_with_gemini", gemini)
+    monkeypatch.setattr(service, "_categorize_with_openai", openai)
+    router = llm_router.get_llm_router()
+    result = await service._categorize_with_providers("hi", "gemini")
+    assert (result["reasoning"], result["provider"]) == ("llm", "openai")
+    assert calls == ["gemini", "openai"]
+
+    for _ in range(router.failure_threshold):
+        router.record("gemini", "gemini-pro", 100, ok=False)
+    calls.clear()
+    await service._categorize_with_providers("hi", "gemini")
+    assert calls == ["openai"]
@@ -0,0 +1,121 @@
+import random
+from unittest.mock import MagicMock
+
+import pytest
+
+import services.local_call_classifier as lcc
+from services.call_analysis_service import CallAnalysisService
+from services.local_call_classifier import (
+    ClassifierAgreementTracker,
+    LocalCallClassifier,
+    fetch_training_examples,
+    train_classifier,
+)
+
+CUES = {
+    "consult_scheduled": ("scheduling", ["book you tuesday", "appointment confirmed", "see you then"]),
+    "consult_not_scheduled": ("pricing", ["too expensive", "think about it", "call you back"]),
+    "other_question": ("directions", ["parking garage", "which exit", "office hours"]),
+}
+
+
+def _examples(n=120, seed=3):
+    rng = random.Random(seed)
+    filler = "hello thanks for calling how can i help you today okay sure yes".split()
+    examples = []
+    for _ in range(n):
+        category = rng.choice(sorted(CUES))
+        call_type, phrases = CUES[category]
+        text = " ".join(rng.choices(filler, k=20)) + " " + " ".join(rng.choices(phrases, k=2))
+        examples.append({"transcript": text, "call_category": category, "call_type": call_type, "confidence": 0.9})
+    return examples
+
+
+@pytest.fixture(scope="module")
+def trained():
+    return train_classifier(_examples(), n_features=2 ** 12, epochs=80)
+
+
+def test_train_predict_and_round_trip(trained, tmp_path):
+    assert trained.metadata["holdout_category_accuracy"] >= 0.9
+    version = trained.save(tmp_path, version="v1")
+    assert (tmp_path / "LATEST").read_text() == "v1"
+
+    loaded = LocalCallClassifier.load(tmp_path)
+    prediction = loaded.predict("can i book you tuesday, appointment confirmed")
+    assert prediction["category"] == "consult_scheduled"
+    assert prediction["call_type"] == "scheduling"
+    assert prediction["model_version"] == version
+    assert prediction == trained.predict("can i book you tuesday, appointment confirmed") | {"model_version": "v1"}
+
+
+def test_fetch_training_examples_skips_non_llm_labels():
+    supabase = MagicMock()
+    query = supabase.table.return_value.select.return_value.not_.is_.return_value.gte.return_value.range.return_value
+    query.execute.return_value = MagicMock(data=[
+        {"transcript": "a", "call_category": "other_question", "call_type": None, "categorization_confidence": 0.9, "categorization_notes": "LLM"},
+        {"transcript": "b", "call_category": "other_question", "categorization_confidence": 0.9, "categorization_notes": "x [HEURISTIC - Last Resort]"},
+        {"transcript": None, "call_category": "other_question", "categorization_confidence": 0.9},
+    ])
+    examples = fetch_training_examples(supabase, page_size=1000)
+    assert [e["transcript"] for e in examples] == ["a"]
+
+
+def test_agreement_tracker_suggests_threshold():
+    tracker = ClassifierAgreementTracker()
+    for _ in range(20):
+        tracker.record_comparison({"confidence": 0.95, "category": "a", "call_type": "x"}, {"category": "a", "call_type": "x"})
+        tracker.record_comparison({"confidence": 0.85, "category": "a", "call_type": "x"}, {"category": "a", "call_type": "y"})
+        tracker.record_comparison({"confidence": 0.75, "category": "a", "call_type": "x"}, {"category": "b", "call_type": "x"})
+    snapshot = tracker.snapshot(target_agreement=0.95)
+    assert snapshot["by_confidence"]["0.7"]["category_agreement"] == 0.0
+    assert snapshot["by_confidence"]["0.8"]["call_type_agreement"] == 0.0
+    assert snapshot["suggested_threshold"] == 0.8
+
+
+@pytest.mark.asyncio
+async def test_categorize_call_uses_confident_local_prediction(trained, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setattr("services.call_analysis_service.get_local_classifier", lambda: trained)
+    monkeypatch.setattr("services.call_analysis_service.get_local_classifier_threshold", lambda: 0.5)
+    monkeypatch.setattr("services.call_analysis_service.should_audit", lambda: False)
+    tracker = ClassifierAgreementTracker()
+    monkeypatch.setattr("services.call_analysis_service.get_classifier_agreement_tracker", lambda: tracker)
+
+    service = CallAnalysisService(MagicMock())
+    llm = MagicMock(side_effect=AssertionError("LLM should not be called"))
+    monkeypatch.setattr(service, "_categorize_with_openai", llm)
+
+    result = await service.categorize_call("book you tuesday appointment confirmed", "cr-1", provider="openai")
+    assert result["category"] == "consult_scheduled"
+    assert "[LOCAL MODEL]" in result["reasoning"]
+    assert tracker.snapshot()["local_accepted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_categorize_call_escalates_below_threshold_and_records_agreement(trained, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setattr("services.call_analysis_service.get_local_classifier", lambda: trained)
+    monkeypatch.setattr("services.call_analysis_service.get_local_classifier_threshold", lambda: 1.01)
+    tracker = ClassifierAgreementTracker()
+    monkeypatch.setattr("services.call_analysis_service.get_classifier_agreement_tracker", lambda: tracker)
+
+    service = CallAnalysisService(MagicMock())
+
+    async def fake_openai(transcript):
+        return {"category": "consult_scheduled", "call_type": "scheduling", "confidence": 0.9, "reasoning": "LLM"}
+
+    monkeypatch.setattr(service, "_categorize_with_openai", fake_openai)
+    result = await service.categorize_call("book you tuesday appointment confirmed", "cr-1", provider="openai")
+
+    assert result["reasoning"] == "LLM"
+    snapshot = tracker.snapshot()
+    assert snapshot["escalated"] == 1
+    compared = sum(b["compared"] for b in snapshot["by_confidence"].values())
+    agreed = sum(b["category_agree"] for b in snapshot["by_confidence"].values())
+    assert compared == agreed == 1
+
+
+def test_local_classifier_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("LOCAL_CLASSIFIER_ENABLED", raising=False)
+    assert lcc.get_local_classifier() is None
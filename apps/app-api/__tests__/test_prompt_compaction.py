@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+from services.llm_usage import (
+    LLMUsageTracker,
+    extract_gemini_usage,
+    extract_openai_usage,
+    get_llm_usage_tracker,
+    set_usage_org,
+)
+from services.prompt_compaction import (
+    compact_for_llm,
+    compact_prompt,
+    compact_segments,
+    compact_transcript,
+    compaction_stats,
+)
+
+
+def test_compact_transcript_drops_fillers_backchannels_and_merges_turns():
+    transcript = """Speaker A: Hi, um, thanks for calling,   how can I I help?
+Speaker B: Yeah.
+Speaker B: Uh, I wanted to ask about the the price.
+Speaker A: Mm-hmm.
+Speaker B: uh-huh
+Speaker B: My number is five five five.
+Speaker A: We open at 10:30."""
+
+    assert compact_transcript(transcript) == (
+        "Speaker A: Hi, thanks for calling, how can I help?\n"
+        "Speaker B: Yeah. I wanted to ask about the price. My number is five five five.\n"
+        "Speaker A: We open at 10:30."
+    )
+    stats = compaction_stats(transcript, compact_transcript(transcript))
+    assert stats["saved_tokens"] > 0
+
+
+def test_customer_assent_survives_compaction():
+    transcript = "Agent: Does Tuesday at 3 work?\nCustomer: Yes\nAgent: Great.\nCustomer: Sounds good."
+    assert compact_transcript(transcript) == transcript
+
+
+def test_compact_segments_and_prompt():
+    segments = [
+        {"speaker": "Speaker A", "text": "Okay.", "start": 0},
+        {"speaker": "Speaker B", "text": "It's um too expensive", "start": 1},
+    ]
+    assert compact_segments(segments + [{"speaker": "Speaker A", "text": "Mm-hmm.", "start": 2}]) == [
+        {"speaker": "Speaker A", "text": "Okay.", "start": 0},
+        {"speaker": "Speaker B", "text": "It's too expensive", "start": 1},
+    ]
+    assert compact_prompt("\n  A   b  \n    {  x }\n\n\n\nend  ") == "A b\n    { x }\n\nend"
+
+
+def test_compact_for_llm_never_returns_empty_and_records_savings():
+    tracker = get_llm_usage_tracker()
+    tracker.reset()
+    token = set_usage_org("org-1")
+    try:
+        assert compact_for_llm("Yeah.", "analyze") == "Yeah."
+        compact_for_llm("Customer: um um I think it's, uh, too too expensive", "analyze")
+    finally:
+        from services import llm_usage
+        llm_usage._usage_org.reset(token)
+
+    compaction = tracker.snapshot("org-1")["org-1"]["compaction"]
+    assert compaction["prompts"] == 2
+    assert compaction["saved_tokens"] > 0
+    tracker.reset()
+
+
+def test_usage_tracker_aggregates_per_org_operation_and_provider():
+    tracker = LLMUsageTracker()
+    tracker.record_call("openai", "categorize", prompt_tokens=100, completion_tokens=20, latency_ms=500, org_id="org-1")
+    tracker.record_call("gemini", "objections", prompt_tokens=300, completion_tokens=None, latency_ms=700, org_id="org-1")
+    tracker.record_compaction("categorize", 150, 100, org_id="org-1")
+    tracker.record_call("openai", "followup", prompt_tokens=50, org_id="org-2")
+
+    org1 = tracker.snapshot("org-1")["org-1"]
+    assert org1["calls"] == 2
+    assert org1["prompt_tokens"] == 400
+    assert org1["completion_tokens"] == 20
+    assert org1["avg_latency_ms"] == 600
+    assert org1["by_provider"]["gemini"]["prompt_tokens"] == 300
+    assert org1["compaction"]["saved_tokens"] == 50
+    assert org1["compaction"]["estimated_saved_ms"] == 150  # 3ms per prompt token
+    assert set(tracker.snapshot()) == {"org-1", "org-2"}
+
+
+def test_extract_usage_tolerates_missing_metadata():
+    assert extract_openai_usage({"usage": {"prompt_tokens": 12, "completion_tokens": 3}}) == {"prompt_tokens": 12, "completion_tokens": 3}
+    assert extract_openai_usage({}) == {"prompt_tokens": None, "completion_tokens": None}
+    gemini = SimpleNamespace(usage_metadata=SimpleNamespace(prompt_token_count=40, candidates_token_count=8))
+    assert extract_gemini_usage(gemini) == {"prompt_tokens": 40, "completion_tokens": 8}
+    assert extract_gemini_usage(SimpleNamespace()) == {"prompt_tokens": None, "completion_tokens": None}
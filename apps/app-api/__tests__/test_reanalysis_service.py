@@ -0,0 +1,213 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+import services.reanalysis_service as rs
+from services.call_analysis_service import ObjectionResults
+from services.reanalysis_service import ProviderPool, ReanalysisJobRunner, ReanalysisProgress, apply_reanalysis_filters
+
+RECORDS = [{"id": f"cr-{i:02d}", "organization_id": "org-1", "transcript": f"call {i}", "created_at": f"2025-01-{i + 1:02d}"} for i in range(7)]
+
+
+class FakeAnalysisService:
+    def __init__(self, fail_ids=(), heuristic_ids=(), fallback_ids=(), objection_fail_ids=()):
+        self.gemini_key = "g"
+        self.openai_key = "o"
+        self.fail_ids = set(fail_ids)
+        self.heuristic_ids = set(heuristic_ids)
+        self.fallback_ids = set(fallback_ids)
+        self.objection_fail_ids = set(objection_fail_ids)
+        self.seen = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def categorize_call(self, transcript, call_record_id, provider):
+        self.seen.append((call_record_id, provider))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if call_record_id in self.fail_ids:
+            raise RuntimeError("boom")
+        if call_record_id in self.heuristic_ids:
+            return {"category": "other_question", "reasoning": "x [HEURISTIC - Last Resort]"}
+        if call_record_id in self.fallback_ids:
+            provider = "openai" if provider == "gemini" else "gemini"
+        return {"category": "other_question", "reasoning": "llm", "provider": provider}
+
+    async def detect_objections(self, transcript, call_record_id, provider, segments=None):
+        if call_record_id in self.objection_fail_ids:
+            return ObjectionResults(reliable=False)
+        return ObjectionResults(provider=provider)
+
+
+def _paged(records):
+    def fetch(supabase, filters, checkpoint, page_size=3):
+        start = 0
+        if checkpoint:
+            start = next(i for i, r in enumerate(records) if r["id"] == checkpoint["id"]) + 1
+        return records[start:start + 3]
+    return fetch
+
+
+@pytest.fixture
+def runner_env(monkeypatch):
+    monkeypatch.setattr(rs, "fetch_records_page", _paged(RECORDS))
+    monkeypatch.setattr(rs, "count_matching_records", lambda supabase, filters: len(RECORDS))
+    monkeypatch.setattr(rs, "get_diarization_segments", lambda supabase, cid: None)
+    monkeypatch.setattr(rs, "get_org_analysis_concurrency", lambda *a, **k: 2)
+    monkeypatch.setattr(ReanalysisJobRunner, "_is_cancelled", lambda self: False)
+    updates = []
+    monkeypatch.setattr(
+        ReanalysisJobRunner, "_update_job", lambda self, fields, unless_cancelled=False: updates.append(fields) or True
+    )
+    return updates
+
+
+@pytest.mark.asyncio
+async def test_provider_pool_bounds_and_spreads_load():
+    pool = ProviderPool({"gemini": 2, "openai": 1})
+    taken = [await pool.acquire() for _ in range(3)]
+    assert sorted(taken) == ["gemini", "gemini", "openai"]
+    waiter = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+    await pool.release("openai")
+    assert await asyncio.wait_for(waiter, 1) == "openai"
+
+
+def test_progress_snapshot_reports_error_rates():
+    progress = ReanalysisProgress(total=4, providers={"openai": {"processed": 1, "errors": 0}})
+    progress.record("openai", ok=True, provider_error=True)
+    progress.record("gemini", ok=False, provider_error=True)
+    snapshot = progress.snapshot()
+    assert snapshot["processed"] == 2 and snapshot["failed"] == 1
+    assert snapshot["providers"]["openai"]["error_rate"] == 0.5
+    assert snapshot["providers"]["gemini"]["error_rate"] == 1.0
+    assert snapshot["progress_percentage"] == 50.0
+
+
+def test_filters_applied_to_query():
+    query = MagicMock()
+    for name in ("eq", "gte", "lte", "is_"):
+        getattr(query, name).return_value = query
+    apply_reanalysis_filters(query, {"organization_id": "org-1", "date_from": "2025-01-01", "call_category": "uncategorized"})
+    query.eq.assert_called_once_with("organization_id", "org-1")
+    query.gte.assert_called_once_with("created_at", "2025-01-01")
+    query.is_.assert_called_once_with("call_category", "null")
+    query.not_.is_.assert_called_once_with("transcript", "null")
+
+
+@pytest.mark.asyncio
+async def test_runner_processes_all_pages_and_checkpoints(runner_env):
+    service = FakeAnalysisService(fail_ids={"cr-03"}, heuristic_ids={"cr-05"})
+    job = {"id": "job-1", "filters": {}, "providers": ["gemini", "openai"], "provider_concurrency": {"gemini": 2, "openai": 1}}
+
+    snapshot = await ReanalysisJobRunner(MagicMock(), job, analysis_service=service).run()
+
+    assert sorted(cid for cid, _ in service.seen) == [r["id"] for r in RECORDS]
+    assert service.max_in_flight <= 3
+    assert snapshot["processed"] == 7 and snapshot["failed"] == 1
+    assert sum(p["errors"] for p in snapshot["providers"].values()) == 2
+    checkpoints = [u["checkpoint"]["id"] for u in runner_env if "checkpoint" in u]
+    assert checkpoints == ["cr-02", "cr-05", "cr-06"]
+    assert runner_env[-1]["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_errors_are_attributed_to_the_provider_that_answered(runner_env):
+    service = FakeAnalysisService(fallback_ids={"cr-01", "cr-02"}, objection_fail_ids={"cr-04"})
+    job = {"id": "job-1", "filters": {}, "providers": ["gemini"]}
+
+    snapshot = await ReanalysisJobRunner(MagicMock(), job, analysis_service=service).run()
+
+    # Gemini was asked for all 7: two fell back to OpenAI, one lost its objections
+    assert snapshot["providers"]["gemini"] == {"processed": 7, "errors": 3, "error_rate": round(3 / 7, 4)}
+    assert snapshot["providers"]["openai"] == {"processed": 2, "errors": 0, "error_rate": 0.0}
+    assert snapshot["failed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancel_during_last_page_is_not_overwritten(monkeypatch):
+    monkeypatch.setattr(rs, "fetch_records_page", _paged(RECORDS[:2]))
+    monkeypatch.setattr(rs, "count_matching_records", lambda supabase, filters: 2)
+    monkeypatch.setattr(rs, "get_diarization_segments", lambda supabase, cid: None)
+    monkeypatch.setattr(rs, "get_org_analysis_concurrency", lambda *a, **k: 2)
+    supabase = MagicMock()
+    jobs = supabase.table.return_value
+    # Still running when each page starts; the user cancels while the last page runs
+    jobs.select.return_value.eq.return_value.execute.return_value = MagicMock(data=[{"status": "running"}])
+    jobs.update.return_value.eq.return_value.neq.return_value.execute.return_value = MagicMock(data=[])
+
+    snapshot = await ReanalysisJobRunner(supabase, {"id": "job-1", "filters": {}}, analysis_service=FakeAnalysisService()).run()
+
+    assert snapshot["processed"] == 2
+    completed = [c.args[0] for c in jobs.update.call_args_list if c.args[0].get("status") == "completed"]
+    assert len(completed) == 1
+    jobs.update.return_value.eq.return_value.neq.assert_called_once_with("status", "cancelled")
+
+
+@pytest.mark.asyncio
+async def test_runner_resumes_from_checkpoint(runner_env):
+    service = FakeAnalysisService()
+    job = {
+        "id": "job-1", "filters": {}, "providers": ["openai"], "total_records": 7,
+        "processed_records": 3, "failed_records": 0, "checkpoint": {"created_at": "2025-01-03", "id": "cr-02"},
+        "stats": {"providers": {"openai": {"processed": 3, "errors": 0}}},
+    }
+    snapshot = await ReanalysisJobRunner(MagicMock(), job, analysis_service=service).run()
+
+    assert [cid for cid, _ in service.seen][0] == "cr-03"
+    assert len(service.seen) == 4
+    assert snapshot["processed"] == 7
+    assert snapshot["providers"]["openai"]["processed"] == 7
+
+
+@pytest.mark.asyncio
+async def test_runner_skips_current_records_unless_forced(runner_env, monkeypatch):
+    import services.analysis_stamp as analysis_stamp
+    monkeypatch.setattr(analysis_stamp, "is_analysis_current", lambda supabase, cid, transcript: cid != "cr-04")
+    job = {"id": "job-1", "filters": {}, "providers": ["openai"]}
+
+    service = FakeAnalysisService()
+    snapshot = await ReanalysisJobRunner(MagicMock(), job, analysis_service=service).run()
+    assert [cid for cid, _ in service.seen] == ["cr-04"]
+    assert snapshot["processed"] == 7 and snapshot["skipped"] == 6
+    assert snapshot["providers"]["openai"]["processed"] == 1
+
+    service = FakeAnalysisService()
+    await ReanalysisJobRunner(MagicMock(), {**job, "force": True}, analysis_service=service).run()
+    assert len(service.seen) == 7
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_is_renewed_during_a_page_and_job_stops_when_taken_over(monkeypatch):
+    monkeypatch.setattr(rs, "REANALYSIS_HEARTBEAT_SECONDS", 0.01)
+    stopped = asyncio.Event()
+
+    class SlowPage:
+        def __init__(self, supabase, job):
+            pass
+
+        async def run(self):
+            try:
+                await asyncio.sleep(10)  # one long page
+            except asyncio.CancelledError:
+                stopped.set()
+                raise
+
+    monkeypatch.setattr(rs, "ReanalysisJobRunner", SlowPage)
+    supabase = MagicMock()
+    jobs = supabase.table.return_value.update.return_value.eq.return_value
+    jobs.or_.return_value.execute.return_value = MagicMock(data=[{"id": "job-1"}])
+    # Renewed twice, then another worker owns the job
+    jobs.eq.return_value.execute.side_effect = [MagicMock(data=[{"id": "job-1"}])] * 2 + [MagicMock(data=[])]
+
+    assert rs.start_reanalysis_job(supabase, "job-1")
+    await asyncio.wait_for(stopped.wait(), timeout=2)
+    await asyncio.sleep(0)
+
+    assert jobs.eq.return_value.execute.call_count == 3
+    jobs.eq.assert_called_with("owner", rs._worker_id())
+    assert "job-1" not in rs._running_jobs
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.single_flight import SingleFlight, flight_key
+
+
+def test_flight_key_hashes_inputs():
+    assert flight_key("analysis", "cr-1", "hello", "openai") == flight_key("analysis", "cr-1", "hello", "openai")
+    assert flight_key("analysis", "cr-1", "hello") != flight_key("analysis", "cr-1", "hello!")
+    assert flight_key("analysis", "cr-1", "x")[:2] == ("analysis", "cr-1")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"category": "consult_scheduled"}
+
+    key = flight_key("analysis", "cr-1", "transcript")
+    results = await asyncio.gather(*(flights.do(key, work) for _ in range(5)))
+    assert len(calls) == 1
+    assert all(r == {"category": "consult_scheduled"} for r in results)
+    assert flights.snapshot()["operations"]["analysis"] == {"executed": 1, "coalesced": 4}
+
+    # Released once finished: a later call runs again
+    await flights.do(key, work)
+    assert len(calls) == 2
+    assert flights.snapshot()["in_flight"] == {}
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter_and_release_the_key():
+    flights = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    key = flight_key("followup", "cr-1", "prompt")
+    results = await asyncio.gather(flights.do(key, boom), flights.do(key, boom), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flights.snapshot()["in_flight"] == {}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_keeps_running_for_followers():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    key = flight_key("followup", "cr-1", "prompt")
+    leader = asyncio.ensure_future(flights.do(key, work))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flights.do(key, work))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == "done"
+
+
+def test_threads_and_event_loops_share_flights():
+    flights = SingleFlight()
+    calls = []
+    results = []
+
+    def transcribe():
+        calls.append(1)
+        time.sleep(0.05)
+        return "transcript"
+
+    key = flight_key("transcription", "cr-1", "path/audio.mp3")
+    threads = [threading.Thread(target=lambda: results.append(flights.do_sync(key, transcribe))) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == [1] and results == ["transcript"] * 3
+
+    # An async caller on another thread's loop joins a flight led by a thread
+    key = flight_key("analysis", "cr-2", "t")
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.05)
+        return "shared"
+
+    leader = threading.Thread(target=lambda: results.append(flights.do_sync(key, slow)))
+    leader.start()
+    started.wait()
+
+    async def unused():
+        raise AssertionError("should join the in-flight run")
+
+    assert asyncio.run(flights.do(key, unused)) == "shared"
+    leader.join()
@@ -0,0 +1,116 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from services.call_analysis_service import CallAnalysisService
+from services.speaker_roles import (
+    customer_focused_segments,
+    get_or_resolve_speaker_roles,
+    label_segments,
+    resolve_speaker_roles,
+)
+
+CALL = [
+    {"speaker": "Speaker A", "text": "Thank you for calling Bright Smiles, this is Jane, how can I help?"},
+    {"speaker": "Speaker B", "text": "Hi, I'm calling about veneers. How much do they cost?"},
+    {"speaker": "Speaker A", "text": "Let me check. Our veneers start at nine hundred per tooth and we offer financing plans for every budget."},
+    {"speaker": "Speaker B", "text": "That's a lot, I'm not sure I can afford it and my insurance won't cover it."},
+    {"speaker": "Speaker A", "text": "I understand. Is there anything else?"},
+]
+
+
+def test_resolves_agent_and_customer():
+    roles = resolve_speaker_roles(CALL)
+    assert roles["customer_speaker"] == "Speaker B"
+    assert roles["agent_speaker"] == "Speaker A"
+    assert roles["roles"] == {"Speaker A": "agent", "Speaker B": "customer"}
+    assert roles["confidence"] >= 0.6
+
+
+def test_positional_signals_alone_are_not_confident():
+    segments = [{"speaker": "Speaker 0", "text": "Hello."}, {"speaker": "Speaker 1", "text": "Hi there."}]
+    assert resolve_speaker_roles(segments)["confidence"] < 0.6
+    assert resolve_speaker_roles(segments[:1])["method"] == "single_speaker"
+    assert resolve_speaker_roles([])["roles"] == {}
+
+
+def test_customer_focused_segments_keep_customer_turns_with_agent_context():
+    roles = resolve_speaker_roles(CALL)
+    focused = customer_focused_segments(CALL, roles, context_chars=40)
+
+    assert [s["role"] for s in focused] == ["agent", "customer", "agent", "customer"]
+    assert focused[1]["speaker"] == "Speaker B (customer)"
+    assert focused[2]["text"].startswith("...")
+    assert len(focused[2]["text"]) <= 43
+    assert "anything else" not in " ".join(s["text"] for s in focused)
+    assert [s["role"] for s in label_segments(CALL, roles["roles"])][:2] == ["agent", "customer"]
+
+
+def test_roles_cached_on_call_record():
+    supabase = MagicMock()
+    table = supabase.table.return_value
+    table.select.return_value.eq.return_value.execute.return_value = MagicMock(data=[{"speaker_roles": None}])
+
+    roles = get_or_resolve_speaker_roles(supabase, "cr-1", CALL)
+    table.update.assert_called_once_with({"speaker_roles": roles})
+
+    cached = {"roles": {"Speaker A": "customer", "Speaker B": "agent"}, "confidence": 0.9}
+    table.select.return_value.eq.return_value.execute.return_value = MagicMock(data=[{"speaker_roles": cached}])
+    table.update.reset_mock()
+    assert get_or_resolve_speaker_roles(supabase, "cr-1", CALL) is cached
+    table.update.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_objection_detection_sends_customer_turns(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    supabase = MagicMock()
+    supabase.table.return_value.select.return_value.eq.return_value.execute.return_value = MagicMock(data=[])
+    service = CallAnalysisService(supabase)
+    prompts = []
+
+    async def fake_openai(text):
+        prompts.append(text)
+        return []
+
+    monkeypatch.setattr(service, "_detect_objections_with_openai", fake_openai)
+    full = "\n".join(f"{s['speaker']}: {s['text']}" for s in CALL)
+    await service.detect_objections(full, "cr-1", provider="openai", segments=CALL)
+
+    assert len(prompts) == 1
+    assert "afford" in prompts[0]
+    assert "Speaker B (customer)" in prompts[0]
+    assert "Is there anything else" not in prompts[0]
+
+
+def test_new_transcript_replaces_cached_speaker_roles(monkeypatch):
+    import time
+    from contextlib import nullcontext
+
+    import api.transcribe_api as transcribe_api
+
+    # Retranscribed: same labels, roles swapped compared with CALL
+    swapped = [{**s, "speaker": "Speaker B" if s["speaker"] == "Speaker A" else "Speaker A"} for s in CALL]
+    supabase = MagicMock()
+    monkeypatch.setattr(transcribe_api, "get_supabase_client", lambda: supabase)
+    download = MagicMock(iter_content=lambda chunk_size: iter([b"audio"]))
+    monkeypatch.setattr(transcribe_api.requests, "get", lambda *a, **k: nullcontext(download))
+    monkeypatch.setattr(transcribe_api, "_get_provider_settings", lambda *a: (["assemblyai"], None))
+    monkeypatch.setattr(
+        transcribe_api, "_transcribe_with_assemblyai",
+        lambda url, diarization: {"transcript": " ".join(s["text"] for s in swapped), "diarization_segments": swapped},
+    )
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+
+    async def no_analysis(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr("services.analysis_dag.run_call_analysis", no_analysis)
+
+    transcribe_api._process_transcription_background(
+        "upload-1", "u/cr-1.mp3", "https://audio", "assemblyai", "mp3", "Jane", "Acme", None,
+        call_record_id="cr-1",
+    )
+
+    call_updates = [c.args[0] for c in supabase.from_.return_value.update.call_args_list if "speaker_roles" in c.args[0]]
+    assert call_updates[-1]["speaker_roles"]["roles"] == {"Speaker A": "customer", "Speaker B": "agent"}
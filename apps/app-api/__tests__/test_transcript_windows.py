@@ -0,0 +1,104 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from services.call_analysis_service import CallAnalysisService
+from services.transcript_windows import build_windows, estimate_tokens, merge_objections, segments_to_turns
+
+
+def _segments(n, words=20):
+    return [
+        {"speaker": f"Speaker {'A' if i % 2 == 0 else 'B'}", "text": f"turn {i} " + " ".join(f"w{i}x{j}" for j in range(words))}
+        for i in range(n)
+    ]
+
+
+def test_segments_merge_consecutive_speaker_turns():
+    segments = [
+        {"speaker": "Speaker A", "text": "Hello"},
+        {"speaker": "Speaker A", "text": "there."},
+        {"speaker": "Speaker B", "text": "Hi"},
+        {"speaker": "Speaker B", "text": ""},
+    ]
+    assert segments_to_turns(segments) == ["Speaker A: Hello there.", "Speaker B: Hi"]
+
+
+def test_windows_respect_budget_and_overlap():
+    windows = build_windows("", _segments(30), token_budget=100, overlap_turns=1)
+
+    assert len(windows) > 1
+    assert all(estimate_tokens(w) <= 100 for w in windows)
+    # Last turn of each window is repeated at the start of the next
+    for prev, nxt in zip(windows, windows[1:]):
+        assert nxt.startswith(prev.splitlines()[-1])
+    # Nothing is dropped
+    joined = "\n".join(windows)
+    assert all(f"turn {i} " in joined for i in range(30))
+
+
+def test_windows_fall_back_to_lines_and_split_oversized_turns():
+    transcript = "short line\n" + ("A very long sentence without end " * 40)
+    windows = build_windows(transcript, None, token_budget=50, overlap_turns=0)
+    assert windows[0].startswith("short line")
+    assert all(estimate_tokens(w) <= 50 for w in windows)
+
+
+def test_merge_objections_dedupes_by_type_and_quote():
+    merged = merge_objections([
+        [{"type": "cost-value", "segment": "That's too expensive.", "confidence": 0.6}],
+        [
+            {"type": "cost-value", "segment": "that's too expensive", "confidence": 0.9},
+            {"type": "timing", "segment": "that's too expensive", "confidence": 0.5},
+            {"type": "cost-value", "segment": "Honestly that's too expensive for us", "confidence": "0.7"},
+        ],
+    ])
+    assert [(o["type"], o["confidence"]) for o in merged] == [("cost-value", 0.9), ("timing", 0.5)]
+
+
+@pytest.mark.asyncio
+async def test_detect_objections_windowed_for_long_transcripts(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    monkeypatch.delenv("GOOGLE_SERVICES_API_KEY", raising=False)
+    monkeypatch.delenv("GOOGLE_APPLICATION_CREDENTIALS", raising=False)
+    monkeypatch.setenv("OBJECTION_WINDOW_TOKENS_OPENAI", "100")
+
+    service = CallAnalysisService(MagicMock())
+    seen = []
+    in_flight = {"now": 0, "max": 0}
+
+    async def fake_openai(text):
+        seen.append(text)
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        return [{"type": "cost-value", "text": "Price", "segment": "too expensive", "confidence": 0.8}]
+
+    monkeypatch.setattr(service, "_detect_objections_with_openai", fake_openai)
+    segments = _segments(40)
+    transcript = " ".join(s["text"] for s in segments)
+
+    objections = await service.detect_objections(transcript, "cr-1", provider="openai", segments=segments)
+
+    assert len(seen) > 1
+    assert in_flight["max"] > 1
+    assert "turn 39 " in seen[-1]
+    assert len(objections) == 1
+
+
+@pytest.mark.asyncio
+async def test_detect_objections_short_transcript_single_call(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    service = CallAnalysisService(MagicMock())
+    calls = []
+
+    async def fake_openai(text):
+        calls.append(text)
+        return []
+
+    monkeypatch.setattr(service, "_detect_objections_with_openai", fake_openai)
+    await service.detect_objections("Customer: how much is it?", "cr-1", provider="openai")
+    assert calls == ["Customer: how much is it?"]
@@ -1,8 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import List, AsyncIterator, Optional
+import asyncio
+import json
 import os
 import logging
-from middleware.auth import get_current_user
+import time
+import httpx
+from middleware.auth import get_current_user, require_org_admin, require_system_admin
+from services.prompt_compaction import compact_for_llm
+from services.llm_usage import get_llm_usage_tracker, extract_openai_usage, set_usage_org
+from services.llm_rate_limiter import get_llm_rate_limiter, set_llm_priority, INTERACTIVE
+from services.deadline import INTERACTIVE_DEADLINE_SECONDS, start_deadline, step_timeout
+from services.heuristic_labeler import label_transcripts
+from services.llm_json import get_json_repair_stats
+from services.llm_router import get_llm_router, get_org_enabled_providers
+from services.llm_gemini import generate_with_gemini
+from services.llm_hedging import get_llm_hedger
+from services.single_flight import get_single_flight
+from services.supabase_client import get_supabase_client
+from services.local_call_classifier import (
+    get_classifier_agreement_tracker,
+    get_local_classifier,
+    get_local_classifier_threshold,
+)
 
 router = APIRouter(prefix="/api/analysis", tags=["analysis"])
 
@@ -13,6 +35,10 @@ class AnalyzePayload(BaseModel):
     prompt: str
 
 
+class HeuristicBatchPayload(BaseModel):
+    transcripts: List[str]
+
+
 @router.post("/analyze", response_model=dict)
 async def analyze(payload: AnalyzePayload, current_user: dict = Depends(get_current_user)):
     """Analyze transcript text via provider (OpenAI if available), return { analysis }.
@@ -23,39 +49,260 @@ async def analyze(payload: AnalyzePayload, current_user: dict = Depends(get_curr
         raise HTTPException(status_code=400, detail="Empty prompt")
 
     openai_key = os.getenv("OPENAI_API_KEY")
+    set_usage_org(current_user.get("organization_id"))
+    set_llm_priority(INTERACTIVE)
+    start_deadline(INTERACTIVE_DEADLINE_SECONDS, label="analyze")
 
-    # Try OpenAI if available
+    # Try OpenAI if available (hedged with Gemini when hedging is enabled for the org)
     if openai_key:
         try:
-            import requests
-            headers = {
-                "Authorization": f"Bearer {openai_key}",
-                "Content-Type": "application/json",
-            }
-            # Use gpt-4o-mini or gpt-3.5-turbo compatible endpoint
-            body = {
-                "model": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-                "messages": [
-                    {"role": "system", "content": "You are a helpful assistant that summarizes sales call transcripts and extracts insights succinctly."},
-                    {"role": "user", "content": f"Summarize this sales call and extract key insights, objections, next steps.\n\n{text}"},
-                ],
-                "temperature": 0.2,
+            compacted = compact_for_llm(text, "analyze")
+            prompt = f"Summarize this sales call and extract key insights, objections, next steps.\n\n{compacted}"
+            org_id = current_user.get("organization_id")
+            runners = {
+                "openai": lambda: _openai_summary(prompt, openai_key),
+                "gemini": lambda: _gemini_summary(prompt),
             }
-            resp = requests.post("https://api.openai.com/v1/chat/completions", json=body, headers=headers, timeout=60)
-            resp.raise_for_status()
-            data = resp.json()
-            content = data["choices"][0]["message"]["content"].strip()
+            provider, content = await get_llm_hedger().call(
+                org_id, "openai", _hedge_provider(org_id), lambda p: runners[p]()
+            )
             return {"analysis": content}
         except Exception as e:
             logger.error(f"OpenAI analysis failed: {e}")
             # Fall through to heuristic
 
     # Heuristic fallback
-    # Simple extraction of key sentences
+    return {"analysis": _heuristic_analysis(text)}
+
+
+async def _openai_summary(prompt: str, openai_key: str) -> str:
+    import requests
+    headers = {
+        "Authorization": f"Bearer {openai_key}",
+        "Content-Type": "application/json",
+    }
+    # Use gpt-4o-mini or gpt-3.5-turbo compatible endpoint
+    body = {
+        "model": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant that summarizes sales call transcripts and extracts insights succinctly."},
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.2,
+    }
+    await get_llm_rate_limiter().acquire("openai", prompt)
+    started = time.time()
+    with get_llm_router().track("openai", body["model"]):
+        # Off the event loop so a hedge can race it
+        resp = await asyncio.to_thread(
+            requests.post, "https://api.openai.com/v1/chat/completions", json=body, headers=headers, timeout=step_timeout(60)
+        )
+        resp.raise_for_status()
+    data = resp.json()
+    usage = extract_openai_usage(data)
+    get_llm_usage_tracker().record_call(
+        "openai",
+        "analyze",
+        prompt_tokens=usage["prompt_tokens"],
+        completion_tokens=usage["completion_tokens"],
+        latency_ms=int((time.time() - started) * 1000)
+    )
+    return data["choices"][0]["message"]["content"].strip()
+
+
+async def _gemini_summary(prompt: str) -> str:
+    # Rate limiting, usage and router tracking happen inside (sync, so run it in a thread)
+    return await asyncio.to_thread(generate_with_gemini, prompt, "analyze")
+
+
+def _hedge_provider(org_id: Optional[str]) -> Optional[str]:
+    """Gemini hedges /analyze when hedging is on for the org and Gemini is configured and enabled"""
+    if not get_llm_hedger().enabled_for(org_id):
+        return None
+    if not (os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY") or os.getenv("GOOGLE_SERVICES_API_KEY")):
+        return None
+    if "gemini" not in get_org_enabled_providers(get_supabase_client(), org_id):
+        return None
+    return "gemini"
+
+
+def _heuristic_analysis(text: str) -> str:
+    """Simple extraction of key sentences, used when no provider is available"""
     summary = text.strip()
     if len(summary) > 1200:
         summary = summary[:1200] + "..."
-    analysis = f"Summary: {summary}\n\nKey points:\n- Potential interest detected if keywords like 'price', 'timeline' present.\n- Objections and next steps should be confirmed on follow-up."
-    return {"analysis": analysis}
+    return f"Summary: {summary}\n\nKey points:\n- Potential interest detected if keywords like 'price', 'timeline' present.\n- Objections and next steps should be confirmed on follow-up."
+
+
+def _sse(event: str, data: dict) -> str:
+    """One Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _stream_openai_analysis(request: Request, compacted: str, openai_key: str) -> AsyncIterator[str]:
+    """
+    Proxy an OpenAI streamed completion as SSE `token` events, then `done`.
+    Stops reading as soon as the client goes away; leaving the `stream` block
+    closes the upstream connection so OpenAI stops generating.
+    """
+    headers = {
+        "Authorization": f"Bearer {openai_key}",
+        "Content-Type": "application/json",
+    }
+    body = {
+        "model": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant that summarizes sales call transcripts and extracts insights succinctly."},
+            {"role": "user", "content": f"Summarize this sales call and extract key insights, objections, next steps.\n\n{compacted}"},
+        ],
+        "temperature": 0.2,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+    await get_llm_rate_limiter().acquire("openai", body["messages"][1]["content"])
+    started = time.time()
+    usage = {"prompt_tokens": None, "completion_tokens": None}
+    disconnected = False
+    try:
+        # A client that goes away says nothing about the provider: no router sample then
+        with get_llm_router().track("openai", body["model"]) as call:
+            async with httpx.AsyncClient(timeout=httpx.Timeout(step_timeout(60.0))) as client:
+                async with client.stream("POST", "https://api.openai.com/v1/chat/completions", json=body, headers=headers) as resp:
+                    resp.raise_for_status()
+                    async for line in resp.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        if await request.is_disconnected():
+                            disconnected = True
+                            call.discard()
+                            logger.info("Client disconnected from analysis stream, closing provider stream")
+                            return
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        if chunk.get("usage"):
+                            usage = extract_openai_usage(chunk)
+                        for choice in chunk.get("choices") or []:
+                            content = (choice.get("delta") or {}).get("content")
+                            if content:
+                                yield _sse("token", {"text": content})
+        yield _sse("done", {"provider": "openai", "usage": usage})
+    finally:
+        get_llm_usage_tracker().record_call(
+            "openai",
+            "analyze_stream" if not disconnected else "analyze_stream_cancelled",
+            prompt_tokens=usage["prompt_tokens"],
+            completion_tokens=usage["completion_tokens"],
+            latency_ms=int((time.time() - started) * 1000)
+        )
+
+
+@router.post("/analyze/stream")
+async def analyze_stream(payload: AnalyzePayload, request: Request, current_user: dict = Depends(get_current_user)):
+    """Streaming variant of /analyze as Server-Sent Events.
+    Events: `token` ({"text"}) as the provider produces it, then `done` ({"provider"}),
+    or `error` if the provider fails mid-stream. Without a key (or if the provider
+    fails before the first token) the heuristic summary is sent as a single token.
+    """
+    text = payload.prompt or ""
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Empty prompt")
+
+    openai_key = os.getenv("OPENAI_API_KEY")
+    org_id = current_user.get("organization_id")
+
+    async def events() -> AsyncIterator[str]:
+        set_usage_org(org_id)
+        set_llm_priority(INTERACTIVE)
+        start_deadline(INTERACTIVE_DEADLINE_SECONDS, label="analyze stream")
+        if openai_key:
+            sent = False
+            try:
+                async for event in _stream_openai_analysis(request, compact_for_llm(text, "analyze"), openai_key):
+                    sent = True
+                    yield event
+                return
+            except Exception as e:
+                logger.error(f"OpenAI streaming analysis failed: {e}")
+                if sent:
+                    yield _sse("error", {"detail": "Provider stream interrupted"})
+                    return
+                # Fall through to heuristic
+        yield _sse("token", {"text": _heuristic_analysis(text)})
+        yield _sse("done", {"provider": "heuristic"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/heuristic-labels", response_model=dict)
+async def heuristic_labels(payload: HeuristicBatchPayload, current_user: dict = Depends(get_current_user)):
+    """Keyword-based category, call_type and objections for many transcripts in one call.
+    Results are returned in input order; no LLM provider is used.
+    """
+    max_batch = int(os.getenv("HEURISTIC_BATCH_MAX", "5000"))
+    if len(payload.transcripts) > max_batch:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {max_batch} transcripts per request")
+    # CPU-bound; keep the event loop free for large batches
+    results = await asyncio.to_thread(label_transcripts, payload.transcripts)
+    return {"results": results, "count": len(results)}
+
+
+@router.get("/usage", response_model=dict)
+async def get_llm_usage(current_user: dict = Depends(require_org_admin)):
+    """Token usage, latency and compaction savings per org.
+    System admins see every org, org admins only their own.
+    """
+    tracker = get_llm_usage_tracker()
+    if current_user.get("role") == "system_admin":
+        return {"usage": tracker.snapshot()}
+    org_id = current_user.get("organization_id")
+    if not org_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No organization")
+    return {"usage": tracker.snapshot(org_id)}
+
+
+@router.get("/local-classifier", response_model=dict)
+async def get_local_classifier_status(current_user: dict = Depends(require_system_admin)):
+    """Loaded local classifier model, its threshold and local-vs-LLM agreement by confidence bucket"""
+    classifier = get_local_classifier()
+    return {
+        "enabled": classifier is not None,
+        "model": classifier.metadata if classifier else None,
+        "threshold": get_local_classifier_threshold(),
+        "agreement": get_classifier_agreement_tracker().snapshot(),
+    }
+
+
+@router.get("/rate-limits", response_model=dict)
+async def get_llm_rate_limits(current_user: dict = Depends(require_system_admin)):
+    """Provider rate limits, queue depth and wait-time metrics for this worker"""
+    return get_llm_rate_limiter().snapshot()
+
+
+@router.get("/json-repair", response_model=dict)
+async def get_json_repair_metrics(current_user: dict = Depends(require_system_admin)):
+    """How often malformed LLM JSON was repaired locally instead of re-calling a provider (this worker)"""
+    return get_json_repair_stats().snapshot()
+
+
+@router.get("/providers", response_model=dict)
+async def get_llm_provider_health(current_user: dict = Depends(require_system_admin)):
+    """Live router state: per-provider/model latency percentiles, error rates and circuit breakers (this worker)"""
+    return get_llm_router().snapshot()
+
+
+@router.get("/hedging", response_model=dict)
+async def get_llm_hedging_metrics(current_user: dict = Depends(require_system_admin)):
+    """Hedging policy, hedge/win counts and per-org hedge rates (this worker)"""
+    return get_llm_hedger().snapshot()
 
 
+@router.get("/single-flight", response_model=dict)
+async def get_single_flight_metrics(current_user: dict = Depends(require_system_admin)):
+    """Executed vs coalesced duplicate transcription/analysis/follow-up runs (this worker)"""
+    return get_single_flight().snapshot()
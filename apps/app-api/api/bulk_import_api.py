@@ -1,7 +1,7 @@
 """
 Bulk Import API - Handle bulk audio file imports from web sources
 """
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel, Field, HttpUrl
 from typing import Optional, List, Dict, Any
 from datetime import datetime
@@ -28,6 +28,12 @@ class BulkImportRequest(BaseModel):
     source_url: HttpUrl
     provider: Optional[str] = Field("openai", pattern="^(openai|gemini)$")
     call_log_file_url: Optional[HttpUrl] = Field(None, description="Optional URL to call log file for mapping")
+    concurrency: Optional[int] = Field(None, ge=1, le=32, description="Files processed at once; defaults to BULK_IMPORT_CONCURRENCY")
+    order: Optional[str] = Field(
+        None,
+        pattern="^(discovery|shortest_first|largest_first)$",
+        description="shortest_first gets first results sooner, largest_first maximizes throughput; defaults to BULK_IMPORT_FILE_ORDER"
+    )
 
 
 class BulkImportJobResponse(BaseModel):
@@ -52,12 +58,15 @@ class BulkImportStatusResponse(BaseModel):
     updated_at: datetime
     completed_at: Optional[datetime] = None
     files: Optional[List[Dict[str, Any]]] = None
+    stats: Optional[Dict[str, Any]] = None  # Live progress: per-stage in-flight counts, throughput, ETA
+    discovered_files: Optional[int] = None
+    unique_files: Optional[int] = None
+    discovery_details: Optional[Dict[str, Any]] = None  # Counts plus one page of discovered entries
 
 
 @router.post("/start", response_model=BulkImportJobResponse, status_code=status.HTTP_201_CREATED)
 async def start_bulk_import(
     request: BulkImportRequest,
-    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
 ):
     """
@@ -170,8 +179,15 @@ async def start_bulk_import(
             "customer_name": request.customer_name,
             "source_url": str(request.source_url),
             "storage_bucket_name": bucket_name,
-            "status": "pending"
+            "status": "pending",
+            # Kept on the job so any worker can resume it
+            "provider": request.provider or "openai",
+            "call_log_file_url": str(request.call_log_file_url) if request.call_log_file_url else None
         }
+        if request.concurrency:
+            job_data["concurrency"] = request.concurrency
+        if request.order:
+            job_data["file_order"] = request.order
 
         result = supabase.table("bulk_import_jobs").insert(job_data).execute()
         if not result.data:
@@ -183,18 +199,13 @@ async def start_bulk_import(
         job_id = result.data[0]["id"]
         logger.info(f"Created bulk import job: {job_id} for customer: {request.customer_name}")
 
-        # Start background processing
-        background_tasks.add_task(
-            process_bulk_import,
-            job_id=job_id,
-            customer_name=request.customer_name,
-            source_url=str(request.source_url),
-            bucket_name=bucket_name,
-            user_id=current_user["id"],
-            provider=request.provider or "openai",
-            call_log_file_url=str(request.call_log_file_url) if request.call_log_file_url else None
-        )
-        logger.info(f"Background task queued for job: {job_id}")
+        # Start processing under a lease on the job row; if this worker goes away,
+        # the scheduler on another (or the restarted) worker resumes the job
+        from services.bulk_import_service import start_bulk_import_job
+        if start_bulk_import_job(supabase, job_id):
+            logger.info(f"Bulk import job {job_id} started")
+        else:
+            logger.info(f"Bulk import job {job_id} was picked up by the scheduler")
 
         return BulkImportJobResponse(
             success=True,
@@ -214,13 +225,74 @@ async def start_bulk_import(
         )
 
 
+def _discovery_details(supabase, job: Dict[str, Any], offset: int, limit: int) -> Optional[Dict[str, Any]]:
+    """Counts from the job row plus one page of manifest entries (and of duplicated URLs)"""
+    if job.get("discovered_files") is None:
+        return _legacy_discovery_details(job.get("error_message"))
+
+    details = {
+        "discovered": job["discovered_files"],
+        "unique": job.get("unique_files"),
+        "duplicate_urls": job.get("duplicate_urls") or 0,
+        "offset": offset,
+        "limit": limit,
+        "entries": [],
+        "duplicates_by_url": [],
+    }
+    try:
+        entries = supabase.table("bulk_import_discovery_entries").select(
+            "position,name,url,source_file_id,occurrences"
+        ).eq("job_id", job["id"]).order("position").range(offset, offset + limit - 1).execute()
+        details["entries"] = [
+            {"name": e["name"], "url": e.get("url"), "file_id": e.get("source_file_id"), "occurrences": e.get("occurrences", 1)}
+            for e in (entries.data or [])
+        ]
+        details["found_file_names"] = sorted({e["name"].lower() for e in details["entries"]})
+        if details["duplicate_urls"]:
+            duplicates = supabase.table("bulk_import_discovery_entries").select("url,occurrences").eq(
+                "job_id", job["id"]
+            ).gt("occurrences", 1).order("occurrences", desc=True).limit(limit).execute()
+            details["duplicates_by_url"] = [
+                {"url": d["url"], "count": d["occurrences"]} for d in (duplicates.data or [])
+            ]
+    except Exception as e:
+        logger.warning(f"Failed to read discovery entries for job {job['id']}: {e}")
+    return details
+
+
+def _legacy_discovery_details(error_msg: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Jobs from before the discovery manifest kept it as DISCOVERY_JSON in error_message"""
+    try:
+        if error_msg and "DISCOVERY_JSON::" in error_msg:
+            import json as _json
+            return _json.loads(error_msg.split("DISCOVERY_JSON::")[-1].strip())
+    except Exception as parse_error:
+        logger.warning(f"Failed to parse discovery_details from error_message: {parse_error}")
+    return None
+
+
+def _count_job_files(supabase, job_id: str) -> Optional[int]:
+    """Unique files of a job without stored discovery counts"""
+    try:
+        result = supabase.table("bulk_import_files").select("id", count="exact").eq("job_id", job_id).execute()
+        # Some client versions return count on the result object, others in data length
+        if getattr(result, "count", None) is not None:
+            return int(result.count)
+        return len(result.data or [])
+    except Exception as e:
+        logger.warning(f"Failed to count files for job {job_id}: {e}")
+        return None
+
+
 @router.get("/status/{job_id}", response_model=BulkImportStatusResponse)
 async def get_import_status(
     job_id: str,
     current_user: dict = Depends(get_current_user),
     include_files: bool = False,
+    entries_offset: int = Query(0, ge=0, description="First discovery entry to return"),
+    entries_limit: int = Query(100, ge=1, le=1000, description="Discovery entries per page"),
 ):
-    """Get the status of a bulk import job"""
+    """Get the status of a bulk import job (discovery entries are paginated)"""
     supabase = get_supabase_client()
     if not supabase:
         raise HTTPException(
@@ -249,23 +321,9 @@ async def get_import_status(
         error_msg = job.get("error_message", "")
         call_log_mapping_skipped = "Call log file mapping skipped" in error_msg if error_msg else False
         
-        # Extract discovery details if present
-        discovery_details = None
-        try:
-            if error_msg and "DISCOVERY_JSON::" in error_msg:
-                # Extract JSON after the marker - find the last occurrence
-                parts = error_msg.split("DISCOVERY_JSON::")
-                if len(parts) > 1:
-                    # Take everything after the last marker
-                    payload_str = parts[-1].strip()
-                    # Try to parse as JSON
-                    import json as _json
-                    discovery_details = _json.loads(payload_str)
-                    logger.info(f"Extracted discovery_details: discovered={discovery_details.get('discovered')}, entries={len(discovery_details.get('entries', []))}")
-        except Exception as parse_error:
-            logger.warning(f"Failed to parse discovery_details from error_message: {parse_error}")
-            discovery_details = None
-        
+        # Discovery counts and one page of entries from the manifest
+        discovery_details = _discovery_details(supabase, job, entries_offset, entries_limit)
+
         response_data = {
             "job_id": job_id,
             "status": job["status"],
@@ -277,27 +335,19 @@ async def get_import_status(
             "error_message": job.get("error_message"),
             "call_log_mapping_skipped": call_log_mapping_skipped,
             "discovery_details": discovery_details,
+            "stats": job.get("stats") or None,
             "created_at": datetime.fromisoformat(job["created_at"].replace("Z", "+00:00")),
             "updated_at": datetime.fromisoformat(job["updated_at"].replace("Z", "+00:00")),
             "completed_at": datetime.fromisoformat(job["completed_at"].replace("Z", "+00:00")) if job.get("completed_at") else None,
         }
 
-        # Add discovery counts: discovered (from job.total_files) and unique (from bulk_import_files count)
-        try:
-            unique_count_result = supabase.table("bulk_import_files").select("id", count="exact").eq("job_id", job_id).execute()
-            # Some client versions return count on the result object, others in data length
-            unique_files_count = None
-            if hasattr(unique_count_result, 'count') and unique_count_result.count is not None:
-                unique_files_count = unique_count_result.count
-            elif unique_count_result.data is not None:
-                unique_files_count = len(unique_count_result.data)
-            else:
-                unique_files_count = 0
-            response_data["discovered_files"] = int(total or 0)
-            response_data["unique_files"] = int(unique_files_count or 0)
-        except Exception as _:
-            response_data["discovered_files"] = int(total or 0)
-            response_data["unique_files"] = None
+        # Discovery counts are stored on the job when discovery finishes;
+        # older jobs fall back to total_files and the bulk_import_files count
+        details = discovery_details or {}
+        discovered = details.get("discovered")
+        unique = details.get("unique")
+        response_data["discovered_files"] = discovered if discovered is not None else int(total or 0)
+        response_data["unique_files"] = unique if unique is not None else _count_job_files(supabase, job_id)
 
         # Include file details if requested
         if include_files:
@@ -452,9 +502,13 @@ async def get_import_status(
 @router.post("/retranscribe/{call_record_id}", status_code=status.HTTP_200_OK)
 async def retranscribe_call(
     call_record_id: str,
+    force: bool = False,
     current_user: dict = Depends(get_current_user),
 ):
-    """Retry transcription for a specific call record"""
+    """Retry transcription for a specific call record.
+    Existing analysis is kept and only re-run if the new transcript differs
+    (or the analysis version changed); `force=true` clears it and always re-analyzes.
+    """
     logger.info(f"🔄 RETRANSCRIBE REQUEST: call_record_id={call_record_id}, user_id={current_user.get('id')}")
     print(f"🔄 RETRANSCRIBE REQUEST: call_record_id={call_record_id}, user_id={current_user.get('id')}")
     
@@ -591,36 +645,44 @@ async def retranscribe_call(
                 detail="No transcription API keys configured (DEEPGRAM_API_KEY or ASSEMBLY_AI_API_KEY)"
             )
         
-        # Delete existing analysis data (objections, objection overcomes, categorization) before retranscribing
-        logger.info(f"📋 Step 6a: Deleting existing analysis data for call_record {call_record_id}")
-        try:
-            # Delete objection overcome details first (they reference objections)
-            overcome_delete_result = supabase.table("objection_overcome_details").delete().eq("call_record_id", call_record_id).execute()
-            logger.info(f"✅ Step 6a: Deleted objection overcome details for call_record {call_record_id}")
-        except Exception as overcome_delete_error:
-            logger.warning(f"⚠️ Step 6a: Error deleting objection overcome details: {overcome_delete_error}")
+        if force:
+            # Delete existing analysis data (objections, objection overcomes, categorization) before retranscribing
+            logger.info(f"📋 Step 6a: Deleting existing analysis data for call_record {call_record_id}")
+            try:
+                # Delete objection overcome details first (they reference objections)
+                overcome_delete_result = supabase.table("objection_overcome_details").delete().eq("call_record_id", call_record_id).execute()
+                logger.info(f"✅ Step 6a: Deleted objection overcome details for call_record {call_record_id}")
+            except Exception as overcome_delete_error:
+                logger.warning(f"⚠️ Step 6a: Error deleting objection overcome details: {overcome_delete_error}")
         
-        try:
-            # Delete objections
-            objection_delete_result = supabase.table("call_objections").delete().eq("call_record_id", call_record_id).execute()
-            logger.info(f"✅ Step 6a: Deleted objections for call_record {call_record_id}")
-        except Exception as objection_delete_error:
-            logger.warning(f"⚠️ Step 6a: Error deleting objections: {objection_delete_error}")
+            try:
+                # Delete objections
+                objection_delete_result = supabase.table("call_objections").delete().eq("call_record_id", call_record_id).execute()
+                logger.info(f"✅ Step 6a: Deleted objections for call_record {call_record_id}")
+            except Exception as objection_delete_error:
+                logger.warning(f"⚠️ Step 6a: Error deleting objections: {objection_delete_error}")
         
-        # Update call record to show transcription is in progress and clear analysis data
-        logger.info(f"📋 Step 6: Updating call_record transcript to 'Processing...' and clearing analysis data")
-        update_result = supabase.table("call_records").update({
-            "transcript": "Processing...",
-            "call_category": None,
-            "call_type": None,
-            "categorization_confidence": None,
-            "categorization_notes": None
-        }).eq("id", call_record_id).execute()
-        if update_result.data:
-            logger.info(f"✅ Step 6: Updated call_record transcript status and cleared analysis data")
+            # Update call record to show transcription is in progress and clear analysis data
+            logger.info(f"📋 Step 6: Updating call_record transcript to 'Processing...' and clearing analysis data")
+            update_result = supabase.table("call_records").update({
+                "transcript": "Processing...",
+                "call_category": None,
+                "call_type": None,
+                "categorization_confidence": None,
+                "categorization_notes": None,
+                "transcript_hash": None,
+                "analysis_version": None,
+                "speaker_roles": None
+            }).eq("id", call_record_id).execute()
+            if update_result.data:
+                logger.info(f"✅ Step 6: Updated call_record transcript status and cleared analysis data")
+            else:
+                logger.warning(f"⚠️ Step 6: Update returned no data")
         else:
-            logger.warning(f"⚠️ Step 6: Update returned no data")
-        
+            # Keep the current analysis; the pipeline re-analyzes only if the new transcript differs
+            supabase.table("call_records").update({"transcript": "Processing..."}).eq("id", call_record_id).execute()
+            logger.info(f"✅ Step 6: Updated call_record transcript status (existing analysis kept until the transcript changes)")
+
         # Trigger transcription in background
         logger.info(f"📋 Step 7: Setting up background transcription thread")
         from api.transcribe_api import _process_transcription_background
@@ -679,7 +741,8 @@ async def retranscribe_call(
                     None,  # language
                     True,  # enable_diarization
                     call_record_id,  # Pass call_record_id directly
-                    file_id  # Pass file_id for status updates
+                    file_id,  # Pass file_id for status updates
+                    force_analysis=force
                 )
                 logger.info(f"✅ TRANSCRIPTION THREAD COMPLETED: upload_id={upload_id}, call_record_id={call_record_id}")
                 print(f"✅ TRANSCRIPTION THREAD COMPLETED: upload_id={upload_id}, call_record_id={call_record_id}")
@@ -811,32 +874,25 @@ async def list_import_jobs(
         )
 
 
-# Background processing function (to be implemented)
-async def process_bulk_import(
-    job_id: str,
-    customer_name: str,
-    source_url: str,
-    bucket_name: str,
-    user_id: str,
-    provider: str = "openai",
-    call_log_file_url: Optional[str] = None
-):
-    """Background task to process bulk import job"""
-    from services.bulk_import_service import BulkImportService
-    
-    supabase = get_supabase_client()
-    if not supabase:
-        logger.error("Supabase client not available for bulk import processing")
-        return
-    
-    service = BulkImportService(supabase)
-    await service.process_import_job(
-        job_id=job_id,
-        customer_name=customer_name,
-        source_url=source_url,
-        bucket_name=bucket_name,
-        user_id=user_id,
-        provider=provider,
-        call_log_file_url=call_log_file_url
-    )
+# Background processing: jobs are run by the lease-based scheduler in bulk_import_service
+_scheduler_task = None
+
+
+@router.on_event("startup")
+async def start_bulk_import_scheduler():
+    """Resume unfinished jobs orphaned by a restart, then keep sweeping for unowned ones"""
+    global _scheduler_task
+    try:
+        supabase = get_supabase_client()
+        if supabase:
+            import asyncio
+            from services.bulk_import_service import run_bulk_import_scheduler
+            _scheduler_task = asyncio.create_task(run_bulk_import_scheduler(supabase))
+    except Exception as e:
+        logger.warning(f"Could not start bulk import scheduler: {e}")
+
 
+@router.on_event("shutdown")
+async def stop_bulk_import_scheduler():
+    if _scheduler_task is not None:
+        _scheduler_task.cancel()
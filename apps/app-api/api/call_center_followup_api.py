@@ -16,6 +16,15 @@ from datetime import datetime, timedelta
 from middleware.auth import get_current_user
 from services.supabase_client import get_supabase_client
 from services.elevenlabs_rvm_service import get_rvm_service
+from services.prompt_compaction import compact_for_llm, compact_prompt
+from services.llm_json import FOLLOWUP_PLAN_SCHEMA, LLMJSONError, parse_llm_json
+from services.llm_usage import get_llm_usage_tracker, extract_openai_usage, set_usage_org
+from services.llm_rate_limiter import get_llm_rate_limiter, set_llm_priority, INTERACTIVE
+from services.llm_router import get_llm_router
+from services.llm_gemini import generate_with_gemini
+from services.llm_hedging import get_llm_hedger
+from services.single_flight import flight_key, get_single_flight
+from services.deadline import INTERACTIVE_DEADLINE_SECONDS, start_deadline, step_timeout
 import asyncio
 
 router = APIRouter(prefix="/api/call-center/followup", tags=["call-center-followup"])
@@ -25,6 +34,9 @@ logger = logging.getLogger(__name__)
 # Analysis semaphore for rate limiting
 _analysis_semaphore = asyncio.Semaphore(5)
 
+# Per-call ceiling; the request deadline lowers it for a fallback provider
+FOLLOWUP_TIMEOUT_SECONDS = 120
+
 def get_analysis_semaphore():
     """Get the analysis semaphore for rate limiting"""
     return _analysis_semaphore
@@ -92,66 +104,26 @@ def _analyze_with_openai(prompt: str) -> str:
         ],
         "temperature": 0.2,
     }
-    resp = requests.post("https://api.openai.com/v1/chat/completions", json=body, headers=headers, timeout=120)
-    resp.raise_for_status()
+    get_llm_rate_limiter().acquire_sync("openai", prompt)
+    started = time.time()
+    with get_llm_router().track("openai", body["model"]):
+        resp = requests.post("https://api.openai.com/v1/chat/completions", json=body, headers=headers, timeout=step_timeout(FOLLOWUP_TIMEOUT_SECONDS))
+        resp.raise_for_status()
     data = resp.json()
+    usage = extract_openai_usage(data)
+    get_llm_usage_tracker().record_call(
+        "openai",
+        "followup",
+        prompt_tokens=usage["prompt_tokens"],
+        completion_tokens=usage["completion_tokens"],
+        latency_ms=int((time.time() - started) * 1000)
+    )
     return data["choices"][0]["message"]["content"].strip()
 
 
-def _analyze_with_gemini(prompt: str) -> str:
-    """Analyze text using Gemini"""
-    try:
-        import google.generativeai as genai
-    except ImportError:
-        raise ValueError("google-generativeai package not installed")
-    
-    gemini_key = (
-        os.getenv("GEMINI_API_KEY") or 
-        os.getenv("GOOGLE_API_KEY") or 
-        os.getenv("GOOGLE_SERVICES_API_KEY")
-    )
-    if not gemini_key:
-        raise ValueError("Gemini API key not found")
-    
-    genai.configure(api_key=gemini_key)
-    
-    # Try to list available models first, then use them
-    model_names = []
-    try:
-        # Try to get available models
-        available_models = genai.list_models()
-        model_names = [m.name.split('/')[-1] for m in available_models if 'generateContent' in m.supported_generation_methods]
-        logger.info(f"Found {len(model_names)} available Gemini models: {model_names[:5]}")
-    except Exception as e:
-        logger.warning(f"Could not list available models: {e}, using fallback list")
-    
-    # Fallback to common model names if listing failed
-    if not model_names:
-        model_names = [
-            'gemini-1.5-pro-latest',
-            'gemini-1.5-flash-latest', 
-            'gemini-1.5-pro',
-            'gemini-1.5-flash',
-            'gemini-pro',
-            'gemini-1.0-pro'
-        ]
-    
-    last_error = None
-    
-    for model_name in model_names:
-        try:
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(
-                prompt,
-                generation_config={"temperature": 0.2}
-            )
-            return response.text.strip()
-        except Exception as e:
-            logger.warning(f"Model {model_name} failed: {e}")
-            last_error = e
-            continue
-    
-    raise Exception(f"All Gemini models failed. Last error: {last_error}")
+def _analyze_with_gemini(prompt: str, operation: str = "followup") -> str:
+    """Analyze text using Gemini (operation labels the call in usage metrics)"""
+    return generate_with_gemini(prompt, operation, timeout_seconds=FOLLOWUP_TIMEOUT_SECONDS)
 
 
 def _get_org_analysis_settings(supabase, user_id: str):
@@ -261,6 +233,9 @@ def _build_followup_prompt(
                 objection_context += f"   Quote: \"{obj.get('transcript_segment')}\"\n"
             objection_context += f"   Confidence/Priority Score: {obj.get('confidence', 0)} (HIGHER = MORE IMPORTANT)\n\n"
     
+    # Filler words, stutters and backchannel turns only cost tokens
+    compacted_transcript = compact_for_llm(transcript, "followup")
+
     prompt = f"""
 You are an expert sales strategist specializing in healthcare consumer psychology and follow-up optimization. 
 Generate a focused, multi-touchpoint 5-day follow-up plan based on this call analysis.
@@ -296,7 +271,7 @@ CALL ANALYSIS SUMMARY:
 {call_type_context}
 {objection_context}
 FULL TRANSCRIPT:
-{transcript}
+{compacted_transcript}
 
 Generate a JSON follow-up plan with this EXACT structure (designed for a 5-day cadence with exactly 3 touchpoints):
 
@@ -427,50 +402,17 @@ OBJECTION PRIORITY ORDER (use this order - highest confidence first):
 
 Return the complete JSON object with exactly 3 messages now:
 """
-    return prompt
+    return compact_prompt(prompt)
 
 
-def _parse_followup_response(response_text: str) -> Dict[str, Any]:
-    """Parse LLM response and extract follow-up plan JSON"""
-    # Strip code fences if present
-    cleaned = response_text.strip()
-    if cleaned.startswith('```'):
-        # Remove markdown code fences
-        lines = cleaned.split('\n')
-        # Find first line with {
-        start_idx = 0
-        for i, line in enumerate(lines):
-            if '{' in line:
-                start_idx = i
-                # Remove the ```json or ``` from this line
-                lines[i] = line.split('```')[-1].strip()
-                break
-        # Find last line with }
-        end_idx = len(lines) - 1
-        for i in range(len(lines) - 1, -1, -1):
-            if '}' in lines[i]:
-                end_idx = i
-                # Remove ``` from this line
-                lines[i] = lines[i].split('```')[0].strip()
-                break
-        cleaned = '\n'.join(lines[start_idx:end_idx + 1])
-    
-    # Try to extract JSON between first { and last }
-    start = cleaned.find('{')
-    end = cleaned.rfind('}')
-    if start != -1 and end != -1 and end > start:
-        cleaned = cleaned[start:end + 1]
-    
+def _parse_followup_response(response_text: str, source: str = "call_center_followup") -> Dict[str, Any]:
+    """Parse LLM response and extract follow-up plan JSON (fences, prose and malformed JSON are repaired)"""
     try:
-        parsed = json.loads(cleaned)
-        # Handle nested response structure (e.g., {"follow_up_plan": {...}})
-        if 'follow_up_plan' in parsed and isinstance(parsed['follow_up_plan'], dict):
-            logger.info("🔍 DEBUG: Found nested 'follow_up_plan' key, extracting inner structure")
-            return parsed['follow_up_plan']
-        return parsed
-    except json.JSONDecodeError as e:
+        # A parse failure here means the user regenerates the plan, i.e. another provider call
+        return parse_llm_json(response_text, FOLLOWUP_PLAN_SCHEMA, source=source, fallback_is_provider_call=True)
+    except LLMJSONError as e:
         logger.error(f"Failed to parse follow-up plan JSON: {e}")
-        logger.error(f"Response text: {response_text[:500]}")
+        logger.error(f"Response text: {(response_text or '')[:500]}")
         raise ValueError(f"Invalid JSON response from LLM: {str(e)}")
 
 
@@ -621,6 +563,10 @@ async def generate_call_center_followup_plan(
         
         supabase = get_supabase_client()
         user_id = current_user.get("user_id")
+        set_usage_org(current_user.get("organization_id"))
+        set_llm_priority(INTERACTIVE)
+        # One time budget for every provider attempt of this request
+        start_deadline(INTERACTIVE_DEADLINE_SECONDS, label="call center follow-up")
         
         # Fetch call_record to get call_category and call_type if not in analysisData
         call_record_result = supabase.table("call_records").select("call_category,call_type").eq("id", payload.callRecordId).maybe_single().execute()
@@ -648,27 +594,49 @@ async def generate_call_center_followup_plan(
         if use_provider == 'auto':
             use_provider = None  # Let it try providers in order
         
-        if use_provider and use_provider in enabled_providers:
-            provider_order = [use_provider] + [p for p in provider_order if p != use_provider]
+        # Fastest healthy enabled provider first (org priority breaks ties); an explicitly
+        # requested provider stays first unless its circuit breaker is open
+        candidates = [p for p in provider_order if p in enabled_providers] or list(provider_order)
+        provider_order = get_llm_router().order(candidates, preferred=use_provider)
         
         # Try each provider
         last_error = None
         response_text = None
         used_provider = None
         
+        # Opt-in hedging (not when a provider was requested explicitly): if the first
+        # provider is slower than usual, race the second and keep the first answer
+        hedger = get_llm_hedger()
+        org_id = current_user.get("organization_id")
+        llm_calls = {"openai": _analyze_with_openai, "gemini": _analyze_with_gemini}
+
+        async def call_provider(provider: str) -> str:
+            # Identical concurrent requests (double-clicks, retries) share one provider call.
+            # Run off the event loop: the call may wait for rate limit capacity
+            key = flight_key("call_center_followup", payload.callRecordId, provider, prompt)
+            return await get_single_flight().do(key, lambda: asyncio.to_thread(llm_calls[provider], prompt))
+
+        hedge_pair = [p for p in provider_order if p in llm_calls][:2]
+        if not use_provider and len(hedge_pair) == 2 and hedger.enabled_for(org_id):
+            start_time = time.time()
+            try:
+                used_provider, response_text = await hedger.call(org_id, hedge_pair[0], hedge_pair[1], call_provider)
+                generation_time = int((time.time() - start_time) * 1000)
+                logger.info(f"Call center follow-up plan generated with {used_provider} in {generation_time}ms (hedged)")
+            except Exception as e:
+                logger.error(f"Hedged generation failed: {e}")
+                last_error = e
+            provider_order = [] if response_text else [p for p in provider_order if p not in hedge_pair]
+        
         for provider in provider_order:
             try:
                 logger.info(f"Attempting call center follow-up plan generation with {provider}")
                 start_time = time.time()
                 
-                if provider == "openai":
-                    response_text = _analyze_with_openai(prompt)
-                    used_provider = "openai"
-                elif provider == "gemini":
-                    response_text = _analyze_with_gemini(prompt)
-                    used_provider = "gemini"
-                else:
+                if provider not in llm_calls:
                     continue
+                response_text = await call_provider(provider)
+                used_provider = provider
                 
                 generation_time = int((time.time() - start_time) * 1000)
                 logger.info(f"Call center follow-up plan generated with {used_provider} in {generation_time}ms")
@@ -687,7 +655,7 @@ async def generate_call_center_followup_plan(
         
         # Parse response
         try:
-            plan_data = _parse_followup_response(response_text)
+            plan_data = _parse_followup_response(response_text, source=f"{used_provider}:call_center_followup")
             logger.info(f"🔍 DEBUG: Parsed plan_data keys: {list(plan_data.keys())}")
             
             # Handle nested response structure (e.g., {"follow_up_plan": {...}})
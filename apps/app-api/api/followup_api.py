@@ -4,6 +4,7 @@ Follow-up Plan API - Generate AI-powered follow-up plans from call analysis
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
+import asyncio
 import os
 import logging
 import json
@@ -14,6 +15,14 @@ import re
 from datetime import datetime, timedelta
 from middleware.auth import get_current_user
 from services.supabase_client import get_supabase_client
+from services.prompt_compaction import compact_for_llm, compact_prompt
+from services.llm_json import FOLLOWUP_PLAN_SCHEMA, LLMJSONError, parse_llm_json
+from services.llm_usage import set_usage_org
+from services.llm_rate_limiter import set_llm_priority, INTERACTIVE
+from services.deadline import INTERACTIVE_DEADLINE_SECONDS, start_deadline
+from services.llm_router import get_llm_router
+from services.llm_hedging import get_llm_hedger
+from services.single_flight import flight_key, get_single_flight
 # Import analysis functions - these may not exist in analysis_api, so define fallbacks
 try:
     from api.analysis_api import (
@@ -77,6 +86,9 @@ def _build_followup_prompt(
     objections = analysis_data.get('objections', [])
     action_items = analysis_data.get('actionItems', [])
     
+    # Filler words, stutters and backchannel turns only cost tokens
+    compacted_transcript = compact_for_llm(transcript, "followup")
+
     prompt = f"""
 You are an expert sales strategist specializing in healthcare consumer psychology and follow-up optimization. 
 Generate a comprehensive, multi-touchpoint follow-up plan based on this call analysis.
@@ -92,10 +104,10 @@ CALL ANALYSIS SUMMARY:
 - Action Items: {len(action_items)}
 
 TRANSCRIPT:
-{transcript[:3000]}
+{compacted_transcript[:3000]}
 
 ANALYSIS DATA:
-{json.dumps(analysis_data, indent=2, default=str)[:2000]}
+{json.dumps(analysis_data, separators=(",", ":"), default=str)[:2000]}
 
 Generate a JSON follow-up plan with this EXACT structure:
 
@@ -132,45 +144,17 @@ REQUIREMENTS:
 
 Return the complete JSON object now:
 """
-    return prompt
+    return compact_prompt(prompt)
 
 
-def _parse_followup_response(response_text: str) -> Dict[str, Any]:
-    """Parse LLM response and extract follow-up plan JSON"""
-    # Strip code fences if present
-    cleaned = response_text.strip()
-    if cleaned.startswith('```'):
-        # Remove markdown code fences
-        lines = cleaned.split('\n')
-        # Find first line with {
-        start_idx = 0
-        for i, line in enumerate(lines):
-            if '{' in line:
-                start_idx = i
-                # Remove the ```json or ``` from this line
-                lines[i] = line.split('```')[-1].strip()
-                break
-        # Find last line with }
-        end_idx = len(lines) - 1
-        for i in range(len(lines) - 1, -1, -1):
-            if '}' in lines[i]:
-                end_idx = i
-                # Remove ``` from this line
-                lines[i] = lines[i].split('```')[0].strip()
-                break
-        cleaned = '\n'.join(lines[start_idx:end_idx + 1])
-    
-    # Try to extract JSON between first { and last }
-    start = cleaned.find('{')
-    end = cleaned.rfind('}')
-    if start != -1 and end != -1 and end > start:
-        cleaned = cleaned[start:end + 1]
-    
+def _parse_followup_response(response_text: str, source: str = "followup") -> Dict[str, Any]:
+    """Parse LLM response and extract follow-up plan JSON (fences, prose and malformed JSON are repaired)"""
     try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError as e:
+        # A parse failure here means the user regenerates the plan, i.e. another provider call
+        return parse_llm_json(response_text, FOLLOWUP_PLAN_SCHEMA, source=source, fallback_is_provider_call=True)
+    except LLMJSONError as e:
         logger.error(f"Failed to parse follow-up plan JSON: {e}")
-        logger.error(f"Response text: {response_text[:500]}")
+        logger.error(f"Response text: {(response_text or '')[:500]}")
         raise ValueError(f"Invalid JSON response from LLM: {str(e)}")
 
 
@@ -210,6 +194,10 @@ async def generate_followup_plan(
         
         supabase = get_supabase_client()
         user_id = current_user.get("user_id")
+        set_usage_org(current_user.get("organization_id"))
+        set_llm_priority(INTERACTIVE)
+        # One time budget for every provider attempt of this request
+        start_deadline(INTERACTIVE_DEADLINE_SECONDS, label="follow-up")
         
         # Build prompt
         prompt = _build_followup_prompt(
@@ -227,27 +215,49 @@ async def generate_followup_plan(
         if use_provider == 'auto':
             use_provider = None  # Let it try providers in order
         
-        if use_provider and use_provider in enabled_providers:
-            provider_order = [use_provider] + [p for p in provider_order if p != use_provider]
+        # Fastest healthy enabled provider first (org priority breaks ties); an explicitly
+        # requested provider stays first unless its circuit breaker is open
+        candidates = [p for p in provider_order if p in enabled_providers] or list(provider_order)
+        provider_order = get_llm_router().order(candidates, preferred=use_provider)
         
         # Try each provider
         last_error = None
         response_text = None
         used_provider = None
         
+        # Opt-in hedging (not when a provider was requested explicitly): if the first
+        # provider is slower than usual, race the second and keep the first answer
+        hedger = get_llm_hedger()
+        org_id = current_user.get("organization_id")
+        llm_calls = {"openai": _analyze_with_openai, "gemini": _analyze_with_gemini}
+
+        async def call_provider(provider: str) -> str:
+            # Identical concurrent requests (double-clicks, retries) share one provider call.
+            # Run off the event loop: the call may wait for rate limit capacity
+            key = flight_key("followup", payload.callRecordId, provider, prompt)
+            return await get_single_flight().do(key, lambda: asyncio.to_thread(llm_calls[provider], prompt))
+
+        hedge_pair = [p for p in provider_order if p in llm_calls][:2]
+        if not use_provider and len(hedge_pair) == 2 and hedger.enabled_for(org_id):
+            start_time = time.time()
+            try:
+                used_provider, response_text = await hedger.call(org_id, hedge_pair[0], hedge_pair[1], call_provider)
+                generation_time = int((time.time() - start_time) * 1000)
+                logger.info(f"Follow-up plan generated with {used_provider} in {generation_time}ms (hedged)")
+            except Exception as e:
+                logger.error(f"Hedged generation failed: {e}")
+                last_error = e
+            provider_order = [] if response_text else [p for p in provider_order if p not in hedge_pair]
+        
         for provider in provider_order:
             try:
                 logger.info(f"Attempting follow-up plan generation with {provider}")
                 start_time = time.time()
                 
-                if provider == "openai":
-                    response_text = _analyze_with_openai(prompt)
-                    used_provider = "openai"
-                elif provider == "gemini":
-                    response_text = _analyze_with_gemini(prompt)
-                    used_provider = "gemini"
-                else:
+                if provider not in llm_calls:
                     continue
+                response_text = await call_provider(provider)
+                used_provider = provider
                 
                 generation_time = int((time.time() - start_time) * 1000)
                 logger.info(f"Follow-up plan generated with {used_provider} in {generation_time}ms")
@@ -266,7 +276,7 @@ async def generate_followup_plan(
         
         # Parse response
         try:
-            plan_data = _parse_followup_response(response_text)
+            plan_data = _parse_followup_response(response_text, source=f"{used_provider}:followup")
             logger.info(f"🔍 DEBUG: Parsed plan_data keys: {list(plan_data.keys())}")
             logger.info(f"🔍 DEBUG: plan_data structure - has 'messages' key: {'messages' in plan_data}")
             if 'messages' in plan_data:
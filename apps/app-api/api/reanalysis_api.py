@@ -0,0 +1,170 @@
+"""
+Re-analysis API - Re-run categorization and objection detection over existing calls
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+import logging
+from services.supabase_client import get_supabase_client
+from services.reanalysis_service import (
+    ReanalysisProgress,
+    TERMINAL_STATUSES,
+    resume_reanalysis_jobs,
+    start_reanalysis_job,
+)
+from middleware.auth import require_org_admin
+
+router = APIRouter(prefix="/api/reanalysis", tags=["reanalysis"])
+
+logger = logging.getLogger(__name__)
+
+
+class ReanalysisJobRequest(BaseModel):
+    organization_id: Optional[str] = Field(None, description="System admins only; org admins always target their own org")
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    call_category: Optional[str] = Field(
+        None, pattern="^(consult_not_scheduled|consult_scheduled|other_question|uncategorized)$"
+    )
+    bulk_import_job_id: Optional[str] = None
+    providers: List[str] = Field(default_factory=lambda: ["gemini", "openai"])
+    provider_concurrency: Optional[Dict[str, int]] = Field(None, description="Max in-flight calls per provider")
+    force: bool = Field(False, description="Re-analyze calls even when transcript and analysis version are unchanged")
+
+
+def _require_supabase():
+    supabase = get_supabase_client()
+    if not supabase:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database unavailable")
+    return supabase
+
+
+def _get_job(supabase, job_id: str, current_user: dict) -> Dict[str, Any]:
+    result = supabase.table("reanalysis_jobs").select("*").eq("id", job_id).execute()
+    if not result.data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Re-analysis job not found")
+    job = result.data[0]
+    if current_user.get("role") != "system_admin" and job.get("organization_id") != current_user.get("organization_id"):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Re-analysis job not found")
+    return job
+
+
+def _job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    stats = job.get("stats") or {}
+    if not stats:
+        stats = ReanalysisProgress(job.get("total_records") or 0).snapshot()
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "organization_id": job.get("organization_id"),
+        "filters": job.get("filters") or {},
+        "providers": job.get("providers"),
+        "force": bool(job.get("force")),
+        "total_records": job.get("total_records") or 0,
+        "processed_records": job.get("processed_records") or 0,
+        "failed_records": job.get("failed_records") or 0,
+        "progress": stats,
+        "checkpoint": job.get("checkpoint"),
+        "error_message": job.get("error_message"),
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "completed_at": job.get("completed_at"),
+    }
+
+
+@router.post("/jobs", response_model=dict, status_code=status.HTTP_201_CREATED)
+async def create_reanalysis_job(request: ReanalysisJobRequest, current_user: dict = Depends(require_org_admin)):
+    """Create a re-analysis job and start it in this worker"""
+    supabase = _require_supabase()
+    org_id = current_user.get("organization_id")
+    if current_user.get("role") == "system_admin":
+        org_id = request.organization_id or None
+    elif not org_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No organization")
+
+    providers = [p for p in request.providers if p in ("gemini", "openai")]
+    if not providers:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="At least one of gemini/openai is required")
+
+    filters = {
+        "organization_id": org_id,
+        "date_from": request.date_from.isoformat() if request.date_from else None,
+        "date_to": request.date_to.isoformat() if request.date_to else None,
+        "call_category": request.call_category,
+        "bulk_import_job_id": request.bulk_import_job_id,
+    }
+    job_data = {
+        "organization_id": org_id,
+        "user_id": current_user["id"],
+        "filters": {k: v for k, v in filters.items() if v},
+        "providers": providers,
+        "provider_concurrency": request.provider_concurrency or {},
+        "force": request.force,
+        "status": "pending",
+    }
+
+    try:
+        result = supabase.table("reanalysis_jobs").insert(job_data).execute()
+    except Exception as e:
+        logger.error(f"Error creating re-analysis job: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to create re-analysis job: {str(e)}")
+    if not result.data:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create re-analysis job")
+
+    job = result.data[0]
+    start_reanalysis_job(supabase, job["id"])
+    logger.info(f"Created re-analysis job {job['id']} with filters {job_data['filters']}")
+    return _job_response(job)
+
+
+@router.get("/jobs", response_model=dict)
+async def list_reanalysis_jobs(current_user: dict = Depends(require_org_admin), limit: int = 50, offset: int = 0):
+    supabase = _require_supabase()
+    query = supabase.table("reanalysis_jobs").select("*")
+    if current_user.get("role") != "system_admin":
+        query = query.eq("organization_id", current_user.get("organization_id"))
+    result = query.order("created_at", desc=True).range(offset, offset + limit - 1).execute()
+    return {"jobs": [_job_response(job) for job in result.data or []]}
+
+
+@router.get("/jobs/{job_id}", response_model=dict)
+async def get_reanalysis_job(job_id: str, current_user: dict = Depends(require_org_admin)):
+    """Progress, throughput, ETA and per-provider error rates"""
+    supabase = _require_supabase()
+    return _job_response(_get_job(supabase, job_id, current_user))
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=dict)
+async def cancel_reanalysis_job(job_id: str, current_user: dict = Depends(require_org_admin)):
+    """Stop after the page in flight; the checkpoint is kept"""
+    supabase = _require_supabase()
+    job = _get_job(supabase, job_id, current_user)
+    if job["status"] in TERMINAL_STATUSES:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job is already {job['status']}")
+    supabase.table("reanalysis_jobs").update({"status": "cancelled"}).eq("id", job_id).execute()
+    return {"success": True, "job_id": job_id, "status": "cancelled"}
+
+
+@router.post("/jobs/{job_id}/resume", response_model=dict)
+async def resume_reanalysis_job(job_id: str, current_user: dict = Depends(require_org_admin)):
+    """Continue a cancelled or failed job from its checkpoint"""
+    supabase = _require_supabase()
+    job = _get_job(supabase, job_id, current_user)
+    if job["status"] == "completed":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Job is already completed")
+    if job["status"] in ("cancelled", "failed"):
+        supabase.table("reanalysis_jobs").update({"status": "pending", "error_message": None}).eq("id", job_id).execute()
+    started = start_reanalysis_job(supabase, job_id)
+    return {"success": True, "job_id": job_id, "started": started}
+
+
+@router.on_event("startup")
+async def resume_interrupted_reanalysis_jobs():
+    """Pick up jobs left pending or orphaned by a restart"""
+    try:
+        supabase = get_supabase_client()
+        if supabase:
+            resume_reanalysis_jobs(supabase)
+    except Exception as e:
+        logger.warning(f"Could not resume re-analysis jobs on startup: {e}")
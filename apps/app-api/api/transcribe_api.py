@@ -11,6 +11,8 @@ import os
 import uuid
 import requests
 from services.supabase_client import get_supabase_client
+from services.deadline import Deadline, deadline_scope, step_timeout
+from services.completion_registry import COMPLETED, FAILED, get_completion_registry
 from middleware.auth import get_current_user
 
 from middleware.auth import require_system_admin, require_org_admin
@@ -246,6 +248,62 @@ def _process_transcription_background(
     enable_diarization: bool = True,
     call_record_id: Optional[str] = None,  # Add optional call_record_id parameter
     file_id: Optional[str] = None,  # Add optional file_id parameter for updating bulk_import_files status
+    force_analysis: bool = False,  # Re-run analysis even if the transcript is unchanged
+    deadline: Optional[Deadline] = None,  # Time budget started by the caller (e.g. bulk import)
+):
+    """Background task entry point. Identical concurrent requests for the same call
+    and audio (double-clicks, parallel retranscribes) share one transcription run.
+    Transcription and analysis share one time budget: the caller's deadline, else
+    a new PIPELINE_DEADLINE_SECONDS one (threads do not inherit context, so it is
+    passed in explicitly).
+    """
+    from services.single_flight import flight_key, get_single_flight
+
+    key = flight_key(
+        "transcription", call_record_id or upload_id,
+        storage_path, provider, language, enable_diarization, file_id, force_analysis,
+    )
+    try:
+        with deadline_scope(label=f"transcription {call_record_id or upload_id}", deadline=deadline):
+            return get_single_flight().do_sync(
+                key,
+                lambda: _transcribe_and_analyze(
+                    upload_id,
+                    storage_path,
+                    public_url,
+                    provider,
+                    file_extension,
+                    salesperson_name,
+                    customer_name,
+                    language,
+                    enable_diarization=enable_diarization,
+                    call_record_id=call_record_id,
+                    file_id=file_id,
+                    force_analysis=force_analysis,
+                ),
+            )
+    finally:
+        if file_id:
+            # Wake a waiting bulk importer even when the pipeline stopped before analysis
+            # (no-op when analysis already reported the outcome)
+            get_completion_registry().resolve(
+                file_id, FAILED, "Transcription finished without analysis", persisted=False
+            )
+
+
+def _transcribe_and_analyze(
+    upload_id: str,
+    storage_path: str,
+    public_url: Optional[str],
+    provider: str,
+    file_extension: str,
+    salesperson_name: str,
+    customer_name: str,
+    language: Optional[str],
+    enable_diarization: bool = True,
+    call_record_id: Optional[str] = None,  # Add optional call_record_id parameter
+    file_id: Optional[str] = None,  # Add optional file_id parameter for updating bulk_import_files status
+    force_analysis: bool = False,  # Re-run analysis even if the transcript is unchanged
 ):
     """Background task: download audio via signed URL, send to provider, update DB.
     This implementation simulates provider processing and writes progress to
@@ -280,7 +338,7 @@ def _process_transcription_background(
         
         print(f"📥 Downloading audio from signed URL for upload_id={upload_id} (provider={provider})")
 
-        with requests.get(public_url, stream=True, timeout=60) as r:
+        with requests.get(public_url, stream=True, timeout=step_timeout(60)) as r:
             r.raise_for_status()
             # In a real implementation we would stream to the provider here.
             # Simulate a small read to verify URL works.
@@ -347,8 +405,16 @@ def _process_transcription_background(
                     "completed_at": datetime.utcnow().isoformat() + "Z",
                 }
                 
+                # Stored with the transcript below, replacing roles cached from an earlier diarization
+                speaker_roles = None
                 if diarization_segments:
-                    update_fields["diarization_segments"] = diarization_segments
+                    try:
+                        from services.speaker_roles import resolve_speaker_roles, label_segments
+                        speaker_roles = resolve_speaker_roles(diarization_segments)
+                        update_fields["diarization_segments"] = label_segments(diarization_segments, speaker_roles["roles"])
+                    except Exception as role_error:
+                        logger.warning(f"⚠️ Could not label speaker roles: {role_error}")
+                        update_fields["diarization_segments"] = diarization_segments
                 if diarization_confidence is not None:
                     update_fields["diarization_confidence"] = diarization_confidence
 
@@ -360,11 +426,13 @@ def _process_transcription_background(
                 if call_record_id:
                     print(f"✅ Found call_record_id={call_record_id}, updating call_records table with transcript (length: {len(transcript_text)} chars)")
                     try:
-                        # Only update the transcript field - this is the core requirement
+                        # Only the transcript (and the speaker roles resolved with it) - this is the core requirement
                         # Other fields like transcription_provider, diarization_segments, diarization_confidence
                         # may not exist in the call_records table schema
                         call_update = {
                             "transcript": transcript_text,
+                            # Same speaker labels may now mean different roles: never reuse the old mapping
+                            "speaker_roles": speaker_roles if speaker_roles and speaker_roles["roles"] else None,
                         }
                         
                         # Validate transcript is complete before saving
@@ -374,7 +442,7 @@ def _process_transcription_background(
                             return  # Don't update database or trigger analysis
                         
                         print(f"📝 Updating call_records table: call_record_id={call_record_id}, transcript_length={len(transcript_text)}")
-                        print(f"📝 Update payload: transcript only (length={len(transcript_text)})")
+                        print(f"📝 Update payload: transcript and speaker roles (length={len(transcript_text)})")
                         update_result = supabase.from_('call_records').update(call_update).eq('id', call_record_id).execute()
                         if update_result.data:
                             logger.info(f"✅ Successfully updated call_record {call_record_id} with transcript (length: {len(transcript_text)} chars, provider: {p})")
@@ -401,45 +469,38 @@ def _process_transcription_background(
                                 # Run analysis in async context
                                 async def run_analysis():
                                     try:
-                                        # Determine provider from environment: Gemini (primary) -> OpenAI (secondary)
-                                        import os
-                                        provider = "gemini"  # Default to Gemini (primary)
-                                        if not (os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")):
-                                            if os.getenv("OPENAI_API_KEY"):
-                                                provider = "openai"
-                                            else:
-                                                provider = "heuristic"  # Last resort
+                                        # No pinned provider: the LLM router picks the fastest healthy
+                                        # provider the org has enabled, heuristics are the last resort
+                                        provider = "auto"
                                         
-                                        print(f"📊 Step 1: Categorizing call {call_record_id} with provider={provider}")
-                                        category_result = await analysis_service.categorize_call(
+                                        # Categorization and objection detection are independent and run
+                                        # concurrently; overcome analysis waits for both (consult_scheduled only)
+                                        from services.analysis_dag import run_call_analysis, get_org_analysis_concurrency, get_call_record_org_id
+                                        from services.llm_usage import set_usage_org
+                                        org_id = get_call_record_org_id(supabase, call_record_id)
+                                        set_usage_org(org_id)
+                                        concurrency = get_org_analysis_concurrency(supabase, call_record_id, org_id=org_id)
+                                        print(f"📊 Running analysis graph for call {call_record_id} with provider={provider}, concurrency={concurrency}")
+                                        # Skipped (None) when this exact transcript was already analyzed with the current version
+                                        dag_results = await run_call_analysis(
+                                            supabase,
+                                            analysis_service,
                                             transcript=transcript_text,
                                             call_record_id=call_record_id,
-                                            provider=provider
+                                            provider=provider,
+                                            max_concurrency=concurrency,
+                                            segments=diarization_segments,
+                                            force=force_analysis
                                         )
-                                        print(f"✅ Categorization complete: category={category_result.get('category')}, confidence={category_result.get('confidence')}")
-                                        
-                                        print(f"📊 Step 2: Detecting objections for call {call_record_id}")
-                                        objections = await analysis_service.detect_objections(
-                                            transcript=transcript_text,
-                                            call_record_id=call_record_id,
-                                            provider=provider
-                                        )
-                                        print(f"✅ Objection detection complete: found {len(objections) if objections else 0} objections")
-                                        
-                                        # If consult was scheduled, analyze objection overcome
-                                        # Note: call_type is already stored in call_record from categorization
-                                        if category_result.get("category") == "consult_scheduled" and objections:
-                                            print(f"📊 Step 3: Analyzing objection overcomes for call {call_record_id}")
-                                            call_type = category_result.get("call_type")
-                                            if call_type:
-                                                logger.info(f"Using call_type context '{call_type}' for objection overcome analysis")
-                                            await analysis_service.analyze_objection_overcome(
-                                                transcript=transcript_text,
-                                                call_record_id=call_record_id,
-                                                objections=objections,
-                                                provider=provider
-                                            )
-                                            print(f"✅ Objection overcome analysis complete")
+                                        if dag_results is None:
+                                            print(f"⏭️ Transcript unchanged since last analysis, keeping existing results for {call_record_id}")
+                                        else:
+                                            category_result = dag_results.get("categorize") or {}
+                                            objections = dag_results.get("objections")
+                                            print(f"✅ Categorization complete: category={category_result.get('category')}, confidence={category_result.get('confidence')}")
+                                            print(f"✅ Objection detection complete: found {len(objections) if objections else 0} objections")
+                                            if dag_results.get("overcome") is not None:
+                                                print(f"✅ Objection overcome analysis complete")
                                         
                                         print(f"✅ ANALYSIS PIPELINE COMPLETE: call_record_id={call_record_id}")
                                         
@@ -459,6 +520,7 @@ def _process_transcription_background(
                                             except Exception as file_update_error:
                                                 logger.warning(f"⚠️ Failed to update bulk_import_files status: {file_update_error}")
                                                 print(f"⚠️ Failed to update bulk_import_files status: {file_update_error}")
+                                            get_completion_registry().resolve(file_id, COMPLETED)
                                     except Exception as analysis_error:
                                         logger.error(f"❌ Error in analysis pipeline: {analysis_error}", exc_info=True)
                                         print(f"❌ ANALYSIS ERROR: {analysis_error}")
@@ -476,6 +538,7 @@ def _process_transcription_background(
                                                     }).eq("id", file_id).execute()
                                             except Exception:
                                                 pass
+                                            get_completion_registry().resolve(file_id, FAILED, f"Analysis failed: {str(analysis_error)[:500]}")
                                 
                                 # Run analysis in a new event loop (since we're in a thread)
                                 loop = asyncio.new_event_loop()
@@ -727,15 +790,15 @@ def _transcribe_with_assemblyai(signed_url: str, enable_diarization: bool = True
         'audio_url': signed_url,
         'speaker_labels': enable_diarization,
     }
-    r = requests.post('https://api.assemblyai.com/v2/transcript', json=payload, headers=headers, timeout=30)
+    r = requests.post('https://api.assemblyai.com/v2/transcript', json=payload, headers=headers, timeout=step_timeout(30))
     r.raise_for_status()
     job_id = r.json().get('id')
     if not job_id:
         raise RuntimeError('AssemblyAI: missing job id')
 
-    # Poll until completed/failed
+    # Poll until completed/failed (step_timeout raises once the pipeline deadline has passed)
     for _ in range(60):  # up to ~60 * 2s = 2 minutes
-        s = requests.get(f'https://api.assemblyai.com/v2/transcript/{job_id}', headers=headers, timeout=15)
+        s = requests.get(f'https://api.assemblyai.com/v2/transcript/{job_id}', headers=headers, timeout=step_timeout(15))
         s.raise_for_status()
         data = s.json()
         status = data.get('status')
@@ -791,7 +854,7 @@ def _transcribe_with_deepgram(signed_url: str, enable_diarization: bool = True)
     
     url = f'https://api.deepgram.com/v1/listen?{"&".join(params)}'
     payload = { 'url': signed_url }
-    r = requests.post(url, json=payload, headers=headers, timeout=60)
+    r = requests.post(url, json=payload, headers=headers, timeout=step_timeout(60))
     r.raise_for_status()
     data = r.json()
     
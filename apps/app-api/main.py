@@ -284,6 +284,16 @@ except ImportError as e:
 except Exception as e:
     logger.error(f"Failed to register bulk import router: {e}")
 
+# Register re-analysis router
+try:
+    from api import reanalysis_api
+    app.include_router(reanalysis_api.router)
+    logger.info("✅ reanalysis router registered successfully")
+except ImportError as e:
+    logger.warning(f"reanalysis router not available: {e}")
+except Exception as e:
+    logger.error(f"Failed to register reanalysis router: {e}")
+
 # Register call statistics router
 if CALL_STATISTICS_ROUTER_AVAILABLE:
     try:
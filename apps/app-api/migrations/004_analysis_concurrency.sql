@@ -0,0 +1,8 @@
+-- Migration: Per-organization analysis concurrency
+-- Controls how many analysis steps (categorization, objection detection, overcome analysis)
+-- may run at the same time for a single call. Defaults to ANALYSIS_DAG_CONCURRENCY (2) when NULL.
+
+ALTER TABLE organization_analysis_settings
+ADD COLUMN IF NOT EXISTS analysis_concurrency INTEGER CHECK (analysis_concurrency IS NULL OR analysis_concurrency BETWEEN 1 AND 16);
+
+COMMENT ON COLUMN organization_analysis_settings.analysis_concurrency IS 'Max concurrent analysis steps per call (1 = sequential). NULL uses the server default.';
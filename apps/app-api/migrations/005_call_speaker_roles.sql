@@ -0,0 +1,9 @@
+-- Migration: Cache resolved speaker roles on call records
+-- speaker_roles maps diarization speakers to agent/customer, e.g.
+-- {"roles": {"Speaker A": "agent", "Speaker B": "customer"}, "customer_speaker": "Speaker B",
+--  "agent_speaker": "Speaker A", "confidence": 0.8, "method": "heuristic"}
+
+ALTER TABLE call_records
+ADD COLUMN IF NOT EXISTS speaker_roles JSONB;
+
+COMMENT ON COLUMN call_records.speaker_roles IS 'Agent/customer labels for diarization speakers, used to send only customer turns to objection detection';
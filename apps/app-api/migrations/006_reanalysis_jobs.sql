@@ -0,0 +1,41 @@
+-- Migration: Re-analysis jobs
+-- Re-runs categorization and objection detection over existing call_records after prompt/model changes.
+-- Records are walked in (created_at, id) order; `checkpoint` holds the last fully processed record so an
+-- interrupted job resumes where it stopped. `heartbeat_at` lets another worker take over a job whose
+-- process died.
+
+CREATE TABLE IF NOT EXISTS reanalysis_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    organization_id UUID REFERENCES organizations(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    filters JSONB NOT NULL DEFAULT '{}'::jsonb,
+    providers TEXT[] NOT NULL DEFAULT ARRAY['gemini', 'openai'],
+    provider_concurrency JSONB NOT NULL DEFAULT '{}'::jsonb,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'completed', 'failed', 'cancelled')),
+    total_records INTEGER DEFAULT 0,
+    processed_records INTEGER DEFAULT 0,
+    failed_records INTEGER DEFAULT 0,
+    checkpoint JSONB,
+    stats JSONB NOT NULL DEFAULT '{}'::jsonb,
+    error_message TEXT,
+    heartbeat_at TIMESTAMP WITH TIME ZONE,
+    started_at TIMESTAMP WITH TIME ZONE,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_reanalysis_jobs_organization_id ON reanalysis_jobs(organization_id);
+CREATE INDEX IF NOT EXISTS idx_reanalysis_jobs_status ON reanalysis_jobs(status);
+
+-- Keyset pagination over call_records
+CREATE INDEX IF NOT EXISTS idx_call_records_created_at_id ON call_records(created_at, id);
+
+ALTER TABLE reanalysis_jobs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own reanalysis jobs"
+    ON reanalysis_jobs FOR SELECT
+    USING (auth.uid() = user_id);
+
+COMMENT ON COLUMN reanalysis_jobs.checkpoint IS 'Last fully processed call record as {"created_at", "id"}; NULL before the first page completes';
+COMMENT ON COLUMN reanalysis_jobs.stats IS 'Progress snapshot: throughput, ETA and per-provider processed/error counts';
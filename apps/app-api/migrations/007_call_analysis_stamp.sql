@@ -0,0 +1,16 @@
+-- Migration: Transcript hash and analysis-version stamp on call records
+-- After a successful (LLM-backed) analysis the pipeline stores the hash of the transcript it analyzed and
+-- the analysis version (prompt version + model). A later run with the same transcript and version is
+-- skipped unless forced, so retranscribes that produce an identical transcript do not re-spend LLM budget.
+
+ALTER TABLE call_records
+ADD COLUMN IF NOT EXISTS transcript_hash TEXT,
+ADD COLUMN IF NOT EXISTS analysis_version TEXT,
+ADD COLUMN IF NOT EXISTS analyzed_at TIMESTAMP WITH TIME ZONE;
+
+COMMENT ON COLUMN call_records.transcript_hash IS 'SHA-256 of the whitespace-normalized transcript the current analysis was produced from';
+COMMENT ON COLUMN call_records.analysis_version IS 'Analysis prompt/model version that produced the current categorization and objections';
+
+-- Re-analysis jobs skip unchanged records unless forced
+ALTER TABLE reanalysis_jobs
+ADD COLUMN IF NOT EXISTS force BOOLEAN NOT NULL DEFAULT FALSE;
@@ -0,0 +1,12 @@
+-- Migration: Concurrent bulk import processing
+-- A job may process several files at once (bounded worker pool) instead of strictly one by one.
+-- `concurrency` overrides BULK_IMPORT_CONCURRENCY for the job; downloads, uploads and transcriptions have
+-- their own limits inside the pool. `stats` holds the live progress snapshot (per-stage in-flight counts,
+-- throughput, ETA) written as files finish.
+
+ALTER TABLE bulk_import_jobs
+ADD COLUMN IF NOT EXISTS concurrency INTEGER CHECK (concurrency IS NULL OR concurrency BETWEEN 1 AND 32),
+ADD COLUMN IF NOT EXISTS stats JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+COMMENT ON COLUMN bulk_import_jobs.concurrency IS 'Files processed at once for this job; NULL uses BULK_IMPORT_CONCURRENCY';
+COMMENT ON COLUMN bulk_import_jobs.stats IS 'Progress snapshot: per-stage in-flight counts, throughput and ETA';
@@ -0,0 +1,8 @@
+-- Migration: Content hash of imported audio files
+-- Bulk import streams each source file to a temp file and then to storage, hashing it on the way, so the
+-- full file is never held in memory. The SHA-256 of the downloaded bytes is kept with the file record.
+
+ALTER TABLE bulk_import_files
+ADD COLUMN IF NOT EXISTS content_sha256 TEXT;
+
+COMMENT ON COLUMN bulk_import_files.content_sha256 IS 'SHA-256 (hex) of the downloaded audio, computed while streaming it to storage';
@@ -0,0 +1,12 @@
+-- Migration: One file record per URL and job
+-- The importer registers all discovered files with batched upserts keyed on (job_id, original_url) instead of a
+-- lookup plus insert per file, and keeps the returned ids in memory while the job runs. Earlier runs could
+-- leave duplicate rows for the same URL; keep the oldest one before adding the key.
+
+DELETE FROM bulk_import_files newer
+USING bulk_import_files older
+WHERE newer.job_id = older.job_id
+  AND newer.original_url = older.original_url
+  AND (newer.created_at, newer.id) > (older.created_at, older.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_bulk_import_files_job_url ON bulk_import_files(job_id, original_url);
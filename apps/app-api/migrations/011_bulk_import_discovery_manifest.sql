@@ -0,0 +1,43 @@
+-- Migration: Discovery manifest for bulk import jobs
+-- Discovery results used to be serialized into bulk_import_jobs.error_message behind a DISCOVERY_JSON:: prefix
+-- and re-parsed on every status poll. They now live in their own table (one row per discovered URL, with how
+-- often discovery saw it), and the counts are stored on the job so the status endpoint can page through entries.
+
+CREATE TABLE IF NOT EXISTS bulk_import_discovery_entries (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    job_id UUID NOT NULL REFERENCES bulk_import_jobs(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    url TEXT,
+    source_file_id TEXT,
+    occurrences INTEGER NOT NULL DEFAULT 1 CHECK (occurrences >= 1),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_bulk_import_discovery_entries_job_url ON bulk_import_discovery_entries(job_id, url);
+CREATE INDEX IF NOT EXISTS idx_bulk_import_discovery_entries_job_position ON bulk_import_discovery_entries(job_id, position);
+
+COMMENT ON COLUMN bulk_import_discovery_entries.position IS 'Index of the first sighting in discovery order';
+COMMENT ON COLUMN bulk_import_discovery_entries.source_file_id IS 'Id of the file at the source (e.g. Google Drive file id)';
+COMMENT ON COLUMN bulk_import_discovery_entries.occurrences IS 'How many times discovery returned this URL (> 1 means duplicates)';
+
+ALTER TABLE bulk_import_jobs
+ADD COLUMN IF NOT EXISTS discovered_files INTEGER,
+ADD COLUMN IF NOT EXISTS unique_files INTEGER,
+ADD COLUMN IF NOT EXISTS duplicate_urls INTEGER;
+
+COMMENT ON COLUMN bulk_import_jobs.discovered_files IS 'Entries returned by discovery, duplicates included';
+COMMENT ON COLUMN bulk_import_jobs.unique_files IS 'Distinct URLs among the discovered entries';
+COMMENT ON COLUMN bulk_import_jobs.duplicate_urls IS 'URLs discovery returned more than once';
+
+ALTER TABLE bulk_import_discovery_entries ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view discovery entries of their own jobs"
+    ON bulk_import_discovery_entries FOR SELECT
+    USING (
+        EXISTS (
+            SELECT 1 FROM bulk_import_jobs
+            WHERE bulk_import_jobs.id = bulk_import_discovery_entries.job_id
+            AND bulk_import_jobs.user_id = auth.uid()
+        )
+    );
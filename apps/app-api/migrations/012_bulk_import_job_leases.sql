@@ -0,0 +1,19 @@
+-- Migration: Resumable bulk import jobs
+-- Jobs used to run as an in-memory background task of the worker that accepted them; a recycled worker or a
+-- deploy left them stuck. A worker now takes a lease on the job row (lease_owner, lease_expires_at) and renews
+-- it while the job runs. A scheduler sweep on every worker picks up unfinished jobs whose lease ran out and
+-- resumes them from per-file state: finished files are skipped and uploaded files continue at transcription.
+-- provider and call_log_file_url are stored so any worker has what it needs to resume the job.
+
+ALTER TABLE bulk_import_jobs
+ADD COLUMN IF NOT EXISTS provider TEXT NOT NULL DEFAULT 'openai',
+ADD COLUMN IF NOT EXISTS call_log_file_url TEXT,
+ADD COLUMN IF NOT EXISTS lease_owner TEXT,
+ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITH TIME ZONE;
+
+COMMENT ON COLUMN bulk_import_jobs.lease_owner IS 'Worker currently running the job (host-pid-boot id); NULL when nobody is';
+COMMENT ON COLUMN bulk_import_jobs.lease_expires_at IS 'Renewed while the job runs; once past, another worker may resume the job';
+
+-- Scheduler sweep: unfinished jobs by lease expiry
+CREATE INDEX IF NOT EXISTS idx_bulk_import_jobs_active_lease ON bulk_import_jobs(lease_expires_at)
+    WHERE status IN ('pending', 'discovering', 'converting', 'uploading', 'analyzing');
@@ -0,0 +1,22 @@
+-- Migration: Content-level deduplication across bulk import jobs
+-- The same recording imported under another URL or by another job used to be downloaded, stored, transcribed
+-- and analyzed again. The importer now checks the source's HEAD metadata first (a strong ETag with the same
+-- Content-Length) and the SHA-256 of the downloaded bytes last; a match among the user's completed files links
+-- the new file to the existing call record and storage object (duplicate_of) instead of reprocessing it.
+-- Skipped files and bytes are reported in bulk_import_jobs.stats.
+
+ALTER TABLE bulk_import_files
+ADD COLUMN IF NOT EXISTS etag TEXT,
+ADD COLUMN IF NOT EXISTS content_length BIGINT,
+ADD COLUMN IF NOT EXISTS last_modified TEXT,
+ADD COLUMN IF NOT EXISTS duplicate_of UUID REFERENCES bulk_import_files(id) ON DELETE SET NULL;
+
+COMMENT ON COLUMN bulk_import_files.etag IS 'ETag the source returned for HEAD';
+COMMENT ON COLUMN bulk_import_files.content_length IS 'Content-Length the source returned for HEAD';
+COMMENT ON COLUMN bulk_import_files.last_modified IS 'Last-Modified the source returned for HEAD';
+COMMENT ON COLUMN bulk_import_files.duplicate_of IS 'Earlier imported file with the same content; its call record and storage object are reused';
+
+CREATE INDEX IF NOT EXISTS idx_bulk_import_files_content_sha256 ON bulk_import_files(content_sha256)
+    WHERE content_sha256 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_bulk_import_files_etag ON bulk_import_files(etag, content_length)
+    WHERE etag IS NOT NULL;
@@ -0,0 +1,14 @@
+-- Migration: HEAD prefetch and processing order for bulk imports
+-- Before processing, the importer HEADs every discovered file (size, type, ETag). Oversize and non-audio files
+-- fail before any download, known sizes feed a byte-based ETA in bulk_import_jobs.stats, and files can be
+-- processed shortest-first (first results sooner) or largest-first (better overall throughput).
+
+ALTER TABLE bulk_import_jobs
+ADD COLUMN IF NOT EXISTS file_order TEXT CHECK (file_order IS NULL OR file_order IN ('discovery', 'shortest_first', 'largest_first'));
+
+COMMENT ON COLUMN bulk_import_jobs.file_order IS 'Processing order for the job; NULL uses BULK_IMPORT_FILE_ORDER';
+
+ALTER TABLE bulk_import_files
+ADD COLUMN IF NOT EXISTS content_type TEXT;
+
+COMMENT ON COLUMN bulk_import_files.content_type IS 'Content-Type the source returned for HEAD';
@@ -0,0 +1,10 @@
+-- Migration: Owner of a running re-analysis job
+-- The heartbeat used to be written only after a whole page of records, and a slow page could outlast
+-- REANALYSIS_STALE_SECONDS, letting a second worker claim a job that was still running. The owning worker now
+-- renews heartbeat_at on a timer, and only while `owner` is still its own id: a worker that finds the job
+-- claimed by someone else stops instead of processing the same records twice.
+
+ALTER TABLE reanalysis_jobs
+ADD COLUMN IF NOT EXISTS owner TEXT;
+
+COMMENT ON COLUMN reanalysis_jobs.owner IS 'Worker currently running the job (host-pid-boot id), set when it is claimed';
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Train the local call classifier from LLM-labeled call_records
+Writes a new versioned model to LOCAL_CLASSIFIER_DIR (or --output-dir) and
+points LATEST at it. Running API processes pick it up on restart.
+
+Usage: python scripts/train_call_classifier.py [--min-confidence 0.8] [--limit N] [--output-dir DIR]
+"""
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.supabase_client import get_supabase_client
+from services.local_call_classifier import fetch_training_examples, train_classifier
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local call classifier")
+    parser.add_argument("--min-confidence", type=float, default=0.8, help="Minimum LLM categorization_confidence")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of call records to use")
+    parser.add_argument("--holdout", type=float, default=0.1, help="Share of examples held out for evaluation")
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--output-dir", default=None, help="Model directory (defaults to LOCAL_CLASSIFIER_DIR)")
+    args = parser.parse_args()
+
+    supabase = get_supabase_client()
+    examples = fetch_training_examples(supabase, min_confidence=args.min_confidence, limit=args.limit)
+    logger.info(f"Fetched {len(examples)} LLM-labeled call records")
+    if len(examples) < 50:
+        logger.error("❌ Not enough labeled call records to train a useful model")
+        sys.exit(1)
+
+    classifier = train_classifier(examples, holdout=args.holdout, epochs=args.epochs)
+    version = classifier.save(args.output_dir)
+    logger.info(f"\n✅ Saved model {version}")
+    logger.info(json.dumps(classifier.metadata, indent=2))
+
+
+if __name__ == "__main__":
+    main()
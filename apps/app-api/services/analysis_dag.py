@@ -0,0 +1,306 @@
+"""
+Analysis DAG - Runs the call analysis steps as a small dependency graph
+Independent steps (categorization, objection detection) run concurrently,
+dependent steps start as soon as everything they need has finished. Optional
+steps declare the time they need and are skipped when the pipeline deadline
+(services.deadline) has less than that left.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Dict, Any, Optional, List, Callable, Awaitable, Iterable
+
+from services.deadline import OVERCOME_MIN_BUDGET_SECONDS, deadline_scope, get_deadline, has_budget
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_DAG_CONCURRENCY", "2"))
+
+
+class AnalysisStep:
+    """A single node in the analysis graph"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Awaitable[Any]],
+        depends_on: Optional[Iterable[str]] = None,
+        condition: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        min_budget: Optional[float] = None,
+    ):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on or [])
+        self.condition = condition
+        self.min_budget = min_budget
+
+
+class AnalysisDAG:
+    """
+    Minimal async DAG executor.
+
+    Each step receives the results of all previously completed steps and
+    returns its own result. A step with a condition is skipped (result None)
+    when the condition is false once its dependencies are done, and a step
+    with a min_budget is skipped when less time than that is left; the reason
+    for each skip is kept in `skipped` ("condition" or "deadline").
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_ANALYSIS_CONCURRENCY):
+        self.max_concurrency = max(1, int(max_concurrency or 1))
+        self.steps: Dict[str, AnalysisStep] = {}
+        self.skipped: Dict[str, str] = {}
+
+    def add_step(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Awaitable[Any]],
+        depends_on: Optional[Iterable[str]] = None,
+        condition: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        min_budget: Optional[float] = None,
+    ) -> "AnalysisDAG":
+        if name in self.steps:
+            raise ValueError(f"Duplicate analysis step: {name}")
+        self.steps[name] = AnalysisStep(name, func, depends_on, condition, min_budget)
+        return self
+
+    def _validate(self):
+        for step in self.steps.values():
+            for dep in step.depends_on:
+                if dep not in self.steps:
+                    raise ValueError(f"Step '{step.name}' depends on unknown step '{dep}'")
+
+        # Detect cycles with a simple DFS
+        visiting, visited = set(), set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle detected in analysis graph at '{name}'")
+            visiting.add(name)
+            for dep in self.steps[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.steps:
+            visit(name)
+
+    async def run(self) -> Dict[str, Any]:
+        """Execute all steps; raises the first step error after cancelling the rest"""
+        self._validate()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results: Dict[str, Any] = {}
+        self.skipped = {}
+        done_events = {name: asyncio.Event() for name in self.steps}
+
+        async def run_step(step: AnalysisStep):
+            try:
+                for dep in step.depends_on:
+                    await done_events[dep].wait()
+
+                if step.condition is not None and not step.condition(results):
+                    logger.info(f"⏭️ Skipping analysis step '{step.name}' (condition not met)")
+                    results[step.name] = None
+                    self.skipped[step.name] = "condition"
+                    return
+
+                if step.min_budget is not None and not has_budget(step.min_budget):
+                    logger.warning(
+                        f"⏱️ Skipping analysis step '{step.name}': under {step.min_budget:.0f}s left ({get_deadline()})"
+                    )
+                    results[step.name] = None
+                    self.skipped[step.name] = "deadline"
+                    return
+
+                async with semaphore:
+                    logger.info(f"📊 Running analysis step '{step.name}'")
+                    results[step.name] = await step.func(results)
+            finally:
+                done_events[step.name].set()
+
+        tasks: List[asyncio.Task] = [
+            asyncio.ensure_future(run_step(step)) for step in self.steps.values()
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return results
+
+
+def get_call_record_org_id(supabase, call_record_id: Optional[str]) -> Optional[str]:
+    """Organization owning a call record (None when unknown)"""
+    if not supabase or not call_record_id:
+        return None
+    try:
+        record = supabase.from_('call_records').select('organization_id').eq('id', call_record_id).execute()
+        return record.data[0].get('organization_id') if record and record.data else None
+    except Exception as e:
+        logger.warning(f"Error looking up organization for call record {call_record_id}: {e}")
+        return None
+
+
+def get_org_analysis_concurrency(supabase, call_record_id: Optional[str] = None, org_id: Optional[str] = None) -> int:
+    """
+    Resolve analysis concurrency for the organization owning a call record.
+    Reads organization_analysis_settings.analysis_concurrency, falls back to
+    ANALYSIS_DAG_CONCURRENCY.
+    """
+    if not supabase:
+        return DEFAULT_ANALYSIS_CONCURRENCY
+    try:
+        org_id = org_id or get_call_record_org_id(supabase, call_record_id)
+        if not org_id:
+            return DEFAULT_ANALYSIS_CONCURRENCY
+
+        settings = supabase.from_('organization_analysis_settings').select('analysis_concurrency').eq('organization_id', org_id).execute()
+        if settings and settings.data:
+            value = settings.data[0].get('analysis_concurrency')
+            if value:
+                return max(1, int(value))
+    except Exception as e:
+        logger.warning(f"Error getting org analysis concurrency: {e}, using default")
+    return DEFAULT_ANALYSIS_CONCURRENCY
+
+
+def build_call_analysis_dag(
+    analysis_service,
+    transcript: str,
+    call_record_id: str,
+    provider: str,
+    max_concurrency: int = DEFAULT_ANALYSIS_CONCURRENCY,
+    segments: Optional[List[Dict[str, Any]]] = None,
+) -> AnalysisDAG:
+    """
+    Standard call analysis graph:
+        categorize ─┐
+                    ├─> overcome (only when consult_scheduled and objections found)
+        objections ─┘
+    """
+    dag = AnalysisDAG(max_concurrency=max_concurrency)
+
+    async def categorize(_results):
+        return await analysis_service.categorize_call(
+            transcript=transcript,
+            call_record_id=call_record_id,
+            provider=provider
+        )
+
+    async def objections(_results):
+        return await analysis_service.detect_objections(
+            transcript=transcript,
+            call_record_id=call_record_id,
+            provider=provider,
+            segments=segments
+        )
+
+    async def overcome(results):
+        call_type = (results.get("categorize") or {}).get("call_type")
+        if call_type:
+            logger.info(f"Using call_type context '{call_type}' for objection overcome analysis")
+        return await analysis_service.analyze_objection_overcome(
+            transcript=transcript,
+            call_record_id=call_record_id,
+            objections=results.get("objections"),
+            provider=provider
+        )
+
+    def should_analyze_overcome(results) -> bool:
+        category = (results.get("categorize") or {}).get("category")
+        return category == "consult_scheduled" and bool(results.get("objections"))
+
+    dag.add_step("categorize", categorize)
+    dag.add_step("objections", objections)
+    dag.add_step(
+        "overcome",
+        overcome,
+        depends_on=["categorize", "objections"],
+        condition=should_analyze_overcome,
+        min_budget=OVERCOME_MIN_BUDGET_SECONDS,
+    )
+    return dag
+
+
+async def run_call_analysis(
+    supabase,
+    analysis_service,
+    transcript: str,
+    call_record_id: str,
+    provider: str,
+    max_concurrency: int = DEFAULT_ANALYSIS_CONCURRENCY,
+    segments: Optional[List[Dict[str, Any]]] = None,
+    force: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """
+    Run the standard analysis graph unless the call was already analyzed from
+    the same transcript with the current analysis version (returns None then).
+    The stamp is only written when categorization and objection detection
+    both came from an LLM and no step was cut for time, so a heuristic or
+    failed step during an outage or a deadline-shortened run is retried on
+    the next run. Runs under the
+    caller's deadline, else a new PIPELINE_DEADLINE_SECONDS one.
+    """
+    from services.analysis_stamp import transcript_hash
+    from services.single_flight import flight_key, get_single_flight
+
+    # Concurrent triggers for the same call and transcript share one run
+    key = flight_key("analysis:force" if force else "analysis", call_record_id, transcript_hash(transcript), provider)
+    return await get_single_flight().do(
+        key,
+        lambda: _run_call_analysis(
+            supabase, analysis_service, transcript, call_record_id, provider, max_concurrency, segments, force
+        ),
+    )
+
+
+async def _run_call_analysis(
+    supabase,
+    analysis_service,
+    transcript: str,
+    call_record_id: str,
+    provider: str,
+    max_concurrency: int,
+    segments: Optional[List[Dict[str, Any]]],
+    force: bool,
+) -> Optional[Dict[str, Any]]:
+    from services.analysis_stamp import is_analysis_current, stamp_analysis
+
+    if not force and is_analysis_current(supabase, call_record_id, transcript):
+        logger.info(f"⏭️ Analysis for call {call_record_id} is current (same transcript and version), skipping")
+        return None
+
+    dag = build_call_analysis_dag(
+        analysis_service,
+        transcript=transcript,
+        call_record_id=call_record_id,
+        provider=provider,
+        max_concurrency=max_concurrency,
+        segments=segments,
+    )
+    # Steps size their timeouts from this budget (the caller's, if it set one)
+    with deadline_scope(label=f"analysis {call_record_id}"):
+        results = await dag.run()
+    cut_for_time = [name for name, reason in dag.skipped.items() if reason == "deadline"]
+
+    if results.get("overcome") is None and "overcome" not in cut_for_time and supabase:
+        # Overcome details from an earlier analysis no longer apply
+        try:
+            supabase.table("objection_overcome_details").delete().eq("call_record_id", call_record_id).execute()
+        except Exception as e:
+            logger.debug(f"Could not clear stale overcome details for {call_record_id}: {e}")
+
+    reasoning = (results.get("categorize") or {}).get("reasoning") or ""
+    objections = results.get("objections")
+    # Heuristic or failed detection says so (ObjectionResults.reliable); None means the step failed
+    objections_from_llm = objections is not None and getattr(objections, "reliable", True)
+    if "[HEURISTIC" not in reasoning and objections_from_llm and not cut_for_time:
+        answered = {(results.get("categorize") or {}).get("provider"), getattr(objections, "provider", None)}
+        stamp_analysis(supabase, call_record_id, transcript, providers=answered - {None})
+    return results
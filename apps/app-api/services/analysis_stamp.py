@@ -0,0 +1,85 @@
+"""
+Analysis Stamp - Transcript content hash and analysis version for call records
+A call's analysis is current when it was produced from the same transcript
+(by content hash) with the same analysis version; re-running it would only
+re-spend LLM budget to write the same rows again. The version names each
+provider that answered with its model, so changing that provider's model
+makes the analysis stale.
+"""
+
+import hashlib
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bump when analysis prompts or result parsing change in a way that should re-run existing calls
+ANALYSIS_PROMPT_VERSION = "1"
+
+
+def transcript_hash(transcript: Optional[str]) -> str:
+    """SHA-256 of the transcript with whitespace normalized (re-wrapping is not a change)"""
+    normalized = " ".join((transcript or "").split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def provider_model(provider: str) -> str:
+    """Model the analysis steps use for a provider"""
+    if provider == "gemini":
+        from services.call_analysis_service import GEMINI_ANALYSIS_MODELS
+        return GEMINI_ANALYSIS_MODELS[0]
+    return os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+
+def current_analysis_version(providers: Optional[Iterable[str]] = None) -> str:
+    """
+    Prompt version plus each provider's model (all configured providers unless
+    given the ones that answered); ANALYSIS_VERSION overrides the whole stamp
+    """
+    override = os.getenv("ANALYSIS_VERSION")
+    if override:
+        return override
+    from services.llm_router import DEFAULT_PROVIDERS
+
+    models = ",".join(f"{p}:{provider_model(p)}" for p in sorted(set(providers or DEFAULT_PROVIDERS)))
+    return f"p{ANALYSIS_PROMPT_VERSION}+{models}"
+
+
+def _stamped_providers(version: Optional[str]) -> List[str]:
+    """Providers named in a stored version ("p1+gemini:m1,openai:m2" -> gemini, openai)"""
+    _, _, models = (version or "").partition("+")
+    return [m.partition(":")[0] for m in models.split(",") if m]
+
+
+def is_analysis_current(supabase, call_record_id: Optional[str], transcript: str) -> bool:
+    """True when the stored stamp matches this transcript and the current version"""
+    if not supabase or not call_record_id:
+        return False
+    try:
+        result = supabase.table("call_records").select("transcript_hash, analysis_version").eq("id", call_record_id).execute()
+        if not result or not result.data:
+            return False
+        stamp = result.data[0]
+        return (
+            stamp.get("transcript_hash") == transcript_hash(transcript)
+            and stamp.get("analysis_version") == current_analysis_version(_stamped_providers(stamp.get("analysis_version")))
+        )
+    except Exception as e:
+        logger.debug(f"Could not read analysis stamp for {call_record_id}: {e}")
+        return False
+
+
+def stamp_analysis(supabase, call_record_id: Optional[str], transcript: str, providers: Optional[Iterable[str]] = None):
+    """Record that the call's analysis now reflects this transcript and the providers' models"""
+    if not supabase or not call_record_id:
+        return
+    try:
+        supabase.table("call_records").update({
+            "transcript_hash": transcript_hash(transcript),
+            "analysis_version": current_analysis_version(providers),
+            "analyzed_at": datetime.now(timezone.utc).isoformat(),
+        }).eq("id", call_record_id).execute()
+    except Exception as e:
+        logger.warning(f"⚠️ Could not stamp analysis on call_record {call_record_id}: {e}")
@@ -1,18 +1,35 @@
 """
 Bulk Import Service - Handles the actual processing of bulk audio imports
+Files run through a bounded worker pool: up to `concurrency` files at once
+(BULK_IMPORT_CONCURRENCY, or the job's own setting), with separate limits for
+downloads, storage uploads and transcription so one slow stage cannot take
+every slot. The default of 1 keeps the original one-by-one processing.
+Discovery is an async generator feeding a bounded queue, so workers start on
+the first files while a large folder is still being listed.
+Downloads stream to a temp file in chunks (size limit and SHA-256 checked on
+the way) and are uploaded from disk, so memory per file stays constant.
+Jobs run under a renewed lease on the job row; a job whose worker went away is
+resumed from per-file state by the scheduler sweep on any worker.
 """
 import logging
 import os
 import re
+import time
 import asyncio
+from contextlib import asynccontextmanager
 import aiohttp
 import aiofiles
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
 from urllib.parse import urljoin, urlparse
 from pathlib import Path
 import tempfile
 import shutil
+import hashlib
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
 from supabase import Client
+from services.completion_registry import FAILED, get_completion_registry
 import json
 
 logger = logging.getLogger(__name__)
@@ -21,6 +38,361 @@ logger = logging.getLogger(__name__)
 SUPPORTED_FORMATS = ['.wav', '.mp3', '.m4a', '.webm', '.ogg']
 MAX_FILE_SIZE = 1024 * 1024 * 1024  # 1GB
 
+# Files processed at once per job (1 = sequential)
+DEFAULT_BULK_IMPORT_CONCURRENCY = int(os.getenv("BULK_IMPORT_CONCURRENCY", "1"))
+MAX_BULK_IMPORT_CONCURRENCY = 32
+# Per-stage limits inside the pool
+BULK_IMPORT_DOWNLOAD_CONCURRENCY = int(os.getenv("BULK_IMPORT_DOWNLOAD_CONCURRENCY", "4"))
+BULK_IMPORT_UPLOAD_CONCURRENCY = int(os.getenv("BULK_IMPORT_UPLOAD_CONCURRENCY", "4"))
+BULK_IMPORT_TRANSCRIPTION_CONCURRENCY = int(os.getenv("BULK_IMPORT_TRANSCRIPTION_CONCURRENCY", "4"))
+
+STAGES = ("downloading", "uploading", "transcribing")
+
+# Downloads are streamed to temp files in this directory (system temp dir by default)
+BULK_IMPORT_TEMP_DIR = os.getenv("BULK_IMPORT_TEMP_DIR") or None
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+# Discovered files are registered with one upsert per batch
+FILE_RECORD_BATCH_SIZE = 500
+# Files are processed while discovery still runs: discovered files are handed over in batches
+# (FILE_RECORD_BATCH_SIZE files, or whatever was found within this many seconds) through a queue
+# of at most BULK_IMPORT_DISCOVERY_QUEUE_SIZE files, which pauses discovery while workers catch up
+BULK_IMPORT_DISCOVERY_BATCH_SECONDS = float(os.getenv("BULK_IMPORT_DISCOVERY_BATCH_SECONDS", "1.0"))
+BULK_IMPORT_DISCOVERY_QUEUE_SIZE = int(os.getenv("BULK_IMPORT_DISCOVERY_QUEUE_SIZE", "200"))
+# HEAD requests in flight while prefetching sizes/types of discovered files (0 = no prefetch)
+BULK_IMPORT_HEAD_CONCURRENCY = int(os.getenv("BULK_IMPORT_HEAD_CONCURRENCY", "16"))
+# Processing order: discovery, shortest_first (earliest first results) or largest_first (throughput)
+FILE_ORDERS = ("discovery", "shortest_first", "largest_first")
+DEFAULT_FILE_ORDER = os.getenv("BULK_IMPORT_FILE_ORDER", "discovery")
+# Content types that are certainly not audio (e.g. an HTML error or login page)
+NON_AUDIO_CONTENT_TYPE_PREFIXES = ("text/", "image/")
+NON_AUDIO_CONTENT_TYPES = ("application/json", "application/xml", "application/pdf", "application/zip")
+
+# Skip files whose content was already imported (and analyzed) by one of the user's jobs
+CONTENT_DEDUP_ENABLED = os.getenv("BULK_IMPORT_CONTENT_DEDUP", "true").lower() not in ("0", "false", "no")
+
+# Jobs are owned through a lease on the job row, renewed while the job runs; a job whose
+# lease ran out (its worker died) is picked up by the next scheduler sweep on any worker
+BULK_IMPORT_LEASE_SECONDS = int(os.getenv("BULK_IMPORT_LEASE_SECONDS", "120"))
+BULK_IMPORT_SWEEP_SECONDS = int(os.getenv("BULK_IMPORT_SWEEP_SECONDS", "60"))
+ACTIVE_JOB_STATUSES = ("pending", "discovering", "converting", "uploading", "analyzing")
+
+# Status and progress writes are buffered and flushed together (seconds / changes)
+PROGRESS_FLUSH_SECONDS = float(os.getenv("BULK_IMPORT_PROGRESS_FLUSH_SECONDS", "1.0"))
+PROGRESS_FLUSH_EVERY = int(os.getenv("BULK_IMPORT_PROGRESS_FLUSH_EVERY", "50"))
+TERMINAL_FILE_STATUSES = ("completed", "failed")
+
+
+def _file_too_large(size: int) -> str:
+    file_size_mb = size / (1024 * 1024)
+    max_size_gb = MAX_FILE_SIZE / (1024 * 1024 * 1024)
+    return f"File size {file_size_mb:.2f}MB exceeds maximum {max_size_gb}GB"
+
+
+def _remove_quietly(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove temp file {path}: {e}")
+
+
+def _reject_reason(source: Dict[str, Any]) -> Optional[str]:
+    """Why a file can be refused from its HEAD metadata alone (None when it may be imported)"""
+    length = source.get("content_length")
+    if length and length > MAX_FILE_SIZE:
+        return _file_too_large(length)
+    content_type = (source.get("content_type") or "").split(";")[0].strip().lower()
+    if content_type and (
+        content_type.startswith(NON_AUDIO_CONTENT_TYPE_PREFIXES) or content_type in NON_AUDIO_CONTENT_TYPES
+    ):
+        return f"Unsupported content type: {content_type}"
+    return None
+
+
+def _looks_like_audio(file_info: Dict[str, Any]) -> bool:
+    """
+    Whether a discovered Google Drive entry may be audio. Checked again when
+    downloading; Drive links often carry no extension, so those are kept.
+    """
+    url = file_info.get("url", "").lower()
+    name = file_info.get("name", "").lower()
+    return (
+        any(ext in name for ext in SUPPORTED_FORMATS)
+        or any(ext in url for ext in SUPPORTED_FORMATS)
+        or "drive.google.com" in url
+    )
+
+
+def order_files(files: List[Dict[str, Any]], order: str) -> List[Dict[str, Any]]:
+    """Files in processing order; sizes come from the HEAD prefetch, unknown sizes go last"""
+    def size(file_info):
+        return (file_info.get("source") or {}).get("content_length")
+
+    if order == "shortest_first":
+        return sorted(files, key=lambda f: (size(f) is None, size(f) or 0))
+    if order == "largest_first":
+        return sorted(files, key=lambda f: (size(f) is None, -(size(f) or 0)))
+    return files
+
+
+class DownloadedAudio:
+    """A downloaded source file on local disk, with its size and content hash"""
+
+    def __init__(self, path: str, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    def cleanup(self):
+        _remove_quietly(self.path)
+
+
+class BulkImportLimits:
+    """Worker count and per-stage semaphores for one job"""
+
+    def __init__(
+        self,
+        files: int = DEFAULT_BULK_IMPORT_CONCURRENCY,
+        download: int = BULK_IMPORT_DOWNLOAD_CONCURRENCY,
+        upload: int = BULK_IMPORT_UPLOAD_CONCURRENCY,
+        transcription: int = BULK_IMPORT_TRANSCRIPTION_CONCURRENCY,
+    ):
+        self.files = max(1, min(MAX_BULK_IMPORT_CONCURRENCY, int(files or 1)))
+        self.stage_limits = {
+            "downloading": max(1, int(download or 1)),
+            "uploading": max(1, int(upload or 1)),
+            "transcribing": max(1, int(transcription or 1)),
+        }
+        self._semaphores = {stage: asyncio.Semaphore(limit) for stage, limit in self.stage_limits.items()}
+
+    def semaphore(self, stage: str) -> asyncio.Semaphore:
+        return self._semaphores[stage]
+
+
+class BulkImportProgress:
+    """Per-job counters: files done, failures, files in each stage, throughput and ETA"""
+
+    def __init__(self, total: int, limits: BulkImportLimits):
+        self.total = total
+        self.limits = limits
+        self.processed = 0
+        self.failed = 0
+        self.duplicates = 0
+        self.duplicate_bytes = 0
+        self.rejected = 0
+        # Sizes known from the HEAD prefetch
+        self.total_bytes = 0
+        self.done_bytes = 0
+        self.unknown_size = 0
+        # Set while discovery still runs (total keeps growing)
+        self.discovering = False
+        self.in_flight = {stage: 0 for stage in STAGES}
+        self._started = time.monotonic()
+
+    def expect_bytes(self, size: Optional[int]):
+        """Add a file still to be processed to the byte estimate"""
+        if size:
+            self.total_bytes += size
+        else:
+            self.unknown_size += 1
+
+    def record(self, ok: bool, size: Optional[int] = None):
+        if ok:
+            self.processed += 1
+        else:
+            self.failed += 1
+        self.done_bytes += size or 0
+
+    def record_duplicate(self, size: int):
+        """A file linked to already-imported content instead of being processed again"""
+        self.duplicates += 1
+        self.duplicate_bytes += size or 0
+
+    @property
+    def done(self) -> int:
+        return self.processed + self.failed
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self._started
+        throughput = (self.done / elapsed * 60) if elapsed > 0 else 0.0
+        remaining = max(0, self.total - self.done)
+        eta = int(remaining / throughput * 60) if throughput else None
+        if self.total_bytes and not self.unknown_size and self.done_bytes and elapsed > 0:
+            # Every size is known: bytes predict the rest better than file counts
+            eta = int(max(0, self.total_bytes - self.done_bytes) / (self.done_bytes / elapsed))
+        return {
+            "total": self.total,
+            "processed": self.processed,
+            "failed": self.failed,
+            "skipped_duplicates": self.duplicates,
+            "skipped_duplicate_bytes": self.duplicate_bytes,
+            "rejected_before_download": self.rejected,
+            "total_bytes": self.total_bytes,
+            "processed_bytes": self.done_bytes,
+            "unknown_size_files": self.unknown_size,
+            "discovering": self.discovering,
+            "progress_percentage": round(self.done / self.total * 100, 1) if self.total else 100.0,
+            "in_flight": dict(self.in_flight),
+            "concurrency": {"files": self.limits.files, **self.limits.stage_limits},
+            "throughput_per_minute": round(throughput, 1),
+            "eta_seconds": eta,
+        }
+
+
+class ProgressAggregator:
+    """
+    Buffers a job's status writes and flushes them together: on a timer, every
+    `flush_every` changes, and right away for terminal states (or when asked).
+    Consecutive changes to the same file merge into one write, and files with
+    identical pending changes (e.g. many "downloading") share one UPDATE.
+    """
+
+    def __init__(
+        self,
+        supabase: Client,
+        job_id: str,
+        flush_interval: float = PROGRESS_FLUSH_SECONDS,
+        flush_every: int = PROGRESS_FLUSH_EVERY,
+    ):
+        self.supabase = supabase
+        self.job_id = job_id
+        self.flush_interval = flush_interval
+        self.flush_every = max(1, flush_every)
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._job: Dict[str, Any] = {}
+        self._changes_since_flush = 0
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self.changes = 0
+        self.writes = 0
+
+    def start(self):
+        if self._timer is None:
+            self._timer = asyncio.ensure_future(self._flush_periodically())
+
+    async def close(self):
+        """Stop the timer and write whatever is still buffered"""
+        if self._timer is not None:
+            self._timer.cancel()
+            try:
+                await self._timer
+            except asyncio.CancelledError:
+                pass
+            self._timer = None
+        await self.flush()
+        logger.info(f"🧮 Job {self.job_id}: {self.changes} progress changes written in {self.writes} updates")
+
+    async def update_file(self, file_id: str, updates: Dict[str, Any], flush: bool = False):
+        self._files.setdefault(file_id, {}).update(updates)
+        await self._changed(flush or updates.get("status") in TERMINAL_FILE_STATUSES)
+
+    async def update_job(self, updates: Dict[str, Any], flush: bool = False):
+        self._job.update(updates)
+        await self._changed(flush)
+
+    async def _changed(self, flush: bool):
+        self.changes += 1
+        self._changes_since_flush += 1
+        if flush or self._changes_since_flush >= self.flush_every:
+            await self.flush()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._files or self._job:
+                await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            files, self._files = self._files, {}
+            job, self._job = self._job, {}
+            self._changes_since_flush = 0
+
+            groups: Dict[str, tuple] = {}
+            for file_id, updates in files.items():
+                key = json.dumps(updates, sort_keys=True, default=str)
+                groups.setdefault(key, (updates, []))[1].append(file_id)
+            for updates, file_ids in groups.values():
+                try:
+                    query = self.supabase.table("bulk_import_files").update(updates)
+                    if len(file_ids) == 1:
+                        query.eq("id", file_ids[0]).execute()
+                    else:
+                        query.in_("id", file_ids).execute()
+                    self.writes += 1
+                except Exception as e:
+                    logger.warning(f"Failed to write status of {len(file_ids)} file(s) for job {self.job_id}: {e}")
+                    # Retry with the next flush, under anything newer
+                    for file_id in file_ids:
+                        self._files[file_id] = {**updates, **self._files.get(file_id, {})}
+
+            if job:
+                try:
+                    self.supabase.table("bulk_import_jobs").update(job).eq("id", self.job_id).execute()
+                    self.writes += 1
+                except Exception as e:
+                    logger.warning(f"Failed to update progress for job {self.job_id}: {e}")
+                    self._job = {**job, **self._job}
+
+
+class DiscoveryManifest:
+    """
+    A job's discovered entries in bulk_import_discovery_entries (one row per URL,
+    in discovery order, with how often it was seen) and the counts on the job,
+    written batch by batch while discovery runs.
+    """
+
+    def __init__(self, supabase: Client, job_id: str):
+        self.supabase = supabase
+        self.job_id = job_id
+        self.discovered = 0
+        self.rows: List[Dict[str, Any]] = []
+        self._by_url: Dict[str, Dict[str, Any]] = {}
+        self._unsaved: List[Dict[str, Any]] = []
+
+    def add(self, file_info: Dict[str, Any]) -> bool:
+        """Count a discovered entry; False when its URL was already discovered"""
+        position = self.discovered
+        self.discovered += 1
+        url = file_info.get("url")
+        row = self._by_url.get(url) if url else None
+        if row is not None:
+            row["occurrences"] += 1
+            if not any(r is row for r in self._unsaved):
+                self._unsaved.append(row)
+            return False
+        row = {
+            "job_id": self.job_id,
+            "position": position,
+            "name": file_info.get("name", "unknown"),
+            "url": url,
+            "source_file_id": file_info.get("file_id"),
+            "occurrences": 1,
+        }
+        self.rows.append(row)
+        self._unsaved.append(row)
+        if url:
+            self._by_url[url] = row
+        return True
+
+    def reset(self):
+        """A re-run replaces the manifest of the earlier discovery"""
+        self.supabase.table("bulk_import_discovery_entries").delete().eq("job_id", self.job_id).execute()
+
+    def save(self, job_updates: Optional[Dict[str, Any]] = None):
+        """Write new rows and changed occurrence counts, then the counts on the job"""
+        rows, self._unsaved = self._unsaved, []
+        table = self.supabase.table("bulk_import_discovery_entries")
+        for start in range(0, len(rows), FILE_RECORD_BATCH_SIZE):
+            table.upsert(rows[start:start + FILE_RECORD_BATCH_SIZE], on_conflict="job_id,url").execute()
+        self.supabase.table("bulk_import_jobs").update({
+            "discovered_files": self.discovered,
+            "unique_files": len(self.rows),
+            "duplicate_urls": sum(1 for row in self.rows if row["occurrences"] > 1),
+            **(job_updates or {}),
+        }).eq("id", self.job_id).execute()
+
 
 class BulkImportService:
     """Service to handle bulk audio file imports and processing"""
@@ -28,6 +400,28 @@ class BulkImportService:
     def __init__(self, supabase: Client):
         self.supabase = supabase
         self.session: Optional[aiohttp.ClientSession] = None
+        # Set while process_import_job runs; _process_file called on its own runs unbounded
+        self._limits: Optional[BulkImportLimits] = None
+        self._progress: Optional[BulkImportProgress] = None
+        # original_url -> bulk_import_files.id for the running job
+        self._file_ids: Dict[str, str] = {}
+        # original_url -> existing record state (status, storage_path, call_record_id) when resuming
+        self._file_records: Dict[str, Dict[str, Any]] = {}
+        # Buffers status/progress writes while process_import_job runs
+        self._aggregator: Optional[ProgressAggregator] = None
+
+    @asynccontextmanager
+    async def _stage(self, stage: str):
+        """Hold a slot of the stage's limit and count the file as in that stage"""
+        if self._limits is None:
+            yield
+            return
+        async with self._limits.semaphore(stage):
+            self._progress.in_flight[stage] += 1
+            try:
+                yield
+            finally:
+                self._progress.in_flight[stage] -= 1
 
     async def process_import_job(
         self,
@@ -37,9 +431,14 @@ class BulkImportService:
         bucket_name: str,
         user_id: str,
         provider: str = "openai",
-        call_log_file_url: Optional[str] = None
+        call_log_file_url: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        order: Optional[str] = None
     ):
-        """Main processing function for a bulk import job"""
+        """
+        Main processing function for a bulk import job (concurrency: files at once, default
+        BULK_IMPORT_CONCURRENCY; order: one of FILE_ORDERS, default BULK_IMPORT_FILE_ORDER)
+        """
         try:
             # Update job status to discovering
             await self._update_job_status(job_id, "discovering", error_message=None)
@@ -63,42 +462,62 @@ class BulkImportService:
                 # TODO: Implement call log file mapping logic here
                 # For now, we'll skip the actual mapping but mark it as attempted
 
-            # Step 1: Discover audio files from source URL
-            logger.info(f"Discovering audio files from {source_url}")
-            try:
-                audio_files = await self._discover_audio_files(source_url)
-                logger.info(f"Discovery completed. Found {len(audio_files)} audio files")
-            except Exception as discover_error:
-                logger.error(f"Error discovering audio files: {discover_error}", exc_info=True)
-                # Update job to show discovery failed
-                self.supabase.table("bulk_import_jobs").update({
-                    "status": "failed",
-                    "error_message": f"Failed to discover audio files: {str(discover_error)}",
-                    "total_files": 0
-                }).eq("id", job_id).execute()
-                raise
-            
-            # Update job with total files count immediately after discovery
-            logger.info(f"Updating job {job_id} with total_files={len(audio_files)}")
+            # Step 1: Discover audio files; workers start on them while discovery goes on
+            order = order or DEFAULT_FILE_ORDER
+            if order not in FILE_ORDERS:
+                logger.warning(f"Unknown file order {order!r}, using discovery order")
+                order = "discovery"
+            self._file_ids, self._file_records = {}, {}
+            self._limits = BulkImportLimits(files=concurrency or DEFAULT_BULK_IMPORT_CONCURRENCY)
+            self._progress = BulkImportProgress(0, self._limits)
+            self._aggregator = ProgressAggregator(self.supabase, job_id)
+            self._aggregator.start()
+            queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, BULK_IMPORT_DISCOVERY_QUEUE_SIZE))
+
+            async def worker():
+                while True:
+                    file_info = await queue.get()
+                    if file_info is None:
+                        return
+                    await self._process_queued_file(
+                        job_id=job_id,
+                        file_info=file_info,
+                        bucket_name=bucket_name,
+                        user_id=user_id,
+                        customer_name=customer_name,
+                        provider=provider
+                    )
+
+            workers = [asyncio.ensure_future(worker()) for _ in range(self._limits.files)]
+            logger.info(f"Discovering audio files from {source_url} ({len(workers)} worker(s) waiting)")
             try:
-                update_result = self.supabase.table("bulk_import_jobs").update({
-                    "total_files": len(audio_files),
-                    "status": "converting" if len(audio_files) > 0 else "completed"
-                }).eq("id", job_id).execute()
-                
-                if update_result.data:
-                    logger.info(f"Successfully updated job {job_id}: total_files={len(audio_files)}, status=converting")
-                else:
-                    logger.warning(f"Update returned no data for job {job_id}. Checking if update succeeded...")
-                    # Verify the update by reading back
-                    check_result = self.supabase.table("bulk_import_jobs").select("total_files, status").eq("id", job_id).execute()
-                    if check_result.data:
-                        logger.info(f"Job {job_id} current state: total_files={check_result.data[0].get('total_files')}, status={check_result.data[0].get('status')}")
-            except Exception as update_error:
-                logger.error(f"Error updating total_files for job {job_id}: {update_error}", exc_info=True)
-            
-            if not audio_files:
+                try:
+                    discovered = await self._discover_into_queue(job_id, source_url, queue, order)
+                except Exception as discover_error:
+                    logger.error(f"Error discovering audio files: {discover_error}", exc_info=True)
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+                    await self._close_aggregator()
+                    # Update job to show discovery failed
+                    self.supabase.table("bulk_import_jobs").update({
+                        "status": "failed",
+                        "error_message": f"Failed to discover audio files: {str(discover_error)}"
+                    }).eq("id", job_id).execute()
+                    raise
+
+                # Discovery is done: each worker stops once the queue is drained
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                # Also when the job itself is cancelled (lease lost)
+                for task in workers:
+                    task.cancel()
+
+            if not discovered:
                 logger.warning(f"No audio files found at source URL: {source_url}")
+                await self._close_aggregator()
                 await self._update_job_status(
                     job_id,
                     "completed",
@@ -106,155 +525,10 @@ class BulkImportService:
                     error_message="No audio files found at source URL"
                 )
                 return
-            
-            # Build discovery details before deduplication
-            try:
-                discovered_entries = []
-                found_file_names = set()
-                for fi in audio_files:
-                    name = fi.get("name", "unknown")
-                    discovered_entries.append({
-                        "name": name,
-                        "url": fi.get("url"),
-                        "file_id": fi.get("file_id"),
-                    })
-                    found_file_names.add(name.lower())
-                
-                # Log which file names we found
-                logger.info(f"Discovered file names: {sorted(found_file_names)}")
-                
-                # Detect duplicates by URL in the discovered list
-                url_counts: Dict[str, int] = {}
-                for fi in audio_files:
-                    u = fi.get("url", "")
-                    if not u:
-                        continue
-                    url_counts[u] = url_counts.get(u, 0) + 1
-                duplicates = [ {"url": u, "count": c} for u, c in url_counts.items() if c > 1 ]
-                discovery_payload = {
-                    "discovered": len(audio_files),
-                    "duplicates_by_url": duplicates,
-                    "entries": discovered_entries,
-                    "found_file_names": sorted(found_file_names),  # Add for debugging
-                }
-                # Persist into error_message with a recognizable prefix. Preserve any existing error_message by appending.
-                job_read = self.supabase.table("bulk_import_jobs").select("error_message").eq("id", job_id).maybe_single().execute()
-                prev = (job_read.data or {}).get("error_message") if job_read and hasattr(job_read, 'data') else None
-                merged = f"DISCOVERY_JSON::{json.dumps(discovery_payload)}"
-                if prev and isinstance(prev, str) and "DISCOVERY_JSON::" not in prev:
-                    merged = f"{prev}\n{merged}"
-                self.supabase.table("bulk_import_jobs").update({
-                    "error_message": merged
-                }).eq("id", job_id).execute()
-            except Exception as _capture_err:
-                logger.debug(f"Could not persist discovery details: {_capture_err}")
-            
-            # Create file records for all discovered files immediately (before processing)
-            # Deduplicate by URL to avoid creating duplicate records
-            seen_urls = set()
-            unique_files = []
-            for file_info in audio_files:
-                file_url = file_info.get("url", "")
-                if file_url and file_url not in seen_urls:
-                    seen_urls.add(file_url)
-                    unique_files.append(file_info)
-                elif not file_url:
-                    # Include files without URL (shouldn't happen, but be safe)
-                    unique_files.append(file_info)
-            
-            if len(unique_files) < len(audio_files):
-                logger.info(f"Deduplicated files: {len(audio_files)} -> {len(unique_files)} unique files")
-            
-            logger.info(f"Creating file records for {len(unique_files)} unique discovered files")
-            for file_info in unique_files:
-                try:
-                    # Check if record already exists (in case of retries)
-                    file_url = file_info.get("url", "")
-                    existing_result = self.supabase.table("bulk_import_files").select("id").eq(
-                        "job_id", job_id
-                    ).eq("original_url", file_url).maybe_single().execute()
-                    
-                    # Handle None response or missing data attribute
-                    if not existing_result or not hasattr(existing_result, 'data') or not existing_result.data:
-                        await self._create_file_record(
-                            job_id=job_id,
-                            file_name=file_info.get("name", "unknown"),
-                            original_url=file_url,
-                            status="pending",
-                            error_message=None
-                        )
-                    else:
-                        logger.debug(f"File record already exists for {file_info.get('name')}, skipping creation")
-                except Exception as file_record_error:
-                    logger.warning(f"Failed to create file record for {file_info.get('name')}: {file_record_error}")
-            
-            # Use deduplicated list for processing
-            audio_files = unique_files
 
-            # Step 2: Process each file
-            processed = 0
-            failed = 0
-
-            for file_info in audio_files:
-                try:
-                    await self._process_file(
-                        job_id=job_id,
-                        file_info=file_info,
-                        bucket_name=bucket_name,
-                        user_id=user_id,
-                        customer_name=customer_name,
-                        provider=provider
-                    )
-                    processed += 1
-                except Exception as e:
-                    logger.error(f"Error processing file {file_info.get('url')}: {e}", exc_info=True)
-                    failed += 1
-                    # Update existing file record with error status
-                    try:
-                        file_url = file_info.get("url", "")
-                        result = self.supabase.table("bulk_import_files").select("id").eq(
-                            "job_id", job_id
-                        ).eq("original_url", file_url).maybe_single().execute()
-                        
-                        # Handle None response or missing data attribute
-                        if result and hasattr(result, 'data') and result.data:
-                            file_id = result.data["id"]
-                            await self._update_file_record(file_id, {
-                                "status": "failed",
-                                "error_message": str(e)[:500]  # Limit error message length
-                            })
-                        else:
-                            # No existing record, create one with error
-                            await self._create_file_record(
-                                job_id=job_id,
-                                file_name=file_info.get("name", "unknown"),
-                                original_url=file_url,
-                                status="failed",
-                                error_message=str(e)[:500]
-                            )
-                    except Exception as update_error:
-                        logger.warning(f"Failed to update file record status: {update_error}")
-                        # Fallback: create new record if update fails
-                        try:
-                            await self._create_file_record(
-                                job_id=job_id,
-                                file_name=file_info.get("name", "unknown"),
-                                original_url=file_info.get("url", ""),
-                                status="failed",
-                                error_message=str(e)[:500]
-                            )
-                        except Exception:
-                            pass  # Give up if we can't create or update
-
-                # Update job progress after each file
-                update_result = self.supabase.table("bulk_import_jobs").update({
-                    "processed_files": processed,
-                    "failed_files": failed,
-                    "status": "analyzing" if processed > 0 else ("uploading" if processed + failed < len(audio_files) else "completed")
-                }).eq("id", job_id).execute()
-                
-                if update_result.data:
-                    logger.debug(f"Updated progress for job {job_id}: processed={processed}, failed={failed}")
+            processed, failed = self._progress.processed, self._progress.failed
+            # Buffered progress lands before the final status, never after it
+            await self._close_aggregator()
 
             # Mark job as completed
             await self._update_job_status(
@@ -264,13 +538,18 @@ class BulkImportService:
                 error_message=None
             )
 
-            logger.info(f"Bulk import job {job_id} completed: {processed} processed, {failed} failed")
+            logger.info(
+                f"Bulk import job {job_id} completed: {processed} processed, {failed} failed, "
+                f"{self._progress.duplicates} duplicates skipped ({self._progress.duplicate_bytes / (1024 * 1024):.1f}MB)"
+            )
 
         except Exception as e:
             logger.error(f"Error in bulk import job {job_id}: {e}", exc_info=True)
+            await self._close_aggregator()
             await self._update_job_status(job_id, "failed", error_message=str(e))
             raise
         finally:
+            await self._close_aggregator()
             # Clean up HTTP session
             if self.session:
                 try:
@@ -280,9 +559,243 @@ class BulkImportService:
                 except Exception as cleanup_error:
                     logger.warning(f"Error closing session: {cleanup_error}")
 
+    async def _process_queued_file(
+        self,
+        job_id: str,
+        file_info: Dict[str, Any],
+        bucket_name: str,
+        user_id: str,
+        customer_name: str,
+        provider: str
+    ):
+        """Process one file from the pool; failures are recorded, never raised"""
+        size = (file_info.get("source") or {}).get("content_length")
+        try:
+            await self._process_file(
+                job_id=job_id,
+                file_info=file_info,
+                bucket_name=bucket_name,
+                user_id=user_id,
+                customer_name=customer_name,
+                provider=provider
+            )
+            self._progress.record(ok=True, size=size)
+        except Exception as e:
+            logger.error(f"Error processing file {file_info.get('url')}: {e}", exc_info=True)
+            self._progress.record(ok=False, size=size)
+            await self._record_file_failure(job_id, file_info, e)
+
+        await self._update_job_progress(job_id)
+
+    async def _discover_into_queue(
+        self,
+        job_id: str,
+        source_url: str,
+        queue: asyncio.Queue,
+        order: str
+    ) -> int:
+        """
+        Run discovery and hand files to the workers as they are found. Repeated
+        URLs are dropped on the fly; new files are registered in batches (file
+        records, manifest rows and total_files in one round of writes), then
+        prefetched, ordered within the batch and queued. Returns the number of
+        unique files discovered.
+        """
+        manifest = DiscoveryManifest(self.supabase, job_id)
+        try:
+            manifest.reset()
+        except Exception as e:
+            logger.warning(f"Could not clear the earlier discovery manifest of job {job_id}: {e}")
+        self._progress.discovering = True
+        batch: List[Dict[str, Any]] = []
+        batch_started = time.monotonic()
+
+        async for file_info in self._iter_audio_files(source_url):
+            if not manifest.add(file_info):
+                continue
+            if not batch:
+                batch_started = time.monotonic()
+            batch.append(file_info)
+            if len(batch) >= FILE_RECORD_BATCH_SIZE or time.monotonic() - batch_started >= BULK_IMPORT_DISCOVERY_BATCH_SECONDS:
+                await self._admit_discovered(job_id, batch, manifest, queue, order)
+                batch = []
+
+        self._progress.discovering = False
+        await self._admit_discovered(job_id, batch, manifest, queue, order)
+        logger.info(
+            f"Discovery completed for job {job_id}. Found {manifest.discovered} audio files, "
+            f"{len(manifest.rows)} unique"
+        )
+        return len(manifest.rows)
+
+    async def _admit_discovered(
+        self,
+        job_id: str,
+        files: List[Dict[str, Any]],
+        manifest: DiscoveryManifest,
+        queue: asyncio.Queue,
+        order: str
+    ):
+        """Register a batch of newly discovered files and queue the ones still to do"""
+        first_batch = self._progress.total == 0 and files
+        self._progress.total += len(files)
+        job_updates = {"total_files": self._progress.total}
+        if first_batch:
+            job_updates["status"] = "converting"
+        try:
+            manifest.save(job_updates)
+        except Exception as e:
+            logger.warning(f"Could not save discovery manifest for job {job_id}: {e}")
+        if not files:
+            return
+
+        await self._upsert_file_records(job_id, files)
+        pending = []
+        for file_info in files:
+            # Finished before the job was interrupted: counted, not processed again
+            finished = (self._file_records.get(file_info.get("url")) or {}).get("status")
+            if finished in TERMINAL_FILE_STATUSES:
+                self._progress.record(ok=finished == "completed")
+            else:
+                pending.append(file_info)
+        if len(pending) < len(files):
+            logger.info(f"⏩ Resuming job {job_id}: {len(files) - len(pending)} discovered files already finished")
+
+        # HEAD pass: sizes and types up front, refuse what cannot be imported, order the batch
+        for file_info in await self._prefetch_metadata(job_id, pending, order):
+            await queue.put(file_info)
+        logger.info(f"📥 Job {job_id}: {self._progress.total} files discovered, {queue.qsize()} queued")
+
+    async def _upsert_file_records(self, job_id: str, files: List[Dict[str, Any]]):
+        """
+        Create the job's file records in batches of one upsert each, keyed on
+        (job_id, original_url), and remember their ids by URL. Existing records
+        (a retried job) keep their status; the upsert still returns their ids.
+        """
+        rows = [
+            {"job_id": job_id, "file_name": f.get("name", "unknown"), "original_url": f["url"]}
+            for f in files if f.get("url")
+        ]
+        for start in range(0, len(rows), FILE_RECORD_BATCH_SIZE):
+            batch = rows[start:start + FILE_RECORD_BATCH_SIZE]
+            try:
+                result = self.supabase.table("bulk_import_files").upsert(
+                    batch, on_conflict="job_id,original_url"
+                ).execute()
+                for record in result.data or []:
+                    self._file_ids[record["original_url"]] = record["id"]
+                    if record.get("status") not in (None, "pending"):
+                        self._file_records[record["original_url"]] = record
+            except Exception as e:
+                # Those files get their record when they are processed
+                logger.warning(f"Failed to create {len(batch)} file records for job {job_id}: {e}")
+        logger.info(f"File records ready for job {job_id}: {len(self._file_ids)}/{len(files)}")
+
+    async def _prefetch_metadata(self, job_id: str, files: List[Dict[str, Any]], order: str) -> List[Dict[str, Any]]:
+        """
+        HEAD every file concurrently (BULK_IMPORT_HEAD_CONCURRENCY at a time) and keep
+        the metadata as file_info["source"]. Oversize and non-audio files fail here,
+        before any download; the rest feed the byte estimate and are returned in
+        the requested order.
+        """
+        if BULK_IMPORT_HEAD_CONCURRENCY > 0 and files:
+            started = time.monotonic()
+            semaphore = asyncio.Semaphore(BULK_IMPORT_HEAD_CONCURRENCY)
+
+            async def head(file_info):
+                async with semaphore:
+                    file_info["source"] = await self._head_metadata(file_info["url"])
+
+            await asyncio.gather(*(head(f) for f in files if f.get("url")))
+            logger.info(f"HEAD prefetch for job {job_id}: {len(files)} files in {time.monotonic() - started:.1f}s")
+
+        accepted = []
+        for file_info in files:
+            reason = _reject_reason(file_info.get("source") or {})
+            if reason:
+                logger.warning(f"Rejected {file_info.get('name')} before download: {reason}")
+                self._progress.rejected += 1
+                self._progress.record(ok=False)
+                await self._record_file_failure(job_id, file_info, Exception(reason))
+            else:
+                self._progress.expect_bytes((file_info.get("source") or {}).get("content_length"))
+                accepted.append(file_info)
+
+        if self._progress.rejected or self._progress.total_bytes:
+            await self._update_job_progress(job_id)
+        return order_files(accepted, order)
+
+    async def _record_file_failure(self, job_id: str, file_info: Dict[str, Any], error: Exception):
+        """Mark the file's record failed (creating one if discovery did not)"""
+        try:
+            file_url = file_info.get("url", "")
+            file_id = self._file_ids.get(file_url)
+            if file_id:
+                await self._update_file_record(file_id, {
+                    "status": "failed",
+                    "error_message": str(error)[:500]  # Limit error message length
+                })
+            else:
+                # No existing record, create one with error
+                file_record = await self._create_file_record(
+                    job_id=job_id,
+                    file_name=file_info.get("name", "unknown"),
+                    original_url=file_url,
+                    status="failed",
+                    error_message=str(error)[:500]
+                )
+                self._file_ids[file_url] = file_record["id"]
+        except Exception as update_error:
+            logger.warning(f"Failed to update file record status: {update_error}")
+            # Fallback: create new record if update fails
+            try:
+                await self._create_file_record(
+                    job_id=job_id,
+                    file_name=file_info.get("name", "unknown"),
+                    original_url=file_info.get("url", ""),
+                    status="failed",
+                    error_message=str(error)[:500]
+                )
+            except Exception:
+                pass  # Give up if we can't create or update
+
+    async def _close_aggregator(self):
+        """Flush buffered writes and go back to writing directly"""
+        aggregator, self._aggregator = self._aggregator, None
+        if aggregator is not None:
+            try:
+                await aggregator.close()
+            except Exception as e:
+                logger.warning(f"Failed to flush progress: {e}")
+
+    async def _update_job_progress(self, job_id: str):
+        """Record processed/failed counts and the progress snapshot after each file"""
+        progress = self._progress
+        updates = {
+            "processed_files": progress.processed,
+            "failed_files": progress.failed,
+            "status": "analyzing" if progress.processed > 0 else (
+                "uploading" if progress.discovering or progress.done < progress.total else "completed"
+            ),
+            "stats": progress.snapshot()
+        }
+        if self._aggregator is not None:
+            await self._aggregator.update_job(updates)
+            return
+        try:
+            update_result = self.supabase.table("bulk_import_jobs").update(updates).eq("id", job_id).execute()
+            if update_result.data:
+                logger.debug(f"Updated progress for job {job_id}: processed={progress.processed}, failed={progress.failed}")
+        except Exception as e:
+            logger.warning(f"Failed to update progress for job {job_id}: {e}")
+
     async def _discover_audio_files(self, source_url: str) -> List[Dict[str, Any]]:
+        """All audio files at a web URL (see _iter_audio_files)"""
+        return [file_info async for file_info in self._iter_audio_files(source_url)]
+
+    async def _iter_audio_files(self, source_url: str) -> AsyncIterator[Dict[str, Any]]:
         """
-        Discover audio files from a web URL.
+        Discover audio files from a web URL, yielding each file as it is found.
         Supports:
         - Direct file links
         - Directory listings (HTML)
@@ -290,14 +803,13 @@ class BulkImportService:
         - S3/GCS public buckets
         - Simple web servers
         """
-        audio_files = []
-
         try:
             # Check if it's a Google Drive URL
             if "drive.google.com" in source_url.lower():
                 logger.info(f"Detected Google Drive URL: {source_url}")
-                audio_files = await self._discover_google_drive_files(source_url)
-                return audio_files
+                async for file_info in self._iter_google_drive_files(source_url):
+                    yield file_info
+                return
 
             # Create HTTP session if needed
             if not self.session:
@@ -306,6 +818,7 @@ class BulkImportService:
                     headers={"User-Agent": "Mozilla/5.0 (compatible; BulkImport/1.0)"}
                 )
 
+            audio_files = []
             async with self.session.get(source_url) as response:
                 if response.status != 200:
                     raise Exception(f"Failed to access source URL: {response.status}")
@@ -321,33 +834,38 @@ class BulkImportService:
                             "url": source_url,
                             "name": file_name
                         })
-                    return audio_files
 
                 # If it's HTML, try to parse for links
-                if "text/html" in content_type:
+                elif "text/html" in content_type:
                     html_content = await response.text()
                     # Simple regex to find audio file links
                     # Look for common patterns: <a href="...">, direct links, etc.
-                    audio_urls = self._extract_audio_links_from_html(html_content, source_url)
-                    audio_files.extend(audio_urls)
+                    audio_files.extend(self._extract_audio_links_from_html(html_content, source_url))
 
                 # If it's JSON (API response), try to parse
                 elif "application/json" in content_type:
                     json_data = await response.json()
                     audio_files.extend(self._extract_audio_links_from_json(json_data, source_url))
 
+            # Yielded once the listing is read, so a slow consumer does not hold the response open
+            for file_info in audio_files:
+                yield file_info
+
         except Exception as e:
             logger.error(f"Error discovering audio files: {e}", exc_info=True)
             raise
 
-        return audio_files
-
     async def _discover_google_drive_files(self, drive_url: str) -> List[Dict[str, Any]]:
+        """All audio files of a Google Drive folder or file link (see _iter_google_drive_files)"""
+        return [file_info async for file_info in self._iter_google_drive_files(drive_url)]
+
+    async def _iter_google_drive_files(self, drive_url: str) -> AsyncIterator[Dict[str, Any]]:
         """
-        Discover audio files from a Google Drive folder.
+        Discover audio files from a Google Drive folder, yielding each file as soon
+        as its name is resolved (one request per file, so large folders take a while).
         Handles both folder sharing URLs and direct file links.
         """
-        audio_files = []
+        found = 0
         
         try:
             # Extract folder ID or file ID from URL
@@ -377,367 +895,370 @@ class BulkImportService:
                         raise Exception(f"Failed to access Google Drive folder: {response.status}")
                     
                     html_content = await response.text()
+                
+                # Google Drive embeds file metadata in JavaScript variables and JSON data
+                # The folder page contains file data in various JavaScript structures
+                # We need to extract file IDs from these structures
+                
+                found_ids = set()
+                
+                # First, try to extract from JavaScript data structures directly
+                # Google Drive often embeds data in window['_DRIVE_ivd'] or similar
+                # Look for patterns like: var _DRIVE_ivd = '...'; or window['_DRIVE_ivd'] = {...}
+                js_data_patterns = [
+                    r'window\[["\']_DRIVE_ivd["\']\]\s*=\s*({[^}]+})',
+                    r'var\s+_DRIVE_ivd\s*=\s*({[^}]+})',
+                    r'\["([a-zA-Z0-9_-]{33})"\]',  # Direct array of file IDs
+                    r'"([a-zA-Z0-9_-]{33})"',  # Quoted file IDs in JSON
+                ]
+                
+                for pattern in js_data_patterns:
+                    matches = re.finditer(pattern, html_content)
+                    for match in matches:
+                        if len(match.groups()) > 0:
+                            potential_id = match.group(1)
+                            if len(potential_id) == 33 and potential_id != folder_id:
+                                # Additional validation
+                                if not any(skip in potential_id.lower() for skip in ['aiza', 'http', 'google']):
+                                    found_ids.add(potential_id)
+                
+                # Also look for JSON-LD structured data
+                json_ld_pattern = r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>'
+                json_ld_matches = re.finditer(json_ld_pattern, html_content, re.DOTALL | re.IGNORECASE)
+                for match in json_ld_matches:
+                    try:
+                        import json
+                        json_data = json.loads(match.group(1))
+                        # Recursively search for file IDs in JSON
+                        def find_ids_in_json(obj):
+                            if isinstance(obj, dict):
+                                for v in obj.values():
+                                    find_ids_in_json(v)
+                            elif isinstance(obj, list):
+                                for item in obj:
+                                    find_ids_in_json(item)
+                            elif isinstance(obj, str) and len(obj) == 33:
+                                if obj != folder_id and not any(skip in obj.lower() for skip in ['aiza', 'http']):
+                                    found_ids.add(obj)
+                        find_ids_in_json(json_data)
+                    except:
+                        pass
+                
+                # Use BeautifulSoup for more reliable HTML parsing
+                try:
+                    from bs4 import BeautifulSoup
+                    soup = BeautifulSoup(html_content, 'html.parser')
                     
-                    # Google Drive embeds file metadata in JavaScript variables and JSON data
-                    # The folder page contains file data in various JavaScript structures
-                    # We need to extract file IDs from these structures
-                    
-                    found_ids = set()
-                    
-                    # First, try to extract from JavaScript data structures directly
-                    # Google Drive often embeds data in window['_DRIVE_ivd'] or similar
-                    # Look for patterns like: var _DRIVE_ivd = '...'; or window['_DRIVE_ivd'] = {...}
-                    js_data_patterns = [
-                        r'window\[["\']_DRIVE_ivd["\']\]\s*=\s*({[^}]+})',
-                        r'var\s+_DRIVE_ivd\s*=\s*({[^}]+})',
-                        r'\["([a-zA-Z0-9_-]{33})"\]',  # Direct array of file IDs
-                        r'"([a-zA-Z0-9_-]{33})"',  # Quoted file IDs in JSON
-                    ]
-                    
-                    for pattern in js_data_patterns:
-                        matches = re.finditer(pattern, html_content)
-                        for match in matches:
-                            if len(match.groups()) > 0:
-                                potential_id = match.group(1)
-                                if len(potential_id) == 33 and potential_id != folder_id:
-                                    # Additional validation
-                                    if not any(skip in potential_id.lower() for skip in ['aiza', 'http', 'google']):
-                                        found_ids.add(potential_id)
+                    # Method 1: Look for actual file links in the HTML (most reliable)
+                    # Google Drive uses specific patterns for file links
+                    for link in soup.find_all('a', href=True):
+                        href = link.get('href', '')
+                        # Only match actual /file/d/ links (not folders)
+                        # Google Drive file IDs are EXACTLY 33 characters
+                        file_match = re.search(r'/file/d/([a-zA-Z0-9_-]{33})', href)
+                        if file_match:
+                            file_id = file_match.group(1)
+                            if len(file_id) == 33 and file_id != folder_id:
+                                found_ids.add(file_id)
                     
-                    # Also look for JSON-LD structured data
-                    json_ld_pattern = r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>'
-                    json_ld_matches = re.finditer(json_ld_pattern, html_content, re.DOTALL | re.IGNORECASE)
-                    for match in json_ld_matches:
-                        try:
-                            import json
-                            json_data = json.loads(match.group(1))
-                            # Recursively search for file IDs in JSON
-                            def find_ids_in_json(obj):
-                                if isinstance(obj, dict):
-                                    for v in obj.values():
-                                        find_ids_in_json(v)
-                                elif isinstance(obj, list):
-                                    for item in obj:
-                                        find_ids_in_json(item)
-                                elif isinstance(obj, str) and len(obj) == 33:
-                                    if obj != folder_id and not any(skip in obj.lower() for skip in ['aiza', 'http']):
-                                        found_ids.add(obj)
-                            find_ids_in_json(json_data)
-                        except:
-                            pass
+                    # Method 2: Look for data attributes that specifically indicate files
+                    # Google Drive uses data-id for file items, but be careful - not all data-id are files
+                    for element in soup.find_all(attrs={'data-id': True}):
+                        file_id = element.get('data-id', '')
+                        # Google Drive file IDs are EXACTLY 33 characters
+                        # Only include if it's exactly 33 characters and in a file-related context
+                        if len(file_id) == 33 and file_id != folder_id:
+                            parent_classes = ' '.join(element.get('class', []))
+                            # Check if the element is in a file list context
+                            if 'file' in parent_classes.lower() or element.name in ['div', 'tr']:
+                                found_ids.add(file_id)
                     
-                    # Use BeautifulSoup for more reliable HTML parsing
-                    try:
-                        from bs4 import BeautifulSoup
-                        soup = BeautifulSoup(html_content, 'html.parser')
-                        
-                        # Method 1: Look for actual file links in the HTML (most reliable)
-                        # Google Drive uses specific patterns for file links
-                        for link in soup.find_all('a', href=True):
-                            href = link.get('href', '')
-                            # Only match actual /file/d/ links (not folders)
+                    # Method 3: Look in script tags for file data arrays (more specific patterns)
+                    # Google Drive embeds file lists in JavaScript - this is critical for finding files
+                    for script in soup.find_all('script'):
+                        script_text = script.string
+                        if script_text:
+                            # Look specifically for /file/d/ patterns in scripts (most reliable)
                             # Google Drive file IDs are EXACTLY 33 characters
-                            file_match = re.search(r'/file/d/([a-zA-Z0-9_-]{33})', href)
-                            if file_match:
-                                file_id = file_match.group(1)
+                            script_file_matches = re.finditer(r'/file/d/([a-zA-Z0-9_-]{33})', script_text)
+                            for match in script_file_matches:
+                                file_id = match.group(1)
                                 if len(file_id) == 33 and file_id != folder_id:
                                     found_ids.add(file_id)
-                        
-                        # Method 2: Look for data attributes that specifically indicate files
-                        # Google Drive uses data-id for file items, but be careful - not all data-id are files
-                        for element in soup.find_all(attrs={'data-id': True}):
-                            file_id = element.get('data-id', '')
-                            # Google Drive file IDs are EXACTLY 33 characters
-                            # Only include if it's exactly 33 characters and in a file-related context
-                            if len(file_id) == 33 and file_id != folder_id:
-                                parent_classes = ' '.join(element.get('class', []))
-                                # Check if the element is in a file list context
-                                if 'file' in parent_classes.lower() or element.name in ['div', 'tr']:
-                                    found_ids.add(file_id)
-                        
-                        # Method 3: Look in script tags for file data arrays (more specific patterns)
-                        # Google Drive embeds file lists in JavaScript - this is critical for finding files
-                        for script in soup.find_all('script'):
-                            script_text = script.string
-                            if script_text:
-                                # Look specifically for /file/d/ patterns in scripts (most reliable)
-                                # Google Drive file IDs are EXACTLY 33 characters
-                                script_file_matches = re.finditer(r'/file/d/([a-zA-Z0-9_-]{33})', script_text)
-                                for match in script_file_matches:
+                            
+                            # Look for file arrays - Google Drive often stores file IDs in arrays
+                            # Pattern: ["33charid1", "33charid2"] or ['33charid1', '33charid2']
+                            array_patterns = [
+                                r'\["([a-zA-Z0-9_-]{33})"',
+                                r"\['([a-zA-Z0-9_-]{33})'",
+                                r'\["([a-zA-Z0-9_-]{33})"',
+                            ]
+                            for array_pattern in array_patterns:
+                                array_matches = re.finditer(array_pattern, script_text)
+                                for match in array_matches:
                                     file_id = match.group(1)
+                                    # Only add if it's exactly 33 characters (Google Drive file ID length)
                                     if len(file_id) == 33 and file_id != folder_id:
-                                        found_ids.add(file_id)
-                                
-                                # Look for file arrays - Google Drive often stores file IDs in arrays
-                                # Pattern: ["33charid1", "33charid2"] or ['33charid1', '33charid2']
-                                array_patterns = [
-                                    r'\["([a-zA-Z0-9_-]{33})"',
-                                    r"\['([a-zA-Z0-9_-]{33})'",
-                                    r'\["([a-zA-Z0-9_-]{33})"',
-                                ]
-                                for array_pattern in array_patterns:
-                                    array_matches = re.finditer(array_pattern, script_text)
-                                    for match in array_matches:
-                                        file_id = match.group(1)
-                                        # Only add if it's exactly 33 characters (Google Drive file ID length)
-                                        if len(file_id) == 33 and file_id != folder_id:
-                                            # Additional check: should not contain common non-ID patterns
-                                            if not any(skip in file_id.lower() for skip in ['http', 'https', 'www', 'google', 'drive', 'aiza']):
-                                                found_ids.add(file_id)
-                                
-                                # Look for Google Drive's specific data structures
-                                # Pattern: "id":"33charid" or 'id':'33charid'
-                                id_patterns = [
-                                    r'["\']id["\']\s*:\s*["\']([a-zA-Z0-9_-]{33})["\']',
-                                    r'["\']fileId["\']\s*:\s*["\']([a-zA-Z0-9_-]{33})["\']',
-                                    r'["\']file_id["\']\s*:\s*["\']([a-zA-Z0-9_-]{33})["\']',
-                                ]
-                                for id_pattern in id_patterns:
-                                    id_matches = re.finditer(id_pattern, script_text)
-                                    for match in id_matches:
-                                        file_id = match.group(1)
-                                        if len(file_id) == 33 and file_id != folder_id:
-                                            if not any(skip in file_id.lower() for skip in ['aiza', 'http']):
-                                                found_ids.add(file_id)
-                        
-                        logger.info(f"Found {len(found_ids)} potential file IDs using BeautifulSoup parsing")
-                        
-                        # Also look for download links - these are more reliable
-                        # Google Drive download links contain file IDs
-                        for link in soup.find_all('a', href=True, string=re.compile('Download', re.I)):
-                            href = link.get('href', '')
-                            # Download links might be relative or absolute
-                            # Pattern: /file/d/FILE_ID/view or /file/d/FILE_ID/download
-                            download_match = re.search(r'/file/d/([a-zA-Z0-9_-]{33})', href)
-                            if download_match:
-                                file_id = download_match.group(1)
-                                if len(file_id) == 33 and file_id != folder_id:
-                                    found_ids.add(file_id)
-                                    logger.debug(f"Found file ID from download link: {file_id}")
-                        
-                    except ImportError:
-                        logger.warning("BeautifulSoup not available, using basic regex parsing")
-                        # Fallback to basic regex
-                        # Google Drive file IDs are EXACTLY 33 characters
-                        file_link_pattern = r'href=["\'](/file/d/([a-zA-Z0-9_-]{33}))["\']'
-                        link_matches = re.finditer(file_link_pattern, html_content, re.IGNORECASE)
-                        for match in link_matches:
-                            file_id = match.group(2)
+                                        # Additional check: should not contain common non-ID patterns
+                                        if not any(skip in file_id.lower() for skip in ['http', 'https', 'www', 'google', 'drive', 'aiza']):
+                                            found_ids.add(file_id)
+                            
+                            # Look for Google Drive's specific data structures
+                            # Pattern: "id":"33charid" or 'id':'33charid'
+                            id_patterns = [
+                                r'["\']id["\']\s*:\s*["\']([a-zA-Z0-9_-]{33})["\']',
+                                r'["\']fileId["\']\s*:\s*["\']([a-zA-Z0-9_-]{33})["\']',
+                                r'["\']file_id["\']\s*:\s*["\']([a-zA-Z0-9_-]{33})["\']',
+                            ]
+                            for id_pattern in id_patterns:
+                                id_matches = re.finditer(id_pattern, script_text)
+                                for match in id_matches:
+                                    file_id = match.group(1)
+                                    if len(file_id) == 33 and file_id != folder_id:
+                                        if not any(skip in file_id.lower() for skip in ['aiza', 'http']):
+                                            found_ids.add(file_id)
+                    
+                    logger.info(f"Found {len(found_ids)} potential file IDs using BeautifulSoup parsing")
+                    
+                    # Also look for download links - these are more reliable
+                    # Google Drive download links contain file IDs
+                    for link in soup.find_all('a', href=True, string=re.compile('Download', re.I)):
+                        href = link.get('href', '')
+                        # Download links might be relative or absolute
+                        # Pattern: /file/d/FILE_ID/view or /file/d/FILE_ID/download
+                        download_match = re.search(r'/file/d/([a-zA-Z0-9_-]{33})', href)
+                        if download_match:
+                            file_id = download_match.group(1)
                             if len(file_id) == 33 and file_id != folder_id:
                                 found_ids.add(file_id)
+                                logger.debug(f"Found file ID from download link: {file_id}")
                     
-                    logger.info(f"Total file IDs found after all parsing methods: {len(found_ids)}")
-                    logger.info(f"Sample file IDs found: {list(found_ids)[:5]}")
-                    
-                    # ADDITIONAL: Extract ALL 33-character alphanumeric strings that could be file IDs
-                    # This is a catch-all to find any IDs we might have missed
-                    all_33char_pattern = r'\b([a-zA-Z0-9_-]{33})\b'
-                    all_33char_matches = re.finditer(all_33char_pattern, html_content)
-                    for match in all_33char_matches:
-                        potential_id = match.group(1)
-                        if potential_id != folder_id:
-                            # Only add if it looks like a valid Google Drive ID (alphanumeric + dash/underscore)
-                            if re.match(r'^[a-zA-Z0-9_-]{33}$', potential_id):
-                                found_ids.add(potential_id)
+                except ImportError:
+                    logger.warning("BeautifulSoup not available, using basic regex parsing")
+                    # Fallback to basic regex
+                    # Google Drive file IDs are EXACTLY 33 characters
+                    file_link_pattern = r'href=["\'](/file/d/([a-zA-Z0-9_-]{33}))["\']'
+                    link_matches = re.finditer(file_link_pattern, html_content, re.IGNORECASE)
+                    for match in link_matches:
+                        file_id = match.group(2)
+                        if len(file_id) == 33 and file_id != folder_id:
+                            found_ids.add(file_id)
+                
+                logger.info(f"Total file IDs found after all parsing methods: {len(found_ids)}")
+                logger.info(f"Sample file IDs found: {list(found_ids)[:5]}")
+                
+                # ADDITIONAL: Extract ALL 33-character alphanumeric strings that could be file IDs
+                # This is a catch-all to find any IDs we might have missed
+                all_33char_pattern = r'\b([a-zA-Z0-9_-]{33})\b'
+                all_33char_matches = re.finditer(all_33char_pattern, html_content)
+                for match in all_33char_matches:
+                    potential_id = match.group(1)
+                    if potential_id != folder_id:
+                        # Only add if it looks like a valid Google Drive ID (alphanumeric + dash/underscore)
+                        if re.match(r'^[a-zA-Z0-9_-]{33}$', potential_id):
+                            found_ids.add(potential_id)
+                
+                logger.info(f"After catch-all extraction: {len(found_ids)} total file IDs found")
+                
+                # ADDITIONAL METHOD: Look for file names in HTML and try to find nearby file IDs
+                # Google Drive often shows file names with their IDs nearby
+                # Look for patterns like "conversation (5).wav" and find the closest file_id
+                try:
+                    from bs4 import BeautifulSoup
+                    soup = BeautifulSoup(html_content, 'html.parser')
                     
-                    logger.info(f"After catch-all extraction: {len(found_ids)} total file IDs found")
+                    # Find all text that looks like file names (ending in .wav, .mp3, etc.)
+                    file_name_pattern = r'conversation\s*\(\d+\)\.wav'
+                    name_matches = re.finditer(file_name_pattern, html_content, re.IGNORECASE)
                     
-                    # ADDITIONAL METHOD: Look for file names in HTML and try to find nearby file IDs
-                    # Google Drive often shows file names with their IDs nearby
-                    # Look for patterns like "conversation (5).wav" and find the closest file_id
-                    try:
-                        from bs4 import BeautifulSoup
-                        soup = BeautifulSoup(html_content, 'html.parser')
-                        
-                        # Find all text that looks like file names (ending in .wav, .mp3, etc.)
-                        file_name_pattern = r'conversation\s*\(\d+\)\.wav'
-                        name_matches = re.finditer(file_name_pattern, html_content, re.IGNORECASE)
+                    for name_match in name_matches:
+                        name_text = name_match.group(0)
+                        match_start = name_match.start()
+                        # Look for file IDs within 500 characters before or after the name
+                        context_start = max(0, match_start - 500)
+                        context_end = min(len(html_content), match_start + len(name_text) + 500)
+                        context = html_content[context_start:context_end]
                         
-                        for name_match in name_matches:
-                            name_text = name_match.group(0)
-                            match_start = name_match.start()
-                            # Look for file IDs within 500 characters before or after the name
-                            context_start = max(0, match_start - 500)
-                            context_end = min(len(html_content), match_start + len(name_text) + 500)
-                            context = html_content[context_start:context_end]
-                            
-                            # Find all 33-char IDs in this context
-                            context_ids = re.findall(r'\b([a-zA-Z0-9_-]{33})\b', context)
-                            for potential_id in context_ids:
-                                if potential_id != folder_id and re.match(r'^[a-zA-Z0-9_-]{33}$', potential_id):
-                                    if not any(skip in potential_id.lower() for skip in ['http', 'https', 'www', 'google', 'drive', 'aiza']):
-                                        found_ids.add(potential_id)
-                                        logger.debug(f"Found file_id {potential_id} near filename {name_text}")
-                    except Exception as name_extract_error:
-                        logger.debug(f"Error extracting IDs from file names: {name_extract_error}")
+                        # Find all 33-char IDs in this context
+                        context_ids = re.findall(r'\b([a-zA-Z0-9_-]{33})\b', context)
+                        for potential_id in context_ids:
+                            if potential_id != folder_id and re.match(r'^[a-zA-Z0-9_-]{33}$', potential_id):
+                                if not any(skip in potential_id.lower() for skip in ['http', 'https', 'www', 'google', 'drive', 'aiza']):
+                                    found_ids.add(potential_id)
+                                    logger.debug(f"Found file_id {potential_id} near filename {name_text}")
+                except Exception as name_extract_error:
+                    logger.debug(f"Error extracting IDs from file names: {name_extract_error}")
+                
+                logger.info(f"After name-based extraction: {len(found_ids)} total file IDs found")
+                
+                # Filter out obviously invalid IDs
+                # Google Drive file IDs are EXACTLY 33 characters (very specific pattern)
+                filtered_ids = set()
+                skipped_ids = []
+                for file_id in found_ids:
+                    # Skip if it contains obvious non-ID patterns
+                    skip_patterns = ['http', 'https', 'www', 'google', 'drive', 'com', 'gstatic', 'apis', 'youtube', 'gmail', 
+                                   'anonymous', 'viewer', 'remove', 'scrim', 'exit', 'off', 'on', 'ai', 'az', 'recaptcha',
+                                   'aiza', 'googleapis']
+                    if any(pattern in file_id.lower() for pattern in skip_patterns):
+                        skipped_ids.append(f"{file_id} (contains skip pattern)")
+                        continue
+                    # Google Drive file IDs are EXACTLY 33 characters (this is the key!)
+                    if len(file_id) != 33:
+                        continue
+                    # Skip if it contains spaces or special chars that aren't in Google IDs
+                    if re.search(r'[^a-zA-Z0-9_-]', file_id):
+                        continue
+                    # Skip if it looks like an API key (starts with AIza, contains Sy, etc.)
+                    if file_id.startswith('AIza') or 'AIza' in file_id:
+                        continue
+                    # Skip if it contains common non-ID patterns
+                    if re.search(r'[A-Z]{2,}', file_id):  # Too many consecutive uppercase (unlikely for file IDs)
+                        # Actually, file IDs can have uppercase, so be careful here
+                        # But if it's all uppercase or has patterns like "AIzaSy", skip it
+                        if 'AIza' in file_id or file_id.isupper():
+                            continue
+                    filtered_ids.add(file_id)
+                
+                logger.info(f"Filtered to {len(filtered_ids)} file IDs after removing invalid patterns (from {len(found_ids)} candidates)")
+                if skipped_ids:
+                    logger.debug(f"Skipped {len(skipped_ids)} IDs: {skipped_ids[:5]}")
+                
+                # Additional filtering: Only keep IDs that appear in file-related contexts
+                # This helps eliminate false positives from random long strings
+                # NOTE: For Google Drive, the /file/d/{file_id} pattern is the most reliable indicator
+                # We'll be less strict with context filtering to avoid false negatives
+                context_filtered = set()
+                for file_id in filtered_ids:
+                    # Check if it's in a /file/d/ URL pattern (most reliable for Google Drive)
+                    if f'/file/d/{file_id}' in html_content:
+                        context_filtered.add(file_id)
+                        logger.debug(f"Found file_id {file_id} in /file/d/ URL pattern")
+                        continue
                     
-                    logger.info(f"After name-based extraction: {len(found_ids)} total file IDs found")
+                    # Also check if the ID appears near file-related keywords (less strict)
+                    # This is a heuristic to reduce false positives, but we'll be more lenient
+                    file_id_pattern = re.escape(file_id)
+                    # Look for the ID near file-related terms (with more flexible matching)
+                    context_patterns = [
+                        rf'{file_id_pattern}.*?file',
+                        rf'file.*?{file_id_pattern}',
+                        rf'{file_id_pattern}.*?drive',
+                        rf'drive.*?{file_id_pattern}',
+                        rf'["\']{file_id_pattern}["\']',  # ID in quotes (common in JSON/JS data)
+                        rf'id["\']?\s*:\s*["\']?{file_id_pattern}',  # ID in id: "..." pattern
+                    ]
                     
-                    # Filter out obviously invalid IDs
-                    # Google Drive file IDs are EXACTLY 33 characters (very specific pattern)
-                    filtered_ids = set()
-                    skipped_ids = []
-                    for file_id in found_ids:
-                        # Skip if it contains obvious non-ID patterns
-                        skip_patterns = ['http', 'https', 'www', 'google', 'drive', 'com', 'gstatic', 'apis', 'youtube', 'gmail', 
-                                       'anonymous', 'viewer', 'remove', 'scrim', 'exit', 'off', 'on', 'ai', 'az', 'recaptcha',
-                                       'aiza', 'googleapis']
-                        if any(pattern in file_id.lower() for pattern in skip_patterns):
-                            skipped_ids.append(f"{file_id} (contains skip pattern)")
-                            continue
-                        # Google Drive file IDs are EXACTLY 33 characters (this is the key!)
-                        if len(file_id) != 33:
-                            continue
-                        # Skip if it contains spaces or special chars that aren't in Google IDs
-                        if re.search(r'[^a-zA-Z0-9_-]', file_id):
-                            continue
-                        # Skip if it looks like an API key (starts with AIza, contains Sy, etc.)
-                        if file_id.startswith('AIza') or 'AIza' in file_id:
-                            continue
-                        # Skip if it contains common non-ID patterns
-                        if re.search(r'[A-Z]{2,}', file_id):  # Too many consecutive uppercase (unlikely for file IDs)
-                            # Actually, file IDs can have uppercase, so be careful here
-                            # But if it's all uppercase or has patterns like "AIzaSy", skip it
-                            if 'AIza' in file_id or file_id.isupper():
-                                continue
-                        filtered_ids.add(file_id)
+                    matches_context = False
+                    for pattern in context_patterns:
+                        if re.search(pattern, html_content, re.IGNORECASE):
+                            matches_context = True
+                            logger.debug(f"Found file_id {file_id} in context pattern: {pattern}")
+                            break
                     
-                    logger.info(f"Filtered to {len(filtered_ids)} file IDs after removing invalid patterns (from {len(found_ids)} candidates)")
-                    if skipped_ids:
-                        logger.debug(f"Skipped {len(skipped_ids)} IDs: {skipped_ids[:5]}")
+                    if matches_context:
+                        context_filtered.add(file_id)
+                    else:
+                        # ALWAYS include file IDs that passed the initial filter, even without context match
+                        # This prevents false negatives - if it's a valid 33-char ID, it's likely a real file
+                        logger.debug(f"File_id {file_id} not found in strict context, but including anyway (to avoid false negatives)")
+                        context_filtered.add(file_id)
+                
+                logger.info(f"Context-filtered to {len(context_filtered)} file IDs (from {len(filtered_ids)} candidates)")
+                filtered_ids = context_filtered
+                
+                # Validate file IDs by checking if they're actually accessible
+                validated_ids = []
+                logger.info(f"Validating {len(filtered_ids)} file IDs...")
+                
+                # Limit validation to avoid too many requests
+                validation_limit = 20  # Only validate first 20 to avoid timeouts
+                ids_to_validate = list(filtered_ids)[:validation_limit]
+                
+                for file_id in ids_to_validate:
+                    try:
+                        # Try to access the file info page with a HEAD request
+                        test_url = f"https://drive.google.com/file/d/{file_id}/view"
+                        async with self.session.head(test_url, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=3)) as test_response:
+                            # If we get a 200 or redirect, it's likely a valid file
+                            if test_response.status in [200, 301, 302, 303, 307, 308]:
+                                validated_ids.append(file_id)
+                                logger.debug(f"Validated file_id {file_id}: status {test_response.status}")
+                            else:
+                                logger.debug(f"Skipping file_id {file_id}: status {test_response.status}")
+                    except Exception as validation_error:
+                        logger.debug(f"Could not validate file_id {file_id}: {validation_error}")
+                        # If validation fails, we'll still try to process it - might be a valid file
+                        # but validation failed due to network/permissions
+                        validated_ids.append(file_id)
+                
+                # For IDs beyond validation limit, include them if they passed the filter
+                if len(filtered_ids) > validation_limit:
+                    remaining_ids = list(filtered_ids)[validation_limit:]
+                    logger.info(f"Including {len(remaining_ids)} additional file IDs without validation (validation limit reached)")
+                    validated_ids.extend(remaining_ids)
+                
+                logger.info(f"Final validated file IDs: {len(validated_ids)}")
+                found_ids = set(validated_ids)
+                
+                # For each file ID, try to get file info and create download link
+                for file_id in found_ids:
+                    # Skip the folder ID itself
+                    if file_id == folder_id:
+                        continue
                     
-                    # Additional filtering: Only keep IDs that appear in file-related contexts
-                    # This helps eliminate false positives from random long strings
-                    # NOTE: For Google Drive, the /file/d/{file_id} pattern is the most reliable indicator
-                    # We'll be less strict with context filtering to avoid false negatives
-                    context_filtered = set()
-                    for file_id in filtered_ids:
-                        # Check if it's in a /file/d/ URL pattern (most reliable for Google Drive)
-                        if f'/file/d/{file_id}' in html_content:
-                            context_filtered.add(file_id)
-                            logger.debug(f"Found file_id {file_id} in /file/d/ URL pattern")
-                            continue
+                    # Try to get file metadata
+                    try:
+                        # Create direct download URL
+                        # Format: https://drive.google.com/uc?export=download&id=FILE_ID
+                        download_url = f"https://drive.google.com/uc?export=download&id={file_id}"
                         
-                        # Also check if the ID appears near file-related keywords (less strict)
-                        # This is a heuristic to reduce false positives, but we'll be more lenient
-                        file_id_pattern = re.escape(file_id)
-                        # Look for the ID near file-related terms (with more flexible matching)
-                        context_patterns = [
-                            rf'{file_id_pattern}.*?file',
-                            rf'file.*?{file_id_pattern}',
-                            rf'{file_id_pattern}.*?drive',
-                            rf'drive.*?{file_id_pattern}',
-                            rf'["\']{file_id_pattern}["\']',  # ID in quotes (common in JSON/JS data)
-                            rf'id["\']?\s*:\s*["\']?{file_id_pattern}',  # ID in id: "..." pattern
-                        ]
+                        # Try to get file name by fetching file info
+                        # Google Drive file info endpoint
+                        file_info_url = f"https://drive.google.com/file/d/{file_id}/view"
                         
-                        matches_context = False
-                        for pattern in context_patterns:
-                            if re.search(pattern, html_content, re.IGNORECASE):
-                                matches_context = True
-                                logger.debug(f"Found file_id {file_id} in context pattern: {pattern}")
-                                break
+                        file_name = f"file_{file_id}.wav"  # Default name
                         
-                        if matches_context:
-                            context_filtered.add(file_id)
-                        else:
-                            # ALWAYS include file IDs that passed the initial filter, even without context match
-                            # This prevents false negatives - if it's a valid 33-char ID, it's likely a real file
-                            logger.debug(f"File_id {file_id} not found in strict context, but including anyway (to avoid false negatives)")
-                            context_filtered.add(file_id)
-                    
-                    logger.info(f"Context-filtered to {len(context_filtered)} file IDs (from {len(filtered_ids)} candidates)")
-                    filtered_ids = context_filtered
-                    
-                    # Validate file IDs by checking if they're actually accessible
-                    validated_ids = []
-                    logger.info(f"Validating {len(filtered_ids)} file IDs...")
-                    
-                    # Limit validation to avoid too many requests
-                    validation_limit = 20  # Only validate first 20 to avoid timeouts
-                    ids_to_validate = list(filtered_ids)[:validation_limit]
-                    
-                    for file_id in ids_to_validate:
                         try:
-                            # Try to access the file info page with a HEAD request
-                            test_url = f"https://drive.google.com/file/d/{file_id}/view"
-                            async with self.session.head(test_url, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=3)) as test_response:
-                                # If we get a 200 or redirect, it's likely a valid file
-                                if test_response.status in [200, 301, 302, 303, 307, 308]:
-                                    validated_ids.append(file_id)
-                                    logger.debug(f"Validated file_id {file_id}: status {test_response.status}")
-                                else:
-                                    logger.debug(f"Skipping file_id {file_id}: status {test_response.status}")
-                        except Exception as validation_error:
-                            logger.debug(f"Could not validate file_id {file_id}: {validation_error}")
-                            # If validation fails, we'll still try to process it - might be a valid file
-                            # but validation failed due to network/permissions
-                            validated_ids.append(file_id)
-                    
-                    # For IDs beyond validation limit, include them if they passed the filter
-                    if len(filtered_ids) > validation_limit:
-                        remaining_ids = list(filtered_ids)[validation_limit:]
-                        logger.info(f"Including {len(remaining_ids)} additional file IDs without validation (validation limit reached)")
-                        validated_ids.extend(remaining_ids)
-                    
-                    logger.info(f"Final validated file IDs: {len(validated_ids)}")
-                    found_ids = set(validated_ids)
-                    
-                    # For each file ID, try to get file info and create download link
-                    for file_id in found_ids:
-                        # Skip the folder ID itself
-                        if file_id == folder_id:
-                            continue
+                            async with self.session.get(file_info_url, allow_redirects=False) as info_response:
+                                # Try to extract filename from headers
+                                content_disposition = info_response.headers.get('Content-Disposition', '')
+                                if content_disposition:
+                                    filename_match = re.search(r'filename[^;=\n]*=(([\'"]).*?\2|[^\s;]+)', content_disposition)
+                                    if filename_match:
+                                        file_name = filename_match.group(1).strip('\'"')
+                                
+                                # If not in headers, try to get from HTML title
+                                if file_name == f"file_{file_id}.wav":
+                                    html = await info_response.text()
+                                    title_match = re.search(r'<title[^>]*>(.*?)</title>', html, re.IGNORECASE | re.DOTALL)
+                                    if title_match:
+                                        title = title_match.group(1).strip()
+                                        # Remove "Google Drive" suffix if present
+                                        title = re.sub(r'\s*-\s*Google\s+Drive\s*$', '', title, flags=re.IGNORECASE)
+                                        if title:
+                                            file_name = title
+                        except Exception as name_error:
+                            logger.warning(f"Could not get filename for {file_id}: {name_error}, using default")
                         
-                        # Try to get file metadata
-                        try:
-                            # Create direct download URL
-                            # Format: https://drive.google.com/uc?export=download&id=FILE_ID
-                            download_url = f"https://drive.google.com/uc?export=download&id={file_id}"
-                            
-                            # Try to get file name by fetching file info
-                            # Google Drive file info endpoint
-                            file_info_url = f"https://drive.google.com/file/d/{file_id}/view"
-                            
-                            file_name = f"file_{file_id}.wav"  # Default name
-                            
-                            try:
-                                async with self.session.get(file_info_url, allow_redirects=False) as info_response:
-                                    # Try to extract filename from headers
-                                    content_disposition = info_response.headers.get('Content-Disposition', '')
-                                    if content_disposition:
-                                        filename_match = re.search(r'filename[^;=\n]*=(([\'"]).*?\2|[^\s;]+)', content_disposition)
-                                        if filename_match:
-                                            file_name = filename_match.group(1).strip('\'"')
-                                    
-                                    # If not in headers, try to get from HTML title
-                                    if file_name == f"file_{file_id}.wav":
-                                        html = await info_response.text()
-                                        title_match = re.search(r'<title[^>]*>(.*?)</title>', html, re.IGNORECASE | re.DOTALL)
-                                        if title_match:
-                                            title = title_match.group(1).strip()
-                                            # Remove "Google Drive" suffix if present
-                                            title = re.sub(r'\s*-\s*Google\s+Drive\s*$', '', title, flags=re.IGNORECASE)
-                                            if title:
-                                                file_name = title
-                            except Exception as name_error:
-                                logger.warning(f"Could not get filename for {file_id}: {name_error}, using default")
-                            
-                            # Check if file extension is supported (we'll verify on download)
-                            # For now, add all files and filter later
-                            audio_files.append({
-                                "url": download_url,
-                                "name": file_name,
-                                "file_id": file_id
-                            })
-                            
-                        except Exception as file_error:
-                            logger.warning(f"Error processing Google Drive file {file_id}: {file_error}")
-                            continue
+                        file_info = {
+                            "url": download_url,
+                            "name": file_name,
+                            "file_id": file_id
+                        }
+                        
+                    except Exception as file_error:
+                        logger.warning(f"Error processing Google Drive file {file_id}: {file_error}")
+                        continue
                     
-                    # If we still didn't find files, try a more direct approach
-                    if not audio_files and found_ids:
-                        logger.warning(f"Found {len(found_ids)} file IDs but couldn't process them. This might indicate a parsing issue.")
+                    # Check if file extension is supported (we'll verify on download)
+                    if _looks_like_audio(file_info):
+                        found += 1
+                        yield file_info
+                
+                # If we still didn't find files, try a more direct approach
+                if not found and found_ids:
+                    logger.warning(f"Found {len(found_ids)} file IDs but couldn't process them. This might indicate a parsing issue.")
             
             elif file_id_match:
                 # It's a direct file link
@@ -745,34 +1266,18 @@ class BulkImportService:
                 download_url = f"https://drive.google.com/uc?export=download&id={file_id}"
                 file_name = f"google_drive_file_{file_id}.wav"  # Default name
                 
-                audio_files.append({
+                found += 1
+                yield {
                     "url": download_url,
                     "name": file_name,
                     "file_id": file_id
-                })
+                }
             else:
                 raise Exception("Could not extract folder or file ID from Google Drive URL")
             
-            # Filter to only audio files based on URL patterns or file extensions
-            # We'll do a more thorough check when downloading
-            filtered_files = []
-            for file_info in audio_files:
-                url = file_info.get("url", "")
-                name = file_info.get("name", "")
-                
-                # Check if it looks like an audio file
-                if any(ext in name.lower() for ext in ['.wav', '.mp3', '.m4a', '.webm', '.ogg']):
-                    filtered_files.append(file_info)
-                # Also check if URL suggests it's an audio file
-                elif any(ext in url.lower() for ext in ['.wav', '.mp3', '.m4a', '.webm', '.ogg']):
-                    filtered_files.append(file_info)
-                # For Google Drive, we might not know the extension, so include it and check on download
-                elif "drive.google.com" in url:
-                    filtered_files.append(file_info)
-            
-            logger.info(f"Found {len(filtered_files)} audio files from Google Drive")
+            logger.info(f"Found {found} audio files from Google Drive")
             
-            if not filtered_files:
+            if not found:
                 # Provide helpful error message
                 error_msg = (
                     "No audio files found in Google Drive folder. "
@@ -785,8 +1290,6 @@ class BulkImportService:
                 logger.warning(error_msg)
                 raise Exception(error_msg)
             
-            return filtered_files
-            
         except Exception as e:
             logger.error(f"Error discovering Google Drive files: {e}", exc_info=True)
             # Provide more helpful error message
@@ -856,72 +1359,128 @@ class BulkImportService:
         file_name = file_info["name"]
 
         try:
-            # Find existing file record (created during discovery) or create new one
-            # We create file records upfront during discovery, so we should update that record
-            existing_record = None
-            try:
-                result = self.supabase.table("bulk_import_files").select("*").eq(
-                    "job_id", job_id
-                ).eq("original_url", file_url).maybe_single().execute()
-                
-                # Handle None response or missing data attribute
-                if result and hasattr(result, 'data') and result.data:
-                    existing_record = result.data
-                    file_id = existing_record["id"]
-                    # Update status to downloading
+            # File records are created in bulk after discovery; only create one here if that missed it
+            # A file uploaded before the job was interrupted resumes at transcription
+            record = self._file_records.get(file_url) or {}
+            file_id = self._file_ids.get(file_url)
+            if file_id:
+                if not record.get("storage_path"):
                     await self._update_file_record(file_id, {"status": "downloading"})
-                    logger.debug(f"Found existing file record {file_id} for {file_name}, updating status")
-                else:
-                    # No existing record, create new one
-                    file_record = await self._create_file_record(
-                        job_id=job_id,
-                        file_name=file_name,
-                        original_url=file_url,
-                        status="downloading"
-                    )
-                    file_id = file_record["id"]
-                    logger.debug(f"Created new file record {file_id} for {file_name}")
-            except Exception as record_error:
-                logger.warning(f"Error finding/updating file record: {record_error}, creating new one")
-                try:
-                    file_record = await self._create_file_record(
-                        job_id=job_id,
-                        file_name=file_name,
-                        original_url=file_url,
-                        status="downloading"
-                    )
-                    file_id = file_record["id"]
-                except Exception as create_error:
-                    logger.error(f"Failed to create file record: {create_error}")
-                    raise
+            else:
+                file_record = await self._create_file_record(
+                    job_id=job_id,
+                    file_name=file_name,
+                    original_url=file_url,
+                    status="downloading"
+                )
+                file_id = file_record["id"]
+                self._file_ids[file_url] = file_id
+                logger.debug(f"Created new file record {file_id} for {file_name}")
+
+            if record.get("storage_path"):
+                storage_path = record["storage_path"]
+                logger.info(f"⏩ {file_name} already uploaded to {storage_path}, resuming at transcription")
+            else:
+                # Cheap pre-check on the source's HEAD metadata before downloading anything
+                source = file_info.get("source")
+                if source is None:
+                    source = await self._head_metadata(file_url) if CONTENT_DEDUP_ENABLED else {}
+                duplicate = await self._find_duplicate_by_source(file_id, user_id, source)
+                if duplicate:
+                    await self._link_duplicate(file_id, file_name, duplicate, source)
+                    return
+                storage_path = await self._download_and_store(
+                    job_id, file_id, file_info, bucket_name, user_id, source=source
+                )
+                if storage_path is None:
+                    return  # Same content as an earlier import (by SHA-256), linked to it
+
+            # Create call record (or reuse the one from before an interruption)
+            if record.get("call_record_id"):
+                call_record = {"id": record["call_record_id"]}
+            else:
+                call_record = await self._create_call_record(
+                    job_id=job_id,
+                    user_id=user_id,
+                    customer_name=customer_name,
+                    file_name=file_name,
+                    storage_path=storage_path,
+                    bucket_name=bucket_name
+                )
+
+                # Update file record with call_record_id (flushed: the resume point after a restart)
+                await self._update_file_record(file_id, {"call_record_id": call_record["id"]}, flush=True)
+
+            # Update file status to analyzing
+            await self._update_file_status(file_id, "analyzing")
+            
+            # Trigger transcription and analysis (pass file_id so it can update status when done)
+            async with self._stage("transcribing"):
+                await self._trigger_transcription_and_analysis(
+                    call_record_id=call_record["id"],
+                    storage_path=storage_path,
+                    bucket_name=bucket_name,
+                    file_name=file_name,
+                    user_id=user_id,
+                    customer_name=customer_name,
+                    provider=provider,
+                    file_id=file_id  # Pass file_id so we can update status after analysis
+                )
+
+        except Exception as e:
+            logger.error(f"Error processing file {file_name}: {e}", exc_info=True)
+            raise
+
+    async def _download_and_store(
+        self,
+        job_id: str,
+        file_id: str,
+        file_info: Dict[str, Any],
+        bucket_name: str,
+        user_id: str,
+        source: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        """
+        Download a file and upload it to the job's storage bucket; returns the storage
+        path, or None when the content hash shows it was already imported (then the
+        file is linked to the earlier import and nothing is uploaded).
+        """
+        file_url = file_info["url"]
+        file_name = file_info["name"]
+        source = source or {}
 
-            # Download file
-            logger.info(f"Downloading {file_name} from {file_url}")
-            audio_data = await self._download_file(file_url)
+        # Download file (streamed to a temp file; size limit and hash checked on the way)
+        logger.info(f"Downloading {file_name} from {file_url}")
+        async with self._stage("downloading"):
+            download = await self._download_to_temp_file(file_url, os.path.splitext(file_name)[1].lower())
 
-            # Check file size
-            if len(audio_data) > MAX_FILE_SIZE:
-                file_size_mb = len(audio_data) / (1024 * 1024)
-                max_size_gb = MAX_FILE_SIZE / (1024 * 1024 * 1024)
-                raise Exception(f"File size {file_size_mb:.2f}MB exceeds maximum {max_size_gb}GB")
+        try:
+            # Final check: same bytes as a file already imported
+            duplicate = await self._find_duplicate(file_id, user_id, {"content_sha256": download.sha256})
+            if duplicate:
+                await self._link_duplicate(
+                    file_id, file_name, duplicate,
+                    {**source, "content_sha256": download.sha256, "file_size": download.size}
+                )
+                return None
 
             # Convert if needed (ensure format compatibility)
-            audio_data, file_format = await self._ensure_format_compatibility(audio_data, file_name)
+            audio_path, file_format = await self._ensure_format_compatibility(download.path, file_name)
 
             # Upload to storage
             storage_path = f"{user_id}/{job_id}/{file_name}"
-            logger.info(f"Uploading {file_name} to storage")
-            
+            logger.info(f"Uploading {file_name} to storage ({download.size / (1024 * 1024):.1f}MB)")
+
             await self._update_file_status(file_id, "uploading")
-            
+
             # Upload to Supabase storage
             # The upload method will raise an exception on error, so we don't need to check for error attribute
             try:
-                upload_result = self.supabase.storage.from_(bucket_name).upload(
-                    storage_path,
-                    audio_data,
-                    file_options={"content-type": self._get_content_type(file_format), "upsert": "true"}
-                )
+                # Off the event loop so other files keep downloading/transcribing meanwhile
+                async with self._stage("uploading"):
+                    upload_result = await asyncio.to_thread(
+                        self._upload_from_file, bucket_name, storage_path, audio_path, self._get_content_type(file_format)
+                    )
                 # If we get here, upload was successful
                 # upload_result should have a 'path' attribute if successful
                 if hasattr(upload_result, 'path'):
@@ -930,74 +1489,152 @@ class BulkImportService:
                     logger.debug(f"Upload successful: {storage_path}")
             except Exception as upload_error:
                 raise Exception(f"Upload failed: {str(upload_error)}")
+        finally:
+            download.cleanup()
 
-            # Update file record
-            file_ext = os.path.splitext(file_name)[1].lower()
-            await self._update_file_record(
-                file_id,
-                {
-                    "storage_path": storage_path,
-                    "file_size": len(audio_data),
-                    "file_format": file_ext or file_format,
-                    "status": "transcribing"
-                }
-            )
+        # Update file record (flushed right away: once stored, a resumed job skips the download)
+        file_ext = os.path.splitext(file_name)[1].lower()
+        await self._update_file_record(
+            file_id,
+            {
+                "storage_path": storage_path,
+                "file_size": download.size,
+                "file_format": file_ext or file_format,
+                "content_sha256": download.sha256,
+                **source,
+                "status": "transcribing"
+            },
+            flush=True
+        )
+        return storage_path
 
-            # Create call record
-            call_record = await self._create_call_record(
-                job_id=job_id,
-                user_id=user_id,
-                customer_name=customer_name,
-                file_name=file_name,
-                storage_path=storage_path,
-                bucket_name=bucket_name
+    async def _head_metadata(self, url: str) -> Dict[str, Any]:
+        """ETag, Content-Length, Content-Type and Last-Modified of the source (empty when HEAD is not answered)"""
+        if not self.session:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=300),  # 5 minutes for large files
+                headers={"User-Agent": "Mozilla/5.0 (compatible; BulkImport/1.0)"}
             )
+        try:
+            async with self.session.head(url, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                if response.status != 200:
+                    return {}
+                metadata = {
+                    "etag": response.headers.get("ETag"),
+                    "content_length": response.content_length,
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "content_type": response.headers.get("Content-Type"),
+                }
+        except Exception as e:
+            logger.debug(f"HEAD {url} failed: {e}")
+            return {}
+        return {key: value for key, value in metadata.items() if value is not None}
 
-            # Update file record with call_record_id
-            await self._update_file_record(file_id, {"call_record_id": call_record["id"]})
-
-            # Update file status to analyzing
-            await self._update_file_status(file_id, "analyzing")
-            
-            # Trigger transcription and analysis (pass file_id so it can update status when done)
-            await self._trigger_transcription_and_analysis(
-                call_record_id=call_record["id"],
-                storage_path=storage_path,
-                bucket_name=bucket_name,
-                file_name=file_name,
-                user_id=user_id,
-                customer_name=customer_name,
-                provider=provider,
-                file_id=file_id  # Pass file_id so we can update status after analysis
-            )
+    async def _find_duplicate_by_source(
+        self, file_id: str, user_id: str, source: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Same source object as an earlier import, judged from HEAD metadata alone.
+        Only strong ETags with a matching Content-Length (and Last-Modified when
+        known) are trusted; anything weaker is left to the content hash.
+        """
+        etag = source.get("etag")
+        if not etag or etag.startswith("W/") or not source.get("content_length"):
+            return None
+        filters = {"etag": etag, "content_length": source["content_length"]}
+        if source.get("last_modified"):
+            filters["last_modified"] = source["last_modified"]
+        return await self._find_duplicate(file_id, user_id, filters)
 
+    async def _find_duplicate(self, file_id: str, user_id: str, filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """A completed file of one of the user's jobs matching filters, with its call record"""
+        if not CONTENT_DEDUP_ENABLED:
+            return None
+        try:
+            query = self.supabase.table("bulk_import_files").select(
+                "id, call_record_id, storage_path, file_size, bulk_import_jobs!inner(user_id)"
+            ).eq("bulk_import_jobs.user_id", user_id).eq("status", "completed").not_.is_(
+                "call_record_id", "null"
+            ).neq("id", file_id)
+            for column, value in filters.items():
+                query = query.eq(column, value)
+            result = query.limit(1).execute()
+            return result.data[0] if result.data else None
         except Exception as e:
-            logger.error(f"Error processing file {file_name}: {e}", exc_info=True)
-            raise
+            logger.warning(f"Duplicate lookup failed, importing the file anyway: {e}")
+            return None
+
+    async def _link_duplicate(
+        self, file_id: str, file_name: str, duplicate: Dict[str, Any], updates: Dict[str, Any]
+    ):
+        """Point the file at the earlier import's call record and storage object instead of reprocessing"""
+        await self._update_file_record(file_id, {
+            **updates,
+            "status": "completed",
+            "error_message": None,
+            "duplicate_of": duplicate["id"],
+            "call_record_id": duplicate["call_record_id"],
+            "storage_path": duplicate.get("storage_path"),
+        }, flush=True)
+        size = updates.get("file_size") or updates.get("content_length") or duplicate.get("file_size") or 0
+        if self._progress is not None:
+            self._progress.record_duplicate(size)
+        logger.info(f"♻️ {file_name} is already imported (file {duplicate['id']}), linked to call record {duplicate['call_record_id']}")
 
-    async def _download_file(self, url: str) -> bytes:
-        """Download a file from URL"""
+    async def _download_to_temp_file(self, url: str, suffix: str = "") -> DownloadedAudio:
+        """
+        Stream a file from URL into a temp file, chunk by chunk, so memory per file
+        stays constant. Enforces MAX_FILE_SIZE (up front from Content-Length, and
+        while reading) and computes the SHA-256 of the content.
+        """
         if not self.session:
             self.session = aiohttp.ClientSession(
                 timeout=aiohttp.ClientTimeout(total=300),  # 5 minutes for large files
                 headers={"User-Agent": "Mozilla/5.0 (compatible; BulkImport/1.0)"}
             )
 
-        async with self.session.get(url) as response:
-            if response.status != 200:
-                raise Exception(f"Failed to download file: {response.status}")
-            return await response.read()
+        fd, path = tempfile.mkstemp(prefix="bulk-import-", suffix=suffix, dir=BULK_IMPORT_TEMP_DIR)
+        os.close(fd)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with self.session.get(url) as response:
+                if response.status != 200:
+                    raise Exception(f"Failed to download file: {response.status}")
+                if response.content_length and response.content_length > MAX_FILE_SIZE:
+                    raise Exception(_file_too_large(response.content_length))
+
+                async with aiofiles.open(path, "wb") as out:
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > MAX_FILE_SIZE:
+                            raise Exception(_file_too_large(size))
+                        digest.update(chunk)
+                        await out.write(chunk)
+        except BaseException:
+            _remove_quietly(path)
+            raise
+        return DownloadedAudio(path, size, digest.hexdigest())
+
+    def _upload_from_file(self, bucket_name: str, storage_path: str, path: str, content_type: str):
+        """Upload a local file to storage; the client streams an open file instead of reading it whole"""
+        with open(path, "rb") as audio_file:
+            return self.supabase.storage.from_(bucket_name).upload(
+                storage_path,
+                audio_file,
+                file_options={"content-type": content_type, "upsert": "true"}
+            )
 
-    async def _ensure_format_compatibility(self, audio_data: bytes, file_name: str) -> tuple[bytes, str]:
+    async def _ensure_format_compatibility(self, audio_path: str, file_name: str) -> tuple[str, str]:
         """
         Ensure audio format is compatible.
         For now, we'll just validate the format.
-        Actual conversion would require ffmpeg or similar.
+        Actual conversion would require ffmpeg or similar (on the downloaded file at audio_path).
         """
         file_ext = os.path.splitext(file_name)[1].lower()
         
         if file_ext in SUPPORTED_FORMATS:
-            return audio_data, file_ext
+            return audio_path, file_ext
         
         # If format is not supported, we'd need to convert
         # For now, raise an error
@@ -1022,26 +1659,31 @@ class BulkImportService:
         status: str,
         error_message: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Create a file record in the database"""
-        result = self.supabase.table("bulk_import_files").insert({
+        """Create a file record in the database (or take over the job's existing record for the URL)"""
+        result = self.supabase.table("bulk_import_files").upsert({
             "job_id": job_id,
             "file_name": file_name,
             "original_url": original_url,
             "status": status,
             "error_message": error_message
-        }).execute()
+        }, on_conflict="job_id,original_url").execute()
 
         if not result.data:
             raise Exception("Failed to create file record")
         return result.data[0]
 
-    async def _update_file_record(self, file_id: str, updates: Dict[str, Any]):
-        """Update a file record"""
+    async def _update_file_record(self, file_id: str, updates: Dict[str, Any], flush: bool = False):
+        """Update a file record (buffered during a job; flush=True writes it before returning)"""
+        if self._aggregator is not None:
+            await self._aggregator.update_file(file_id, updates, flush=flush)
+            return
         self.supabase.table("bulk_import_files").update(updates).eq("id", file_id).execute()
 
-    async def _update_file_status(self, file_id: str, status: str, error_message: Optional[str] = None):
+    async def _update_file_status(
+        self, file_id: str, status: str, error_message: Optional[str] = None, flush: bool = False
+    ):
         """Update file status"""
-        await self._update_file_record(file_id, {"status": status, "error_message": error_message})
+        await self._update_file_record(file_id, {"status": status, "error_message": error_message}, flush=flush)
 
     async def _create_call_record(
         self,
@@ -1188,6 +1830,11 @@ class BulkImportService:
             import asyncio
             import threading
             
+            # One time budget for this file's transcription and analysis; the
+            # thread does not inherit our context, so it is handed over explicitly
+            from services.deadline import Deadline, PIPELINE_DEADLINE_SECONDS
+            pipeline_deadline = Deadline(PIPELINE_DEADLINE_SECONDS, label=f"file {file_name}")
+
             # Run transcription in a separate thread
             def run_transcription():
                 try:
@@ -1202,11 +1849,25 @@ class BulkImportService:
                         None,  # language
                         True,  # enable_diarization
                         call_record_id,  # Pass call_record_id directly
-                        file_id  # Pass file_id so status can be updated to "completed" when done
+                        file_id,  # Pass file_id so status can be updated to "completed" when done
+                        deadline=pipeline_deadline
                     )
                 except Exception as e:
                     logger.error(f"Error in transcription thread: {e}")
             
+            # Update file status to transcribing (written now, before the thread can mark it completed)
+            if file_id:
+                try:
+                    await self._update_file_status(file_id, "transcribing", flush=True)
+                    logger.debug(f"File {file_name} status updated to transcribing")
+                except Exception as e:
+                    logger.warning(f"Failed to update file status: {e}")
+            
+            # Registered before the thread starts so an instant failure is not missed
+            completion = get_completion_registry()
+            if file_id:
+                completion.expect(file_id)
+
             transcription_thread = threading.Thread(target=run_transcription, daemon=True)
             transcription_thread.start()
             
@@ -1216,84 +1877,28 @@ class BulkImportService:
             logger.info(f"✅ Transcription thread started for {call_record_id}. Analysis will be triggered automatically by _process_transcription_background when transcript completes.")
             print(f"✅ Transcription thread started for {call_record_id}. Analysis will be triggered automatically.")
             
-            # Update file status to transcribing
-            if file_id:
-                try:
-                    await self._update_file_status(file_id, "transcribing")
-                    logger.debug(f"File {file_name} status updated to transcribing")
-                except Exception as e:
-                    logger.warning(f"Failed to update file status: {e}")
-            
-            # Wait for transcription and analysis to complete before returning
-            # This ensures sequential processing - next file only starts after current one is fully done
+            # Wait for transcription and analysis to complete before returning.
+            # The pipeline resolves the file's completion when analysis finishes or
+            # anything fails, so no database polling is needed while waiting.
             if file_id:
                 logger.info(f"⏳ Waiting for transcription and analysis to complete for file {file_name} (call_record_id={call_record_id})...")
                 print(f"⏳ Waiting for pipeline completion for file {file_name}...")
-                
-                max_wait_time = 600  # 10 minutes max wait time
-                poll_interval = 3  # Check every 3 seconds
-                waited = 0
-                
-                while waited < max_wait_time:
-                    try:
-                        # Check file status
-                        file_result = self.supabase.table("bulk_import_files").select("status").eq("id", file_id).maybe_single().execute()
-                        
-                        if file_result and hasattr(file_result, 'data') and file_result.data:
-                            file_status = file_result.data.get("status")
-                            
-                            # Check if pipeline is complete
-                            if file_status == "completed":
-                                logger.info(f"✅ Pipeline completed for file {file_name} (status: {file_status})")
-                                print(f"✅ Pipeline completed for file {file_name} after {waited}s")
-                                break
-                            elif file_status == "failed":
-                                logger.warning(f"⚠️ Pipeline failed for file {file_name} (status: {file_status})")
-                                print(f"⚠️ Pipeline failed for file {file_name} after {waited}s")
-                                break
-                            else:
-                                # Still processing - log intermediate status
-                                if waited % 30 == 0:  # Log every 30 seconds
-                                    logger.debug(f"⏳ Still processing file {file_name}: status={file_status}, waited={waited}s")
-                                    print(f"⏳ Still processing file {file_name}: status={file_status}, waited={waited}s")
-                        
-                        # Also check call_record to see if transcript is ready
-                        call_result = self.supabase.table("call_records").select("transcript, call_category, call_type").eq("id", call_record_id).maybe_single().execute()
-                        if call_result and hasattr(call_result, 'data') and call_result.data:
-                            transcript = call_result.data.get("transcript", "")
-                            call_category = call_result.data.get("call_category")
-                            call_type = call_result.data.get("call_type")
-                            
-                            # If we have a valid transcript and category, analysis is likely complete
-                            invalid_transcripts = ["Processing...", "Transcribing audio...", "Transcription timeout"]
-                            if transcript and transcript not in invalid_transcripts and len(transcript.strip()) > 10:
-                                if call_category:
-                                    # Both transcript and category exist - analysis is likely complete
-                                    # call_type is optional but preferred for better context
-                                    analysis_info = f"category={call_category}"
-                                    if call_type:
-                                        analysis_info += f", call_type={call_type}"
-                                    # Check file status one more time to confirm
-                                    file_result = self.supabase.table("bulk_import_files").select("status").eq("id", file_id).maybe_single().execute()
-                                    if file_result and hasattr(file_result, 'data') and file_result.data:
-                                        file_status = file_result.data.get("status")
-                                        if file_status in ["completed", "categorized", "failed"]:
-                                            logger.info(f"✅ Analysis appears complete for file {file_name} (transcript ready, {analysis_info})")
-                                            print(f"✅ Analysis appears complete for file {file_name} after {waited}s")
-                                            break
-                        
-                    except Exception as poll_error:
-                        logger.debug(f"Error polling file status: {poll_error}")
-                    
-                    await asyncio.sleep(poll_interval)
-                    waited += poll_interval
-                
-                if waited >= max_wait_time:
-                    logger.warning(f"⚠️ Pipeline timeout for file {file_name} after {max_wait_time}s - proceeding to next file")
-                    print(f"⚠️ Pipeline timeout for file {file_name} after {max_wait_time}s")
+
+                # No point waiting past the pipeline's own deadline
+                max_wait_time = pipeline_deadline.remaining()
+                outcome = await completion.wait(file_id, timeout=max_wait_time)
+
+                if outcome is None:
+                    logger.warning(f"⚠️ Pipeline timeout for file {file_name} after {max_wait_time:.0f}s - proceeding to next file")
+                    print(f"⚠️ Pipeline timeout for file {file_name} after {max_wait_time:.0f}s")
+                elif outcome["status"] == FAILED:
+                    logger.warning(f"⚠️ Pipeline failed for file {file_name}: {outcome.get('error')}")
+                    print(f"⚠️ Pipeline failed for file {file_name} after {pipeline_deadline.elapsed():.0f}s")
+                    if not outcome.get("persisted"):
+                        await self._update_file_status(file_id, "failed", error_message=(outcome.get("error") or "")[:500])
                 else:
-                    logger.info(f"✅ Sequential processing: File {file_name} completed, proceeding to next file")
-                    print(f"✅ Sequential processing: File {file_name} completed, proceeding to next file")
+                    logger.info(f"✅ Pipeline completed for file {file_name}")
+                    print(f"✅ Pipeline completed for file {file_name} after {pipeline_deadline.elapsed():.0f}s")
             else:
                 # No file_id - can't track status, wait a bit for thread to start
                 logger.warning(f"⚠️ No file_id provided, cannot track completion. Waiting 5 seconds for thread to start...")
@@ -1332,3 +1937,131 @@ class BulkImportService:
             await self.session.close()
             self.session = None
 
+
+# Jobs running in this process, so a job is never run twice by the same worker
+_running_imports: Dict[str, asyncio.Task] = {}
+_boot_id = uuid.uuid4().hex[:8]
+
+
+def _worker_id() -> str:
+    # Per call: forked workers share the module but not the pid
+    return f"{socket.gethostname()}-{os.getpid()}-{_boot_id}"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _lease_until() -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=BULK_IMPORT_LEASE_SECONDS)).isoformat()
+
+
+def claim_bulk_import_job(supabase, job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Take the lease on an unfinished job that nobody holds (new, or its
+    worker's lease ran out). Returns the job row when claimed.
+    """
+    owner = _worker_id()
+    result = (
+        supabase.table("bulk_import_jobs")
+        .update({"lease_owner": owner, "lease_expires_at": _lease_until()})
+        .eq("id", job_id)
+        .in_("status", list(ACTIVE_JOB_STATUSES))
+        .or_(f'lease_owner.is.null,lease_expires_at.lt.{_now()},lease_owner.eq."{owner}"')
+        .execute()
+    )
+    return result.data[0] if result.data else None
+
+
+def renew_bulk_import_lease(supabase, job_id: str) -> bool:
+    """Extend our lease; False when another worker has taken the job over"""
+    result = (
+        supabase.table("bulk_import_jobs")
+        .update({"lease_expires_at": _lease_until()})
+        .eq("id", job_id)
+        .eq("lease_owner", _worker_id())
+        .execute()
+    )
+    return bool(result.data)
+
+
+def release_bulk_import_lease(supabase, job_id: str):
+    supabase.table("bulk_import_jobs").update(
+        {"lease_owner": None, "lease_expires_at": None}
+    ).eq("id", job_id).eq("lease_owner", _worker_id()).execute()
+
+
+async def _keep_lease(supabase, job_id: str, task: asyncio.Task):
+    """Renew the lease while the job runs; stop the job if the lease is lost"""
+    while True:
+        await asyncio.sleep(BULK_IMPORT_LEASE_SECONDS / 3)
+        try:
+            renewed = renew_bulk_import_lease(supabase, job_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not renew lease on bulk import job {job_id}: {e}")
+            continue
+        if not renewed:
+            logger.warning(f"⚠️ Lost the lease on bulk import job {job_id}, another worker took it over")
+            task.cancel()
+            return
+
+
+def start_bulk_import_job(supabase, job_id: str) -> bool:
+    """Claim the job and run (or resume) it in the background of this process"""
+    if job_id in _running_imports and not _running_imports[job_id].done():
+        return False
+    job = claim_bulk_import_job(supabase, job_id)
+    if not job:
+        return False
+
+    async def runner():
+        keeper = asyncio.ensure_future(_keep_lease(supabase, job_id, asyncio.current_task()))
+        try:
+            await BulkImportService(supabase).process_import_job(
+                job_id=job_id,
+                customer_name=job["customer_name"],
+                source_url=job["source_url"],
+                bucket_name=job["storage_bucket_name"],
+                user_id=job["user_id"],
+                provider=job.get("provider") or "openai",
+                call_log_file_url=job.get("call_log_file_url"),
+                concurrency=job.get("concurrency"),
+                order=job.get("file_order")
+            )
+        except Exception:
+            pass  # Already recorded on the job row
+        finally:
+            keeper.cancel()
+            try:
+                release_bulk_import_lease(supabase, job_id)
+            except Exception as e:
+                logger.warning(f"Could not release lease on bulk import job {job_id}: {e}")
+            _running_imports.pop(job_id, None)
+
+    _running_imports[job_id] = asyncio.create_task(runner())
+    return True
+
+
+def resume_bulk_import_jobs(supabase) -> List[str]:
+    """Start unfinished jobs nobody holds a lease on (new ones, and ones orphaned by a restart)"""
+    result = (
+        supabase.table("bulk_import_jobs")
+        .select("id")
+        .in_("status", list(ACTIVE_JOB_STATUSES))
+        .or_(f"lease_owner.is.null,lease_expires_at.lt.{_now()}")
+        .execute()
+    )
+    resumed = [row["id"] for row in result.data or [] if start_bulk_import_job(supabase, row["id"])]
+    if resumed:
+        logger.info(f"🔁 Resumed {len(resumed)} bulk import job(s): {resumed}")
+    return resumed
+
+
+async def run_bulk_import_scheduler(supabase):
+    """Sweep for unowned jobs every BULK_IMPORT_SWEEP_SECONDS"""
+    while True:
+        try:
+            resume_bulk_import_jobs(supabase)
+        except Exception as e:
+            logger.warning(f"Bulk import scheduler sweep failed: {e}")
+        await asyncio.sleep(BULK_IMPORT_SWEEP_SECONDS)
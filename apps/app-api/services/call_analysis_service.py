@@ -1,14 +1,58 @@
 """
 Call Analysis Service - Handles LLM-based call categorization and objection analysis
 """
+import asyncio
 import logging
 import os
-import json
+import time
 from typing import Dict, Any, Optional, List
 from supabase import Client
+from services.transcript_windows import build_windows, estimate_tokens, merge_objections, segments_to_turns
+from services.heuristic_labeler import heuristic_categorize, heuristic_objections
+from services.speaker_roles import CUSTOMER, MIN_ROLE_CONFIDENCE, customer_focused_segments, get_or_resolve_speaker_roles
+from services.prompt_compaction import compact_for_llm, compact_segments
+from services.llm_usage import get_llm_usage_tracker, extract_openai_usage, extract_gemini_usage, get_usage_org
+from services.llm_router import get_llm_router, get_org_enabled_providers
+from services.llm_rate_limiter import get_llm_rate_limiter
+from services.llm_json import CATEGORY_SCHEMA, OBJECTIONS_SCHEMA, OVERCOME_SCHEMA, LLMJSONError, parse_llm_json
+from services.deadline import MIN_STEP_TIMEOUT_SECONDS, get_deadline, has_budget, step_timeout
+from services.local_call_classifier import (
+    get_classifier_agreement_tracker,
+    get_local_classifier,
+    get_local_classifier_threshold,
+    should_audit,
+)
 
 logger = logging.getLogger(__name__)
 
+# Per-call ceilings; a pipeline deadline in context lowers them (services.deadline)
+OPENAI_TIMEOUT_SECONDS = 60
+GEMINI_TIMEOUT_SECONDS = 60
+
+# Gemini models tried in order by the analysis steps; the first one that initializes is used
+GEMINI_ANALYSIS_MODELS = [
+    'gemini-pro',           # Most widely available, stable
+    'gemini-1.0-pro',       # Older but reliable
+    'gemini-1.5-pro',       # More capable, longer context
+    'gemini-1.5-flash',     # Faster, cheaper
+    'gemini-2.0-flash',     # Newer version (if available)
+    'gemini-2.5-flash',     # Newest version (if available)
+]
+
+
+class ObjectionResults(list):
+    """
+    Detected objections (a plain list to callers) that also say whether an LLM
+    produced them: reliable is False for the keyword heuristic or when detection
+    failed, so the analysis is not stamped as current and gets retried.
+    provider is the LLM that answered (None when none did, or windows disagreed).
+    """
+
+    def __init__(self, objections=(), reliable: bool = True, provider: Optional[str] = None):
+        super().__init__(objections)
+        self.reliable = reliable
+        self.provider = provider
+
 
 class CallAnalysisService:
     """Service for analyzing calls using LLM providers"""
@@ -42,39 +86,14 @@ class CallAnalysisService:
         provider: str = "openai"
     ) -> Dict[str, Any]:
         """
-        Categorize a call transcript using LLM.
+        Categorize a call transcript using LLM (or the local classifier tier when
+        it is enabled and confident, see _categorize_with_local_tier).
         Returns both:
         - call_category: consult_not_scheduled, consult_scheduled, other_question (success/failure)
         - call_type: scheduling, pricing, directions, billing, complaint, transfer_to_office, general_question, reschedule, confirming_existing_appointment, cancellation (granular category)
         """
         try:
-            # Priority: Gemini (primary) -> OpenAI (secondary) -> Heuristic (last resort)
-            if provider == "gemini" and self.gemini_key:
-                try:
-                    result = await self._categorize_with_gemini(transcript)
-                except Exception as gemini_error:
-                    logger.warning(f"Gemini categorization failed: {gemini_error}, falling back to OpenAI")
-                    if self.openai_key:
-                        result = await self._categorize_with_openai(transcript)
-                    else:
-                        result = self._categorize_with_heuristic(transcript)
-            elif provider == "openai" and self.openai_key:
-                result = await self._categorize_with_openai(transcript)
-            else:
-                # Auto-select provider: Gemini first, then OpenAI, then heuristic
-                if self.gemini_key:
-                    try:
-                        result = await self._categorize_with_gemini(transcript)
-                    except Exception as gemini_error:
-                        logger.warning(f"Gemini categorization failed: {gemini_error}, falling back to OpenAI")
-                        if self.openai_key:
-                            result = await self._categorize_with_openai(transcript)
-                        else:
-                            result = self._categorize_with_heuristic(transcript)
-                elif self.openai_key:
-                    result = await self._categorize_with_openai(transcript)
-                else:
-                    result = self._categorize_with_heuristic(transcript)
+            result = await self._categorize_with_local_tier(transcript, provider)
 
             # Store categorization in call_records
             # Mark if this is a heuristic result (for frontend display)
@@ -120,44 +139,108 @@ class CallAnalysisService:
             self.supabase.table("call_records").update(update_data).eq("id", call_record_id).execute()
             return result
 
+    async def _categorize_with_local_tier(self, transcript: str, provider: str) -> Dict[str, Any]:
+        """
+        Consult the optional local classifier first. Confident predictions are
+        returned as-is (except for a small audit sample); everything else goes
+        to the LLM chain and the two answers are compared for the agreement metrics.
+        """
+        classifier = get_local_classifier()
+        local = None
+        if classifier:
+            try:
+                local = await asyncio.to_thread(classifier.predict, transcript)
+            except Exception as e:
+                logger.warning(f"⚠️ Local classifier prediction failed, using LLM: {e}")
+
+        tracker = get_classifier_agreement_tracker()
+        has_llm = bool(self.gemini_key or self.openai_key)
+        if local and (not has_llm or (local["confidence"] >= get_local_classifier_threshold() and not should_audit())):
+            tracker.record_route("local_accepted")
+            return {
+                "category": local["category"],
+                "call_type": local["call_type"],
+                "confidence": local["confidence"],
+                "reasoning": (
+                    f"Local classifier {local['model_version']} "
+                    f"(call_type confidence {local['call_type_confidence']}) [LOCAL MODEL]"
+                ),
+            }
+
+        result = await self._categorize_with_providers(self._compact(transcript, "categorize"), provider)
+        if local:
+            tracker.record_route("audited" if local["confidence"] >= get_local_classifier_threshold() else "escalated")
+            if "[HEURISTIC" not in (result.get("reasoning") or ""):
+                tracker.record_comparison(local, result)
+        return result
+
+    async def _categorize_with_providers(self, transcript: str, provider: str) -> Dict[str, Any]:
+        """Providers in router order (see _provider_chain) -> Heuristic (last resort)"""
+        return await self._run_provider_chain(
+            "categorization",
+            provider,
+            {"gemini": self._categorize_with_gemini, "openai": self._categorize_with_openai},
+            lambda: self._categorize_with_heuristic(transcript),
+            transcript,
+            tag=lambda result, name: {**result, "provider": name},
+        )
+
+    def _provider_chain(self, provider: str) -> List[str]:
+        """
+        Providers to try, in order: those with an API key that the current
+        organization has enabled, ordered by the adaptive router (fastest
+        healthy first). An explicitly requested provider stays first while healthy.
+        """
+        available = [p for p, key in (("gemini", self.gemini_key), ("openai", self.openai_key)) if key]
+        enabled = get_org_enabled_providers(self.supabase, get_usage_org())
+        candidates = [p for p in available if p in enabled]
+        return get_llm_router().order(candidates, preferred=provider if provider in candidates else None)
+
+    async def _run_provider_chain(self, operation: str, provider: str, calls: Dict[str, Any], last_resort, *args, tag=None):
+        """
+        Try each provider of the chain in turn; last_resort() when all fail or none
+        is usable. tag(result, provider) marks a provider's result with its name.
+        """
+        if not has_budget(MIN_STEP_TIMEOUT_SECONDS):
+            logger.warning(f"⏱️ No time left for {operation} ({get_deadline()}), using last resort")
+            return last_resort()
+        chain = self._provider_chain(provider)
+        for index, name in enumerate(chain):
+            try:
+                result = await calls[name](*args)
+                return tag(result, name) if tag else result
+            except Exception as provider_error:
+                next_step = chain[index + 1] if index + 1 < len(chain) else "last resort"
+                logger.warning(f"{name} {operation} failed: {provider_error}, falling back to {next_step}")
+        return last_resort()
+
     async def detect_objections(
         self,
         transcript: str,
         call_record_id: str,
-        provider: str = "openai"
+        provider: str = "openai",
+        segments: Optional[List[Dict[str, Any]]] = None
     ) -> List[Dict[str, Any]]:
         """
         Detect objections and misgivings in the call transcript.
+        Long transcripts are analyzed in overlapping speaker-turn windows (see
+        _detect_objections_windowed) instead of being truncated.
         Returns list of objection objects.
         """
         try:
-            # Priority: Gemini (primary) -> OpenAI (secondary) -> Heuristic (last resort)
-            if provider == "gemini" and self.gemini_key:
-                try:
-                    objections = await self._detect_objections_with_gemini(transcript)
-                except Exception as gemini_error:
-                    logger.warning(f"Gemini objection detection failed: {gemini_error}, falling back to OpenAI")
-                    if self.openai_key:
-                        objections = await self._detect_objections_with_openai(transcript)
-                    else:
-                        objections = self._detect_objections_with_heuristic(transcript)
-            elif provider == "openai" and self.openai_key:
-                objections = await self._detect_objections_with_openai(transcript)
+            if segments and (self.gemini_key or self.openai_key):
+                focused = self._customer_focused_segments(call_record_id, segments)
+                if focused:
+                    # Objections come from the caller: send customer turns plus a little agent context
+                    segments = focused
+                    transcript = "\n".join(segments_to_turns(focused))
+                segments = compact_segments(segments)
+            transcript = self._compact(transcript, "objections")
+            token_budget = self._objection_window_budget(provider)
+            if (self.gemini_key or self.openai_key) and estimate_tokens(transcript) > token_budget:
+                objections = await self._detect_objections_windowed(transcript, provider, segments, token_budget)
             else:
-                # Auto-select provider: Gemini first, then OpenAI, then heuristic
-                if self.gemini_key:
-                    try:
-                        objections = await self._detect_objections_with_gemini(transcript)
-                    except Exception as gemini_error:
-                        logger.warning(f"Gemini objection detection failed: {gemini_error}, falling back to OpenAI")
-                        if self.openai_key:
-                            objections = await self._detect_objections_with_openai(transcript)
-                        else:
-                            objections = self._detect_objections_with_heuristic(transcript)
-                elif self.openai_key:
-                    objections = await self._detect_objections_with_openai(transcript)
-                else:
-                    objections = self._detect_objections_with_heuristic(transcript)
+                objections = await self._detect_objections_for_text(transcript, provider)
 
             # Delete existing objections for this call record to prevent duplicates
             logger.info(f"🗑️ Deleting existing objections for call_record {call_record_id} before inserting new ones")
@@ -175,6 +258,12 @@ class CallAnalysisService:
                 for obj in objections
             )
             
+            objections = ObjectionResults(
+                objections,
+                reliable=getattr(objections, "reliable", True) and not is_heuristic,
+                provider=getattr(objections, "provider", None),
+            )
+
             # Store objections in database
             inserted_count = 0
             for objection in objections:
@@ -202,7 +291,96 @@ class CallAnalysisService:
 
         except Exception as e:
             logger.error(f"Error detecting objections for call {call_record_id}: {e}", exc_info=True)
-            return []
+            return ObjectionResults(reliable=False)
+
+    def _customer_focused_segments(
+        self,
+        call_record_id: str,
+        segments: List[Dict[str, Any]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Customer turns (with preceding agent context) when speaker roles are resolved confidently"""
+        try:
+            speaker_roles = get_or_resolve_speaker_roles(self.supabase, call_record_id, segments)
+        except Exception as e:
+            logger.warning(f"⚠️ Speaker role resolution failed for {call_record_id}: {e}")
+            return None
+        if speaker_roles.get("confidence", 0) < MIN_ROLE_CONFIDENCE:
+            return None
+        focused = customer_focused_segments(segments, speaker_roles)
+        if not any(s.get("role") == CUSTOMER for s in focused):
+            return None
+        logger.info(f"🗣️ Objection detection using {len(focused)}/{len(segments)} segments (customer turns + context)")
+        return focused
+
+    def _compact(self, transcript: str, operation: str) -> str:
+        """Compact the transcript before it is embedded in an LLM prompt (heuristics get it as-is)"""
+        if not (self.gemini_key or self.openai_key):
+            return transcript
+        return compact_for_llm(transcript, operation)
+
+    def _record_usage(self, provider: str, operation: str, usage: Dict[str, Optional[int]], started: float):
+        """Record token usage reported by the provider plus call latency"""
+        get_llm_usage_tracker().record_call(
+            provider,
+            operation,
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+            latency_ms=int((time.time() - started) * 1000)
+        )
+
+    async def _detect_objections_for_text(self, transcript: str, provider: str) -> List[Dict[str, Any]]:
+        """Run objection detection for a single piece of text with provider fallback"""
+        # Providers in router order -> Heuristic (last resort)
+        return await self._run_provider_chain(
+            "objection detection",
+            provider,
+            {"gemini": self._detect_objections_with_gemini, "openai": self._detect_objections_with_openai},
+            lambda: self._detect_objections_with_heuristic(transcript),
+            transcript,
+            tag=lambda result, name: ObjectionResults(result, getattr(result, "reliable", True), provider=name),
+        )
+
+    def _objection_window_budget(self, provider: str) -> int:
+        """Token budget per objection-detection window (Gemini accepts larger windows)"""
+        chain = self._provider_chain(provider)
+        if chain and chain[0] == "gemini":
+            return int(os.getenv("OBJECTION_WINDOW_TOKENS_GEMINI", "2000"))
+        return int(os.getenv("OBJECTION_WINDOW_TOKENS_OPENAI", "1000"))
+
+    async def _detect_objections_windowed(
+        self,
+        transcript: str,
+        provider: str,
+        segments: Optional[List[Dict[str, Any]]],
+        token_budget: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Map-reduce objection detection: split the transcript into overlapping
+        speaker-turn windows, analyze the windows in parallel, then merge and
+        deduplicate the results by type and quote.
+        """
+        overlap_turns = int(os.getenv("OBJECTION_WINDOW_OVERLAP_TURNS", "2"))
+        windows = build_windows(transcript, segments, token_budget=token_budget, overlap_turns=overlap_turns)
+        semaphore = asyncio.Semaphore(int(os.getenv("OBJECTION_WINDOW_CONCURRENCY", "4")))
+        print(f"🪟 Windowed objection detection: {len(windows)} windows, budget={token_budget} tokens")
+
+        async def analyze_window(index: int, window: str) -> List[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    return await self._detect_objections_for_text(window, provider)
+                except Exception as window_error:
+                    logger.warning(f"⚠️ Objection detection failed for window {index + 1}/{len(windows)}: {window_error}")
+                    return ObjectionResults(reliable=False)
+
+        window_results = await asyncio.gather(*(analyze_window(i, w) for i, w in enumerate(windows)))
+        objections = merge_objections(window_results)
+        logger.info(f"✅ Merged {sum(len(r) for r in window_results)} window objections into {len(objections)}")
+        providers = {getattr(r, "provider", None) for r in window_results}
+        return ObjectionResults(
+            objections,
+            reliable=all(getattr(r, "reliable", True) for r in window_results),
+            provider=providers.pop() if len(providers) == 1 else None,
+        )
 
     async def analyze_objection_overcome(
         self,
@@ -217,33 +395,16 @@ class CallAnalysisService:
         Uses call_type context to provide more relevant analysis.
         """
         try:
-            # Priority: Gemini (primary) -> OpenAI (secondary) -> Skip (last resort)
-            if provider == "gemini" and self.gemini_key:
-                try:
-                    overcome_details = await self._analyze_overcome_with_gemini(transcript, objections)
-                except Exception as gemini_error:
-                    logger.warning(f"Gemini objection overcome analysis failed: {gemini_error}, falling back to OpenAI")
-                    if self.openai_key:
-                        overcome_details = await self._analyze_overcome_with_openai(transcript, objections)
-                    else:
-                        overcome_details = []
-            elif provider == "openai" and self.openai_key:
-                overcome_details = await self._analyze_overcome_with_openai(transcript, objections)
-            else:
-                # Auto-select provider: Gemini first, then OpenAI, then skip
-                if self.gemini_key:
-                    try:
-                        overcome_details = await self._analyze_overcome_with_gemini(transcript, objections)
-                    except Exception as gemini_error:
-                        logger.warning(f"Gemini objection overcome analysis failed: {gemini_error}, falling back to OpenAI")
-                        if self.openai_key:
-                            overcome_details = await self._analyze_overcome_with_openai(transcript, objections)
-                        else:
-                            overcome_details = []
-                elif self.openai_key:
-                    overcome_details = await self._analyze_overcome_with_openai(transcript, objections)
-                else:
-                    overcome_details = []
+            transcript = self._compact(transcript, "overcome")
+            # Providers in router order -> Skip (last resort)
+            overcome_details = await self._run_provider_chain(
+                "objection overcome analysis",
+                provider,
+                {"gemini": self._analyze_overcome_with_gemini, "openai": self._analyze_overcome_with_openai},
+                lambda: [],
+                transcript,
+                objections,
+            )
 
             # Delete existing objection overcome details for this call record to prevent duplicates
             logger.info(f"🗑️ Deleting existing objection overcome details for call_record {call_record_id} before inserting new ones")
@@ -349,18 +510,23 @@ Transcript:
 
         try:
             logger.debug(f"Calling OpenAI API with model {model_name} for categorization")
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                json=body,
-                headers=headers,
-                timeout=60
-            )
-            response.raise_for_status()
+            await get_llm_rate_limiter().acquire("openai", prompt)
+            started = time.time()
+            with get_llm_router().track("openai", body["model"]):
+                response = await asyncio.to_thread(
+                    requests.post,
+                    "https://api.openai.com/v1/chat/completions",
+                    json=body,
+                    headers=headers,
+                    timeout=step_timeout(OPENAI_TIMEOUT_SECONDS)
+                )
+                response.raise_for_status()
             data = response.json()
+            self._record_usage("openai", "categorize", extract_openai_usage(data), started)
             content = data["choices"][0]["message"]["content"].strip()
             
             try:
-                result = json.loads(content)
+                result = parse_llm_json(content, CATEGORY_SCHEMA, source="openai:categorize")
                 confidence = float(result.get("confidence", 0.8))
                 call_type = result.get("call_type", "general_question")
                 logger.info(f"OpenAI categorization: category={result.get('category')}, call_type={call_type}, confidence={confidence}")
@@ -370,31 +536,15 @@ Transcript:
                     "confidence": confidence,
                     "reasoning": result.get("reasoning", "")
                 }
-            except json.JSONDecodeError as json_error:
+            except LLMJSONError as json_error:
                 logger.warning(f"Failed to parse OpenAI JSON response: {json_error}, content: {content[:200]}")
-                # Fallback parsing - try to extract JSON from response
-                import re
-                json_match = re.search(r'\{[^}]+"category"[^}]+\}', content, re.DOTALL)
-                if json_match:
-                    try:
-                        result = json.loads(json_match.group())
-                        return {
-                            "category": result.get("category", "other_question"),
-                            "call_type": result.get("call_type", "general_question"),
-                            "confidence": float(result.get("confidence", 0.8)),
-                            "reasoning": result.get("reasoning", "")
-                        }
-                    except json.JSONDecodeError:
-                        pass
-                # Final fallback to heuristic
-                logger.warning("Falling back to heuristic categorization")
-                return self._categorize_with_heuristic(transcript)
+                raise Exception("Failed to parse OpenAI JSON response")
         except requests.exceptions.RequestException as e:
             logger.error(f"OpenAI API request failed: {e}", exc_info=True)
-            return self._categorize_with_heuristic(transcript)
+            raise  # Re-raise to trigger fallback to the next provider
         except Exception as e:
             logger.error(f"Unexpected error in OpenAI categorization: {e}", exc_info=True)
-            return self._categorize_with_heuristic(transcript)
+            raise  # Re-raise to trigger fallback to the next provider
 
     async def _categorize_with_gemini(self, transcript: str) -> Dict[str, Any]:
         """Categorize call using Gemini"""
@@ -415,14 +565,7 @@ Transcript:
             # - gemini-2.0-flash (newer, if available)
             # - gemini-2.5-flash (newest, if available)
             model = None
-            model_names = [
-                'gemini-pro',           # Most widely available, stable
-                'gemini-1.0-pro',       # Older but reliable
-                'gemini-1.5-pro',       # More capable, longer context
-                'gemini-1.5-flash',     # Faster, cheaper
-                'gemini-2.0-flash',     # Newer version (if available)
-                'gemini-2.5-flash',     # Newest version (if available)
-            ]
+            model_names = GEMINI_ANALYSIS_MODELS
             last_error = None
             
             for model_name in model_names:
@@ -479,16 +622,24 @@ Transcript:
 """
             
             try:
-                response = model.generate_content(
-                    prompt,
-                    generation_config={
-                        "temperature": 0.2,
-                        "response_mime_type": "application/json"
-                    }
-                )
+                await get_llm_rate_limiter().acquire("gemini", prompt)
+                started = time.time()
+                with get_llm_router().track("gemini", getattr(model, "model_name", None)):
+                    response = await asyncio.to_thread(
+                        model.generate_content,
+                        prompt,
+                        generation_config={
+                            "temperature": 0.2,
+                            "response_mime_type": "application/json"
+                        },
+                        request_options={"timeout": step_timeout(GEMINI_TIMEOUT_SECONDS)}
+                    )
+                self._record_usage("gemini", "categorize", extract_gemini_usage(response), started)
                 
                 try:
-                    result = json.loads(response.text)
+                    result = parse_llm_json(
+                        response.text, CATEGORY_SCHEMA, source="gemini:categorize", fallback_is_provider_call=True
+                    )
                     raw_confidence = result.get("confidence")
                     confidence = float(raw_confidence) if raw_confidence is not None else 0.8
                     call_type = result.get("call_type", "general_question")
@@ -500,18 +651,8 @@ Transcript:
                         "confidence": confidence,
                         "reasoning": result.get("reasoning", "")
                     }
-                except json.JSONDecodeError:
-                    # Try to extract JSON from response if it's wrapped
-                    import re
-                    json_match = re.search(r'\{[^}]+"category"[^}]+\}', response.text, re.DOTALL)
-                    if json_match:
-                        result = json.loads(json_match.group())
-                        return {
-                            "category": result.get("category", "other_question"),
-                            "call_type": result.get("call_type", "general_question"),
-                            "confidence": float(result.get("confidence", 0.8)),
-                            "reasoning": result.get("reasoning", "")
-                        }
+                except LLMJSONError as json_error:
+                    logger.warning(f"Gemini JSON could not be repaired: {json_error}")
                     logger.warning("Failed to parse Gemini JSON response, will raise to trigger OpenAI fallback")
                     raise Exception("Failed to parse Gemini JSON response")
             except Exception as gen_api_error:
@@ -530,64 +671,9 @@ Transcript:
         """Simple heuristic-based categorization (LAST RESORT FALLBACK - not real LLM analysis)"""
         logger.warning(f"⚠️ Using HEURISTIC categorization (LAST RESORT - not real LLM analysis)")
         print(f"⚠️ Using HEURISTIC categorization (LAST RESORT - confidence values are hardcoded)")
-        transcript_lower = transcript.lower()
-        
-        # Keywords for scheduled consult
-        scheduled_keywords = ["schedule", "appointment", "book", "set up", "when can", "available"]
-        scheduled_score = sum(1 for kw in scheduled_keywords if kw in transcript_lower)
-        
-        # Keywords for not scheduled
-        not_scheduled_keywords = ["not interested", "maybe later", "think about it", "not ready"]
-        not_scheduled_score = sum(1 for kw in not_scheduled_keywords if kw in transcript_lower)
-        
-        # Determine call_type from keywords
-        call_type = "general_question"  # Default
-        if "price" in transcript_lower or "cost" in transcript_lower or "payment" in transcript_lower:
-            call_type = "pricing"
-        elif "direction" in transcript_lower or "location" in transcript_lower or "address" in transcript_lower or "where" in transcript_lower:
-            call_type = "directions"
-        elif "bill" in transcript_lower or "invoice" in transcript_lower or "charge" in transcript_lower:
-            call_type = "billing"
-        elif "complaint" in transcript_lower or "problem" in transcript_lower or "issue" in transcript_lower:
-            call_type = "complaint"
-        elif "transfer" in transcript_lower or "connect" in transcript_lower:
-            call_type = "transfer_to_office"
-        elif "reschedule" in transcript_lower or "rescheduling" in transcript_lower:
-            call_type = "reschedule"
-        elif "confirm" in transcript_lower and ("appointment" in transcript_lower or "meeting" in transcript_lower):
-            call_type = "confirming_existing_appointment"
-        elif "cancel" in transcript_lower or "cancellation" in transcript_lower:
-            call_type = "cancellation"
-        elif scheduled_score > 0 or "schedule" in transcript_lower or "appointment" in transcript_lower:
-            call_type = "scheduling"
-        
-        if scheduled_score > 2:
-            result = {
-                "category": "consult_scheduled",
-                "call_type": call_type,
-                "confidence": 0.7,  # HARDCODED - this is a placeholder
-                "reasoning": f"Keywords suggest appointment was scheduled, call_type={call_type} [HEURISTIC - Last Resort]"
-            }
-            logger.warning(f"⚠️ HEURISTIC categorization: category=consult_scheduled, call_type={call_type}, confidence=0.7 (HARDCODED)")
-            return result
-        elif not_scheduled_score > 0:
-            result = {
-                "category": "consult_not_scheduled",
-                "call_type": call_type,
-                "confidence": 0.6,  # HARDCODED - this is a placeholder
-                "reasoning": f"Keywords suggest no appointment scheduled, call_type={call_type} [HEURISTIC - Last Resort]"
-            }
-            logger.warning(f"⚠️ HEURISTIC categorization: category=consult_not_scheduled, call_type={call_type}, confidence=0.6 (HARDCODED)")
-            return result
-        else:
-            result = {
-                "category": "other_question",
-                "call_type": call_type,
-                "confidence": 0.5,  # HARDCODED - this is a placeholder
-                "reasoning": f"Unable to determine category, call_type={call_type} [HEURISTIC - Last Resort]"
-            }
-            logger.warning(f"⚠️ HEURISTIC categorization: category=other_question, call_type={call_type}, confidence=0.5 (HARDCODED)")
-            return result
+        result = heuristic_categorize(transcript)
+        logger.warning(f"⚠️ HEURISTIC categorization: category={result['category']}, call_type={result['call_type']}, confidence={result['confidence']} (HARDCODED)")
+        return result
 
     async def _detect_objections_with_openai(self, transcript: str) -> List[Dict[str, Any]]:
         """Detect objections using OpenAI"""
@@ -613,7 +699,7 @@ Return your response as JSON array with this structure:
 }}
 
 Transcript:
-{transcript[:4000]}
+{transcript}
 """
 
         headers = {
@@ -634,18 +720,23 @@ Transcript:
 
         try:
             logger.debug(f"Calling OpenAI API with model {model_name} for objection detection")
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                json=body,
-                headers=headers,
-                timeout=60
-            )
-            response.raise_for_status()
+            await get_llm_rate_limiter().acquire("openai", prompt)
+            started = time.time()
+            with get_llm_router().track("openai", body["model"]):
+                response = await asyncio.to_thread(
+                    requests.post,
+                    "https://api.openai.com/v1/chat/completions",
+                    json=body,
+                    headers=headers,
+                    timeout=step_timeout(OPENAI_TIMEOUT_SECONDS)
+                )
+                response.raise_for_status()
             data = response.json()
+            self._record_usage("openai", "objections", extract_openai_usage(data), started)
             content = data["choices"][0]["message"]["content"].strip()
             
             try:
-                result = json.loads(content)
+                result = parse_llm_json(content, OBJECTIONS_SCHEMA, source="openai:objections")
                 objections = result.get("objections", [])
                 logger.info(f"✅ OpenAI objection detection successful: found {len(objections)} objections")
                 # Log confidence values from LLM
@@ -653,24 +744,15 @@ Transcript:
                     logger.info(f"📊 OpenAI objection: type={obj.get('type')}, confidence={obj.get('confidence')}, raw_confidence_type={type(obj.get('confidence'))}")
                     print(f"📊 OpenAI objection: type={obj.get('type')}, confidence={obj.get('confidence')}")
                 return objections
-            except json.JSONDecodeError as json_error:
+            except LLMJSONError as json_error:
                 logger.warning(f"Failed to parse OpenAI JSON response: {json_error}, content: {content[:200]}")
-                # Fallback parsing
-                import re
-                json_match = re.search(r'\{"objections":\s*\[[^\]]+\]\}', content, re.DOTALL)
-                if json_match:
-                    try:
-                        result = json.loads(json_match.group())
-                        return result.get("objections", [])
-                    except json.JSONDecodeError:
-                        pass
-                return self._detect_objections_with_heuristic(transcript)
+                raise Exception("Failed to parse OpenAI JSON response")
         except requests.exceptions.RequestException as e:
             logger.error(f"OpenAI API request failed: {e}", exc_info=True)
-            return self._detect_objections_with_heuristic(transcript)
+            raise  # Re-raise to trigger fallback to the next provider
         except Exception as e:
             logger.error(f"Unexpected error in OpenAI objection detection: {e}", exc_info=True)
-            return self._detect_objections_with_heuristic(transcript)
+            raise  # Re-raise to trigger fallback to the next provider
 
     async def _detect_objections_with_gemini(self, transcript: str) -> List[Dict[str, Any]]:
         """Detect objections using Gemini"""
@@ -691,14 +773,7 @@ Transcript:
             # - gemini-2.0-flash (newer, if available)
             # - gemini-2.5-flash (newest, if available)
             model = None
-            model_names = [
-                'gemini-pro',           # Most widely available, stable
-                'gemini-1.0-pro',       # Older but reliable
-                'gemini-1.5-pro',       # More capable, longer context
-                'gemini-1.5-flash',     # Faster, cheaper
-                'gemini-2.0-flash',     # Newer version (if available)
-                'gemini-2.5-flash',     # Newest version (if available)
-            ]
+            model_names = GEMINI_ANALYSIS_MODELS
             last_error = None
             
             for model_name in model_names:
@@ -732,20 +807,28 @@ Return your response as JSON with this structure:
 }}
 
 Transcript:
-{transcript[:8000]}
+{transcript}
 """
             
             try:
-                response = model.generate_content(
-                    prompt,
-                    generation_config={
-                        "temperature": 0.2,
-                        "response_mime_type": "application/json"
-                    }
-                )
+                await get_llm_rate_limiter().acquire("gemini", prompt)
+                started = time.time()
+                with get_llm_router().track("gemini", getattr(model, "model_name", None)):
+                    response = await asyncio.to_thread(
+                        model.generate_content,
+                        prompt,
+                        generation_config={
+                            "temperature": 0.2,
+                            "response_mime_type": "application/json"
+                        },
+                        request_options={"timeout": step_timeout(GEMINI_TIMEOUT_SECONDS)}
+                    )
+                self._record_usage("gemini", "objections", extract_gemini_usage(response), started)
                 
                 try:
-                    result = json.loads(response.text)
+                    result = parse_llm_json(
+                        response.text, OBJECTIONS_SCHEMA, source="gemini:objections", fallback_is_provider_call=True
+                    )
                     objections = result.get("objections", [])
                     logger.info(f"✅ Gemini objection detection successful: found {len(objections)} objections")
                     # Log confidence values from LLM
@@ -753,13 +836,8 @@ Transcript:
                         logger.info(f"📊 Gemini objection: type={obj.get('type')}, confidence={obj.get('confidence')}, raw_confidence_type={type(obj.get('confidence'))}")
                         print(f"📊 Gemini objection: type={obj.get('type')}, confidence={obj.get('confidence')}")
                     return objections
-                except json.JSONDecodeError:
-                    # Try to extract JSON from response
-                    import re
-                    json_match = re.search(r'\{"objections":\s*\[[^\]]+\]\}', response.text, re.DOTALL)
-                    if json_match:
-                        result = json.loads(json_match.group())
-                        return result.get("objections", [])
+                except LLMJSONError as json_error:
+                    logger.warning(f"Gemini JSON could not be repaired: {json_error}")
                     logger.warning("Failed to parse Gemini JSON response, will raise to trigger OpenAI fallback")
                     raise Exception("Failed to parse Gemini JSON response")
             except Exception as gen_api_error:
@@ -778,28 +856,10 @@ Transcript:
         """Simple heuristic-based objection detection (FALLBACK - not real LLM analysis)"""
         logger.warning(f"⚠️ Using HEURISTIC objection detection (not real LLM analysis) - this is a fallback method")
         print(f"⚠️ Using HEURISTIC objection detection (not real LLM analysis) - confidence values are hardcoded to 0.6")
-        objections = []
-        transcript_lower = transcript.lower()
-        
-        # Simple pattern matching
-        objection_patterns = {
-            "cost-value": ["expensive", "cost", "price", "afford", "budget"],
-            "timing": ["not ready", "later", "think about it", "too soon"],
-            "safety-risk": ["safe", "risk", "dangerous", "worried", "concerned"],
-        }
-        
-        for obj_type, keywords in objection_patterns.items():
-            matches = [kw for kw in keywords if kw in transcript_lower]
-            if matches:
-                objections.append({
-                    "type": obj_type,
-                    "text": f"Objection related to {obj_type}",
-                    "confidence": 0.6,  # HARDCODED - this is a placeholder
-                    "segment": "Heuristic detection"
-                })
-                logger.warning(f"⚠️ HEURISTIC objection detected: type={obj_type}, confidence=0.6 (HARDCODED)")
-        
-        return objections
+        objections = heuristic_objections(transcript)
+        for objection in objections:
+            logger.warning(f"⚠️ HEURISTIC objection detected: type={objection['type']}, keywords={objection['keywords']}, confidence=0.6 (HARDCODED)")
+        return ObjectionResults(objections, reliable=False)
 
     async def _analyze_overcome_with_openai(
         self,
@@ -851,20 +911,25 @@ Transcript:
             "response_format": {"type": "json_object"}
         }
 
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            json=body,
-            headers=headers,
-            timeout=60
-        )
-        response.raise_for_status()
+        await get_llm_rate_limiter().acquire("openai", prompt)
+        started = time.time()
+        with get_llm_router().track("openai", body["model"]):
+            response = await asyncio.to_thread(
+                requests.post,
+                "https://api.openai.com/v1/chat/completions",
+                json=body,
+                headers=headers,
+                timeout=step_timeout(OPENAI_TIMEOUT_SECONDS)
+            )
+            response.raise_for_status()
         data = response.json()
+        self._record_usage("openai", "overcome", extract_openai_usage(data), started)
         content = data["choices"][0]["message"]["content"].strip()
         
         try:
-            result = json.loads(content)
+            result = parse_llm_json(content, OVERCOME_SCHEMA, source="openai:overcome")
             return result.get("overcome_details", [])
-        except json.JSONDecodeError:
+        except LLMJSONError:
             return []
 
     async def _analyze_overcome_with_gemini(
@@ -893,14 +958,7 @@ Transcript:
             # - gemini-2.0-flash (newer, if available)
             # - gemini-2.5-flash (newest, if available)
             model = None
-            model_names = [
-                'gemini-pro',           # Most widely available, stable
-                'gemini-1.0-pro',       # Older but reliable
-                'gemini-1.5-pro',       # More capable, longer context
-                'gemini-1.5-flash',     # Faster, cheaper
-                'gemini-2.0-flash',     # Newer version (if available)
-                'gemini-2.5-flash',     # Newest version (if available)
-            ]
+            model_names = GEMINI_ANALYSIS_MODELS
             last_error = None
             
             for model_name in model_names:
@@ -946,26 +1004,29 @@ Transcript:
 """
             
             try:
-                response = model.generate_content(
-                    prompt,
-                    generation_config={
-                        "temperature": 0.2,
-                        "response_mime_type": "application/json"
-                    }
-                )
+                await get_llm_rate_limiter().acquire("gemini", prompt)
+                started = time.time()
+                with get_llm_router().track("gemini", getattr(model, "model_name", None)):
+                    response = await asyncio.to_thread(
+                        model.generate_content,
+                        prompt,
+                        generation_config={
+                            "temperature": 0.2,
+                            "response_mime_type": "application/json"
+                        },
+                        request_options={"timeout": step_timeout(GEMINI_TIMEOUT_SECONDS)}
+                    )
+                self._record_usage("gemini", "overcome", extract_gemini_usage(response), started)
                 
                 try:
-                    result = json.loads(response.text)
+                    result = parse_llm_json(
+                        response.text, OVERCOME_SCHEMA, source="gemini:overcome", fallback_is_provider_call=True
+                    )
                     overcome_details = result.get("overcome_details", [])
                     logger.info(f"✅ Gemini objection overcome analysis successful: found {len(overcome_details)} overcome details")
                     return overcome_details
-                except json.JSONDecodeError:
-                    # Try to extract JSON from response
-                    import re
-                    json_match = re.search(r'\{"overcome_details":\s*\[[^\]]+\]\}', response.text, re.DOTALL)
-                    if json_match:
-                        result = json.loads(json_match.group())
-                        return result.get("overcome_details", [])
+                except LLMJSONError as json_error:
+                    logger.warning(f"Gemini JSON could not be repaired: {json_error}")
                     logger.warning("Failed to parse Gemini JSON response, will raise to trigger OpenAI fallback")
                     raise Exception("Failed to parse Gemini JSON response")
             except Exception as gen_api_error:
@@ -0,0 +1,195 @@
+"""
+Completion Registry - Tells the bulk importer when a file's pipeline has finished
+The importer used to poll bulk_import_files and call_records every few seconds
+per file until transcription and analysis were done. Now it registers the file
+before starting the transcription thread and awaits its completion; the
+pipeline resolves it when analysis finishes or anything fails along the way.
+
+In-process the signal is a concurrent.futures.Future (the pipeline runs in a
+plain thread, the importer on the event loop). When the pipeline may run in
+another process, a Redis list per file carries the outcome across processes
+(COMPLETION_BACKEND=redis, or REDIS_URL set): the pipeline pushes, the waiter
+blocks on BLPOP. A push that lands before anyone waits is kept until it expires.
+BLPOP runs in short slices on a small dedicated thread pool, so waits that end
+early free their thread within a slice and never hold up the default executor
+that LLM, upload and Supabase calls share.
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+COMPLETED = "completed"
+FAILED = "failed"
+
+# How long an unclaimed outcome stays in Redis (seconds)
+OUTCOME_TTL_SECONDS = 3600
+# Longest single BLPOP; between slices the waiter checks whether it is still needed
+SHARED_WAIT_SLICE_SECONDS = 1
+# Threads blocked on the shared backend at once (waits beyond this queue)
+COMPLETION_WAIT_THREADS = int(os.getenv("COMPLETION_WAIT_THREADS", "8"))
+
+
+class RedisCompletionBackend:
+    """Outcomes in one short-lived Redis list per file (shared across processes)"""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._client.ping()
+
+    @staticmethod
+    def _key(key: str) -> str:
+        return f"completion:{key}"
+
+    def publish(self, key: str, outcome: Dict[str, Any]):
+        pipe = self._client.pipeline()
+        pipe.rpush(self._key(key), json.dumps(outcome))
+        pipe.expire(self._key(key), OUTCOME_TTL_SECONDS)
+        pipe.execute()
+
+    def clear(self, key: str):
+        self._client.delete(self._key(key))
+
+    def wait(self, key: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Block until an outcome is pushed (None on timeout)"""
+        item = self._client.blpop(self._key(key), timeout=max(1, int(timeout)))
+        return json.loads(item[1]) if item else None
+
+
+class CompletionRegistry:
+    """Pending pipeline completions of this process, plus the optional shared backend"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._pending: Dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+
+    def expect(self, key: str):
+        """
+        Register a completion before starting the work that will resolve it.
+        Drops an unclaimed shared outcome from an earlier run of the same key.
+        """
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending[key] = concurrent.futures.Future()
+        if self.backend is not None:
+            try:
+                self.backend.clear(key)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not clear stale completion for {key}: {e}")
+
+    def resolve(self, key: str, status: str, error: Optional[str] = None, persisted: bool = True):
+        """
+        Report the outcome. The first resolution wins; later ones (a fallback
+        after the real outcome) are ignored. persisted=False tells the waiter
+        the status has not been written to the database yet.
+        """
+        if not key:
+            return
+        outcome = {"status": status, "error": error, "persisted": persisted}
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                if future.done():
+                    return
+                future.set_result(outcome)
+        if self.backend is not None:
+            try:
+                self.backend.publish(key, outcome)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not publish completion for {key}: {e}")
+
+    async def wait(self, key: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """The outcome of a registered completion, or None when it did not arrive in time"""
+        self.expect(key)
+        future = self._pending[key]
+        waiters = {asyncio.wrap_future(future)}
+        loop = asyncio.get_running_loop()
+        stop = threading.Event()
+        if self.backend is not None:
+            waiters.add(asyncio.ensure_future(
+                loop.run_in_executor(_get_wait_executor(), self._wait_shared, key, timeout, stop)
+            ))
+        give_up_at = loop.time() + timeout
+        try:
+            while waiters:
+                remaining = give_up_at - loop.time()
+                if remaining <= 0:
+                    return None
+                done, waiters = await asyncio.wait(waiters, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result() is not None:
+                        return task.result()
+            return None
+        finally:
+            stop.set()
+            for task in waiters:
+                task.cancel()
+            with self._lock:
+                if self._pending.get(key) is future:
+                    del self._pending[key]
+
+    def _wait_shared(self, key: str, timeout: float, stop: threading.Event) -> Optional[Dict[str, Any]]:
+        """BLPOP in short slices until an outcome arrives, the wait is over (stop) or time runs out"""
+        give_up_at = time.monotonic() + timeout
+        while not stop.is_set():
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                return None
+            outcome = self.backend.wait(key, min(remaining, SHARED_WAIT_SLICE_SECONDS))
+            if outcome is not None:
+                return outcome
+        return None
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+
+_completion_registry: Optional[CompletionRegistry] = None
+_registry_lock = threading.Lock()
+_wait_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+
+def _get_wait_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _wait_executor
+    with _registry_lock:
+        if _wait_executor is None:
+            _wait_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=COMPLETION_WAIT_THREADS, thread_name_prefix="completion-wait"
+            )
+    return _wait_executor
+
+
+def _build_backend():
+    choice = os.getenv("COMPLETION_BACKEND", "").lower()
+    redis_url = os.getenv("COMPLETION_REDIS_URL") or os.getenv("REDIS_URL")
+    if choice == "redis" or (not choice and redis_url):
+        try:
+            return RedisCompletionBackend(redis_url or "redis://localhost:6379/0")
+        except Exception as e:
+            logger.warning(f"⚠️ Redis completion backend unavailable ({e}), completions are in-process only")
+    return None
+
+
+def get_completion_registry() -> CompletionRegistry:
+    """Get the process-wide completion registry"""
+    global _completion_registry
+    # Resolved from transcription threads as well as the event loop
+    with _registry_lock:
+        if _completion_registry is None:
+            _completion_registry = CompletionRegistry(_build_backend())
+            backend = _completion_registry.backend.name if _completion_registry.backend else "in-process"
+            logger.info(f"🔔 Completion registry using {backend} signalling")
+    return _completion_registry
@@ -0,0 +1,124 @@
+"""
+Deadline - One time budget for a call's whole transcription/analysis pipeline
+Each stage used to carry its own fixed timeout (60 s per OpenAI call, 120 s
+per follow-up call, 600 s for the bulk import wait loop ...), so a call that
+hit every timeout could take many minutes before failing. A Deadline is
+created when a job starts and travels with the work in a ContextVar (copied
+into asyncio tasks and asyncio.to_thread; passed explicitly to plain
+threads). Each step sizes its timeout from what is left of the budget, and
+optional steps (objection overcome analysis) are skipped when too little
+time remains.
+
+Without a deadline in context every helper returns the step's own default,
+so code paths that never start one behave as before.
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Whole pipeline for one call: transcription, analysis and follow-up generation
+PIPELINE_DEADLINE_SECONDS = float(os.getenv("PIPELINE_DEADLINE_SECONDS", "600"))
+# Interactive endpoints (analysis summary, follow-up generation)
+INTERACTIVE_DEADLINE_SECONDS = float(os.getenv("INTERACTIVE_DEADLINE_SECONDS", "120"))
+# Overcome analysis is skipped with less than this left
+OVERCOME_MIN_BUDGET_SECONDS = float(os.getenv("OVERCOME_MIN_BUDGET_SECONDS", "30"))
+# Never hand a request less than this, a near-zero timeout only wastes the call
+MIN_STEP_TIMEOUT_SECONDS = 1.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """The pipeline's time budget is used up"""
+
+
+class Deadline:
+    """Absolute point in time (monotonic clock) by which the work must be done"""
+
+    def __init__(self, seconds: float, label: str = "pipeline"):
+        self.label = label
+        self.budget = float(seconds)
+        self.started = time.monotonic()
+        self.expires_at = self.started + self.budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, default: float) -> float:
+        """The step's own timeout, capped at what is left; raises once the budget is gone"""
+        remaining = self.remaining()
+        if remaining < MIN_STEP_TIMEOUT_SECONDS:
+            raise DeadlineExceeded(f"{self.label} deadline of {self.budget:.0f}s exceeded")
+        return min(float(default), remaining)
+
+    def allows(self, seconds: float) -> bool:
+        """Whether at least `seconds` of the budget are left"""
+        return self.remaining() >= seconds
+
+    def __repr__(self) -> str:
+        return f"Deadline({self.label}, {self.remaining():.1f}s of {self.budget:.0f}s left)"
+
+
+_deadline: ContextVar[Optional[Deadline]] = ContextVar("pipeline_deadline", default=None)
+
+
+def get_deadline() -> Optional[Deadline]:
+    return _deadline.get()
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float] = None, label: str = "pipeline",
+                   deadline: Optional[Deadline] = None) -> Iterator[Deadline]:
+    """
+    Run the block under a deadline: the given one, else a new one of `seconds`.
+    An enclosing deadline that expires earlier stays in force, so nested
+    scopes can only shorten the budget.
+    """
+    current = _deadline.get()
+    if deadline is None:
+        deadline = Deadline(PIPELINE_DEADLINE_SECONDS if seconds is None else seconds, label)
+    if current is not None and current.expires_at <= deadline.expires_at:
+        yield current
+        return
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def start_deadline(seconds: float, label: str = "request") -> Deadline:
+    """
+    Put the current context (one request, one background pipeline) under a
+    deadline, unless an earlier one is already in force. Like set_usage_org,
+    this is meant for entry points whose context ends with the request.
+    """
+    current = _deadline.get()
+    deadline = Deadline(seconds, label)
+    if current is not None and current.expires_at <= deadline.expires_at:
+        return current
+    _deadline.set(deadline)
+    return deadline
+
+
+def step_timeout(default: float) -> float:
+    """Timeout for one step: its default, capped by the current deadline if any"""
+    deadline = _deadline.get()
+    return float(default) if deadline is None else deadline.timeout(default)
+
+
+def has_budget(seconds: float) -> bool:
+    """False when the current deadline has less than `seconds` left (always True without one)"""
+    deadline = _deadline.get()
+    return deadline is None or deadline.allows(seconds)
@@ -0,0 +1,135 @@
+"""
+Heuristic Labeler - Keyword-based call categorization and objection detection
+Last-resort labels used when no LLM provider is available. All keyword lists
+share one matcher: each distinct keyword is looked up once per transcript
+(one str.find), and categorization and objections read the same hits.
+"""
+
+import logging
+from typing import Dict, Any, List, Optional
+
+from services.keyword_matcher import KeywordMatcher, KeywordScan
+
+logger = logging.getLogger(__name__)
+
+# Keywords for scheduled / not scheduled consults
+SCHEDULED_KEYWORDS = ["schedule", "appointment", "book", "set up", "when can", "available"]
+NOT_SCHEDULED_KEYWORDS = ["not interested", "maybe later", "think about it", "not ready"]
+
+# call_type cues, checked in this order (first match wins)
+CALL_TYPE_KEYWORDS = {
+    "pricing": ["price", "cost", "payment"],
+    "directions": ["direction", "location", "address", "where"],
+    "billing": ["bill", "invoice", "charge"],
+    "complaint": ["complaint", "problem", "issue"],
+    "transfer_to_office": ["transfer", "connect"],
+    "reschedule": ["reschedule", "rescheduling"],
+    "confirm": ["confirm"],
+    "confirm_subject": ["appointment", "meeting"],
+    "cancellation": ["cancel", "cancellation"],
+}
+
+OBJECTION_PATTERNS = {
+    "cost-value": ["expensive", "cost", "price", "afford", "budget"],
+    "timing": ["not ready", "later", "think about it", "too soon"],
+    "safety-risk": ["safe", "risk", "dangerous", "worried", "concerned"],
+}
+
+_groups: Dict[str, List[str]] = {"scheduled": SCHEDULED_KEYWORDS, "not_scheduled": NOT_SCHEDULED_KEYWORDS}
+_groups.update({f"call_type:{name}": kws for name, kws in CALL_TYPE_KEYWORDS.items()})
+_groups.update({f"objection:{name}": kws for name, kws in OBJECTION_PATTERNS.items()})
+HEURISTIC_MATCHER = KeywordMatcher(_groups)
+
+# Characters of context kept around an objection keyword for transcript_segment
+SEGMENT_CONTEXT_CHARS = 80
+
+
+def scan_transcript(transcript: str) -> KeywordScan:
+    return HEURISTIC_MATCHER.scan(transcript or "")
+
+
+def heuristic_categorize(transcript: str, scan: Optional[KeywordScan] = None) -> Dict[str, Any]:
+    """Category/call_type from keyword hits; confidences are fixed placeholders"""
+    scan = scan or scan_transcript(transcript)
+    scheduled_score = len(scan.group_keywords("scheduled"))
+    not_scheduled_score = len(scan.group_keywords("not_scheduled"))
+
+    def cue(name: str) -> bool:
+        return bool(scan.group_keywords(f"call_type:{name}"))
+
+    call_type = "general_question"  # Default
+    if cue("pricing"):
+        call_type = "pricing"
+    elif cue("directions"):
+        call_type = "directions"
+    elif cue("billing"):
+        call_type = "billing"
+    elif cue("complaint"):
+        call_type = "complaint"
+    elif cue("transfer_to_office"):
+        call_type = "transfer_to_office"
+    elif cue("reschedule"):
+        call_type = "reschedule"
+    elif cue("confirm") and cue("confirm_subject"):
+        call_type = "confirming_existing_appointment"
+    elif cue("cancellation"):
+        call_type = "cancellation"
+    elif scheduled_score > 0:
+        call_type = "scheduling"
+
+    if scheduled_score > 2:
+        return {
+            "category": "consult_scheduled",
+            "call_type": call_type,
+            "confidence": 0.7,  # HARDCODED - this is a placeholder
+            "reasoning": f"Keywords suggest appointment was scheduled, call_type={call_type} [HEURISTIC - Last Resort]"
+        }
+    if not_scheduled_score > 0:
+        return {
+            "category": "consult_not_scheduled",
+            "call_type": call_type,
+            "confidence": 0.6,  # HARDCODED - this is a placeholder
+            "reasoning": f"Keywords suggest no appointment scheduled, call_type={call_type} [HEURISTIC - Last Resort]"
+        }
+    return {
+        "category": "other_question",
+        "call_type": call_type,
+        "confidence": 0.5,  # HARDCODED - this is a placeholder
+        "reasoning": f"Unable to determine category, call_type={call_type} [HEURISTIC - Last Resort]"
+    }
+
+
+def heuristic_objections(transcript: str, scan: Optional[KeywordScan] = None) -> List[Dict[str, Any]]:
+    """One objection per matched type, with the text around the first hit as its segment"""
+    scan = scan or scan_transcript(transcript)
+    objections = []
+    for obj_type in OBJECTION_PATTERNS:
+        hit = scan.first_hit(f"objection:{obj_type}")
+        if not hit:
+            continue
+        start = max(0, hit["start"] - SEGMENT_CONTEXT_CHARS)
+        end = min(len(transcript), hit["end"] + SEGMENT_CONTEXT_CHARS)
+        segment = transcript[start:end].strip()
+        objections.append({
+            "type": obj_type,
+            "text": f"Objection related to {obj_type}",
+            "confidence": 0.6,  # HARDCODED - this is a placeholder
+            "segment": segment or "Heuristic detection",
+            "keywords": scan.group_keywords(f"objection:{obj_type}"),
+        })
+    return objections
+
+
+def label_transcripts(transcripts: List[str]) -> List[Dict[str, Any]]:
+    """
+    Batch heuristic labels: the keyword hits of each transcript feed both categorization
+    and objection detection. Returns one result per input, in order.
+    """
+    results = []
+    for transcript in transcripts:
+        scan = scan_transcript(transcript)
+        result = heuristic_categorize(transcript, scan)
+        result["objections"] = heuristic_objections(transcript or "", scan)
+        results.append(result)
+    logger.info(f"🏷️ Heuristically labeled {len(results)} transcripts")
+    return results
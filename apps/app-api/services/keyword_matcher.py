@@ -0,0 +1,81 @@
+"""
+Keyword Matcher - Shared multi-keyword matching
+Resolves keyword groups once at construction so several heuristics can share
+the hits for a transcript. Each distinct keyword is looked up with one
+str.find (faster than a combined regex here), giving its first occurrence,
+position and groups; later occurrences are not reported. Matching is plain
+substring matching, same as `kw in text`.
+"""
+
+import logging
+from typing import Dict, Any, List, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordMatcher:
+    """
+    Matcher for a fixed set of lower-case keywords.
+
+    A keyword may belong to several groups (e.g. "cost" is both a pricing
+    cue and a cost-value objection); hits carry every group of the keyword.
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        self.groups: Dict[str, List[str]] = {name: [kw.lower() for kw in kws] for name, kws in groups.items()}
+        self.keyword_groups: Dict[str, List[str]] = {}
+        for name, keywords in self.groups.items():
+            for keyword in keywords:
+                self.keyword_groups.setdefault(keyword, [])
+                if name not in self.keyword_groups[keyword]:
+                    self.keyword_groups[keyword].append(name)
+        self._keywords = sorted(self.keyword_groups, key=len, reverse=True)
+
+    def first_hits(self, text: str, lowered: bool = False) -> List[Dict[str, Any]]:
+        """
+        First occurrence of each distinct keyword, ordered by position.
+        For presence checks CPython's substring search beats any sre pattern, so
+        this uses one str.find per keyword (each stops at its first hit).
+        """
+        if not text:
+            return []
+        haystack = text if lowered else text.lower()
+        hits = []
+        for keyword in self._keywords:
+            start = haystack.find(keyword)
+            if start != -1:
+                hits.append({
+                    "keyword": keyword,
+                    "groups": self.keyword_groups[keyword],
+                    "start": start,
+                    "end": start + len(keyword),
+                })
+        hits.sort(key=lambda h: (h["start"], -len(h["keyword"])))
+        return hits
+
+    def scan(self, text: str) -> "KeywordScan":
+        """First hit of each keyword (one find per keyword) for the heuristics"""
+        return KeywordScan(self, self.first_hits(text))
+
+
+class KeywordScan:
+    """First hit per keyword for one text, plus cheap lookups used by the heuristics"""
+
+    def __init__(self, matcher: KeywordMatcher, hits: List[Dict[str, Any]]):
+        self.matcher = matcher
+        self.hits = hits
+        self.keywords = {hit["keyword"] for hit in hits}
+
+    def has(self, *keywords: str) -> bool:
+        """True when any of the keywords occurs"""
+        return any(kw in self.keywords for kw in keywords)
+
+    def group_keywords(self, group: str) -> List[str]:
+        """Distinct keywords of a group that occur, in the group's declared order"""
+        return [kw for kw in self.matcher.groups.get(group, []) if kw in self.keywords]
+
+    def first_hit(self, group: str) -> Optional[Dict[str, Any]]:
+        for hit in self.hits:
+            if group in hit["groups"]:
+                return hit
+        return None
@@ -0,0 +1,90 @@
+"""
+LLM Gemini - Plain text generation with Gemini for the API endpoints
+Shared by /analyze and the follow-up plan generators. The model is picked
+first (the preferred model the key lists, or the first preferred name that
+exists); those lookups are neither rate limited nor tracked, so a retired
+model name is not a provider failure. The one generate call then goes
+through the LLM rate limiter, is tracked by the provider router and records
+token usage under `operation`. Synchronous: async callers run it in a thread.
+"""
+
+import logging
+import os
+import time
+
+from services.deadline import step_timeout
+from services.llm_rate_limiter import get_llm_rate_limiter
+from services.llm_router import get_llm_router
+from services.llm_usage import extract_gemini_usage, get_llm_usage_tracker
+
+logger = logging.getLogger(__name__)
+
+# Per-call ceiling; a deadline in context lowers it
+GEMINI_TEXT_TIMEOUT_SECONDS = 120
+
+# Preferred order; any other model the key lists comes after these
+PREFERRED_MODELS = [
+    'gemini-2.5-flash',
+    'gemini-2.0-flash',
+    'gemini-2.5-pro',
+]
+
+
+def _pick_model(genai) -> str:
+    """Name of the model to generate with (untracked lookups, unusable names are skipped)"""
+    try:
+        listed = [m.name.split('/')[-1] for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
+        logger.info(f"Found {len(listed)} available Gemini models: {listed[:5]}")
+    except Exception as e:
+        logger.warning(f"Could not list available models: {e}, checking preferred models")
+        listed = []
+    if listed:
+        return next((name for name in PREFERRED_MODELS if name in listed), listed[0])
+
+    last_error = None
+    for name in PREFERRED_MODELS:
+        try:
+            genai.get_model(f"models/{name}")
+            return name
+        except Exception as e:
+            logger.debug(f"Gemini model {name} unavailable: {e}")
+            last_error = e
+    raise Exception(f"All Gemini models failed. No usable model, last error: {last_error}")
+
+
+def generate_with_gemini(prompt: str, operation: str, timeout_seconds: float = GEMINI_TEXT_TIMEOUT_SECONDS) -> str:
+    """Generate text for a prompt with Gemini (operation labels the call in usage metrics)"""
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        raise ValueError("google-generativeai package not installed")
+
+    gemini_key = (
+        os.getenv("GEMINI_API_KEY") or
+        os.getenv("GOOGLE_API_KEY") or
+        os.getenv("GOOGLE_SERVICES_API_KEY")
+    )
+    if not gemini_key:
+        raise ValueError("Gemini API key not found")
+
+    genai.configure(api_key=gemini_key)
+
+    model_name = _pick_model(genai)
+    model = genai.GenerativeModel(model_name)
+    get_llm_rate_limiter().acquire_sync("gemini", prompt)
+    started = time.time()
+    with get_llm_router().track("gemini", model_name):
+        response = model.generate_content(
+            prompt,
+            generation_config={"temperature": 0.2},
+            request_options={"timeout": step_timeout(timeout_seconds)}
+        )
+    usage = extract_gemini_usage(response)
+    get_llm_usage_tracker().record_call(
+        "gemini",
+        operation,
+        prompt_tokens=usage["prompt_tokens"],
+        completion_tokens=usage["completion_tokens"],
+        latency_ms=int((time.time() - started) * 1000)
+    )
+    return response.text.strip()
@@ -0,0 +1,175 @@
+"""
+LLM Hedging - Race a second provider when the first is slow (interactive endpoints)
+If the first provider has not answered within its rolling latency percentile
+(from the LLM router), the same prompt is sent to the second provider and
+whichever answer arrives first wins; the other task is cancelled. A provider
+that fails before the hedge delay falls through to the second provider
+immediately, like the plain fallback chain.
+
+Opt-in with LLM_HEDGING_ENABLED (optionally limited to the organizations in
+LLM_HEDGING_ORGS). Each organization may hedge at most LLM_HEDGE_MAX_RATE of
+its requests over a rolling window, so hedging cannot double an org's spend.
+
+Provider calls that run in worker threads cannot be interrupted: a cancelled
+loser's HTTP request finishes in the background and its result is dropped.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from services.llm_router import get_llm_router
+
+logger = logging.getLogger(__name__)
+
+ANY_ORG = "_all"
+
+
+class LLMHedger:
+    """Hedge policy, per-org hedge budget and counters for this worker"""
+
+    def __init__(self):
+        self.enabled = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+        orgs = os.getenv("LLM_HEDGING_ORGS", "")
+        self.orgs = {o.strip() for o in orgs.split(",") if o.strip()}
+        self.percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+        self.min_delay_ms = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "500"))
+        # Used until the router has latency samples for the first provider
+        self.default_delay_ms = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_MS", "8000"))
+        self.max_rate = float(os.getenv("LLM_HEDGE_MAX_RATE", "0.1"))
+        self.rate_window_seconds = float(os.getenv("LLM_HEDGE_RATE_WINDOW_SECONDS", "300"))
+        self._requests: Dict[str, deque] = {}
+        self._hedges: Dict[str, deque] = {}
+        self._counters = {"requests": 0, "hedged": 0, "hedge_wins": 0, "capped": 0}
+        self._lock = threading.Lock()
+
+    def enabled_for(self, org_id: Optional[str]) -> bool:
+        return self.enabled and (not self.orgs or (org_id or "") in self.orgs)
+
+    def hedge_delay(self, provider: str) -> float:
+        """Seconds to wait for the first provider before hedging"""
+        latency = get_llm_router().latency_percentile(provider, self.percentile)
+        delay_ms = latency if latency is not None else self.default_delay_ms
+        return max(self.min_delay_ms, delay_ms) / 1000
+
+    @staticmethod
+    def _trim(window: deque, cutoff: float):
+        while window and window[0] < cutoff:
+            window.popleft()
+
+    def _note_request(self, org_id: Optional[str]):
+        now = time.time()
+        with self._lock:
+            self._counters["requests"] += 1
+            self._requests.setdefault(org_id or ANY_ORG, deque()).append(now)
+
+    def _try_reserve_hedge(self, org_id: Optional[str]) -> bool:
+        """Take one hedge from the org's budget (max_rate of its requests in the window)"""
+        now = time.time()
+        key = org_id or ANY_ORG
+        with self._lock:
+            requests = self._requests.setdefault(key, deque())
+            hedges = self._hedges.setdefault(key, deque())
+            cutoff = now - self.rate_window_seconds
+            self._trim(requests, cutoff)
+            self._trim(hedges, cutoff)
+            if len(hedges) >= self.max_rate * len(requests):
+                self._counters["capped"] += 1
+                return False
+            hedges.append(now)
+            self._counters["hedged"] += 1
+            return True
+
+    async def call(
+        self,
+        org_id: Optional[str],
+        primary: str,
+        secondary: Optional[str],
+        run: Callable[[str], Awaitable[Any]],
+    ) -> Tuple[str, Any]:
+        """
+        run(provider) with primary, hedged with secondary when primary is slow.
+        Returns (provider that answered, result); raises the last error when
+        every provider tried failed.
+        """
+        if not secondary or not self.enabled_for(org_id):
+            return primary, await run(primary)
+
+        self._note_request(org_id)
+        first = asyncio.ensure_future(run(primary))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_delay(primary))
+        if done:
+            try:
+                return primary, first.result()
+            except Exception as primary_error:
+                logger.warning(f"{primary} failed before hedge delay: {primary_error}, trying {secondary}")
+                return secondary, await run(secondary)
+
+        if not self._try_reserve_hedge(org_id):
+            logger.info(f"⏳ {primary} is slow but org {org_id} is at its hedge cap, waiting")
+            try:
+                return primary, await first
+            except Exception as primary_error:
+                logger.warning(f"{primary} failed at hedge cap: {primary_error}, trying {secondary}")
+                return secondary, await run(secondary)
+
+        logger.info(f"🏁 {primary} slower than its p{self.percentile:.0f}, hedging with {secondary}")
+        second = asyncio.ensure_future(run(secondary))
+        tasks = {first: primary, second: secondary}
+        pending = set(tasks)
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        logger.warning(f"{tasks[task]} failed during hedge: {last_error}")
+                        continue
+                    if task is second:
+                        with self._lock:
+                            self._counters["hedge_wins"] += 1
+                    return tasks[task], task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise last_error
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            cutoff = now - self.rate_window_seconds
+            orgs = {}
+            for key, requests in self._requests.items():
+                self._trim(requests, cutoff)
+                hedges = self._hedges.get(key, deque())
+                self._trim(hedges, cutoff)
+                orgs[key] = {
+                    "requests": len(requests),
+                    "hedges": len(hedges),
+                    "hedge_rate": round(len(hedges) / len(requests), 4) if requests else 0.0,
+                }
+            counters = dict(self._counters)
+        return {
+            "enabled": self.enabled,
+            "orgs_opted_in": sorted(self.orgs) or "all",
+            "percentile": self.percentile,
+            "max_rate": self.max_rate,
+            "rate_window_seconds": self.rate_window_seconds,
+            "totals": counters,
+            "organizations": orgs,
+        }
+
+
+_llm_hedger: Optional[LLMHedger] = None
+
+
+def get_llm_hedger() -> LLMHedger:
+    global _llm_hedger
+    if _llm_hedger is None:
+        _llm_hedger = LLMHedger()
+    return _llm_hedger
@@ -0,0 +1,286 @@
+"""
+LLM JSON - Tolerant extraction, repair and validation of JSON returned by LLMs
+Providers are asked for JSON but occasionally wrap it in markdown fences or
+prose, leave trailing commas, use single quotes or get cut off mid-array.
+Throwing such a response away means a second provider call (Gemini -> OpenAI)
+or a regenerate, so responses that json.loads rejects get a single repair
+pass before parsing fails:
+
+- the first JSON object/array is located and read up to its matching close,
+  ignoring text around it (fences, "Here is the JSON:" ...)
+- single-quoted strings become double-quoted, Python True/False/None become
+  JSON literals, raw newlines inside strings are escaped
+- trailing commas before a closing bracket are dropped
+- a truncated document is cut back to its last complete element and its
+  open brackets are closed; with no complete element to fall back to, an
+  open string is terminated and the document closed as is
+
+Parsed values are then checked against a small schema (required keys and
+their types, required keys of list items).
+"""
+
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+class LLMJSONError(ValueError):
+    """Response could not be parsed or does not match the expected schema"""
+
+
+class JSONSchema:
+    """
+    Minimal shape check for LLM responses.
+
+    required: top-level keys that must be present, with their expected type
+    items: for list-valued keys, keys each item must have; items that are not
+        objects or lack a key are dropped rather than failing the response
+    unwrap: key of a wrapper object some models add ({"follow_up_plan": {...}})
+    """
+
+    def __init__(
+        self,
+        required: Optional[Dict[str, type]] = None,
+        items: Optional[Dict[str, Tuple[str, ...]]] = None,
+        unwrap: Optional[str] = None,
+    ):
+        self.required = required or {}
+        self.items = items or {}
+        self.unwrap = unwrap
+
+    def validate(self, value: Any) -> Dict[str, Any]:
+        # A bare array for a schema with a single list field ([{...}] instead of {"objections": [...]})
+        list_keys = [k for k, t in self.required.items() if t is list]
+        if isinstance(value, list) and len(self.required) == 1 and list_keys:
+            value = {list_keys[0]: value}
+        if not isinstance(value, dict):
+            raise LLMJSONError(f"Expected a JSON object, got {type(value).__name__}")
+        if self.unwrap and isinstance(value.get(self.unwrap), dict):
+            value = value[self.unwrap]
+
+        for key, expected in self.required.items():
+            if key not in value:
+                raise LLMJSONError(f"Missing required key '{key}'")
+            if expected is float and isinstance(value[key], (int, float)) and not isinstance(value[key], bool):
+                continue
+            if not isinstance(value[key], expected):
+                raise LLMJSONError(f"Key '{key}' should be {expected.__name__}, got {type(value[key]).__name__}")
+
+        for key, item_keys in self.items.items():
+            if not isinstance(value.get(key), list):
+                continue
+            kept = [item for item in value[key] if isinstance(item, dict) and all(k in item for k in item_keys)]
+            if len(kept) != len(value[key]):
+                logger.warning(f"⚠️ Dropped {len(value[key]) - len(kept)} malformed '{key}' item(s) from LLM response")
+            value[key] = kept
+        return value
+
+
+CATEGORY_SCHEMA = JSONSchema(required={"category": str})
+OBJECTIONS_SCHEMA = JSONSchema(required={"objections": list}, items={"objections": ("type",)})
+OVERCOME_SCHEMA = JSONSchema(required={"overcome_details": list})
+FOLLOWUP_PLAN_SCHEMA = JSONSchema(unwrap="follow_up_plan")
+
+
+def _close(out: List[str], stack: List[str]) -> str:
+    """Drop a dangling comma / key and close every open bracket"""
+    text = "".join(out).rstrip()
+    while True:
+        if text.endswith(","):
+            text = text[:-1].rstrip()
+        elif text.endswith(":"):
+            # Key without a value: remove the key string as well
+            text = text[:-1].rstrip()
+            if text.endswith('"'):
+                start = _string_start(text)
+                text = text[:start].rstrip() if start is not None else text
+        else:
+            break
+    return text + "".join(reversed(stack))
+
+
+def _string_start(text: str) -> Optional[int]:
+    """Index of the opening quote of the JSON string that ends text"""
+    i = len(text) - 2
+    while i >= 0:
+        if text[i] == '"':
+            backslashes = 0
+            j = i - 1
+            while j >= 0 and text[j] == "\\":
+                backslashes += 1
+                j -= 1
+            if backslashes % 2 == 0:
+                return i
+        i -= 1
+    return None
+
+
+def repair_json(text: str) -> List[str]:
+    """
+    Candidate JSON documents for the first object/array in text, best first.
+    Complete input yields one candidate; truncated input yields versions cut
+    back to the last few complete elements, then the force-closed document.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return []
+    i = min(starts)
+    n = len(text)
+    out: List[str] = []
+    stack: List[str] = []
+    quote: Optional[str] = None
+    # (length of out, open brackets) after each complete element inside a container
+    cut_points: List[Tuple[int, Tuple[str, ...]]] = []
+
+    while i < n:
+        ch = text[i]
+        if quote:
+            if ch == "\\" and i + 1 < n:
+                nxt = text[i + 1]
+                # \' is not a JSON escape
+                out.append("'" if nxt == "'" else ch + nxt)
+                i += 2
+                continue
+            if ch == quote:
+                out.append('"')
+                quote = None
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == "\n":
+                out.append("\\n")
+            elif ch == "\r":
+                out.append("\\r")
+            elif ch == "\t":
+                out.append("\\t")
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in "\"'":
+            quote = ch
+            out.append('"')
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            if not stack:
+                break
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            out.append(stack.pop())
+            if not stack:
+                return [_close(out, stack)]
+        elif ch == ",":
+            out.append(ch)
+            if stack:
+                cut_points.append((len(out) - 1, tuple(stack)))
+        elif ch.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    # Truncated: prefer cutting back to the last complete element (a half-written
+    # item is unreliable), else terminate an open string and close what is open
+    candidates = [_close(out[:length], list(open_brackets)) for length, open_brackets in reversed(cut_points[-3:])]
+    if quote:
+        out.append('"')
+    candidates.append(_close(out, stack))
+    return candidates
+
+
+class JSONRepairStats:
+    """Per-source parse outcomes; repaired responses would otherwise have cost a fallback"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources: Dict[str, Dict[str, int]] = {}
+
+    def record(self, source: str, outcome: str, avoided_provider_call: bool = False):
+        with self._lock:
+            stats = self._sources.setdefault(
+                source, {"clean": 0, "repaired": 0, "failed": 0, "provider_calls_avoided": 0}
+            )
+            stats[outcome] += 1
+            if outcome == "repaired" and avoided_provider_call:
+                stats["provider_calls_avoided"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            sources = {s: dict(c) for s, c in self._sources.items()}
+        totals = {"clean": 0, "repaired": 0, "failed": 0, "provider_calls_avoided": 0}
+        for counts in sources.values():
+            for key in totals:
+                totals[key] += counts[key]
+        return {"sources": sources, "totals": totals}
+
+    def reset(self):
+        with self._lock:
+            self._sources.clear()
+
+
+_json_repair_stats = JSONRepairStats()
+
+
+def get_json_repair_stats() -> JSONRepairStats:
+    return _json_repair_stats
+
+
+def parse_llm_json(
+    text: Optional[str],
+    schema: Optional[JSONSchema] = None,
+    source: str = "unknown",
+    fallback_is_provider_call: bool = False,
+) -> Dict[str, Any]:
+    """
+    Parse an LLM response, repairing it if needed, and validate it against schema.
+
+    source labels the caller in the repair stats (e.g. "gemini:objections").
+    fallback_is_provider_call marks callers whose parse failure leads to another
+    provider call (or a regenerate), so a successful repair counts as one avoided.
+    Raises LLMJSONError when nothing usable can be recovered.
+    """
+    schema = schema or JSONSchema()
+    text = (text or "").strip()
+    stats = get_json_repair_stats()
+
+    try:
+        value = json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        pass
+    else:
+        try:
+            result = schema.validate(value)
+        except LLMJSONError:
+            stats.record(source, "failed")
+            raise
+        stats.record(source, "clean")
+        return result
+
+    last_error: Exception = LLMJSONError("No JSON object found in response")
+    for candidate in repair_json(text):
+        try:
+            result = schema.validate(json.loads(candidate))
+        except (json.JSONDecodeError, LLMJSONError) as e:
+            last_error = e
+            continue
+        stats.record(source, "repaired", fallback_is_provider_call)
+        logger.info(f"🔧 Repaired malformed JSON from {source}")
+        return result
+
+    stats.record(source, "failed")
+    raise LLMJSONError(str(last_error))
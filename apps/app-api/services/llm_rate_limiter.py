@@ -0,0 +1,366 @@
+"""
+LLM Rate Limiter - Provider-aware requests/min and tokens/min limits
+Every LLM call site takes from a per-provider token bucket before calling the
+provider. Bucket state lives in a shared backend so all gunicorn workers draw
+from the same budget: Redis when configured, otherwise a lock-protected state
+file on the local host (same machine only), or plain process memory.
+
+Callers queue in-process by priority (interactive before batch). Across
+processes, batch callers must leave a reserve of each bucket untouched so
+interactive requests from any worker still get through during bulk runs.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Tuple
+
+from services.transcript_windows import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+_PRIORITY_RANK = {INTERACTIVE: 0, BATCH: 1}
+
+# Priority of LLM calls made in the current context. Endpoints serving a user
+# set INTERACTIVE; background pipelines keep the default.
+_llm_priority: ContextVar[str] = ContextVar("llm_priority", default=BATCH)
+
+# Sleep between checks while waiting in the queue (seconds)
+QUEUE_POLL_SECONDS = 0.05
+MAX_POLL_SECONDS = 1.0
+
+
+def set_llm_priority(priority: str):
+    """Mark LLM calls in the current context as interactive or batch"""
+    return _llm_priority.set(priority if priority in _PRIORITY_RANK else BATCH)
+
+
+def get_llm_priority() -> str:
+    return _llm_priority.get()
+
+
+class RateLimitTimeout(Exception):
+    """Waited longer than LLM_RATE_LIMIT_MAX_WAIT_SECONDS for provider capacity"""
+
+
+def _default_limits() -> Dict[str, Dict[str, int]]:
+    return {
+        "openai": {
+            "rpm": int(os.getenv("LLM_RPM_OPENAI", "500")),
+            "tpm": int(os.getenv("LLM_TPM_OPENAI", "200000")),
+        },
+        "gemini": {
+            "rpm": int(os.getenv("LLM_RPM_GEMINI", "300")),
+            "tpm": int(os.getenv("LLM_TPM_GEMINI", "1000000")),
+        },
+    }
+
+
+def _take(state: Optional[Dict[str, float]], now: float, rpm: int, tpm: int,
+          tokens: int, reserve: float) -> Tuple[Dict[str, float], float]:
+    """
+    Token bucket step shared by the local backends (the Redis script mirrors it).
+    Both buckets refill continuously to their per-minute capacity. Returns the new
+    state and 0 when the request was admitted, else the seconds until it could be.
+    """
+    req = state["req"] if state else float(rpm)
+    tok = state["tok"] if state else float(tpm)
+    elapsed = max(0.0, now - (state["ts"] if state else now))
+    req = min(float(rpm), req + elapsed * rpm / 60.0)
+    tok = min(float(tpm), tok + elapsed * tpm / 60.0)
+
+    # A single oversized prompt must not wait forever for a bucket it can never fit in
+    tokens = min(tokens, int(tpm * (1 - reserve)))
+    req_need = 1 + reserve * rpm
+    tok_need = tokens + reserve * tpm
+    wait = 0.0
+    if req < req_need:
+        wait = max(wait, (req_need - req) * 60.0 / rpm)
+    if tok < tok_need:
+        wait = max(wait, (tok_need - tok) * 60.0 / tpm)
+    if wait == 0.0:
+        req -= 1
+        tok -= tokens
+    return {"req": req, "tok": tok, "ts": now}, wait
+
+
+class MemoryBucketBackend:
+    """Buckets in process memory (single worker, tests)"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, float]] = {}
+
+    def try_acquire(self, provider: str, rpm: int, tpm: int, tokens: int, reserve: float) -> float:
+        with self._lock:
+            self._state[provider], wait = _take(self._state.get(provider), time.time(), rpm, tpm, tokens, reserve)
+            return wait
+
+
+class FileBucketBackend:
+    """
+    Local stand-in for Redis: one small JSON state file per provider, updated
+    under an exclusive flock so every worker process on the host shares it.
+    """
+
+    name = "file"
+
+    def __init__(self, state_dir: Optional[str] = None):
+        import fcntl  # noqa: F401 - POSIX only; get_llm_rate_limiter falls back to memory elsewhere
+        self.state_dir = state_dir or os.getenv("LLM_RATE_LIMIT_STATE_DIR") or os.path.join(tempfile.gettempdir(), "llm-rate-limits")
+        os.makedirs(self.state_dir, exist_ok=True)
+
+    def try_acquire(self, provider: str, rpm: int, tpm: int, tokens: int, reserve: float) -> float:
+        import fcntl
+        path = os.path.join(self.state_dir, f"{provider}.json")
+        with open(path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    state = json.loads(raw) if raw else None
+                except ValueError:
+                    state = None
+                state, wait = _take(state, time.time(), rpm, tpm, tokens, reserve)
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return wait
+
+
+_REDIS_TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local rpm = tonumber(ARGV[2])
+local tpm = tonumber(ARGV[3])
+local tokens = tonumber(ARGV[4])
+local reserve = tonumber(ARGV[5])
+local state = redis.call('HMGET', KEYS[1], 'req', 'tok', 'ts')
+local req = tonumber(state[1]) or rpm
+local tok = tonumber(state[2]) or tpm
+local ts = tonumber(state[3]) or now
+local elapsed = math.max(0, now - ts)
+req = math.min(rpm, req + elapsed * rpm / 60)
+tok = math.min(tpm, tok + elapsed * tpm / 60)
+tokens = math.min(tokens, math.floor(tpm * (1 - reserve)))
+local req_need = 1 + reserve * rpm
+local tok_need = tokens + reserve * tpm
+local wait = 0
+if req < req_need then wait = math.max(wait, (req_need - req) * 60 / rpm) end
+if tok < tok_need then wait = math.max(wait, (tok_need - tok) * 60 / tpm) end
+if wait == 0 then
+  req = req - 1
+  tok = tok - tokens
+end
+redis.call('HSET', KEYS[1], 'req', req, 'tok', tok, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 300)
+return tostring(wait)
+"""
+
+
+class RedisBucketBackend:
+    """Buckets in Redis, updated atomically by a Lua script (shared across hosts)"""
+
+    name = "redis"
+
+    def __init__(self, url: str, key_prefix: str = "llm-rate-limit"):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_TAKE_SCRIPT)
+        self.key_prefix = key_prefix
+
+    def try_acquire(self, provider: str, rpm: int, tpm: int, tokens: int, reserve: float) -> float:
+        wait = self._script(keys=[f"{self.key_prefix}:{provider}"], args=[time.time(), rpm, tpm, tokens, reserve])
+        return float(wait)
+
+
+class LLMRateLimiter:
+    """
+    Admission control for LLM calls. `acquire` waits (queued by priority) until
+    the provider's buckets admit the request; providers without configured
+    limits are not throttled.
+    """
+
+    def __init__(self, backend=None, limits: Optional[Dict[str, Dict[str, int]]] = None,
+                 interactive_reserve: Optional[float] = None, max_wait_seconds: Optional[float] = None,
+                 completion_tokens_estimate: Optional[int] = None):
+        self.backend = backend or MemoryBucketBackend()
+        self.limits = limits or _default_limits()
+        self.interactive_reserve = interactive_reserve if interactive_reserve is not None else float(
+            os.getenv("LLM_RATE_LIMIT_INTERACTIVE_RESERVE", "0.2"))
+        self.max_wait_seconds = max_wait_seconds if max_wait_seconds is not None else float(
+            os.getenv("LLM_RATE_LIMIT_MAX_WAIT_SECONDS", "120"))
+        self.completion_tokens_estimate = completion_tokens_estimate if completion_tokens_estimate is not None else int(
+            os.getenv("LLM_COMPLETION_TOKENS_ESTIMATE", "512"))
+        self._lock = threading.Lock()
+        self._queues: Dict[str, list] = {}
+        self._seq = itertools.count()
+        self._metrics: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def estimate_request_tokens(self, prompt: str) -> int:
+        return estimate_tokens(prompt or "") + self.completion_tokens_estimate
+
+    def _enqueue(self, provider: str, priority: str):
+        entry = (_PRIORITY_RANK[priority], next(self._seq))
+        with self._lock:
+            heapq.heappush(self._queues.setdefault(provider, []), entry)
+        return entry
+
+    def _dequeue(self, provider: str, entry):
+        with self._lock:
+            queue = self._queues[provider]
+            queue.remove(entry)
+            heapq.heapify(queue)
+
+    def _is_head(self, provider: str, entry) -> bool:
+        with self._lock:
+            return self._queues[provider][0] == entry
+
+    def _try(self, provider: str, tokens: int, priority: str) -> float:
+        limits = self.limits[provider]
+        reserve = 0.0 if priority == INTERACTIVE else self.interactive_reserve
+        try:
+            return self.backend.try_acquire(provider, limits["rpm"], limits["tpm"], tokens, reserve)
+        except Exception as e:
+            # A broken backend must not take the LLM features down with it
+            logger.warning(f"⚠️ Rate limit backend {self.backend.name} failed, admitting request: {e}")
+            return 0.0
+
+    def _next_sleep(self, provider: str, entry, tokens: int, priority: str) -> float:
+        """0 when admitted; otherwise how long to sleep before checking again"""
+        if not self._is_head(provider, entry):
+            return QUEUE_POLL_SECONDS
+        wait = self._try(provider, tokens, priority)
+        return min(wait, MAX_POLL_SECONDS) if wait > 0 else 0.0
+
+    def _start(self, provider: str, prompt: Optional[str], tokens: Optional[int], priority: Optional[str]):
+        priority = priority if priority in _PRIORITY_RANK else get_llm_priority()
+        tokens = tokens if tokens is not None else self.estimate_request_tokens(prompt)
+        return priority, tokens
+
+    async def acquire(self, provider: str, prompt: Optional[str] = None, tokens: Optional[int] = None,
+                      priority: Optional[str] = None) -> float:
+        """Wait until the provider admits a request; returns the seconds waited"""
+        if provider not in self.limits:
+            return 0.0
+        priority, tokens = self._start(provider, prompt, tokens, priority)
+        started = time.monotonic()
+        entry = self._enqueue(provider, priority)
+        try:
+            while True:
+                sleep = self._next_sleep(provider, entry, tokens, priority)
+                if sleep == 0.0:
+                    break
+                if time.monotonic() - started + sleep > self.max_wait_seconds:
+                    self._record(provider, priority, time.monotonic() - started, timed_out=True)
+                    raise RateLimitTimeout(f"{provider} rate limit: no capacity within {self.max_wait_seconds:.0f}s")
+                await asyncio.sleep(sleep)
+        finally:
+            self._dequeue(provider, entry)
+        waited = time.monotonic() - started
+        self._record(provider, priority, waited)
+        return waited
+
+    def acquire_sync(self, provider: str, prompt: Optional[str] = None, tokens: Optional[int] = None,
+                     priority: Optional[str] = None) -> float:
+        """Blocking variant for synchronous call sites (run them off the event loop)"""
+        if provider not in self.limits:
+            return 0.0
+        priority, tokens = self._start(provider, prompt, tokens, priority)
+        started = time.monotonic()
+        entry = self._enqueue(provider, priority)
+        try:
+            while True:
+                sleep = self._next_sleep(provider, entry, tokens, priority)
+                if sleep == 0.0:
+                    break
+                if time.monotonic() - started + sleep > self.max_wait_seconds:
+                    self._record(provider, priority, time.monotonic() - started, timed_out=True)
+                    raise RateLimitTimeout(f"{provider} rate limit: no capacity within {self.max_wait_seconds:.0f}s")
+                time.sleep(sleep)
+        finally:
+            self._dequeue(provider, entry)
+        waited = time.monotonic() - started
+        self._record(provider, priority, waited)
+        return waited
+
+    def _record(self, provider: str, priority: str, waited: float, timed_out: bool = False):
+        waited_ms = int(waited * 1000)
+        with self._lock:
+            stats = self._metrics.setdefault(provider, {}).setdefault(priority, {
+                "acquired": 0, "throttled": 0, "timeouts": 0, "wait_ms_total": 0, "wait_ms_max": 0,
+            })
+            if timed_out:
+                stats["timeouts"] += 1
+            else:
+                stats["acquired"] += 1
+                stats["throttled"] += int(waited_ms > 0)
+            stats["wait_ms_total"] += waited_ms
+            stats["wait_ms_max"] = max(stats["wait_ms_max"], waited_ms)
+        if waited_ms >= 1000:
+            logger.info(f"⏳ {priority} {provider} request waited {waited_ms}ms for rate limit capacity")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Limits, current queue depth and wait-time metrics per provider and priority"""
+        with self._lock:
+            providers = {}
+            for provider, limits in self.limits.items():
+                by_priority = {}
+                for priority, stats in self._metrics.get(provider, {}).items():
+                    calls = stats["acquired"] + stats["timeouts"]
+                    by_priority[priority] = {
+                        **stats,
+                        "avg_wait_ms": int(stats["wait_ms_total"] / calls) if calls else 0,
+                    }
+                providers[provider] = {
+                    **limits,
+                    "queued": len(self._queues.get(provider, [])),
+                    "by_priority": by_priority,
+                }
+            return {
+                "backend": self.backend.name,
+                "interactive_reserve": self.interactive_reserve,
+                "providers": providers,
+            }
+
+
+_llm_rate_limiter: Optional[LLMRateLimiter] = None
+
+
+def _build_backend():
+    choice = os.getenv("LLM_RATE_LIMIT_BACKEND", "").lower()
+    redis_url = os.getenv("LLM_RATE_LIMIT_REDIS_URL") or os.getenv("REDIS_URL")
+    if choice == "redis" or (not choice and redis_url):
+        try:
+            return RedisBucketBackend(redis_url or "redis://localhost:6379/0")
+        except Exception as e:
+            logger.warning(f"⚠️ Redis rate limit backend unavailable ({e}), using local file backend")
+    if choice != "memory":
+        try:
+            return FileBucketBackend()
+        except Exception as e:
+            logger.warning(f"⚠️ File rate limit backend unavailable ({e}), using in-process limits")
+    return MemoryBucketBackend()
+
+
+def get_llm_rate_limiter() -> LLMRateLimiter:
+    """Get the process-wide LLM rate limiter"""
+    global _llm_rate_limiter
+    if _llm_rate_limiter is None:
+        _llm_rate_limiter = LLMRateLimiter(_build_backend())
+        logger.info(f"🚦 LLM rate limiter using {_llm_rate_limiter.backend.name} backend")
+    return _llm_rate_limiter
@@ -0,0 +1,261 @@
+"""
+LLM Provider Router - Latency- and error-aware provider ordering
+Every provider call reports its latency and outcome here. The router keeps a
+rolling window per provider (broken down by model for ops) and a circuit
+breaker: after LLM_ROUTER_FAILURE_THRESHOLD consecutive failures, or an error
+rate above LLM_ROUTER_ERROR_RATE over the window, the provider is skipped for
+LLM_ROUTER_OPEN_SECONDS. After that it is half-open: still routed to (after
+the healthy providers) and the next success closes the breaker, the next
+failure reopens it.
+
+order() picks among an organization's enabled providers: healthy ones
+fastest first (median latency weighted by success rate), then half-open
+ones. A provider with an open breaker is only returned when nothing else is
+left, so a slow or failing provider stops adding its timeout to every call.
+State is per worker process.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Iterable
+
+from services.deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROVIDERS = ["gemini", "openai"]
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# How long an organization's enabled provider set is cached (seconds)
+ORG_PROVIDERS_TTL_SECONDS = 60
+
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class ProviderHealth:
+    """Rolling latency/outcome window and circuit breaker for one provider"""
+
+    def __init__(self, provider: str, window: int, window_seconds: float):
+        self.provider = provider
+        self.window_seconds = window_seconds
+        # (timestamp, model, latency_ms, ok)
+        self.samples: deque = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self.open_until = 0.0
+        self.times_opened = 0
+
+    def _recent(self, now: float) -> List[tuple]:
+        cutoff = now - self.window_seconds
+        return [s for s in self.samples if s[0] >= cutoff]
+
+    def current_state(self, now: float) -> str:
+        if self.state == OPEN and now >= self.open_until:
+            self.state = HALF_OPEN
+        return self.state
+
+    def stats(self, now: float, model: Optional[str] = None) -> Dict[str, Any]:
+        samples = [s for s in self._recent(now) if model is None or s[1] == model]
+        latencies = sorted(s[2] for s in samples if s[3])
+        errors = sum(1 for s in samples if not s[3])
+        return {
+            "samples": len(samples),
+            "errors": errors,
+            "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+        }
+
+
+class TrackedCall:
+    """Handle of a tracked call; discard() when its outcome says nothing about the provider"""
+
+    def __init__(self):
+        self.discarded = False
+
+    def discard(self):
+        self.discarded = True
+
+
+class LLMProviderRouter:
+    """Process-wide provider health and routing decisions"""
+
+    def __init__(self):
+        self.window = int(os.getenv("LLM_ROUTER_WINDOW", "50"))
+        self.window_seconds = float(os.getenv("LLM_ROUTER_WINDOW_SECONDS", "600"))
+        self.failure_threshold = int(os.getenv("LLM_ROUTER_FAILURE_THRESHOLD", "5"))
+        self.error_rate_threshold = float(os.getenv("LLM_ROUTER_ERROR_RATE", "0.5"))
+        self.min_samples = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", "10"))
+        self.open_seconds = float(os.getenv("LLM_ROUTER_OPEN_SECONDS", "30"))
+        self._providers: Dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+
+    def _health(self, provider: str) -> ProviderHealth:
+        health = self._providers.get(provider)
+        if health is None:
+            health = self._providers[provider] = ProviderHealth(provider, self.window, self.window_seconds)
+        return health
+
+    def record(self, provider: str, model: Optional[str], latency_ms: float, ok: bool):
+        """Report the outcome of one provider call"""
+        now = time.time()
+        with self._lock:
+            health = self._health(provider)
+            health.samples.append((now, model or provider, float(latency_ms), ok))
+            state = health.current_state(now)
+            if ok:
+                health.consecutive_failures = 0
+                if state == HALF_OPEN:
+                    health.state = CLOSED
+                    logger.info(f"✅ LLM provider {provider} recovered, circuit closed")
+                return
+
+            health.consecutive_failures += 1
+            stats = health.stats(now)
+            tripped = (
+                state == HALF_OPEN
+                or health.consecutive_failures >= self.failure_threshold
+                or (stats["samples"] >= self.min_samples and stats["error_rate"] >= self.error_rate_threshold)
+            )
+            if tripped and state != OPEN:
+                health.state = OPEN
+                health.opened_at = now
+                health.open_until = now + self.open_seconds
+                health.times_opened += 1
+                logger.warning(
+                    f"🔌 LLM provider {provider} circuit opened for {self.open_seconds:.0f}s "
+                    f"({health.consecutive_failures} consecutive failures, error rate {stats['error_rate']:.0%})"
+                )
+
+    @contextmanager
+    def track(self, provider: str, model: Optional[str] = None):
+        """
+        Time a provider call; an exception inside the block counts as a failure.
+        Cancellation (the losing side of a hedge) and running out of our own
+        deadline say nothing about the provider and leave no sample; neither
+        does a call whose handle was discarded (e.g. the client went away).
+        """
+        call = TrackedCall()
+        started = time.time()
+        try:
+            yield call
+        except (asyncio.CancelledError, DeadlineExceeded):
+            raise
+        except Exception:
+            if not call.discarded:
+                self.record(provider, model, (time.time() - started) * 1000, ok=False)
+            raise
+        if not call.discarded:
+            self.record(provider, model, (time.time() - started) * 1000, ok=True)
+
+    def latency_percentile(self, provider: str, pct: float) -> Optional[float]:
+        """Rolling latency percentile (ms) of successful calls, None without samples"""
+        now = time.time()
+        with self._lock:
+            health = self._providers.get(provider)
+            if health is None:
+                return None
+            latencies = sorted(s[2] for s in health._recent(now) if s[3])
+        return _percentile(latencies, pct)
+
+    def _score(self, health: ProviderHealth, now: float) -> float:
+        """Expected latency per successful call; providers without data score 0 so they get tried"""
+        stats = health.stats(now)
+        if stats["p50_ms"] is None:
+            return 0.0
+        return stats["p50_ms"] / max(0.05, 1.0 - stats["error_rate"])
+
+    def order(self, enabled: Iterable[str], preferred: Optional[str] = None) -> List[str]:
+        """
+        Providers to try, best first, out of the enabled ones.
+        A preferred provider stays first while its circuit is closed.
+        """
+        candidates = list(dict.fromkeys(p for p in enabled if p))
+        if not candidates:
+            return []
+        now = time.time()
+        with self._lock:
+            states = {p: self._health(p).current_state(now) for p in candidates}
+            scores = {p: self._score(self._health(p), now) for p in candidates}
+            open_until = {p: self._health(p).open_until for p in candidates}
+
+        closed = sorted((p for p in candidates if states[p] == CLOSED), key=lambda p: scores[p])
+        half_open = [p for p in candidates if states[p] == HALF_OPEN]
+        if preferred in closed:
+            closed.remove(preferred)
+            closed.insert(0, preferred)
+        ordered = closed + half_open
+        if not ordered:
+            # Every breaker is open: try the one closest to reopening rather than nothing
+            ordered = [min(candidates, key=lambda p: open_until[p])]
+        return ordered
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            providers = {}
+            for name, health in self._providers.items():
+                models = sorted({s[1] for s in health._recent(now)})
+                providers[name] = {
+                    "state": health.current_state(now),
+                    "consecutive_failures": health.consecutive_failures,
+                    "times_opened": health.times_opened,
+                    "open_seconds_remaining": round(max(0.0, health.open_until - now), 1) if health.state == OPEN else 0.0,
+                    "score_ms": round(self._score(health, now), 1),
+                    **health.stats(now),
+                    "models": {m: health.stats(now, model=m) for m in models},
+                }
+        return {
+            "providers": providers,
+            "ranking": self.order(list(providers) or DEFAULT_PROVIDERS),
+            "config": {
+                "window": self.window,
+                "window_seconds": self.window_seconds,
+                "failure_threshold": self.failure_threshold,
+                "error_rate_threshold": self.error_rate_threshold,
+                "min_samples": self.min_samples,
+                "open_seconds": self.open_seconds,
+            },
+        }
+
+
+_llm_router: Optional[LLMProviderRouter] = None
+_org_providers_cache: Dict[str, tuple] = {}
+
+
+def get_llm_router() -> LLMProviderRouter:
+    global _llm_router
+    if _llm_router is None:
+        _llm_router = LLMProviderRouter()
+    return _llm_router
+
+
+def get_org_enabled_providers(supabase, org_id: Optional[str]) -> List[str]:
+    """organization_analysis_settings.enabled_providers, cached briefly; all providers when unset"""
+    if not supabase or not org_id:
+        return list(DEFAULT_PROVIDERS)
+    cached = _org_providers_cache.get(org_id)
+    if cached and time.time() - cached[0] < ORG_PROVIDERS_TTL_SECONDS:
+        return list(cached[1])
+    providers = list(DEFAULT_PROVIDERS)
+    try:
+        result = supabase.from_('organization_analysis_settings').select('enabled_providers').eq('organization_id', org_id).execute()
+        if result and result.data and isinstance(result.data[0].get('enabled_providers'), list):
+            providers = [p for p in result.data[0]['enabled_providers'] if p in DEFAULT_PROVIDERS]
+    except Exception as e:
+        logger.warning(f"Error getting enabled providers for org {org_id}: {e}, using defaults")
+    _org_providers_cache[org_id] = (time.time(), providers)
+    return list(providers)
@@ -0,0 +1,141 @@
+"""
+LLM Usage Tracker - Records prompt/completion token counts and latency per org
+Provider responses report real token usage (OpenAI `usage`, Gemini
+`usage_metadata`); compaction records the estimated tokens saved before a call.
+"""
+
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Organization the current request/pipeline is working for. Set once at the
+# entry point (endpoint or background pipeline) and read by every LLM call site.
+_usage_org: ContextVar[Optional[str]] = ContextVar("llm_usage_org", default=None)
+
+UNKNOWN_ORG = "unknown"
+
+
+def set_usage_org(org_id: Optional[str]):
+    """Attribute LLM usage in the current context to an organization"""
+    return _usage_org.set(org_id)
+
+
+def get_usage_org() -> Optional[str]:
+    return _usage_org.get()
+
+
+def _as_int(value) -> Optional[int]:
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def extract_openai_usage(data: Dict[str, Any]) -> Dict[str, Optional[int]]:
+    """Token counts from an OpenAI chat completion response body"""
+    usage = data.get("usage") if isinstance(data, dict) else None
+    usage = usage if isinstance(usage, dict) else {}
+    return {
+        "prompt_tokens": _as_int(usage.get("prompt_tokens")),
+        "completion_tokens": _as_int(usage.get("completion_tokens")),
+    }
+
+
+def extract_gemini_usage(response) -> Dict[str, Optional[int]]:
+    """Token counts from a Gemini generate_content response"""
+    metadata = getattr(response, "usage_metadata", None)
+    return {
+        "prompt_tokens": _as_int(getattr(metadata, "prompt_token_count", None)),
+        "completion_tokens": _as_int(getattr(metadata, "candidates_token_count", None)),
+    }
+
+
+class LLMUsageTracker:
+    """Thread-safe in-process aggregation of LLM usage per organization"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._orgs: Dict[str, Dict[str, Any]] = {}
+
+    def _org_bucket(self, org_id: Optional[str]) -> Dict[str, Any]:
+        key = org_id or get_usage_org() or UNKNOWN_ORG
+        if key not in self._orgs:
+            self._orgs[key] = {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "latency_ms_total": 0,
+                "by_operation": {},
+                "by_provider": {},
+                "compaction": {"prompts": 0, "raw_tokens": 0, "compacted_tokens": 0},
+            }
+        return self._orgs[key]
+
+    def record_call(
+        self,
+        provider: str,
+        operation: str,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        latency_ms: Optional[int] = None,
+        org_id: Optional[str] = None,
+    ):
+        """Record one provider call; missing token counts are counted as 0"""
+        with self._lock:
+            bucket = self._org_bucket(org_id)
+            for target in (
+                bucket,
+                bucket["by_operation"].setdefault(operation, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency_ms_total": 0}),
+                bucket["by_provider"].setdefault(provider, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency_ms_total": 0}),
+            ):
+                target["calls"] += 1
+                target["prompt_tokens"] += prompt_tokens or 0
+                target["completion_tokens"] += completion_tokens or 0
+                target["latency_ms_total"] += latency_ms or 0
+        logger.debug(f"📈 LLM usage: {provider}/{operation} prompt={prompt_tokens} completion={completion_tokens} latency={latency_ms}ms")
+
+    def record_compaction(self, operation: str, raw_tokens: int, compacted_tokens: int, org_id: Optional[str] = None):
+        with self._lock:
+            compaction = self._org_bucket(org_id)["compaction"]
+            compaction["prompts"] += 1
+            compaction["raw_tokens"] += raw_tokens
+            compaction["compacted_tokens"] += compacted_tokens
+
+    def snapshot(self, org_id: Optional[str] = None) -> Dict[str, Any]:
+        """Usage per org (or a single org) with derived averages and savings"""
+        with self._lock:
+            orgs = {k: v for k, v in self._orgs.items() if org_id is None or k == org_id}
+            result = {}
+            for key, bucket in orgs.items():
+                calls = bucket["calls"]
+                compaction = dict(bucket["compaction"])
+                saved = max(0, compaction["raw_tokens"] - compaction["compacted_tokens"])
+                # Rough latency saved: average ms per prompt token observed for this org
+                ms_per_token = (bucket["latency_ms_total"] / bucket["prompt_tokens"]) if bucket["prompt_tokens"] else 0
+                compaction["saved_tokens"] = saved
+                compaction["estimated_saved_ms"] = int(saved * ms_per_token)
+                result[key] = {
+                    "calls": calls,
+                    "prompt_tokens": bucket["prompt_tokens"],
+                    "completion_tokens": bucket["completion_tokens"],
+                    "avg_latency_ms": int(bucket["latency_ms_total"] / calls) if calls else 0,
+                    "by_operation": {k: dict(v) for k, v in bucket["by_operation"].items()},
+                    "by_provider": {k: dict(v) for k, v in bucket["by_provider"].items()},
+                    "compaction": compaction,
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._orgs.clear()
+
+
+_llm_usage_tracker: Optional[LLMUsageTracker] = None
+
+
+def get_llm_usage_tracker() -> LLMUsageTracker:
+    """Get the process-wide LLM usage tracker"""
+    global _llm_usage_tracker
+    if _llm_usage_tracker is None:
+        _llm_usage_tracker = LLMUsageTracker()
+    return _llm_usage_tracker
@@ -0,0 +1,464 @@
+"""
+Local Call Classifier - Optional on-box tier for call categorization
+Hashed word n-grams (TF-IDF weighted) feeding two NumPy softmax regressions,
+one for `call_category` and one for `call_type`. Models are trained offline
+from LLM-labeled call_records (see scripts/train_call_classifier.py) and
+versioned on disk; `categorize_call` consults the loaded model first and only
+escalates to an LLM below a confidence threshold. Agreement with the LLM is
+tracked per confidence bucket so the threshold can be tuned from real traffic.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import threading
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_DIR = Path(__file__).resolve().parent.parent / "models" / "call_classifier"
+LATEST_POINTER = "LATEST"
+
+DEFAULT_N_FEATURES = 2 ** 16
+DEFAULT_NGRAMS = 2
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+# Rows whose labels did not come from an LLM must not be used for training
+NON_LLM_NOTE_MARKERS = ("[HEURISTIC", "Heuristic fallback", "[LOCAL MODEL")
+
+
+def _settings() -> Dict[str, Any]:
+    return {
+        "enabled": os.getenv("LOCAL_CLASSIFIER_ENABLED", "false").lower() in ("1", "true", "yes"),
+        "model_dir": Path(os.getenv("LOCAL_CLASSIFIER_DIR") or DEFAULT_MODEL_DIR),
+        "threshold": float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.9")),
+        # Share of confident predictions still sent to the LLM so agreement is measured above the threshold too
+        "audit_rate": float(os.getenv("LOCAL_CLASSIFIER_AUDIT_RATE", "0.05")),
+    }
+
+
+def get_local_classifier_threshold() -> float:
+    return _settings()["threshold"]
+
+
+def should_audit() -> bool:
+    return random.random() < _settings()["audit_rate"]
+
+
+# CSR-style sparse batch: (indptr, indices, data)
+SparseRows = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+class HashedNgramVectorizer:
+    """
+    Word 1..n-grams hashed into a fixed number of buckets (crc32, stable across
+    processes), log-scaled term frequency times IDF, L2-normalized per document.
+    """
+
+    def __init__(self, n_features: int = DEFAULT_N_FEATURES, ngrams: int = DEFAULT_NGRAMS, idf: Optional[np.ndarray] = None):
+        self.n_features = n_features
+        self.ngrams = ngrams
+        self.idf = idf
+
+    def _bucket_counts(self, text: str) -> Dict[int, int]:
+        tokens = _TOKEN.findall((text or "").lower())
+        counts: Dict[int, int] = {}
+        for n in range(1, self.ngrams + 1):
+            for i in range(len(tokens) - n + 1):
+                gram = " ".join(tokens[i:i + n])
+                bucket = zlib.crc32(gram.encode("utf-8")) % self.n_features
+                counts[bucket] = counts.get(bucket, 0) + 1
+        return counts
+
+    def fit_idf(self, texts: Sequence[str]) -> "HashedNgramVectorizer":
+        df = np.zeros(self.n_features, dtype=np.float64)
+        for text in texts:
+            buckets = list(self._bucket_counts(text))
+            if buckets:
+                df[buckets] += 1
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1.0).astype(np.float32)
+        return self
+
+    def transform(self, texts: Sequence[str]) -> SparseRows:
+        indptr = [0]
+        indices: List[int] = []
+        data: List[float] = []
+        for text in texts:
+            counts = self._bucket_counts(text)
+            if counts:
+                idx = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+                values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+                if self.idf is not None:
+                    values = values * self.idf[idx]
+                norm = float(np.linalg.norm(values))
+                if norm > 0:
+                    values = values / norm
+                indices.extend(idx.tolist())
+                data.extend(values.tolist())
+            indptr.append(len(indices))
+        return (
+            np.asarray(indptr, dtype=np.int64),
+            np.asarray(indices, dtype=np.int64),
+            np.asarray(data, dtype=np.float32),
+        )
+
+
+class SoftmaxRegression:
+    """Multinomial logistic regression over sparse rows, trained with full-batch Adam"""
+
+    def __init__(self, classes: Sequence[str], n_features: int, weights: Optional[np.ndarray] = None, bias: Optional[np.ndarray] = None):
+        self.classes = list(classes)
+        self.weights = weights if weights is not None else np.zeros((n_features, len(self.classes)), dtype=np.float32)
+        self.bias = bias if bias is not None else np.zeros(len(self.classes), dtype=np.float32)
+
+    def _logits(self, rows: SparseRows) -> np.ndarray:
+        indptr, indices, data = rows
+        n_rows = len(indptr) - 1
+        row_ids = np.repeat(np.arange(n_rows), np.diff(indptr))
+        contributions = self.weights[indices] * data[:, None]
+        logits = np.empty((n_rows, len(self.classes)), dtype=np.float64)
+        for k in range(len(self.classes)):
+            logits[:, k] = np.bincount(row_ids, weights=contributions[:, k], minlength=n_rows)
+        return logits + self.bias
+
+    def predict_proba(self, rows: SparseRows) -> np.ndarray:
+        logits = self._logits(rows)
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def fit(
+        self,
+        rows: SparseRows,
+        labels: np.ndarray,
+        sample_weight: Optional[np.ndarray] = None,
+        epochs: int = 200,
+        learning_rate: float = 0.1,
+        l2: float = 1e-4,
+    ) -> "SoftmaxRegression":
+        indptr, indices, data = rows
+        n_rows = len(indptr) - 1
+        n_features, n_classes = self.weights.shape
+        row_ids = np.repeat(np.arange(n_rows), np.diff(indptr))
+        weight = np.ones(n_rows) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+        weight = weight / weight.sum()
+        onehot = np.zeros((n_rows, n_classes))
+        onehot[np.arange(n_rows), labels] = 1.0
+
+        params = [self.weights.astype(np.float64), self.bias.astype(np.float64)]
+        moments = [(np.zeros_like(p), np.zeros_like(p)) for p in params]
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for step in range(1, epochs + 1):
+            self.weights, self.bias = params
+            error = (self.predict_proba(rows) - onehot) * weight[:, None]
+            per_entry = error[row_ids] * data[:, None]
+            grad_w = np.empty((n_features, n_classes))
+            for k in range(n_classes):
+                grad_w[:, k] = np.bincount(indices, weights=per_entry[:, k], minlength=n_features)
+            grad_w += l2 * params[0]
+            grads = [grad_w, error.sum(axis=0)]
+            for p, g, (m, v) in zip(params, grads, moments):
+                m *= beta1
+                m += (1 - beta1) * g
+                v *= beta2
+                v += (1 - beta2) * g * g
+                p -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+
+        self.weights = params[0].astype(np.float32)
+        self.bias = params[1].astype(np.float32)
+        return self
+
+
+class LocalCallClassifier:
+    """Vectorizer plus category and call_type heads, saved/loaded as one versioned bundle"""
+
+    def __init__(self, vectorizer: HashedNgramVectorizer, category_model: SoftmaxRegression,
+                 call_type_model: SoftmaxRegression, metadata: Optional[Dict[str, Any]] = None):
+        self.vectorizer = vectorizer
+        self.category_model = category_model
+        self.call_type_model = call_type_model
+        self.metadata = metadata or {}
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.metadata.get("version")
+
+    def predict_many(self, transcripts: Sequence[str]) -> List[Dict[str, Any]]:
+        rows = self.vectorizer.transform(transcripts)
+        category_proba = self.category_model.predict_proba(rows)
+        call_type_proba = self.call_type_model.predict_proba(rows)
+        predictions = []
+        for cat_p, type_p in zip(category_proba, call_type_proba):
+            cat_i, type_i = int(cat_p.argmax()), int(type_p.argmax())
+            predictions.append({
+                "category": self.category_model.classes[cat_i],
+                "call_type": self.call_type_model.classes[type_i],
+                "confidence": round(float(cat_p[cat_i]), 4),
+                "call_type_confidence": round(float(type_p[type_i]), 4),
+                "model_version": self.version,
+            })
+        return predictions
+
+    def predict(self, transcript: str) -> Dict[str, Any]:
+        return self.predict_many([transcript])[0]
+
+    def save(self, model_dir: Optional[Path] = None, version: Optional[str] = None) -> str:
+        """Write the bundle as <version>.npz and point LATEST at it"""
+        model_dir = Path(model_dir or _settings()["model_dir"])
+        model_dir.mkdir(parents=True, exist_ok=True)
+        version = version or datetime.now(timezone.utc).strftime("v%Y%m%d%H%M%S")
+        self.metadata = {**self.metadata, "version": version}
+        np.savez_compressed(
+            model_dir / f"{version}.npz",
+            idf=self.vectorizer.idf,
+            category_weights=self.category_model.weights,
+            category_bias=self.category_model.bias,
+            call_type_weights=self.call_type_model.weights,
+            call_type_bias=self.call_type_model.bias,
+            metadata=np.array(json.dumps({
+                **self.metadata,
+                "n_features": self.vectorizer.n_features,
+                "ngrams": self.vectorizer.ngrams,
+                "category_classes": self.category_model.classes,
+                "call_type_classes": self.call_type_model.classes,
+            })),
+        )
+        (model_dir / LATEST_POINTER).write_text(version)
+        logger.info(f"💾 Saved local call classifier {version} to {model_dir}")
+        return version
+
+    @classmethod
+    def load(cls, model_dir: Optional[Path] = None, version: Optional[str] = None) -> "LocalCallClassifier":
+        """Load a specific version, or whatever LATEST points at"""
+        model_dir = Path(model_dir or _settings()["model_dir"])
+        version = version or (model_dir / LATEST_POINTER).read_text().strip()
+        with np.load(model_dir / f"{version}.npz") as bundle:
+            metadata = json.loads(str(bundle["metadata"]))
+            vectorizer = HashedNgramVectorizer(metadata["n_features"], metadata["ngrams"], bundle["idf"])
+            category_model = SoftmaxRegression(
+                metadata["category_classes"], metadata["n_features"],
+                bundle["category_weights"], bundle["category_bias"],
+            )
+            call_type_model = SoftmaxRegression(
+                metadata["call_type_classes"], metadata["n_features"],
+                bundle["call_type_weights"], bundle["call_type_bias"],
+            )
+        metadata["version"] = version
+        return cls(vectorizer, category_model, call_type_model, metadata)
+
+
+def _encode(labels: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    classes = sorted(set(labels))
+    lookup = {c: i for i, c in enumerate(classes)}
+    return classes, np.array([lookup[label] for label in labels], dtype=np.int64)
+
+
+def _take(rows: SparseRows, selected: np.ndarray) -> SparseRows:
+    indptr, indices, data = rows
+    parts = [np.arange(indptr[i], indptr[i + 1]) for i in selected]
+    positions = np.concatenate(parts) if parts else np.array([], dtype=np.int64)
+    lengths = np.diff(indptr)[selected]
+    return np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64), indices[positions], data[positions]
+
+
+def train_classifier(
+    examples: Sequence[Dict[str, Any]],
+    n_features: int = DEFAULT_N_FEATURES,
+    ngrams: int = DEFAULT_NGRAMS,
+    holdout: float = 0.1,
+    epochs: int = 200,
+    seed: int = 7,
+) -> LocalCallClassifier:
+    """
+    Train both heads from {"transcript", "call_category", "call_type", "confidence"}
+    examples. LLM confidence is used as the sample weight. A random holdout is
+    scored after training and its accuracy per confidence bucket stored in the
+    metadata as a starting point for the threshold.
+    """
+    examples = [e for e in examples if e.get("transcript") and e.get("call_category")]
+    if len(examples) < 2:
+        raise ValueError("Need at least two labeled examples to train the local classifier")
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(examples))
+    n_holdout = int(len(examples) * holdout) if len(examples) >= 20 else 0
+    holdout_idx, train_idx = order[:n_holdout], order[n_holdout:]
+
+    texts = [e["transcript"] for e in examples]
+    categories, category_labels = _encode([e["call_category"] for e in examples])
+    call_types, call_type_labels = _encode([e.get("call_type") or "general_question" for e in examples])
+    sample_weight = np.array([float(e.get("confidence") or 1.0) for e in examples])
+
+    vectorizer = HashedNgramVectorizer(n_features, ngrams).fit_idf([texts[i] for i in train_idx])
+    rows = vectorizer.transform(texts)
+    train_rows = _take(rows, train_idx)
+
+    category_model = SoftmaxRegression(categories, n_features).fit(
+        train_rows, category_labels[train_idx], sample_weight[train_idx], epochs=epochs
+    )
+    call_type_model = SoftmaxRegression(call_types, n_features).fit(
+        train_rows, call_type_labels[train_idx], sample_weight[train_idx], epochs=epochs
+    )
+
+    metadata: Dict[str, Any] = {
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "train_examples": int(len(train_idx)),
+        "holdout_examples": int(n_holdout),
+    }
+    classifier = LocalCallClassifier(vectorizer, category_model, call_type_model, metadata)
+
+    if n_holdout:
+        holdout_rows = _take(rows, holdout_idx)
+        cat_p = category_model.predict_proba(holdout_rows)
+        type_p = call_type_model.predict_proba(holdout_rows)
+        cat_hit = cat_p.argmax(axis=1) == category_labels[holdout_idx]
+        type_hit = type_p.argmax(axis=1) == call_type_labels[holdout_idx]
+        buckets: Dict[str, Dict[str, Any]] = {}
+        for confidence, hit in zip(cat_p.max(axis=1), cat_hit):
+            stats = buckets.setdefault(_bucket(float(confidence)), {"count": 0, "correct": 0})
+            stats["count"] += 1
+            stats["correct"] += int(hit)
+        metadata["holdout_category_accuracy"] = round(float(cat_hit.mean()), 4)
+        metadata["holdout_call_type_accuracy"] = round(float(type_hit.mean()), 4)
+        metadata["holdout_by_confidence"] = dict(sorted(buckets.items()))
+
+    logger.info(
+        f"🧠 Trained local call classifier on {len(train_idx)} examples "
+        f"(holdout category accuracy: {metadata.get('holdout_category_accuracy')})"
+    )
+    return classifier
+
+
+def fetch_training_examples(supabase, min_confidence: float = 0.8, page_size: int = 1000,
+                            limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """LLM-labeled call_records with a transcript, skipping heuristic/local labels"""
+    examples: List[Dict[str, Any]] = []
+    start = 0
+    while limit is None or len(examples) < limit:
+        result = (
+            supabase.table("call_records")
+            .select("transcript, call_category, call_type, categorization_confidence, categorization_notes")
+            .not_.is_("call_category", "null")
+            .gte("categorization_confidence", min_confidence)
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        rows = result.data or []
+        for row in rows:
+            notes = row.get("categorization_notes") or ""
+            if not row.get("transcript") or any(marker in notes for marker in NON_LLM_NOTE_MARKERS):
+                continue
+            examples.append({
+                "transcript": row["transcript"],
+                "call_category": row["call_category"],
+                "call_type": row.get("call_type"),
+                "confidence": row.get("categorization_confidence"),
+            })
+        if len(rows) < page_size:
+            break
+        start += page_size
+    return examples[:limit] if limit is not None else examples
+
+
+def _bucket(confidence: float) -> str:
+    """Confidence bucket label, 0.1 wide (0.95 -> "0.9")"""
+    return f"{min(int(confidence * 10), 9) / 10:.1f}"
+
+
+class ClassifierAgreementTracker:
+    """Local-vs-LLM agreement per local confidence bucket, plus routing counts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = {"local_accepted": 0, "escalated": 0, "audited": 0}
+            self._buckets: Dict[str, Dict[str, int]] = {}
+
+    def record_route(self, route: str):
+        with self._lock:
+            self._counts[route] = self._counts.get(route, 0) + 1
+
+    def record_comparison(self, local: Dict[str, Any], llm: Dict[str, Any]):
+        with self._lock:
+            stats = self._buckets.setdefault(
+                _bucket(float(local.get("confidence") or 0)),
+                {"compared": 0, "category_agree": 0, "call_type_agree": 0},
+            )
+            stats["compared"] += 1
+            stats["category_agree"] += int(local.get("category") == llm.get("category"))
+            stats["call_type_agree"] += int(local.get("call_type") == llm.get("call_type"))
+
+    def snapshot(self, target_agreement: Optional[float] = None, min_samples: int = 20) -> Dict[str, Any]:
+        """
+        Counts and agreement rates by bucket. `suggested_threshold` is the lowest
+        bucket from which every bucket above it (with enough samples) meets the
+        target category agreement.
+        """
+        if target_agreement is None:
+            target_agreement = float(os.getenv("LOCAL_CLASSIFIER_TARGET_AGREEMENT", "0.95"))
+        with self._lock:
+            buckets = {}
+            for key, stats in sorted(self._buckets.items()):
+                compared = stats["compared"]
+                buckets[key] = {
+                    **stats,
+                    "category_agreement": round(stats["category_agree"] / compared, 4) if compared else None,
+                    "call_type_agreement": round(stats["call_type_agree"] / compared, 4) if compared else None,
+                }
+            suggested = None
+            for key in sorted(buckets, reverse=True):
+                stats = buckets[key]
+                if stats["compared"] < min_samples:
+                    continue
+                if stats["category_agreement"] < target_agreement:
+                    break
+                suggested = float(key)
+            return {**self._counts, "by_confidence": buckets, "target_agreement": target_agreement,
+                    "suggested_threshold": suggested}
+
+
+_local_classifier: Optional[LocalCallClassifier] = None
+_local_classifier_loaded = False
+_agreement_tracker: Optional[ClassifierAgreementTracker] = None
+
+
+def get_local_classifier() -> Optional[LocalCallClassifier]:
+    """The loaded local classifier, or None when disabled or no model is on disk"""
+    global _local_classifier, _local_classifier_loaded
+    settings = _settings()
+    if not settings["enabled"]:
+        return None
+    if not _local_classifier_loaded:
+        _local_classifier_loaded = True
+        try:
+            _local_classifier = LocalCallClassifier.load(settings["model_dir"])
+            logger.info(f"🧠 Loaded local call classifier {_local_classifier.version}")
+        except Exception as e:
+            logger.warning(f"⚠️ Local call classifier enabled but could not be loaded from {settings['model_dir']}: {e}")
+            _local_classifier = None
+    return _local_classifier
+
+
+def reload_local_classifier() -> Optional[LocalCallClassifier]:
+    """Drop the cached model so the next lookup reads LATEST again"""
+    global _local_classifier, _local_classifier_loaded
+    _local_classifier, _local_classifier_loaded = None, False
+    return get_local_classifier()
+
+
+def get_classifier_agreement_tracker() -> ClassifierAgreementTracker:
+    global _agreement_tracker
+    if _agreement_tracker is None:
+        _agreement_tracker = ClassifierAgreementTracker()
+    return _agreement_tracker
@@ -0,0 +1,139 @@
+"""
+Prompt Compaction - Shrinks transcripts and prompt templates before LLM calls
+Normalizes whitespace, collapses disfluencies and stutters, drops filler-only
+turns ("uh-huh", "mm-hmm") and reports the estimated token savings. Short
+assent turns ("yes", "sounds good") are kept: a customer's lone "yes" is often
+what accepts the appointment.
+"""
+
+import logging
+import re
+from typing import Dict, Any, Optional, List, Tuple
+
+from services.transcript_windows import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Filler sounds that carry no meaning for analysis
+_FILLERS = re.compile(r'\b(?:u+m+|u+h+(?:-?h?u+h+)?|e+r+m+|a+h+|h+m+|m+-?h*m+)\b[,.]?\s*', re.IGNORECASE)
+# Stutters / immediate repeats: "I I I think" -> "I think", "the the" -> "the"
+# (spoken digits like "five five five" are left alone)
+_REPEATS = re.compile(
+    r'\b(?!(?:zero|oh|one|two|three|four|five|six|seven|eight|nine)\b)([A-Za-z]+)(?:[,\s]+\1\b)+',
+    re.IGNORECASE
+)
+_SPACES = re.compile(r'[ \t\f\v]+')
+_BLANK_LINES = re.compile(r'\n{3,}')
+_SPACE_BEFORE_PUNCT = re.compile(r'\s+([,.!?;:])')
+_DUPLICATE_PUNCT = re.compile(r'([,.!?;:])(?:\s*[,;:])+')
+_SPEAKER_LABEL = re.compile(r'^([A-Za-z][\w.\'-]*(?: [\w.\'-]+){0,2}):(?:\s+|$)(.*)$')
+
+# Turns made up only of these are pure fillers, not content (assent like "yes" or
+# "sounds good" is content: it can decide whether a consult was scheduled)
+BACKCHANNELS = {
+    "uh huh", "uh-huh", "mm hmm", "mm-hmm", "mhm", "mm", "hmm", "um", "uh",
+}
+
+
+def collapse_disfluencies(text: str) -> str:
+    """Remove fillers and stutters, normalize spacing within a line"""
+    if not text:
+        return ""
+    text = _FILLERS.sub("", text)
+    text = _REPEATS.sub(r"\1", text)
+    text = _SPACES.sub(" ", text)
+    text = _DUPLICATE_PUNCT.sub(r"\1", text)
+    text = _SPACE_BEFORE_PUNCT.sub(r"\1", text)
+    return text.strip(" ,")
+
+
+def is_backchannel(text: str) -> bool:
+    """True when a turn is nothing but filler sounds"""
+    normalized = re.sub(r'[^a-z\- ]+', ' ', (text or "").lower())
+    normalized = " ".join(normalized.split())
+    return not normalized or normalized in BACKCHANNELS
+
+
+def compact_transcript(transcript: str) -> str:
+    """
+    Compact a (possibly speaker-labelled) transcript line by line.
+    Filler-only turns are dropped and consecutive lines from the same speaker
+    are merged so the label is only sent once.
+    """
+    if not transcript:
+        return ""
+
+    lines: List[Tuple[Optional[str], str]] = []
+    for raw_line in transcript.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        match = _SPEAKER_LABEL.match(line)
+        speaker, content = (match.group(1), match.group(2)) if match else (None, line)
+        if is_backchannel(content):
+            continue
+        content = collapse_disfluencies(content)
+        if is_backchannel(content.strip("-")):
+            continue
+        if speaker and lines and lines[-1][0] == speaker:
+            lines[-1] = (speaker, f"{lines[-1][1]} {content}")
+        else:
+            lines.append((speaker, content))
+
+    return "\n".join(f"{speaker}: {content}" if speaker else content for speaker, content in lines)
+
+
+def compact_segments(segments: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Same compaction for diarization segments; filler-only segments are dropped"""
+    compacted = []
+    for segment in segments or []:
+        text = segment.get("text") or ""
+        if is_backchannel(text):
+            continue
+        text = collapse_disfluencies(text)
+        if is_backchannel(text.strip("-")):
+            continue
+        compacted.append({**segment, "text": text})
+    return compacted
+
+
+def compact_prompt(prompt: str) -> str:
+    """
+    Normalize whitespace in a prompt template without touching its structure:
+    trailing spaces and runs of blank lines are removed, indentation is kept.
+    """
+    if not prompt:
+        return ""
+    lines = []
+    for line in prompt.strip().splitlines():
+        stripped = line.rstrip()
+        indent = len(stripped) - len(stripped.lstrip(" "))
+        lines.append(" " * indent + _SPACES.sub(" ", stripped.lstrip(" ")))
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines))
+
+
+def compaction_stats(original: str, compacted: str) -> Dict[str, Any]:
+    """Estimated token counts before/after compaction"""
+    raw_tokens = estimate_tokens(original)
+    compacted_tokens = estimate_tokens(compacted)
+    return {
+        "raw_tokens": raw_tokens,
+        "compacted_tokens": compacted_tokens,
+        "saved_tokens": max(0, raw_tokens - compacted_tokens),
+    }
+
+
+def compact_for_llm(transcript: str, operation: str) -> str:
+    """Compact a transcript for an LLM call and record the estimated savings"""
+    compacted = compact_transcript(transcript)
+    if not compacted.strip():
+        # Never send an empty prompt because everything looked like filler
+        compacted = _SPACES.sub(" ", transcript or "").strip()
+    stats = compaction_stats(transcript, compacted)
+    try:
+        from services.llm_usage import get_llm_usage_tracker
+        get_llm_usage_tracker().record_compaction(operation, stats["raw_tokens"], stats["compacted_tokens"])
+    except Exception as e:
+        logger.debug(f"Could not record compaction stats: {e}")
+    logger.debug(f"🗜️ Compacted transcript for {operation}: {stats['raw_tokens']} -> {stats['compacted_tokens']} tokens")
+    return compacted
@@ -0,0 +1,421 @@
+"""
+Re-analysis Service - Re-runs call analysis over existing call_records
+Used after prompt or model changes. A job selects call_records by org, date
+range, category and bulk import job, walks them page by page in
+(created_at, id) order and runs the standard analysis graph on each with a
+bounded number of calls in flight per provider. The last fully processed
+record is checkpointed after every page so a restarted worker resumes there.
+The owning worker renews the job's heartbeat on a timer while it runs (a page
+can take longer than the stale window) and stops if another worker took the
+job over.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+
+from services.analysis_dag import run_call_analysis, get_org_analysis_concurrency
+from services.llm_usage import set_usage_org
+
+logger = logging.getLogger(__name__)
+
+REANALYSIS_PAGE_SIZE = int(os.getenv("REANALYSIS_PAGE_SIZE", "100"))
+# A running job whose heartbeat is older than this is considered orphaned and may be resumed
+REANALYSIS_STALE_SECONDS = int(os.getenv("REANALYSIS_STALE_SECONDS", "300"))
+# How often the owning worker renews the heartbeat (well inside the stale window)
+REANALYSIS_HEARTBEAT_SECONDS = float(os.getenv("REANALYSIS_HEARTBEAT_SECONDS", str(REANALYSIS_STALE_SECONDS / 3)))
+
+SUPPORTED_PROVIDERS = ("gemini", "openai")
+FILTER_KEYS = ("organization_id", "date_from", "date_to", "call_category", "bulk_import_job_id")
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+def default_provider_concurrency() -> Dict[str, int]:
+    return {
+        "gemini": int(os.getenv("REANALYSIS_CONCURRENCY_GEMINI", "4")),
+        "openai": int(os.getenv("REANALYSIS_CONCURRENCY_OPENAI", "4")),
+    }
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+_boot_id = uuid.uuid4().hex[:8]
+
+
+def _worker_id() -> str:
+    # Per call: forked workers share the module but not the pid
+    return f"{socket.gethostname()}-{os.getpid()}-{_boot_id}"
+
+
+def apply_reanalysis_filters(query, filters: Dict[str, Any]):
+    """Apply job filters to a call_records query"""
+    if filters.get("organization_id"):
+        query = query.eq("organization_id", filters["organization_id"])
+    if filters.get("date_from"):
+        query = query.gte("created_at", filters["date_from"])
+    if filters.get("date_to"):
+        query = query.lte("created_at", filters["date_to"])
+    if filters.get("call_category") == "uncategorized":
+        query = query.is_("call_category", "null")
+    elif filters.get("call_category"):
+        query = query.eq("call_category", filters["call_category"])
+    if filters.get("bulk_import_job_id"):
+        query = query.eq("bulk_import_job_id", filters["bulk_import_job_id"])
+    return query.not_.is_("transcript", "null")
+
+
+def count_matching_records(supabase, filters: Dict[str, Any]) -> int:
+    query = apply_reanalysis_filters(supabase.table("call_records").select("id", count="exact"), filters)
+    result = query.limit(1).execute()
+    return result.count or 0
+
+
+def fetch_records_page(supabase, filters: Dict[str, Any], checkpoint: Optional[Dict[str, Any]],
+                       page_size: int = REANALYSIS_PAGE_SIZE) -> List[Dict[str, Any]]:
+    """Next page of matching records after the checkpoint (keyset pagination on created_at, id)"""
+    query = apply_reanalysis_filters(
+        supabase.table("call_records").select("id, organization_id, transcript, created_at"), filters
+    )
+    if checkpoint:
+        created_at, record_id = checkpoint["created_at"], checkpoint["id"]
+        query = query.or_(f"created_at.gt.{created_at},and(created_at.eq.{created_at},id.gt.{record_id})")
+    result = query.order("created_at").order("id").limit(page_size).execute()
+    return result.data or []
+
+
+def get_diarization_segments(supabase, call_record_id: str) -> Optional[List[Dict[str, Any]]]:
+    """Speaker segments stored with the call's most recent transcription, if any"""
+    try:
+        result = (
+            supabase.table("transcription_queue")
+            .select("diarization_segments")
+            .eq("call_record_id", call_record_id)
+            .order("created_at", desc=True)
+            .limit(1)
+            .execute()
+        )
+        if result.data:
+            return result.data[0].get("diarization_segments") or None
+    except Exception as e:
+        logger.debug(f"No diarization segments for {call_record_id}: {e}")
+    return None
+
+
+def answering_providers(results: Dict[str, Any]) -> List[Optional[str]]:
+    """
+    Provider that answered each LLM step of an analysis: categorization (unless
+    the local classifier took it) and objection detection. None for a step that
+    fell back to heuristics or failed.
+    """
+    categorize = results.get("categorize") or {}
+    reasoning = categorize.get("reasoning") or ""
+    answered = []
+    if "[LOCAL MODEL]" not in reasoning:
+        answered.append(None if "[HEURISTIC" in reasoning else categorize.get("provider"))
+    objections = results.get("objections")
+    reliable = objections is not None and getattr(objections, "reliable", True)
+    answered.append(getattr(objections, "provider", None) if reliable else None)
+    return answered
+
+
+class ProviderPool:
+    """
+    Bounded concurrency across providers: each provider has its own slot count
+    and a record goes to whichever provider has the most free slots.
+    """
+
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = {p: max(1, int(n)) for p, n in limits.items() if n}
+        if not self.limits:
+            raise ValueError("At least one provider with concurrency > 0 is required")
+        self.in_flight = {p: 0 for p in self.limits}
+        self._condition = asyncio.Condition()
+
+    def _free(self, provider: str) -> int:
+        return self.limits[provider] - self.in_flight[provider]
+
+    async def acquire(self) -> str:
+        async with self._condition:
+            await self._condition.wait_for(lambda: any(self._free(p) > 0 for p in self.limits))
+            provider = max(self.limits, key=self._free)
+            self.in_flight[provider] += 1
+            return provider
+
+    async def release(self, provider: str):
+        async with self._condition:
+            self.in_flight[provider] -= 1
+            self._condition.notify()
+
+
+class ReanalysisProgress:
+    """Counters for one run plus the totals carried over from earlier runs of the job"""
+
+    def __init__(self, total: int, processed: int = 0, failed: int = 0, providers: Optional[Dict[str, Dict[str, int]]] = None,
+                 skipped: int = 0):
+        self.total = total
+        self.processed = processed
+        self.failed = failed
+        self.skipped = skipped
+        self.providers: Dict[str, Dict[str, int]] = {p: dict(s) for p, s in (providers or {}).items()}
+        self._run_started = time.monotonic()
+        self._run_processed = 0
+
+    def record(self, provider: str, ok: bool, provider_error: bool, skipped: bool = False,
+               answered_by: Optional[str] = None):
+        """One record on `provider`; answered_by is another provider the chain fell back to"""
+        self.processed += 1
+        self.failed += int(not ok)
+        self._run_processed += 1
+        if skipped:
+            # Unchanged since its last analysis; no provider call was made
+            self.skipped += 1
+            return
+        stats = self.providers.setdefault(provider, {"processed": 0, "errors": 0})
+        stats["processed"] += 1
+        stats["errors"] += int(provider_error)
+        if answered_by and answered_by != provider:
+            self.providers.setdefault(answered_by, {"processed": 0, "errors": 0})["processed"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self._run_started
+        throughput = (self._run_processed / elapsed * 60) if elapsed > 0 else 0.0
+        remaining = max(0, self.total - self.processed)
+        return {
+            "total": self.total,
+            "processed": self.processed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "progress_percentage": round(self.processed / self.total * 100, 1) if self.total else 100.0,
+            "throughput_per_minute": round(throughput, 1),
+            "eta_seconds": int(remaining / throughput * 60) if throughput else None,
+            "providers": {
+                p: {**s, "error_rate": round(s["errors"] / s["processed"], 4) if s["processed"] else 0.0}
+                for p, s in self.providers.items()
+            },
+        }
+
+
+class ReanalysisJobRunner:
+    """Runs (or resumes) one reanalysis_jobs row to completion"""
+
+    def __init__(self, supabase, job: Dict[str, Any], analysis_service=None):
+        from services.call_analysis_service import CallAnalysisService
+        self.supabase = supabase
+        self.job = job
+        self.job_id = job["id"]
+        self.filters = {k: v for k, v in (job.get("filters") or {}).items() if k in FILTER_KEYS and v}
+        self.analysis_service = analysis_service or CallAnalysisService(supabase)
+
+    def _provider_limits(self) -> Dict[str, int]:
+        configured = {**default_provider_concurrency(), **(self.job.get("provider_concurrency") or {})}
+        requested = self.job.get("providers") or list(SUPPORTED_PROVIDERS)
+        available = {
+            "gemini": bool(self.analysis_service.gemini_key),
+            "openai": bool(self.analysis_service.openai_key),
+        }
+        limits = {p: configured.get(p, 0) for p in requested if p in SUPPORTED_PROVIDERS and available.get(p)}
+        # Without any keys the analysis falls back to heuristics; still bound it
+        return limits or {"heuristic": configured.get("openai", 4)}
+
+    def _update_job(self, fields: Dict[str, Any], unless_cancelled: bool = False) -> bool:
+        """Write fields to the job row; unless_cancelled leaves a job a user cancelled meanwhile alone"""
+        query = self.supabase.table("reanalysis_jobs").update({**fields, "updated_at": _now()}).eq("id", self.job_id)
+        if unless_cancelled:
+            query = query.neq("status", "cancelled")
+        return bool(query.execute().data)
+
+    def _is_cancelled(self) -> bool:
+        result = self.supabase.table("reanalysis_jobs").select("status").eq("id", self.job_id).execute()
+        return bool(result.data) and result.data[0].get("status") == "cancelled"
+
+    async def _analyze(self, record: Dict[str, Any], provider: str) -> Dict[str, bool]:
+        """Run the analysis graph for one record; reports success, skip and whether the provider failed"""
+        call_record_id = record["id"]
+        set_usage_org(record.get("organization_id"))
+        try:
+            segments = await asyncio.to_thread(get_diarization_segments, self.supabase, call_record_id)
+            concurrency = get_org_analysis_concurrency(self.supabase, org_id=record.get("organization_id"))
+            results = await run_call_analysis(
+                self.supabase,
+                self.analysis_service,
+                transcript=record["transcript"],
+                call_record_id=call_record_id,
+                provider=provider,
+                max_concurrency=concurrency,
+                segments=segments,
+                force=bool(self.job.get("force")),
+            )
+            if results is None:
+                return {"ok": True, "provider_error": False, "skipped": True}
+            if provider == "heuristic":
+                return {"ok": True, "provider_error": False, "skipped": False}
+            answered = answering_providers(results)
+            return {
+                "ok": True,
+                # Fell back to the other provider or to heuristics for some step
+                "provider_error": any(p != provider for p in answered),
+                "skipped": False,
+                "answered_by": next((p for p in answered if p and p != provider), None),
+            }
+        except Exception as e:
+            logger.warning(f"⚠️ Re-analysis failed for call_record {call_record_id} ({provider}): {e}")
+            return {"ok": False, "provider_error": True, "skipped": False}
+
+    async def _run_page(self, records: List[Dict[str, Any]], pool: ProviderPool, progress: ReanalysisProgress):
+        async def one(record):
+            provider = await pool.acquire()
+            try:
+                outcome = await self._analyze(record, provider)
+            finally:
+                await pool.release(provider)
+            progress.record(
+                provider, outcome["ok"], outcome["provider_error"], outcome["skipped"], outcome.get("answered_by")
+            )
+
+        await asyncio.gather(*(one(record) for record in records))
+
+    async def run(self) -> Dict[str, Any]:
+        stats = self.job.get("stats") or {}
+        checkpoint = self.job.get("checkpoint")
+        total = self.job.get("total_records") or 0
+        if not checkpoint or not total:
+            total = await asyncio.to_thread(count_matching_records, self.supabase, self.filters)
+        progress = ReanalysisProgress(
+            total,
+            processed=self.job.get("processed_records") or 0,
+            failed=self.job.get("failed_records") or 0,
+            providers=stats.get("providers"),
+            skipped=stats.get("skipped") or 0,
+        )
+        pool = ProviderPool(self._provider_limits())
+        logger.info(
+            f"🔁 {'Resuming' if checkpoint else 'Starting'} re-analysis job {self.job_id}: "
+            f"{total} records, providers={pool.limits}, checkpoint={checkpoint}"
+        )
+        self._update_job({
+            "status": "running",
+            "total_records": total,
+            "heartbeat_at": _now(),
+            **({} if self.job.get("started_at") else {"started_at": _now()}),
+        })
+
+        try:
+            while True:
+                if await asyncio.to_thread(self._is_cancelled):
+                    logger.info(f"⏹️ Re-analysis job {self.job_id} cancelled at {progress.processed}/{total}")
+                    return progress.snapshot()
+                records = await asyncio.to_thread(fetch_records_page, self.supabase, self.filters, checkpoint)
+                if not records:
+                    break
+                await self._run_page(records, pool, progress)
+                checkpoint = {"created_at": records[-1]["created_at"], "id": records[-1]["id"]}
+                snapshot = progress.snapshot()
+                self._update_job({
+                    "checkpoint": checkpoint,
+                    "processed_records": progress.processed,
+                    "failed_records": progress.failed,
+                    "stats": snapshot,
+                    "heartbeat_at": _now(),
+                })
+                logger.info(
+                    f"📊 Re-analysis job {self.job_id}: {progress.processed}/{total} "
+                    f"({snapshot['throughput_per_minute']}/min, {progress.failed} failed)"
+                )
+
+            snapshot = progress.snapshot()
+            if self._update_job({"status": "completed", "stats": snapshot, "completed_at": _now()}, unless_cancelled=True):
+                logger.info(f"✅ Re-analysis job {self.job_id} completed: {progress.processed} records, {progress.failed} failed")
+            else:
+                logger.info(f"⏹️ Re-analysis job {self.job_id} cancelled during its last page")
+            return snapshot
+        except Exception as e:
+            logger.error(f"❌ Re-analysis job {self.job_id} failed: {e}", exc_info=True)
+            self._update_job({"status": "failed", "error_message": str(e), "stats": progress.snapshot()}, unless_cancelled=True)
+            raise
+
+
+# Jobs running in this process, so a job is never run twice by the same worker
+_running_jobs: Dict[str, asyncio.Task] = {}
+
+
+def claim_reanalysis_job(supabase, job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Take ownership of a pending job, or of a running job whose heartbeat went
+    stale (its worker died). Returns the job row when claimed.
+    """
+    stale_before = (datetime.now(timezone.utc) - timedelta(seconds=REANALYSIS_STALE_SECONDS)).isoformat()
+    result = (
+        supabase.table("reanalysis_jobs")
+        .update({"status": "running", "owner": _worker_id(), "heartbeat_at": _now(), "updated_at": _now()})
+        .eq("id", job_id)
+        .or_(f"status.eq.pending,and(status.eq.running,heartbeat_at.lt.{stale_before})")
+        .execute()
+    )
+    return result.data[0] if result.data else None
+
+
+def renew_reanalysis_heartbeat(supabase, job_id: str) -> bool:
+    """Refresh the heartbeat of a job we own; False when another worker has taken it over"""
+    result = (
+        supabase.table("reanalysis_jobs")
+        .update({"heartbeat_at": _now()})
+        .eq("id", job_id)
+        .eq("owner", _worker_id())
+        .execute()
+    )
+    return bool(result.data)
+
+
+async def _keep_heartbeat(supabase, job_id: str, task: asyncio.Task):
+    """Renew the heartbeat while the job runs; stop the job if it is no longer ours"""
+    while True:
+        await asyncio.sleep(REANALYSIS_HEARTBEAT_SECONDS)
+        try:
+            renewed = renew_reanalysis_heartbeat(supabase, job_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not renew heartbeat of re-analysis job {job_id}: {e}")
+            continue
+        if not renewed:
+            logger.warning(f"⚠️ Re-analysis job {job_id} was taken over by another worker, stopping here")
+            task.cancel()
+            return
+
+
+def start_reanalysis_job(supabase, job_id: str) -> bool:
+    """Claim the job and run it in the background of this process"""
+    if job_id in _running_jobs and not _running_jobs[job_id].done():
+        return False
+    job = claim_reanalysis_job(supabase, job_id)
+    if not job:
+        return False
+
+    async def runner():
+        keeper = asyncio.create_task(_keep_heartbeat(supabase, job_id, asyncio.current_task()))
+        try:
+            await ReanalysisJobRunner(supabase, job).run()
+        except asyncio.CancelledError:
+            logger.info(f"⏹️ Re-analysis job {job_id} stopped on this worker")
+        except Exception:
+            pass  # Already recorded on the job row
+        finally:
+            keeper.cancel()
+            _running_jobs.pop(job_id, None)
+
+    _running_jobs[job_id] = asyncio.create_task(runner())
+    return True
+
+
+def resume_reanalysis_jobs(supabase) -> List[str]:
+    """Resume pending jobs and running jobs orphaned by a restart"""
+    result = supabase.table("reanalysis_jobs").select("id").in_("status", ["pending", "running"]).execute()
+    resumed = [row["id"] for row in result.data or [] if start_reanalysis_job(supabase, row["id"])]
+    if resumed:
+        logger.info(f"🔁 Resumed {len(resumed)} re-analysis job(s): {resumed}")
+    return resumed
@@ -0,0 +1,112 @@
+"""
+Single Flight - Coalesce identical concurrent work into one computation
+Double-clicks, frontend retries and parallel retranscribe triggers start the
+same transcription, analysis or follow-up generation for a call at the same
+moment. Work is keyed by (operation, call_record_id, input hash); while a key
+is in flight, further callers wait for its result (or exception) instead of
+calling the provider again. Nothing is cached: the key is released as soon
+as the computation finishes.
+
+The registry is shared by async callers on any event loop (analysis runs on
+per-thread loops) and by plain threads (background transcription), so the
+in-flight result is a concurrent.futures.Future. A leader whose own caller is
+cancelled keeps running for the others. Coalescing is per worker process.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+FlightKey = Tuple[str, str, str]
+
+
+def flight_key(operation: str, call_record_id: Optional[str], *inputs: Any) -> FlightKey:
+    """(operation, call_record_id, sha256 of the inputs)"""
+    payload = json.dumps(inputs, sort_keys=True, default=str)
+    return operation, call_record_id or "", hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[FlightKey, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _join_or_lead(self, key: FlightKey) -> Tuple[concurrent.futures.Future, bool]:
+        with self._lock:
+            counters = self._counters.setdefault(key[0], {"executed": 0, "coalesced": 0})
+            future = self._inflight.get(key)
+            if future is not None:
+                counters["coalesced"] += 1
+                return future, False
+            future = concurrent.futures.Future()
+            self._inflight[key] = future
+            counters["executed"] += 1
+            return future, True
+
+    def _release(self, key: FlightKey, future: concurrent.futures.Future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def do(self, key: FlightKey, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() unless the same key is already in flight; either way return its result"""
+        future, leader = self._join_or_lead(key)
+        if not leader:
+            logger.info(f"🔗 Joining in-flight {key[0]} for {key[1] or 'request'}")
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        task = asyncio.ensure_future(fn())
+
+        def settle(done: asyncio.Future):
+            self._release(key, future)
+            if done.cancelled():
+                future.cancel()
+            elif done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                future.set_result(done.result())
+
+        task.add_done_callback(settle)
+        return await asyncio.shield(task)
+
+    def do_sync(self, key: FlightKey, fn: Callable[[], T]) -> T:
+        """Blocking variant for code running in threads"""
+        future, leader = self._join_or_lead(key)
+        if not leader:
+            logger.info(f"🔗 Joining in-flight {key[0]} for {key[1] or 'request'}")
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._release(key, future)
+            future.set_exception(e)
+            raise
+        self._release(key, future)
+        future.set_result(result)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight: Dict[str, int] = {}
+            for operation, _, _ in self._inflight:
+                in_flight[operation] = in_flight.get(operation, 0) + 1
+            return {
+                "in_flight": in_flight,
+                "operations": {op: dict(c) for op, c in self._counters.items()},
+            }
+
+
+# Created eagerly: background threads may race to the first lookup
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    return _single_flight
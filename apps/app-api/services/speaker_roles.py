@@ -0,0 +1,171 @@
+"""
+Speaker Roles - Identifies the agent and the customer in diarized transcripts
+Objections only come from the caller, so objection detection can send the
+customer's turns (plus a little agent context) instead of the whole call.
+"""
+
+import logging
+import os
+import re
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger(__name__)
+
+AGENT = "agent"
+CUSTOMER = "customer"
+
+# Phrases the practice/agent side typically says
+AGENT_CUES = [
+    "thank you for calling", "thanks for calling", "how can i help", "how may i help",
+    "how can i assist", "this is", "my name is", "speaking", "our office", "our clinic",
+    "we offer", "we have availability", "let me check", "let me see", "i can get you",
+    "schedule you", "book you", "our doctor", "date of birth", "can i get your",
+    "can i have your", "is there anything else",
+]
+
+# Phrases the caller/patient typically says
+CUSTOMER_CUES = [
+    "insurance", "afford", "how much", "cost", "price", "i'm calling", "i am calling",
+    "i was wondering", "i'd like to", "i would like to", "i want to", "my husband",
+    "my wife", "my daughter", "my son", "i saw your", "i heard", "do you take",
+    "do you accept", "i need to", "can i come", "i'm worried", "i'm not sure",
+]
+
+_AGENT_PATTERN = re.compile(r'\b(?:' + '|'.join(re.escape(c) for c in AGENT_CUES) + r')\b')
+_CUSTOMER_PATTERN = re.compile(r'\b(?:' + '|'.join(re.escape(c) for c in CUSTOMER_CUES) + r')\b')
+
+# Below this margin the roles are considered a guess and callers should keep the full transcript
+MIN_ROLE_CONFIDENCE = float(os.getenv("SPEAKER_ROLE_MIN_CONFIDENCE", "0.6"))
+
+
+def resolve_speaker_roles(segments: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Score each diarized speaker as agent or customer.
+
+    Signals: agent/customer phrases, who opens the call (the practice usually
+    answers) and who answers the greeting, and turn counts (callers tend to take
+    fewer turns). Returns {"roles": {speaker: role}, "customer_speaker",
+    "agent_speaker", "confidence", "method"}.
+    """
+    speakers: Dict[str, Dict[str, float]] = {}
+    order: List[str] = []
+    for segment in segments or []:
+        speaker = segment.get("speaker")
+        text = (segment.get("text") or "").lower()
+        if not speaker or not text.strip():
+            continue
+        if speaker not in speakers:
+            speakers[speaker] = {"agent": 0.0, "customer": 0.0, "turns": 0}
+            order.append(speaker)
+        stats = speakers[speaker]
+        stats["turns"] += 1
+        stats["agent"] += len(_AGENT_PATTERN.findall(text))
+        stats["customer"] += len(_CUSTOMER_PATTERN.findall(text))
+
+    if len(speakers) < 2:
+        only = order[0] if order else None
+        return {
+            "roles": {only: CUSTOMER} if only else {},
+            "customer_speaker": only,
+            "agent_speaker": None,
+            "confidence": 0.0,
+            "method": "single_speaker",
+        }
+
+    # Greeting: first speaker answers the phone, second one answers the greeting
+    speakers[order[0]]["agent"] += 1.0
+    speakers[order[1]]["customer"] += 0.5
+
+    # Turn counts: the speaker with the fewest turns leans customer
+    fewest = min(order, key=lambda s: speakers[s]["turns"])
+    speakers[fewest]["customer"] += 0.5
+
+    def customer_margin(speaker: str) -> float:
+        return speakers[speaker]["customer"] - speakers[speaker]["agent"]
+
+    ranked = sorted(order, key=customer_margin, reverse=True)
+    customer_speaker = ranked[0]
+    agent_speaker = ranked[-1]
+
+    # Positional signals alone give a gap of ~2 (confidence 0.5); each phrase cue adds evidence
+    gap = customer_margin(customer_speaker) - customer_margin(ranked[1])
+    confidence = round(gap / (gap + 2.0), 2) if gap > 0 else 0.0
+
+    roles = {s: (CUSTOMER if s == customer_speaker else AGENT) for s in order}
+    return {
+        "roles": roles,
+        "customer_speaker": customer_speaker,
+        "agent_speaker": agent_speaker,
+        "confidence": confidence,
+        "method": "heuristic",
+    }
+
+
+def label_segments(segments: Optional[List[Dict[str, Any]]], roles: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Copy of the diarization segments with a "role" key on each"""
+    return [{**segment, "role": roles.get(segment.get("speaker"), AGENT)} for segment in segments or []]
+
+
+def customer_focused_segments(
+    segments: Optional[List[Dict[str, Any]]],
+    speaker_roles: Dict[str, Any],
+    context_chars: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Keep every customer turn and, for context, the tail of the agent turn that
+    immediately precedes it. Everything else is dropped.
+    """
+    if context_chars is None:
+        context_chars = int(os.getenv("SPEAKER_CONTEXT_CHARS", "160"))
+    roles = speaker_roles.get("roles") or {}
+    labeled = label_segments(segments, roles)
+
+    focused: List[Dict[str, Any]] = []
+    for i, segment in enumerate(labeled):
+        if segment["role"] != CUSTOMER:
+            continue
+        previous = labeled[i - 1] if i > 0 else None
+        if previous and previous["role"] != CUSTOMER and context_chars > 0:
+            text = (previous.get("text") or "").strip()
+            if len(text) > context_chars:
+                text = "..." + text[-context_chars:].split(" ", 1)[-1]
+            focused.append({**previous, "speaker": f"{previous.get('speaker')} (agent)", "text": text})
+        focused.append({**segment, "speaker": f"{segment.get('speaker')} (customer)"})
+    return focused
+
+
+def get_cached_speaker_roles(supabase, call_record_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Speaker roles previously stored on the call record"""
+    if not supabase or not call_record_id:
+        return None
+    try:
+        result = supabase.table("call_records").select("speaker_roles").eq("id", call_record_id).execute()
+        if result and result.data:
+            cached = result.data[0].get("speaker_roles")
+            return cached if isinstance(cached, dict) and cached.get("roles") else None
+    except Exception as e:
+        logger.debug(f"Could not read cached speaker roles for {call_record_id}: {e}")
+    return None
+
+
+def get_or_resolve_speaker_roles(
+    supabase,
+    call_record_id: Optional[str],
+    segments: Optional[List[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """Cached roles for the call record, resolving and caching them on a miss"""
+    cached = get_cached_speaker_roles(supabase, call_record_id)
+    if cached and set(cached["roles"]) >= {s.get("speaker") for s in segments or [] if s.get("speaker")}:
+        return cached
+
+    speaker_roles = resolve_speaker_roles(segments)
+    logger.info(
+        f"🗣️ Resolved speaker roles for {call_record_id}: customer={speaker_roles['customer_speaker']}, "
+        f"agent={speaker_roles['agent_speaker']}, confidence={speaker_roles['confidence']}"
+    )
+    if supabase and call_record_id and speaker_roles["roles"]:
+        try:
+            supabase.table("call_records").update({"speaker_roles": speaker_roles}).eq("id", call_record_id).execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Could not cache speaker roles on call_record {call_record_id}: {e}")
+    return speaker_roles
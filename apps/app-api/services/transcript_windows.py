@@ -0,0 +1,160 @@
+"""
+Transcript Windows - Splits long transcripts into overlapping speaker-turn windows
+Used by windowed (map-reduce) analysis so long calls are analyzed in full instead
+of being truncated to the first few thousand characters.
+"""
+
+import logging
+import re
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger(__name__)
+
+# Rough estimate used for budgeting only (~4 characters per token for English)
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+_QUOTE_NORMALIZE = re.compile(r'[^a-z0-9 ]+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for prompt budgeting"""
+    if not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _split_oversized(text: str, token_budget: int) -> List[str]:
+    """Split a single turn that is larger than the budget on sentence, then word boundaries"""
+    max_chars = max(1, token_budget * CHARS_PER_TOKEN)
+    pieces: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_SPLIT.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        pieces.append(current)
+    return [p for p in pieces if p]
+
+
+def segments_to_turns(segments: Optional[List[Dict[str, Any]]]) -> List[str]:
+    """Merge consecutive diarization segments from the same speaker into turns"""
+    turns: List[str] = []
+    last_speaker = None
+    for segment in segments or []:
+        text = (segment.get("text") or "").strip()
+        if not text:
+            continue
+        speaker = segment.get("speaker") or "Speaker"
+        if speaker == last_speaker and turns:
+            turns[-1] = f"{turns[-1]} {text}"
+        else:
+            turns.append(f"{speaker}: {text}")
+            last_speaker = speaker
+    return turns
+
+
+def text_to_turns(transcript: str) -> List[str]:
+    """Fallback for transcripts without diarization: one turn per non-empty line"""
+    return [line.strip() for line in (transcript or "").splitlines() if line.strip()]
+
+
+def build_windows(
+    transcript: str,
+    segments: Optional[List[Dict[str, Any]]] = None,
+    token_budget: int = 1000,
+    overlap_turns: int = 2,
+) -> List[str]:
+    """
+    Pack speaker turns into windows of at most token_budget (estimated) tokens.
+    Each window repeats the last overlap_turns turns of the previous one so an
+    objection spanning a window boundary is still seen with its context.
+    """
+    token_budget = max(1, int(token_budget))
+    turns = segments_to_turns(segments) or text_to_turns(transcript)
+
+    units: List[str] = []
+    for turn in turns:
+        if estimate_tokens(turn) > token_budget:
+            units.extend(_split_oversized(turn, token_budget))
+        else:
+            units.append(turn)
+
+    # Budget on characters (joined with newlines) so the estimate of the final window is exact
+    max_chars = token_budget * CHARS_PER_TOKEN
+    windows: List[str] = []
+    current: List[str] = []
+    current_chars = 0
+    for unit in units:
+        unit_chars = len(unit) + 1
+        if current and current_chars + unit_chars > max_chars:
+            windows.append("\n".join(current))
+            # Carry over trailing turns as overlap, but never more than half the budget
+            carry: List[str] = []
+            carry_chars = 0
+            for prev in reversed(current[-overlap_turns:] if overlap_turns > 0 else []):
+                prev_chars = len(prev) + 1
+                if carry_chars + prev_chars + unit_chars > max_chars or carry_chars + prev_chars > max_chars // 2:
+                    break
+                carry.insert(0, prev)
+                carry_chars += prev_chars
+            current, current_chars = carry, carry_chars
+        current.append(unit)
+        current_chars += unit_chars
+    if current:
+        windows.append("\n".join(current))
+
+    logger.info(f"🪟 Built {len(windows)} transcript windows from {len(units)} turns (budget={token_budget} tokens)")
+    return windows
+
+
+def _normalize_quote(value: str) -> str:
+    return " ".join(_QUOTE_NORMALIZE.sub(" ", (value or "").lower()).split())
+
+
+def _confidence(objection: Dict[str, Any]) -> float:
+    try:
+        return float(objection.get("confidence") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def merge_objections(window_results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Reduce step: merge per-window objections, deduplicating by type and quote.
+    Quotes that contain one another (same objection seen in an overlap) count as
+    duplicates; the higher-confidence entry wins.
+    """
+    merged: List[Dict[str, Any]] = []
+    keys: List[tuple] = []
+    for objections in window_results:
+        for objection in objections or []:
+            obj_type = objection.get("type") or "other"
+            quote = _normalize_quote(objection.get("segment") or objection.get("text") or "")
+            duplicate_index = None
+            for i, (existing_type, existing_quote) in enumerate(keys):
+                if existing_type != obj_type:
+                    continue
+                if existing_quote == quote or (quote and existing_quote and (quote in existing_quote or existing_quote in quote)):
+                    duplicate_index = i
+                    break
+            if duplicate_index is None:
+                merged.append(objection)
+                keys.append((obj_type, quote))
+                continue
+            existing = merged[duplicate_index]
+            if _confidence(objection) > _confidence(existing):
+                merged[duplicate_index] = objection
+                keys[duplicate_index] = (obj_type, quote)
+    return merged